@@ -0,0 +1,178 @@
+"""
+Run N bookings up to a solved Step 1 captcha (nothing is submitted) with
+the sync engine (one thread + Playwright driver + browser per job, like
+the GUI) and the async engine (one event loop, one shared browser), and
+compare CPU time per job and resident memory per job of the process tree.
+Memory/CPU figures read /proc, so they need Linux.
+
+Usage:
+    uv run python -m benchmarks.async_engine --jobs 10
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+from src.async_booking import AsyncBookingAssistant
+from src.booking import BookingAssistant, LAUNCH_ARGS
+from benchmarks.engine_footprint import tree_rss_mb
+
+
+def tree_cpu_ticks(pid: int) -> dict:
+    """Pid -> user + system CPU ticks for a process and its live descendants."""
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # After the comm field: [1] = ppid, [11]/[12] = utime/stime
+        stats[int(entry)] = (int(fields[1]), int(fields[11]) + int(fields[12]))
+
+    ticks, pending = {}, [pid]
+    while pending:
+        current = pending.pop()
+        if current in stats:
+            ticks[current] = stats[current][1]
+        pending.extend(child for child, (parent, _) in stats.items() if parent == current)
+    return ticks
+
+
+class TreeSampler:
+    """
+    Sample the process tree in the background: peak RSS, and CPU time
+    including browser processes that exit before the run ends.
+    """
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak_rss = 0.0
+        self.cpu_at_start = 0.0
+        self._ticks = {}  # pid -> last CPU ticks seen
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample_once(self):
+        self.peak_rss = max(self.peak_rss, tree_rss_mb())
+        self._ticks.update(tree_cpu_ticks(os.getpid()))
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self._sample_once()
+            self._stop.wait(self.interval)
+
+    @property
+    def cpu_seconds(self) -> float:
+        return sum(self._ticks.values()) / os.sysconf("SC_CLK_TCK")
+
+    def __enter__(self):
+        self._sample_once()
+        self.cpu_at_start = self.cpu_seconds
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample_once()
+
+
+def sync_job(errors: list):
+    """One sync job: own browser, booking page, form fill, captcha solved."""
+    assistant = BookingAssistant(on_success=lambda: None, on_error=errors.append)
+    assistant.config["headless"] = True
+    try:
+        assistant._stage_launch()
+        if assistant._stage_prefill():
+            assistant.solve_and_fill_captcha()
+        else:
+            errors.append("page load failed")
+    except Exception as e:
+        errors.append(str(e))
+    finally:
+        assistant.close()
+
+
+def run_sync(jobs: int) -> list:
+    errors = []
+    threads = [threading.Thread(target=sync_job, args=(errors,)) for _ in range(jobs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+async def run_async(jobs: int) -> list:
+    from playwright.async_api import async_playwright
+
+    errors = []
+
+    async def job(browser):
+        assistant = AsyncBookingAssistant(browser=browser, on_success=lambda: None, on_error=errors.append)
+        try:
+            await assistant._stage_launch()
+            if await assistant._stage_prefill():
+                await assistant.solve_and_fill_captcha()
+            else:
+                errors.append("page load failed")
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            await assistant.close()
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        try:
+            await asyncio.gather(*(job(browser) for _ in range(jobs)))
+        finally:
+            await browser.close()
+    return errors
+
+
+def measure(name: str, func) -> dict:
+    baseline_rss = tree_rss_mb()
+    started = time.perf_counter()
+    with TreeSampler() as sampler:
+        errors = func()
+    return {
+        "engine": name,
+        "wall": time.perf_counter() - started,
+        "cpu": sampler.cpu_seconds - sampler.cpu_at_start,
+        "rss": sampler.peak_rss - baseline_rss,
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the sync and async engines on N concurrent jobs")
+    parser.add_argument("--jobs", type=int, default=10, help="Concurrent jobs per engine")
+    args = parser.parse_args(argv)
+
+    # Load the OCR model first so neither engine pays for it
+    BookingAssistant().solver.warm_up()
+
+    results = [
+        measure("sync (thread per job)", lambda: run_sync(args.jobs)),
+        measure("async (one loop)", lambda: asyncio.run(run_async(args.jobs))),
+    ]
+
+    print(f"\n=== {args.jobs} jobs up to a solved captcha ===")
+    for result in results:
+        ok = args.jobs - len(result["errors"])
+        print(f"{result['engine']}:")
+        print(f"  wall           {result['wall']:.1f} s ({ok}/{args.jobs} ok)")
+        print(f"  cpu per job    {result['cpu'] / args.jobs:.2f} s "
+              f"(~{args.jobs / max(result['cpu'], 1e-9) * result['wall']:.1f} jobs per core over the run)")
+        print(f"  rss per job    {result['rss'] / args.jobs:.0f} MiB (peak {result['rss']:.0f} MiB over idle)")
+        for error in result["errors"][:3]:
+            print(f"  error: {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,107 @@
+"""
+Compare captcha capture paths on the live booking page:
+network response bytes vs. element screenshot.
+
+Usage:
+    uv run python -m benchmarks.captcha_capture --rounds 20
+    uv run python -m benchmarks.captcha_capture --rounds 10 --label
+    uv run python -m benchmarks.captcha_capture --rounds 100 --label --save captchas/
+
+With --label the browser stays visible and you type each captcha as
+shown, which turns OCR agreement into real per-path accuracy. --save
+also keeps each labelled captcha (network bytes) as <LABEL>_<n>.png,
+the corpus format benchmarks.captcha_eval reads.
+"""
+import argparse
+import time
+from pathlib import Path
+
+from src.booking import BookingAssistant, CAPTCHA_LOADED_JS
+from src.config import Selectors
+from src.stats import summarize_ms
+
+SOURCES = ("network", "screenshot")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark captcha capture: network vs screenshot")
+    parser.add_argument("--rounds", type=int, default=20, help="Captchas to capture")
+    parser.add_argument("--label", action="store_true", help="Type each captcha to measure OCR accuracy")
+    parser.add_argument("--headless", action="store_true", help="Run browser headless (ignored with --label)")
+    parser.add_argument("--save", metavar="DIR", help="Save labelled captchas here (needs --label)")
+    args = parser.parse_args(argv)
+    if args.save:
+        Path(args.save).mkdir(parents=True, exist_ok=True)
+
+    assistant = BookingAssistant()
+    assistant.config["headless"] = args.headless and not args.label
+    assistant.config["wait_profile"] = "turbo"
+
+    capture_ms = {source: [] for source in SOURCES}
+    ocr_ms = {source: [] for source in SOURCES}
+    correct = {source: 0 for source in SOURCES}
+    missing_network = 0
+    agreed = 0
+    labelled = 0
+
+    try:
+        assistant.start()
+        if not assistant.open_booking_page():
+            return 1
+        assistant.dismiss_cookie_dialog()
+
+        for round_no in range(1, args.rounds + 1):
+            assistant.page.wait_for_function(CAPTCHA_LOADED_JS, arg=Selectors.CAPTCHA_IMAGE)
+
+            images = {}
+            started = time.perf_counter()
+            images["network"] = assistant._captcha_bytes_from_network()
+            capture_ms["network"].append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            images["screenshot"] = assistant.page.locator(Selectors.CAPTCHA_IMAGE).screenshot()
+            capture_ms["screenshot"].append((time.perf_counter() - started) * 1000)
+
+            if not images["network"]:
+                missing_network += 1
+                images["network"] = images["screenshot"]
+
+            texts = {}
+            for source in SOURCES:
+                started = time.perf_counter()
+                texts[source] = assistant.solver.solve_bytes(images[source])
+                ocr_ms[source].append((time.perf_counter() - started) * 1000)
+
+            agreed += texts["network"].upper() == texts["screenshot"].upper()
+            line = f"[{round_no}/{args.rounds}] network={texts['network']!r} screenshot={texts['screenshot']!r}"
+
+            if args.label:
+                label = input(f"{line}  captcha shown: ").strip().upper()
+                labelled += 1
+                for source in SOURCES:
+                    correct[source] += texts[source].upper() == label
+                if args.save and label:
+                    Path(args.save, f"{label}_{time.time_ns()}.png").write_bytes(images["network"])
+            else:
+                print(line)
+
+            assistant.refresh_captcha()
+    finally:
+        assistant.close()
+
+    rounds = len(capture_ms["screenshot"])
+    print("\n=== Captcha capture benchmark ===")
+    for source in SOURCES:
+        print(f"{source:<10} capture: {summarize_ms(capture_ms[source])}")
+        print(f"{'':<10} OCR:     {summarize_ms(ocr_ms[source])}")
+        if labelled:
+            print(f"{'':<10} accuracy: {correct[source]}/{labelled} ({correct[source] / labelled:.0%})")
+    if rounds:
+        print(f"OCR agreement between paths: {agreed}/{rounds} ({agreed / rounds:.0%})")
+    if missing_network:
+        print(f"Network response not captured in {missing_network} round(s) (screenshot used)")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
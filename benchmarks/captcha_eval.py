@@ -0,0 +1,149 @@
+"""
+OCR accuracy and latency on a labelled local captcha corpus, with and
+without confidence scoring, and how each CAPTCHA_MIN_CONFIDENCE would
+have split the corpus into submitted and refreshed captchas. With
+--preprocess, each given pipeline (CAPTCHA_PREPROCESS format) is compared
+against no preprocessing: accuracy gained vs. milliseconds added. With
+--ensemble, an EnsembleSolver (CAPTCHA_ENSEMBLE format) is scored the
+same way, plus how often its members agreed.
+
+The corpus is a directory of captcha images named <LABEL>_<anything>.png
+(e.g. AB12_0001.png), as written by benchmarks.captcha_capture --save.
+
+Usage:
+    uv run python -m benchmarks.captcha_capture --rounds 100 --label --save captchas/
+    uv run python -m benchmarks.captcha_eval captchas/ --thresholds 0.5,0.7,0.9
+    uv run python -m benchmarks.captcha_eval captchas/ --preprocess grayscale,binarize \\
+        --preprocess grayscale,binarize,remove_curve,denoise
+    uv run python -m benchmarks.captcha_eval captchas/ --ensemble "default;default:grayscale,binarize;beta" \\
+        --budget-ms 50
+"""
+import argparse
+import time
+from pathlib import Path
+
+from src.captcha import CaptchaSolver
+from src.config import CAPTCHA_ENSEMBLE_BUDGET_MS
+from src.ensemble import EnsembleSolver
+from src.preprocess import Pipeline
+from src.stats import percentile, summarize_ms
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".bmp"}
+
+
+def load_corpus(directory: str) -> list:
+    """(label, image bytes) for every image in directory, label from the file name."""
+    corpus = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.suffix.lower() in IMAGE_SUFFIXES:
+            corpus.append((path.stem.split("_")[0].upper(), path.read_bytes()))
+    return corpus
+
+
+def threshold_report(scored: list, threshold: float) -> str:
+    """
+    One line on what a minimum confidence would do: how many captchas are
+    submitted, how accurate those are, and how many wrong submits are
+    avoided versus right answers thrown away.
+
+    :param scored: (correct, min confidence) per captcha
+    """
+    kept = [correct for correct, confidence in scored if confidence >= threshold]
+    refreshed = [correct for correct, confidence in scored if confidence < threshold]
+    accuracy = sum(kept) / len(kept) if kept else 0.0
+    return (
+        f"  >= {threshold:.2f}: submit {len(kept)}/{len(scored)} ({accuracy:.0%} correct), "
+        f"refresh {len(refreshed)} ({refreshed.count(False)} wrong avoided, {refreshed.count(True)} right lost)"
+    )
+
+
+def evaluate(solver: CaptchaSolver, corpus: list, verbose: bool = False) -> dict:
+    """Solve every captcha with and without confidence scoring; accuracy, latencies and scores."""
+    plain_ms, detailed_ms = [], []
+    plain_correct = detailed_correct = 0
+    scored = []
+    for label, image_bytes in corpus:
+        started = time.perf_counter()
+        text = solver.solve_bytes(image_bytes)
+        plain_ms.append((time.perf_counter() - started) * 1000)
+        plain_correct += text.upper() == label
+
+        started = time.perf_counter()
+        result = solver.solve_detailed(image_bytes)
+        detailed_ms.append((time.perf_counter() - started) * 1000)
+        correct = result.text.upper() == label
+        detailed_correct += correct
+        scored.append((correct, result.min_confidence))
+        if verbose and not correct:
+            print(f"{label}: got {result!r}")
+    return {"plain_correct": plain_correct, "plain_ms": plain_ms, "detailed_correct": detailed_correct,
+            "detailed_ms": detailed_ms, "scored": scored}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate OCR accuracy and confidence on a captcha corpus")
+    parser.add_argument("corpus", help="Directory of <LABEL>_<n>.png captcha images")
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.9",
+                        help="Comma-separated minimum confidences to report")
+    parser.add_argument("--preprocess", action="append", default=[], metavar="STEPS",
+                        help="Preprocessing pipeline to compare, e.g. grayscale,binarize (repeatable)")
+    parser.add_argument("--ensemble", metavar="SPEC", help="Ensemble to compare, e.g. 'default;beta;old'")
+    parser.add_argument("--budget-ms", type=float, default=CAPTCHA_ENSEMBLE_BUDGET_MS,
+                        help="Ensemble budget past the primary member")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"No captcha images in {args.corpus}")
+        return 1
+
+    try:
+        pipelines = [Pipeline.from_spec(spec) for spec in args.preprocess]
+        ensemble = EnsembleSolver.from_spec(args.ensemble, args.budget_ms) if args.ensemble else None
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    solver = CaptchaSolver(preprocess="")
+    solver.warm_up()
+    base = evaluate(solver, corpus, verbose=True)
+
+    total = len(corpus)
+    print(f"\n=== Captcha OCR evaluation ({total} captchas) ===")
+    print(f"text only:       {base['plain_correct']}/{total} ({base['plain_correct'] / total:.0%}), "
+          f"{summarize_ms(base['plain_ms'])}")
+    print(f"with confidence: {base['detailed_correct']}/{total} ({base['detailed_correct'] / total:.0%}), "
+          f"{summarize_ms(base['detailed_ms'])}")
+    print("Minimum confidence:")
+    for threshold in (float(value) for value in args.thresholds.split(",") if value.strip()):
+        print(threshold_report(base["scored"], threshold))
+
+    if pipelines:
+        print("Preprocessing (text only, vs. none):")
+    base_p50 = percentile(base["plain_ms"], 50)
+    for pipeline in pipelines:
+        solver.pipeline = pipeline  # Same model, so only the preprocessing differs
+        run = evaluate(solver, corpus)
+        gain = (run["plain_correct"] - base["plain_correct"]) / total
+        added = percentile(run["plain_ms"], 50) - base_p50
+        print(f"  {','.join(pipeline.steps) if pipeline else 'none'}: "
+              f"{run['plain_correct']}/{total} ({gain:+.0%} accuracy), {added:+.1f} ms p50")
+
+    if ensemble:
+        ensemble.warm_up()
+        correct, latencies = 0, []
+        for label, image_bytes in corpus:
+            started = time.perf_counter()
+            correct += ensemble.solve_detailed(image_bytes).text.upper() == label
+            latencies.append((time.perf_counter() - started) * 1000)
+        stats = ensemble.stats()
+        ensemble.close()
+        print(f"Ensemble ({stats['members']} members, {args.budget_ms:g} ms budget): "
+              f"{correct}/{total} ({(correct - base['detailed_correct']) / total:+.0%} accuracy vs. one model), "
+              f"{summarize_ms(latencies)}")
+        print(f"  members agreed on {stats['agreement']:.0%} of captchas, {stats['late']} member results late")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,102 @@
+"""
+Replay a collected captcha dataset (CAPTCHA_DATASET, see src/dataset.py)
+through a solver configuration, offline.
+
+Captchas the server accepted have a known answer, so they give accuracy.
+Rejected ones only tell which answer was wrong: the report shows how often
+the configuration repeats that wrong answer.
+
+Usage:
+    uv run python -m benchmarks.captcha_replay captchas/
+    uv run python -m benchmarks.captcha_replay captchas/ --preprocess grayscale,binarize --model beta
+    uv run python -m benchmarks.captcha_replay captchas/ --ensemble "default;beta;old" --min-confidence 0.7
+"""
+import argparse
+import time
+
+from src.captcha import CaptchaSolver
+from src.config import CAPTCHA_ENSEMBLE_BUDGET_MS
+from src.dataset import CaptchaDataset
+from src.ensemble import EnsembleSolver
+from src.stats import percentile
+
+
+def replay(solver: CaptchaSolver, dataset: CaptchaDataset, min_confidence: float = 0.0) -> dict:
+    """
+    Solve every captcha in the dataset.
+
+    :return: Counts for accepted (labelled) and rejected records, and latencies in ms
+    """
+    counts = {"labelled": 0, "correct": 0, "rejected": 0, "repeated": 0, "refreshed": 0}
+    latencies = []
+    for record in dataset.records():
+        try:
+            image_bytes = dataset.image(record)
+        except OSError:
+            continue
+        started = time.perf_counter()
+        result = solver.solve_detailed(image_bytes)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        if min_confidence and result.min_confidence < min_confidence:
+            counts["refreshed"] += 1  # Would have been refreshed, not submitted
+            continue
+        label = dataset.label(record)
+        if label is not None:
+            counts["labelled"] += 1
+            counts["correct"] += result.text.upper() == label
+        else:
+            counts["rejected"] += 1
+            counts["repeated"] += result.text.upper() == record["guess"].upper()
+    counts["latencies_ms"] = latencies
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a collected captcha dataset through a solver configuration")
+    parser.add_argument("dataset", help="CAPTCHA_DATASET directory")
+    parser.add_argument("--model", default="default", choices=CaptchaSolver.MODELS)
+    parser.add_argument("--preprocess", default="", help="Preprocessing steps, e.g. grayscale,binarize")
+    parser.add_argument("--ensemble", metavar="SPEC", help="Ensemble instead of one model, e.g. 'default;beta;old'")
+    parser.add_argument("--budget-ms", type=float, default=CAPTCHA_ENSEMBLE_BUDGET_MS)
+    parser.add_argument("--min-confidence", type=float, default=0.0,
+                        help="Count results below this as refreshed instead of submitted")
+    args = parser.parse_args(argv)
+
+    dataset = CaptchaDataset(args.dataset)
+    if not dataset.records():
+        print(f"No records in {dataset.index_path}")
+        return 1
+
+    try:
+        if args.ensemble:
+            solver = EnsembleSolver.from_spec(args.ensemble, args.budget_ms)
+            name = f"ensemble {args.ensemble}"
+        else:
+            solver = CaptchaSolver(preprocess=args.preprocess, model=args.model)
+            name = f"{args.model}" + (f" + {args.preprocess}" if args.preprocess else "")
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return 1
+    solver.warm_up()
+
+    counts = replay(solver, dataset, args.min_confidence)
+    if args.ensemble:
+        solver.close()
+    latencies = counts["latencies_ms"]
+    labelled, rejected = counts["labelled"], counts["rejected"]
+
+    print(f"\n=== Captcha replay: {name} ({len(latencies)} captchas) ===")
+    if labelled:
+        print(f"accepted captchas: {counts['correct']}/{labelled} correct ({counts['correct'] / labelled:.0%})")
+    if rejected:
+        print(f"rejected captchas: same wrong answer on {counts['repeated']}/{rejected} "
+              f"({counts['repeated'] / rejected:.0%})")
+    if args.min_confidence:
+        print(f"refreshed below {args.min_confidence:g}: {counts['refreshed']}/{len(latencies)}")
+    print(f"latency: p50 {percentile(latencies, 50):.1f} ms / p99 {percentile(latencies, 99):.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,92 @@
+"""
+Compare the browser and HTTP engines up to the Step 1 captcha: time per
+step and resident memory of the whole process tree (Python + browser).
+Nothing is submitted. Memory figures read /proc, so they need Linux.
+
+Usage:
+    uv run python -m benchmarks.engine_footprint --runs 5
+"""
+import argparse
+import os
+import time
+
+from src.booking import BookingAssistant
+from src.http_engine import HttpBookingEngine
+from src.stats import summarize_ms
+
+ENGINES = {"browser": BookingAssistant, "http": HttpBookingEngine}
+
+
+def tree_rss_mb(pid: int = None) -> float:
+    """Resident memory of a process and all its descendants, in MiB."""
+    pid = pid or os.getpid()
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def measure(engine_class) -> dict:
+    """Launch, open the booking page, fill Step 1 and fetch the captcha once."""
+    engine = engine_class(config=None, on_success=lambda: None, on_error=lambda message: None)
+    engine.config["headless"] = True
+    timings = {}
+    try:
+        for step, action in (
+            ("launch", engine.start),
+            ("open", engine.open_booking_page),
+            ("fill", engine.fill_booking_form),
+            ("captcha", engine.get_captcha_image),
+        ):
+            started = time.perf_counter()
+            action()
+            timings[step] = (time.perf_counter() - started) * 1000
+        timings["rss"] = tree_rss_mb()
+    finally:
+        engine.close()
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the browser and HTTP booking engines")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per engine")
+    parser.add_argument("--engine", choices=sorted(ENGINES), action="append", help="Engine(s) to measure")
+    args = parser.parse_args(argv)
+
+    baseline = tree_rss_mb()
+    results = {}
+    for name in args.engine or sorted(ENGINES):
+        results[name] = [measure(ENGINES[name]) for _ in range(args.runs)]
+
+    print("\n=== Engine footprint (up to the Step 1 captcha) ===")
+    for name, runs in results.items():
+        print(f"{name}:")
+        for step in ("launch", "open", "fill", "captcha"):
+            print(f"  {step:<8} {summarize_ms(run[step] for run in runs)}")
+        peak = max(run["rss"] for run in runs)
+        print(f"  rss      {peak:.0f} MiB peak ({peak - baseline:+.0f} MiB over the idle interpreter)")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,101 @@
+"""
+Captcha throughput of the in-process solver vs. the worker-process pool
+(OCR_WORKERS): N images solved by T caller threads, reporting captchas/s,
+CPU time per captcha and captchas per CPU-second of the whole process tree
+(so the workers count too). CPU figures read /proc, so they need Linux.
+Runs offline on a labelled corpus directory or on generated images.
+
+Usage:
+    uv run python -m benchmarks.ocr_pool --images 200 --threads 8 --workers 1,2,4
+    uv run python -m benchmarks.ocr_pool --corpus captchas/ --workers 4
+"""
+import argparse
+import io
+import os
+import random
+import string
+import threading
+import time
+
+from benchmarks.async_engine import TreeSampler
+from benchmarks.captcha_eval import load_corpus
+from src.captcha import CaptchaSolver
+from src.ocr_pool import PooledSolver
+
+
+def generated_images(count: int) -> list:
+    """count captcha-sized images with four random characters each."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.load_default(30)
+    images = []
+    for _ in range(count):
+        image = Image.new("RGB", (140, 48), "white")
+        text = "".join(random.choices(string.ascii_uppercase + string.digits, k=4))
+        ImageDraw.Draw(image).text((10, 5), text, fill="black", font=font)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+
+def run(solver, images: list, threads: int) -> float:
+    """Solve every image from threads callers; returns wall seconds."""
+    pending = list(images)
+    lock = threading.Lock()
+
+    def caller():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                image_bytes = pending.pop()
+            solver.solve_bytes(image_bytes)
+
+    workers = [threading.Thread(target=caller) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def report(name: str, solver, images: list, threads: int):
+    run(solver, images[:threads], threads)  # Warm every caller path
+    with TreeSampler() as sampler:
+        wall = run(solver, images, threads)
+    cpu = sampler.cpu_seconds - sampler.cpu_at_start
+    print(f"{name:<18} {len(images) / wall:7.1f} captchas/s   {cpu / len(images) * 1000:6.1f} ms CPU/captcha   "
+          f"{len(images) / cpu if cpu else 0:6.1f} captchas/CPU-s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark OCR throughput: in-process vs worker-process pool")
+    parser.add_argument("--images", type=int, default=200, help="Images to solve (generated unless --corpus)")
+    parser.add_argument("--corpus", help="Directory of captcha images to use instead")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 4, help="Concurrent callers")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated pool sizes to compare")
+    args = parser.parse_args(argv)
+
+    images = [image for _, image in load_corpus(args.corpus)] if args.corpus else generated_images(args.images)
+    if not images:
+        print("No images to solve")
+        return 1
+
+    print(f"{len(images)} captchas, {args.threads} caller threads, {os.cpu_count()} CPUs")
+    solver = CaptchaSolver()
+    solver.warm_up()
+    report("in-process", solver, images, args.threads)
+
+    for workers in (int(value) for value in args.workers.split(",") if value.strip()):
+        pool = PooledSolver(workers)
+        try:
+            report(f"pool, {workers} worker(s)", pool, images, args.threads)
+        finally:
+            pool.close()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
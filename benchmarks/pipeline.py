@@ -0,0 +1,71 @@
+"""
+Captcha retry throughput of the regular assistant vs. pipelined retries
+(PIPELINE_RETRIES): both run against the local HSR stub, which rejects
+every captcha and answers each Step 1 submit after --rtt-ms, so every
+attempt is a retry. Reports effective attempts/s over the retry loop
+(launch and prefill excluded) and the per-attempt p50.
+
+Captcha images are generated, so each attempt pays for a real OCR run.
+
+Usage:
+    uv run python -m benchmarks.pipeline --attempts 20 --rtt-ms 300
+"""
+import argparse
+
+from benchmarks.ocr_pool import generated_images
+from src.booking import BookingAssistant
+from src.pipeline import PipelinedBookingAssistant
+from src.stats import percentile
+from test.hsr_stub import HsrStubServer
+
+
+def run(assistant_class, url: str, attempts: int, profile: str) -> list:
+    """Run Step 1 until every attempt is used up; returns ms per attempt."""
+    assistant = assistant_class(on_success=lambda: None, on_error=lambda message: None)
+    assistant.config.update({
+        "base_url": url,
+        "headless": True,
+        "trigger_time": "",
+        "wait_profile": profile,
+        "block_resources": False,
+        "captcha_max_resolves": 0,
+        "captcha_min_confidence": 0,
+        "captcha_dataset": "",
+    })
+    assistant.run(max_captcha_retries=attempts)
+    return assistant.attempt_timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark captcha retries: regular vs pipelined")
+    parser.add_argument("--attempts", type=int, default=20, help="Captcha attempts per run (all rejected)")
+    parser.add_argument("--rtt-ms", type=float, default=300, help="Simulated Step 1 submit round trip")
+    parser.add_argument("--profile", default="turbo", choices=["event", "turbo", "compat"], help="Wait profile")
+    args = parser.parse_args(argv)
+
+    images = generated_images(16)
+    stub = HsrStubServer().start()
+    stub.captcha_code = "----"  # Never what the OCR reads: every attempt is rejected
+    stub.captcha_image = lambda n: images[n % len(images)]
+    stub.submit_delay = args.rtt_ms / 1000
+    try:
+        results = {}
+        for name, assistant_class in (("regular", BookingAssistant), ("pipelined", PipelinedBookingAssistant)):
+            results[name] = run(assistant_class, stub.url, args.attempts, args.profile)
+    finally:
+        stub.stop()
+
+    print(f"\n=== Captcha retries: {args.attempts} attempts, {args.rtt_ms:g} ms submit round trip, "
+          f"{args.profile} profile ===")
+    rates = {}
+    for name, timings in results.items():
+        seconds = sum(timings) / 1000
+        rates[name] = len(timings) / seconds if seconds else 0.0
+        print(f"{name:<10} {rates[name]:5.2f} attempts/s   p50 {percentile(timings, 50):6.0f} ms/attempt")
+    if rates["regular"]:
+        print(f"pipelined: {rates['pipelined'] / rates['regular']:.2f}x attempts/s")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
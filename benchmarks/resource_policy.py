@@ -0,0 +1,119 @@
+"""
+Measure the page-load gain of the resource policy on a recorded HAR
+of the booking page, so runs are repeatable and don't hit the site.
+
+Usage:
+    # Record once from the live site
+    uv run python -m benchmarks.resource_policy --record booking.har
+
+    # Replay with and without the policy
+    uv run python -m benchmarks.resource_policy --har booking.har --runs 10
+"""
+import argparse
+import json
+import time
+
+from playwright.sync_api import sync_playwright
+
+from src.config import BASE_URL
+from src.resources import ResourcePolicy
+from src.stats import summarize_ms
+
+NAVIGATION_TIMING_JS = """
+() => {
+    const t = performance.timing;
+    return {
+        domContentLoaded: t.domContentLoadedEventEnd - t.navigationStart,
+        load: t.loadEventEnd - t.navigationStart,
+    };
+}
+"""
+
+
+def har_size_hints(har_path: str) -> dict:
+    """Map each URL in a HAR to its response body size in bytes."""
+    with open(har_path, encoding="utf-8") as f:
+        entries = json.load(f)["log"]["entries"]
+    hints = {}
+    for entry in entries:
+        content_size = entry["response"].get("content", {}).get("size", 0)
+        hints[entry["request"]["url"]] = max(content_size, entry["response"].get("bodySize", 0), 0)
+    return hints
+
+
+def record(browser, har_path: str, url: str):
+    """Record the booking page into a HAR file."""
+    context = browser.new_context(record_har_path=har_path, record_har_content="embed")
+    page = context.new_page()
+    page.goto(url, wait_until="load", timeout=60000)
+    context.close()
+    print(f"Recorded {url} into {har_path}")
+
+
+def measure(browser, har_path: str, url: str, policy: ResourcePolicy = None) -> dict:
+    """Load the page once from the HAR and return timing and transfer figures."""
+    context = browser.new_context()
+    context.route_from_har(har_path, not_found="abort")
+    if policy:
+        policy.install(context)  # Registered last, so it sees requests first
+    page = context.new_page()
+
+    transferred = []
+    page.on("requestfinished", lambda request: transferred.append(request.sizes()["responseBodySize"]))
+
+    started = time.perf_counter()
+    page.goto(url, wait_until="load", timeout=60000)
+    goto_ms = (time.perf_counter() - started) * 1000
+    timing = page.evaluate(NAVIGATION_TIMING_JS)
+    context.close()
+
+    return {
+        "goto": goto_ms,
+        "dcl": timing["domContentLoaded"],
+        "load": timing["load"],
+        "requests": len(transferred),
+        "bytes": sum(size for size in transferred if size > 0),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the resource policy on a recorded HAR")
+    parser.add_argument("--har", help="HAR file to replay")
+    parser.add_argument("--record", metavar="HAR", help="Record the live booking page into this HAR")
+    parser.add_argument("--url", default=BASE_URL, help="Booking page URL")
+    parser.add_argument("--runs", type=int, default=10, help="Page loads per variant")
+    args = parser.parse_args(argv)
+
+    if not args.har and not args.record:
+        parser.error("pass --har to replay or --record to capture one")
+
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=True)
+        try:
+            if args.record:
+                record(browser, args.record, args.url)
+                return 0
+
+            hints = har_size_hints(args.har)
+            results = {"off": [], "on": []}
+            policy = ResourcePolicy(size_hints=hints)
+            for _ in range(args.runs):
+                results["off"].append(measure(browser, args.har, args.url))
+                results["on"].append(measure(browser, args.har, args.url, policy))
+        finally:
+            browser.close()
+
+    print("\n=== Resource policy benchmark ===")
+    for variant, runs in results.items():
+        print(f"policy {variant}:")
+        print(f"  goto (load):      {summarize_ms(r['goto'] for r in runs)}")
+        print(f"  DOMContentLoaded: {summarize_ms(r['dcl'] for r in runs)}")
+        print(f"  load event:       {summarize_ms(r['load'] for r in runs)}")
+        print(f"  requests/load:    {sum(r['requests'] for r in runs) / len(runs):.1f}")
+        print(f"  bytes/load:       {sum(r['bytes'] for r in runs) / len(runs) / 1024:.0f} KiB")
+    print(f"{policy.summary()} over {args.runs} loads")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,550 @@
+"""
+asyncio version of BookingAssistant on playwright.async_api, so one event
+loop (and one Playwright driver and browser) can drive many bookings.
+OCR runs in an executor to keep the loop free.
+"""
+import asyncio
+import time
+
+from . import metrics
+
+from .booking import (
+    BookingAssistant, CONTEXT_OPTIONS, LAUNCH_ARGS, FILL_FORM_JS,
+    CAPTCHA_WATCH_JS, CAPTCHA_RELOADED_JS, OUTCOME_PROBE_JS, CAPTCHA_SRC_JS, CAPTCHA_LOADED_JS,
+    Outcome, OUTCOME_SELECTORS, is_captcha_error,
+)
+from .config import (
+    Selectors, HEADLESS, SLOW_MO, WAIT_PROFILE, CAPTCHA_SOURCE, BLOCK_RESOURCES, BATCH_FILL,
+    PREWARM_SECONDS, PREFILL_SECONDS, PRELOAD_SECONDS, CLOCK_SYNC,
+)
+from .resources import ResourcePolicy
+
+
+async def launch_browser(config: dict):
+    """
+    Start async Playwright and launch Chromium with the config's headless/slow_mo.
+
+    :return: (playwright, browser); stop both when done
+    """
+    from playwright.async_api import async_playwright
+
+    slow_mo = 0 if config.get("wait_profile", WAIT_PROFILE) == "turbo" else config.get("slow_mo", SLOW_MO)
+    playwright = await async_playwright().start()
+    browser = await playwright.chromium.launch(
+        headless=config.get("headless", HEADLESS),
+        slow_mo=slow_mo,
+        args=LAUNCH_ARGS
+    )
+    metrics.BROWSER_LAUNCHES.inc()
+    return playwright, browser
+
+
+class AsyncBookingAssistant(BookingAssistant):
+    """
+    Same config, callbacks and flow as BookingAssistant; every
+    browser step is a coroutine. Usage:
+
+        asyncio.run(AsyncBookingAssistant(config).run())
+
+    Pass a shared async Browser to run several assistants on it
+    concurrently; each one then only opens (and closes) its own context.
+    """
+
+    def __init__(self, config: dict = None, on_success=None, on_error=None, browser=None, executor=None,
+                 on_trigger=None):
+        """
+        Initialize AsyncBookingAssistant.
+
+        Args:
+            config: Optional configuration dict. If None, will read from .env via config.py
+            on_success: Optional callback function called on successful booking
+            on_error: Optional callback function called on error, receives error message string
+            browser: Optional playwright.async_api Browser shared with other assistants
+            executor: Executor for OCR calls (None = the loop's default executor)
+            on_trigger: Optional coroutine function awaited when the booking starts: at the
+                trigger time once the page is prefilled, or right away without trigger_time
+        """
+        super().__init__(config=config, on_success=on_success, on_error=on_error)
+        self.browser = browser
+        self.executor = executor
+        self.on_trigger = on_trigger
+        self._owns_browser = browser is None
+        self._preload_future = None
+
+    async def _in_executor(self, func, *args):
+        """Run a blocking call (OCR, clock sync) without blocking the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _run_stage_async(self, name: str, coro_func):
+        """
+        Run one stage of the booking pipeline and record its latency.
+
+        :param name: Stage name (key in self.stage_timings)
+        :param coro_func: Coroutine function performing the stage
+        :return: Whatever coro_func returns
+        """
+        started = time.perf_counter()
+        try:
+            return await coro_func()
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stage_timings[name] = elapsed_ms
+            metrics.STEP_SECONDS.labels(metrics.step_name(name)).observe(elapsed_ms / 1000)
+            print(f"⏱ Stage '{name}' took {elapsed_ms:.0f} ms")
+
+    async def _click_and_wait_for_navigation(self, selector: str, timeout: int = 15000):
+        """Click selector and wait until the page it navigates to reaches DOMContentLoaded."""
+        from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+        try:
+            async with self.page.expect_navigation(wait_until="domcontentloaded", timeout=timeout):
+                await self.page.click(selector)
+        except PlaywrightTimeout:
+            print(f"No navigation within {timeout // 1000}s after clicking {selector}")
+
+    async def start(self):
+        """Launch a browser (unless one is shared) and open this job's context and page."""
+        if self.browser is None:
+            print("Launching browser...")
+            self.playwright, self.browser = await launch_browser(self.config)
+        self.context = await self.browser.new_context(**CONTEXT_OPTIONS)
+        metrics.OPEN_CONTEXTS.inc()
+        if self.config.get("block_resources", BLOCK_RESOURCES):
+            self.resource_policy = ResourcePolicy()
+            await self.resource_policy.install_async(self.context)
+        self.page = await self.context.new_page()
+        self.page.on("response", self._remember_image_response)
+        print("Browser launched successfully.")
+
+    def _preload(self):
+        """Load and warm up the OCR model (runs in the executor)."""
+        try:
+            self.solver.warm_up()
+        except Exception as e:
+            print(f"Background preload failed: {e}")
+
+    def _start_preload(self):
+        """Start _preload in the executor (once); returns its future."""
+        if self._preload_future is None:
+            self._preload_future = asyncio.ensure_future(self._in_executor(self._run_stage, "preload", self._preload))
+        return self._preload_future
+
+    async def _stage_launch(self):
+        """Launch stage: start the browser while the OCR model loads in the executor."""
+        preload = self._start_preload()
+        if self.page is None:
+            await self.start()
+        await preload
+
+    async def open_booking_page(self):
+        from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+        try:
+            print(f"Navigating to {self.config['base_url']}...")
+            wait_until = "load" if self._compat_waits() else "domcontentloaded"
+            await self.page.goto(self.config["base_url"], timeout=60000, wait_until=wait_until)
+            print("Page loaded successfully!")
+            return True
+        except PlaywrightTimeout:
+            print("Timeout error: Could not load page within 60 seconds.")
+            return False
+        except Exception as e:
+            print(f"Error opening page: {e}")
+            return False
+
+    async def dismiss_cookie_dialog(self):
+        """Dismiss cookie consent dialog if present."""
+        try:
+            cookie_btn = self.page.locator("#cookieAccpetBtn")
+            if await cookie_btn.is_visible(timeout=2000):
+                await cookie_btn.click()
+                print("Cookie dialog dismissed.")
+        except:
+            pass  # No cookie dialog or already dismissed
+
+    async def _fill_field(self, field: dict):
+        """Set one field with its own Playwright call (per-field fill path)."""
+        self._print_field(field)
+        if field["name"] == "travel_date":
+            await self.page.evaluate(
+                """(value) => {
+                    const el = document.querySelector("#toTimeInputField");
+                    el.value = value;
+                    el.dispatchEvent(new Event("change"));
+                }""",
+                field["value"],
+            )
+        elif "count" in field:
+            await self.page.select_option(field["selector"], value=f"{field['count']}{field['suffix']}")
+        else:
+            await self.page.select_option(field["selector"], value=field["value"])
+
+    async def fill_booking_form(self):
+        """Fill the booking form: one batched script, then per-field for anything it missed."""
+        print("\n--- Filling Booking Form ---")
+        fields = self._booking_form_fields()
+
+        batch_fill = self.config.get("batch_fill", BATCH_FILL)
+        if batch_fill:
+            try:
+                results = await self.page.evaluate(FILL_FORM_JS, fields)
+            except Exception as e:
+                print(f"Batched form fill failed: {e}")
+                results = None
+            fields = self._failed_batch_fields(fields, results)
+
+        fields = [field for field in fields if not field.get("optional")]
+        if batch_fill and fields:
+            names = ", ".join(field["name"] for field in fields)
+            print(f"Batched fill didn't set {names}, filling them one by one")
+
+        for field in fields:
+            await self._fill_field(field)
+
+        print("Form filled successfully!")
+
+    async def _captcha_bytes_from_network(self):
+        """Original captcha image bytes from its HTTP response (None if not captured)."""
+        try:
+            src = await self.page.evaluate(CAPTCHA_SRC_JS, Selectors.CAPTCHA_IMAGE)
+            response = self._image_responses.get(src)
+            if response is None or not response.ok:
+                return None
+            return await response.body()
+        except Exception as e:
+            print(f"Network captcha capture failed: {e}")
+            return None
+
+    async def get_captcha_image(self) -> bytes:
+        """Captcha image bytes: network response, element screenshot as fallback."""
+        from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+        if not self._compat_waits():
+            try:
+                await self.page.wait_for_function(CAPTCHA_LOADED_JS, arg=Selectors.CAPTCHA_IMAGE, timeout=5000)
+            except PlaywrightTimeout:
+                print("Captcha image still loading after 5s, capturing anyway")
+
+        if self.config.get("captcha_source", CAPTCHA_SOURCE) == "network":
+            image_bytes = await self._captcha_bytes_from_network()
+            if image_bytes:
+                return image_bytes
+            print("Captcha response not captured, falling back to screenshot")
+
+        return await self.page.locator(Selectors.CAPTCHA_IMAGE).screenshot()
+
+    async def solve_and_fill_captcha(self) -> str:
+        """Solve captcha (OCR in the executor), re-solving implausible results, and fill in the answer."""
+        print("\n--- Solving Captcha ---")
+        for resolve in range(self._max_resolves() + 1):
+            captcha_bytes = await self.get_captcha_image()
+            captcha_text, confidences = await self._in_executor(self._recognize, captcha_bytes)
+            print(f"Captcha recognized: {captcha_text}")
+            if resolve == self._max_resolves() or self._captcha_plausible(captcha_text, confidences):
+                break
+            await self._refresh_captcha_locally()
+        self._submitted_captcha = (captcha_bytes, captcha_text, confidences)
+        await self.page.fill(Selectors.CAPTCHA_INPUT, captcha_text)
+        return captcha_text
+
+    async def _refresh_captcha_locally(self):
+        """Get a new captcha on the current page without submitting."""
+        await self.refresh_captcha()
+
+    async def refresh_captcha(self):
+        """Click refresh button and wait for the new captcha image to load."""
+        from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+        if self._compat_waits():
+            await self.page.click(Selectors.CAPTCHA_REFRESH)
+            await asyncio.sleep(1)
+            return
+
+        old_src = await self.page.evaluate(CAPTCHA_WATCH_JS, Selectors.CAPTCHA_IMAGE)
+        await self.page.click(Selectors.CAPTCHA_REFRESH)
+        try:
+            await self.page.wait_for_function(
+                CAPTCHA_RELOADED_JS, arg=[Selectors.CAPTCHA_IMAGE, old_src], timeout=5000
+            )
+        except PlaywrightTimeout:
+            print("Captcha image did not reload within 5s, continuing anyway")
+
+    async def _click_step(self, selector: str, compat_sleep: float = 0):
+        """Click a submit/confirm button and wait for the next page."""
+        if self._compat_waits():
+            await self.page.click(selector)
+            await self.page.wait_for_load_state("domcontentloaded")
+            if compat_sleep:
+                await asyncio.sleep(compat_sleep)
+        else:
+            await self._click_and_wait_for_navigation(selector)
+
+    async def submit_form(self):
+        """Submit the booking form."""
+        print("\n--- Submitting Form ---")
+        await self._click_step(Selectors.SUBMIT_BUTTON)
+
+    async def check_for_errors(self) -> str:
+        """Check if there are any error messages on the page."""
+        try:
+            error_el = self.page.locator(Selectors.ERROR_MESSAGE)
+            if await error_el.is_visible(timeout=1000):
+                return (await error_el.inner_text()).strip()
+        except:
+            pass
+        return ""
+
+    async def probe_outcome(self, *expected: Outcome, timeout: int = 5000):
+        """
+        Detect where a submit/confirm click landed (see BookingAssistant.probe_outcome).
+
+        :return: (Outcome, error text)
+        """
+        if self._compat_waits():
+            for outcome in expected:
+                if await self.page.locator(OUTCOME_SELECTORS[outcome]).is_visible(timeout=2000):
+                    return outcome, ""
+            error = await self.check_for_errors()
+            if error:
+                return (Outcome.CAPTCHA_ERROR if is_captcha_error(error) else Outcome.OTHER_ERROR), error
+            return Outcome.UNKNOWN, ""
+
+        targets = [[outcome.value, OUTCOME_SELECTORS[outcome]] for outcome in expected]
+        try:
+            result = await self.page.evaluate(OUTCOME_PROBE_JS, [targets, Selectors.ERROR_MESSAGE, timeout])
+        except Exception as e:
+            print(f"Outcome probe failed: {e}")
+            return Outcome.UNKNOWN, ""
+
+        if result["kind"] == "error":
+            error = result["text"]
+            return (Outcome.CAPTCHA_ERROR if is_captcha_error(error) else Outcome.OTHER_ERROR), error
+        return Outcome(result["kind"]), ""
+
+    async def select_first_train(self):
+        """Select the first available train on Step 2."""
+        print("\n--- Selecting Train ---")
+        await self.page.wait_for_selector(Selectors.TRAIN_LIST, timeout=10000)
+
+        trains = self.page.locator(Selectors.TRAIN_RADIO)
+        count = await trains.count()
+        print(f"Found {count} available trains")
+        if count == 0:
+            print("No trains available!")
+            return False
+
+        first_train = trains.first
+        if not await first_train.is_checked():
+            await first_train.click()
+
+        train_code = await first_train.get_attribute("QueryCode")
+        departure = await first_train.get_attribute("QueryDeparture")
+        arrival = await first_train.get_attribute("QueryArrival")
+        self.selected_train = (train_code, departure, arrival)
+        print(f"Selected train: {train_code} ({departure} → {arrival})")
+        return True
+
+    async def confirm_train_selection(self):
+        """Click the confirm button on Step 2."""
+        print("Confirming train selection...")
+        await self._click_step(Selectors.CONFIRM_TRAIN, compat_sleep=1)
+        print("Train confirmed!")
+
+    async def fill_passenger_info(self):
+        """Fill passenger information on Step 3."""
+        print("\n--- Filling Passenger Info ---")
+        for key, selector in (
+            ("passenger_id", Selectors.PASSENGER_ID),
+            ("passenger_phone", Selectors.PASSENGER_PHONE),
+            ("passenger_email", Selectors.PASSENGER_EMAIL),
+        ):
+            value = self.config.get(key, "")
+            if value:
+                await self.page.fill(selector, value)
+
+        agree_box = self.page.locator(Selectors.AGREE_CHECKBOX)
+        if not await agree_box.is_checked():
+            await agree_box.click()
+        print("Passenger info filled!")
+
+    async def confirm_booking(self):
+        """Click confirm booking button on Step 3."""
+        print("\n--- Confirming Booking ---")
+        await self._click_step(Selectors.CONFIRM_BOOKING, compat_sleep=2)
+        print("Booking confirmed!")
+
+    async def close(self):
+        """Close this job's context, and the browser if this assistant launched it."""
+        self._report_run()
+        if self.context:
+            metrics.OPEN_CONTEXTS.dec()  # Closed with the browser, or on its own below
+        if self._owns_browser:
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
+        elif self.context:
+            await self.context.close()
+
+    async def _sleep_until_async(self, target_time):
+        """
+        Sleep until target_time without blocking the loop. In clock-sync
+        mode, target_time is read on the server clock and the last second
+        is handed to ServerClock.wait_until_async for ms precision.
+        """
+        from datetime import datetime
+
+        def seconds_left():
+            if self.clock:
+                return self.clock.seconds_until(target_time.timestamp())
+            return (target_time - datetime.now()).total_seconds()
+
+        precise_window = 1.0 if self.clock else 0
+        remaining_seconds = seconds_left()
+        while remaining_seconds > precise_window:
+            await asyncio.sleep(min(60, remaining_seconds - precise_window))
+            remaining_seconds = seconds_left()
+
+        if self.clock:
+            self.trigger_error_ms = await self.clock.wait_until_async(target_time.timestamp())
+            print(
+                f"🎯 Reached {target_time.strftime('%H:%M:%S')} on server clock "
+                f"(firing error {self.trigger_error_ms:+.2f} ms)"
+            )
+
+    async def _stage_prefill(self) -> bool:
+        """Prefill stage: load the booking page and fill the form."""
+        if not await self.open_booking_page():
+            return False
+        await self.dismiss_cookie_dialog()
+        await self.fill_booking_form()
+        return True
+
+    async def _stage_submit(self):
+        """Submit stage: solve captcha and submit Step 1."""
+        await self.solve_and_fill_captcha()
+        await self.submit_form()
+
+    async def _run_pre_trigger_stages(self, time_str: str) -> bool:
+        """
+        Preload at T-prewarm_seconds-preload_seconds, launch at
+        T-prewarm_seconds, prefill at T-prefill_seconds, then wait for the
+        trigger (same stages as the sync version, on the event loop).
+        """
+        from datetime import timedelta
+
+        trigger_time = self._parse_trigger_time(time_str)
+        prewarm_seconds = float(self.config.get("prewarm_seconds", PREWARM_SECONDS))
+        prefill_seconds = float(self.config.get("prefill_seconds", PREFILL_SECONDS))
+        preload_seconds = float(self.config.get("preload_seconds", PRELOAD_SECONDS))
+
+        if self.config.get("clock_sync", CLOCK_SYNC):
+            await self._run_stage_async("clock_sync", lambda: self._in_executor(self._sync_clock))
+        print(f"⏰ Waiting until {trigger_time.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        await self._sleep_until_async(trigger_time - timedelta(seconds=prewarm_seconds + preload_seconds))
+        self._start_preload()
+        await self._sleep_until_async(trigger_time - timedelta(seconds=prewarm_seconds))
+        await self._run_stage_async("launch", self._stage_launch)
+        if self.clock:
+            await self._run_stage_async("clock_resync", lambda: self._in_executor(self._sync_clock))
+        await self._sleep_until_async(trigger_time - timedelta(seconds=prefill_seconds))
+        if not await self._run_stage_async("prefill", self._stage_prefill):
+            return False
+        await self._sleep_until_async(trigger_time)
+        return True
+
+    async def run_until_step2(self, max_captcha_retries: int = 5) -> bool:
+        """
+        Launch, prefill (on schedule if trigger_time is set) and submit
+        Step 1, retrying captcha errors, until the train list shows.
+
+        :return: True on Step 2; False after reporting the failure
+        """
+        trigger_time = self.config.get("trigger_time", "")
+        if trigger_time:
+            page_ready = await self._run_pre_trigger_stages(trigger_time)
+            if page_ready and self.on_trigger:
+                await self.on_trigger()
+        else:
+            if self.on_trigger:
+                await self.on_trigger()
+            await self._run_stage_async("launch", self._stage_launch)
+            page_ready = await self._run_stage_async("prefill", self._stage_prefill)
+
+        if not page_ready:
+            self._fail("Failed to load page")
+            return False
+
+        for attempt in range(1, max_captcha_retries + 1):
+            print(f"\n=== Attempt {attempt}/{max_captcha_retries} ===")
+            self._begin_attempt(attempt)
+            await self._run_stage_async(f"submit_{attempt}", self._stage_submit)
+
+            outcome, error = await self.probe_outcome(Outcome.STEP2)
+            self._record_captcha_outcome(outcome)
+            if outcome is Outcome.STEP2:
+                self._end_attempt(outcome)
+                print("✅ Successfully reached train selection page!")
+                return True
+            if outcome is Outcome.CAPTCHA_ERROR:
+                print(f"❌ Error: {error}")
+                print("Captcha error - refreshing and retrying...")
+                await self.refresh_captcha()
+                self._end_attempt(outcome, error)
+                continue
+            self._end_attempt(outcome, error)
+            self._fail(f"Non-captcha error: {error}" if error else "Unknown error after form submission")
+            return False
+
+        self._fail(f"Failed after {max_captcha_retries} captcha attempts")
+        return False
+
+    async def complete_booking(self):
+        """From Step 2: pick the first train, fill Step 3, confirm and report the result."""
+        if not await self.select_first_train():
+            self._fail("No available trains to select")
+            return
+        await self.confirm_train_selection()
+
+        outcome, error = await self.probe_outcome(Outcome.STEP3)
+        if outcome is not Outcome.STEP3:
+            error_msg = "Failed to reach passenger info page (Step 3)"
+            self._fail(f"{error_msg}: {error}" if error else error_msg)
+            return
+
+        print("\n=== Step 3: Passenger Info ===")
+        await self.fill_passenger_info()
+        await self.confirm_booking()
+
+        outcome, error = await self.probe_outcome()
+        if error:
+            self._fail(f"Booking was not confirmed: {error}")
+            return
+
+        self._count_booking()
+        if self.on_success:
+            self.on_success()
+        else:
+            await asyncio.to_thread(self._report_success)
+
+    async def run(self, max_captcha_retries: int = 5):
+        """
+        Run the booking assistant with automatic captcha retry.
+
+        Args:
+            max_captcha_retries: Maximum number of captcha retry attempts.
+        """
+        try:
+            if await self.run_until_step2(max_captcha_retries):
+                await self.complete_booking()
+        except Exception as e:
+            self._count_booking("exception")
+            if self.on_error:
+                self.on_error(str(e))
+            else:
+                print(f"An error occurred: {e}")
+                import traceback
+                traceback.print_exc()
+        finally:
+            await self.close()
@@ -0,0 +1,277 @@
+"""
+Batch mode: run many bookings from a jobs file (CSV, JSONL or YAML) on one
+shared browser and OCR solver, with bounded concurrency and a per-job
+timeout. Each result is appended to a JSONL file as soon as it finishes.
+
+Scheduled rows wait for their trigger_time (and prefill) outside the
+concurrency limit; the slot, the timeout and elapsed_ms start at the
+trigger, so jobs set for the same second fire together.
+
+Every row holds config keys (the same names as the GUI/daemon config,
+e.g. travel_date, travel_time, passenger_id) applied on top of .env;
+an optional "id" column names the job. Rows without trigger_time run
+right away (TRIGGER_TIME from .env is not applied to batch jobs).
+
+Usage:
+    uv run python -m src.batch jobs.csv --output results.jsonl --concurrency 4 --timeout 300
+"""
+import argparse
+import asyncio
+import csv
+import json
+import time
+from pathlib import Path
+
+from . import metrics
+from .async_booking import AsyncBookingAssistant, launch_browser
+from .config import BATCH_CONCURRENCY, BATCH_JOB_TIMEOUT, BATCH_FAIR_KEY, METRICS_PORT
+from .stats import summarize_ms
+
+# Config keys that aren't strings (CSV cells always are)
+INT_KEYS = {"adult_count", "child_count", "disabled_count", "elder_count", "student_count",
+            "slow_mo", "clock_sync_samples"}
+FLOAT_KEYS = {"prewarm_seconds", "prefill_seconds", "preload_seconds"}
+BOOL_KEYS = {"headless", "clock_sync", "block_resources", "batch_fill"}
+
+
+def coerce_job(row: dict) -> dict:
+    """
+    Normalize one jobs-file row: drop empty cells (so .env defaults apply)
+    and convert numeric/boolean config values.
+    """
+    job = {}
+    for key, value in row.items():
+        if key is None or value is None or value == "":
+            continue
+        key = key.strip()
+        if isinstance(value, str):
+            value = value.strip()
+        if key in INT_KEYS:
+            value = int(value)
+        elif key in FLOAT_KEYS:
+            value = float(value)
+        elif key in BOOL_KEYS and isinstance(value, str):
+            value = value.lower() in ("true", "1", "yes")
+        elif not isinstance(value, (bool, str)):
+            value = str(value)  # Station codes etc. given as YAML/JSON numbers
+        job[key] = value
+    return job
+
+
+def load_jobs(path: str) -> list:
+    """
+    Read a jobs file by extension (.csv, .jsonl, .yaml/.yml).
+
+    :return: List of job dicts, each with an "id"
+    :raises ValueError: Unknown file type, bad row, or PyYAML missing for YAML
+    """
+    suffix = Path(path).suffix.lower()
+    with open(path, encoding="utf-8", newline="") as f:
+        if suffix == ".csv":
+            rows = list(csv.DictReader(f))
+        elif suffix == ".jsonl":
+            rows = [json.loads(line) for line in f if line.strip()]
+        elif suffix in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML jobs files need PyYAML: uv pip install pyyaml")
+            rows = yaml.safe_load(f) or []
+            if isinstance(rows, dict):
+                rows = rows.get("jobs", [])
+        else:
+            raise ValueError(f"Unsupported jobs file type '{suffix}' (use .csv, .jsonl or .yaml)")
+
+    jobs = []
+    for index, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Job {index} in {path} is not a mapping")
+        job = coerce_job(row)
+        job.setdefault("id", f"job-{index}")
+        jobs.append(job)
+    return jobs
+
+
+def fair_order(jobs: list, key: str = BATCH_FAIR_KEY) -> list:
+    """
+    Interleave jobs round-robin by key (e.g. passenger_id), so one traveller
+    with many dates doesn't hold every slot while others wait.
+    Order within a group is kept.
+    """
+    if not key:
+        return list(jobs)
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.get(key, ""), []).append(job)
+    ordered = []
+    queues = list(groups.values())
+    while queues:
+        for queue in queues:
+            ordered.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+class BatchRunner:
+    """Run jobs concurrently with AsyncBookingAssistant on one browser."""
+
+    def __init__(self, jobs: list, output: str, concurrency: int = BATCH_CONCURRENCY,
+                 job_timeout: float = BATCH_JOB_TIMEOUT, fair_key: str = BATCH_FAIR_KEY):
+        """
+        Initialize BatchRunner.
+
+        Args:
+            jobs: Job dicts from load_jobs()
+            output: JSONL file the results are appended to
+            concurrency: Jobs booking at the same time (waiting for a trigger time doesn't count)
+            job_timeout: Seconds from a job's trigger before it is cancelled (0 = no limit)
+            fair_key: Job key to schedule round-robin by (empty = file order)
+        """
+        self.jobs = fair_order(jobs, fair_key)
+        self.output = output
+        self.concurrency = max(1, concurrency)
+        self.job_timeout = job_timeout
+        self.results = []
+        self.started_at = None
+        self.finished_at = None
+        self._out = None
+
+    def _write(self, result: dict):
+        """Append one result line and flush, so it's on disk as soon as the job ends."""
+        self._out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._out.flush()
+
+    async def _run_job(self, job: dict, browser, semaphore: asyncio.Semaphore):
+        outcome = {}
+        config = {key: value for key, value in job.items() if key != "id"}
+        config.setdefault("trigger_time", "")
+        queued = time.perf_counter()
+        booking = {"started": queued, "started_at": time.time(), "slot": False}
+
+        async def at_trigger():
+            # Take a slot only to book, then start the job's clock
+            await semaphore.acquire()
+            booking["slot"] = True
+            booking["started"] = time.perf_counter()
+            booking["started_at"] = time.time()
+            print(f"[{job['id']}] started")
+            if self.job_timeout:
+                deadline.reschedule(asyncio.get_running_loop().time() + self.job_timeout)
+
+        assistant = AsyncBookingAssistant(
+            browser=browser,
+            on_success=lambda: outcome.setdefault("ok", True),
+            on_error=lambda message: outcome.setdefault("error", message),
+            on_trigger=at_trigger,
+        )
+        assistant.config.update(config)
+
+        try:
+            async with asyncio.timeout(None) as deadline:
+                await assistant.run()
+            status = "succeeded" if outcome.get("ok") and "error" not in outcome else "failed"
+            error = outcome.get("error") if status == "failed" else None
+            if status == "failed" and error is None:
+                error = "Finished without a result"
+        except TimeoutError:
+            status, error = "timeout", f"No result within {self.job_timeout:g}s"
+        except Exception as e:
+            status, error = "failed", str(e)
+        finally:
+            if booking["slot"]:
+                semaphore.release()
+
+        result = {
+            "id": job["id"],
+            "status": status,
+            "error": error,
+            "elapsed_ms": round((time.perf_counter() - booking["started"]) * 1000, 1),
+            "waited_ms": round((booking["started"] - queued) * 1000, 1),
+            "stage_timings": {name: round(ms, 1) for name, ms in assistant.stage_timings.items()},
+            "submits_avoided": assistant.submits_avoided,
+            "started_at": booking["started_at"],
+            "finished_at": time.time(),
+        }
+        self.results.append(result)
+        self._write(result)
+        print(f"[{job['id']}] {status}" + (f": {error}" if error else ""))
+        return result
+
+    async def _launch_browser(self):
+        return await launch_browser({})  # Headless/slow_mo from .env
+
+    async def run(self, browser=None) -> list:
+        """
+        Run every job and return their results (in completion order).
+
+        :param browser: Async Browser to use; one is launched (and closed) if None
+        """
+        playwright = None
+        if browser is None:
+            playwright, browser = await self._launch_browser()
+
+        # Load the shared OCR model once, before jobs race for it
+        warm_up = AsyncBookingAssistant(browser=browser)
+        await warm_up._in_executor(warm_up._preload)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.started_at = time.perf_counter()
+        try:
+            with open(self.output, "a", encoding="utf-8") as self._out:
+                await asyncio.gather(*(self._run_job(job, browser, semaphore) for job in self.jobs))
+        finally:
+            self.finished_at = time.perf_counter()
+            if playwright is not None:
+                await browser.close()
+                await playwright.stop()
+        return self.results
+
+    def summary(self) -> str:
+        """Counts, throughput and latency percentiles of the finished run."""
+        elapsed = (self.finished_at or time.perf_counter()) - (self.started_at or time.perf_counter())
+        counts = {}
+        for result in self.results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        latencies = [result["elapsed_ms"] for result in self.results]
+        per_minute = len(self.results) / elapsed * 60 if elapsed > 0 else 0.0
+        lines = [
+            f"Batch: {len(self.results)} jobs in {elapsed:.1f} s ({per_minute:.1f} jobs/min, "
+            f"concurrency {self.concurrency})",
+            "  " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())),
+            f"  job latency: {summarize_ms(latencies)}",
+        ]
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run bookings from a jobs file (CSV, JSONL or YAML)")
+    parser.add_argument("jobs", help="Jobs file")
+    parser.add_argument("--output", help="Results JSONL (default: <jobs>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=BATCH_JOB_TIMEOUT, help="Seconds per job (0 = no limit)")
+    parser.add_argument("--fair-key", default=BATCH_FAIR_KEY, help="Round-robin jobs by this key ('' = file order)")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_jobs(args.jobs)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    output = args.output or str(Path(args.jobs).with_suffix(".results.jsonl"))
+    runner = BatchRunner(jobs, output, concurrency=args.concurrency, job_timeout=args.timeout,
+                         fair_key=args.fair_key)
+    print(f"Running {len(jobs)} jobs, {runner.concurrency} at a time → {output}")
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        print(f"Metrics on http://{metrics.METRICS_HOST}:{METRICS_PORT}/metrics")
+    try:
+        asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        print("\n\nCancelled by user")
+    print("\n" + runner.summary())
+    return 0 if all(result["status"] == "succeeded" for result in runner.results) else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,15 +1,150 @@
 
-from playwright.sync_api import sync_playwright, Page, TimeoutError as PlaywrightTimeout
+from enum import Enum
+import re
+import threading
 import time
 from .config import (
     BASE_URL, HEADLESS, SLOW_MO,
-    START_STATION, END_STATION, TRAVEL_DATE, TRAVEL_TIME,
+    START_STATION, END_STATION, TRAVEL_DATE, TRAVEL_TIME, CAR_TYPE, SEAT_PREFERENCE,
     ADULT_COUNT, CHILD_COUNT, DISABLED_COUNT, ELDER_COUNT, STUDENT_COUNT,
     Selectors, TIME_VALUES, STATIONS,
     PASSENGER_ID, PASSENGER_PHONE, PASSENGER_EMAIL,
-    TRIGGER_TIME
+    TRIGGER_TIME, PREWARM_SECONDS, PREFILL_SECONDS, PRELOAD_SECONDS,
+    CLOCK_SYNC, CLOCK_SYNC_SAMPLES, WAIT_PROFILE, CAPTCHA_SOURCE,
+    BLOCK_RESOURCES, BATCH_FILL, CAPTCHA_LENGTH, CAPTCHA_CHARSET, CAPTCHA_MAX_RESOLVES,
+    CAPTCHA_MIN_CONFIDENCE, CAPTCHA_DATASET, TRACE_FILE, OTEL_EXPORT
 )
-from .captcha import CaptchaSolver
+from .captcha import CaptchaSolver, is_plausible
+from . import metrics
+from .clock import ServerClock
+from .dataset import CaptchaDataset
+from .resources import ResourcePolicy
+
+# Browser launch/context settings (shared with the browser daemon)
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "viewport": {"width": 1280, "height": 800},
+}
+
+# Ticket rows: config key, selector, option value suffix (options are "<count><suffix>")
+TICKET_ROWS = [
+    ("adult_count", Selectors.ADULT_TICKETS, "F"),
+    ("child_count", Selectors.CHILD_TICKETS, "H"),
+    ("disabled_count", Selectors.DISABLED_TICKETS, "W"),
+    ("elder_count", Selectors.ELDER_TICKETS, "E"),
+    ("student_count", Selectors.STUDENT_TICKETS, "P"),
+]
+
+# Set every Step 1 field in order and return what each element ended up with.
+# Ticket fields give a count and pick the option whose value starts with it.
+FILL_FORM_JS = """
+(fields) => fields.map(field => {
+    const el = document.querySelector(field.selector);
+    if (!el) return null;
+    let value = field.value;
+    if (field.count !== undefined) {
+        const option = Array.from(el.options).find(o => parseInt(o.value, 10) === field.count);
+        if (!option) return null;
+        value = option.value;
+    }
+    el.value = value;
+    el.dispatchEvent(new Event("input", {bubbles: true}));
+    el.dispatchEvent(new Event("change", {bubbles: true}));
+    return el.value;
+})
+"""
+
+# Before clicking captcha refresh: arm a one-shot load listener, return current src
+CAPTCHA_WATCH_JS = """
+(selector) => {
+    const img = document.querySelector(selector);
+    window.__hsrCaptchaLoaded = false;
+    if (!img) return null;
+    img.addEventListener("load", () => { window.__hsrCaptchaLoaded = true; }, { once: true });
+    return img.getAttribute("src");
+}
+"""
+
+# Captcha reloaded: load event fired, or the <img> was swapped for one with a new src
+CAPTCHA_RELOADED_JS = """
+([selector, oldSrc]) => {
+    if (window.__hsrCaptchaLoaded) return true;
+    const img = document.querySelector(selector);
+    return !!img && img.getAttribute("src") !== oldSrc && img.complete && img.naturalWidth > 0;
+}
+"""
+
+# Race the expected next-step forms against #feedMSG inside the page, so the
+# outcome comes back in a single round trip as soon as the first one appears
+OUTCOME_PROBE_JS = """
+async ([targets, errorSelector, timeout]) => {
+    const check = () => {
+        const error = document.querySelector(errorSelector);
+        const text = error ? error.innerText.trim() : "";
+        if (text) return { kind: "error", text };
+        for (const [kind, selector] of targets) {
+            if (document.querySelector(selector)) return { kind, text: "" };
+        }
+        // Page finished parsing but is none of the expected ones
+        if (document.readyState !== "loading") return { kind: "unknown", text: "" };
+        return null;
+    };
+    const deadline = performance.now() + timeout;
+    let result = check();
+    while (!result && performance.now() < deadline) {
+        await new Promise((resolve) => setTimeout(resolve, 10));
+        result = check();
+    }
+    return result || { kind: "unknown", text: "" };
+}
+"""
+
+# Absolute URL the captcha <img> was loaded from
+CAPTCHA_SRC_JS = """
+(selector) => {
+    const img = document.querySelector(selector);
+    return img ? img.src : null;
+}
+"""
+
+# Captcha <img> has finished loading
+CAPTCHA_LOADED_JS = """
+(selector) => {
+    const img = document.querySelector(selector);
+    return !!img && img.complete && img.naturalWidth > 0;
+}
+"""
+
+class Outcome(Enum):
+    """Page state detected after a submit/confirm click."""
+    STEP2 = "step2"
+    STEP3 = "step3"
+    CAPTCHA_ERROR = "captcha_error"
+    OTHER_ERROR = "other_error"
+    UNKNOWN = "unknown"
+
+
+# Form that marks each successful outcome
+OUTCOME_SELECTORS = {
+    Outcome.STEP2: Selectors.STEP2_FORM,
+    Outcome.STEP3: Selectors.STEP3_FORM,
+}
+
+
+def remember_image_response(responses: dict, response, limit: int = 32):
+    """Keep recent image responses by URL so the captcha can be read without a screenshot."""
+    if response.request.resource_type != "image":
+        return
+    responses[response.url] = response
+    if len(responses) > limit:
+        responses.pop(next(iter(responses)))
+
+
+def is_captcha_error(error: str) -> bool:
+    """Check whether an #feedMSG error text is about the captcha."""
+    return "驗證碼" in error or "檢測碼" in error or "security" in error.lower()
+
 
 class BookingAssistant:
     def __init__(self, config: dict = None, on_success=None, on_error=None):
@@ -21,13 +156,24 @@ class BookingAssistant:
             on_success: Optional callback function called on successful booking
             on_error: Optional callback function called on error, receives error message string
         """
-        self.solver = CaptchaSolver()
+        self._solver = None  # Shared OCR solver, loaded on first use (see solver)
+        self._preload_thread = None
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
         self.on_success = on_success
         self.on_error = on_error
+        self.stage_timings = {}  # stage name -> latency in ms
+        self.clock = None  # ServerClock when clock sync is enabled
+        self.trigger_error_ms = None  # Firing error of the last clock-synced wait
+        self._image_responses = {}  # Recent image responses by URL (captcha network capture)
+        self.resource_policy = None  # ResourcePolicy when block_resources is enabled
+        self.page_preloaded = False  # Attached page already shows the booking form
+        self.submits_avoided = 0  # Implausible captcha answers re-solved instead of submitted
+        self._dataset = None  # CaptchaDataset when captcha_dataset is set
+        self._submitted_captcha = None  # (image, guess, confidences) awaiting the server's verdict
+        self.attempt_timings = []  # ms per captcha attempt, from solve/submit until the next one can start
 
         # Use provided config or load from environment
         if config:
@@ -40,6 +186,8 @@ class BookingAssistant:
                 "end_station": END_STATION,
                 "travel_date": TRAVEL_DATE,
                 "travel_time": TRAVEL_TIME,
+                "car_type": CAR_TYPE,
+                "seat_preference": SEAT_PREFERENCE,
                 "adult_count": ADULT_COUNT,
                 "child_count": CHILD_COUNT,
                 "disabled_count": DISABLED_COUNT,
@@ -51,27 +199,117 @@ class BookingAssistant:
                 "headless": HEADLESS,
                 "slow_mo": SLOW_MO,
                 "trigger_time": TRIGGER_TIME,
+                "prewarm_seconds": PREWARM_SECONDS,
+                "prefill_seconds": PREFILL_SECONDS,
+                "preload_seconds": PRELOAD_SECONDS,
+                "clock_sync": CLOCK_SYNC,
+                "clock_sync_samples": CLOCK_SYNC_SAMPLES,
+                "wait_profile": WAIT_PROFILE,
+                "captcha_source": CAPTCHA_SOURCE,
+                "block_resources": BLOCK_RESOURCES,
+                "batch_fill": BATCH_FILL,
+                "captcha_length": CAPTCHA_LENGTH,
+                "captcha_charset": CAPTCHA_CHARSET,
+                "captcha_max_resolves": CAPTCHA_MAX_RESOLVES,
+                "captcha_min_confidence": CAPTCHA_MIN_CONFIDENCE,
+                "captcha_dataset": CAPTCHA_DATASET,
+                "trace_file": TRACE_FILE,
+                "otel_export": OTEL_EXPORT,
             }
 
+        self.attempt = 0  # Current captcha attempt (carried by trace events)
+        self._attempt_started = None  # perf_counter() at the start of the current attempt
+        self.selected_train = None  # (train code, departure, arrival) picked on Step 2
+        self.count_bookings = True  # Off for race lanes: the race counts its one booking itself
+        self.tracer = None  # Tracer wrapping this instance's steps when trace_file is set
+        if self.config.get("trace_file", TRACE_FILE):
+            from .instrumentation import Tracer
+            self.tracer = Tracer()
+            self.tracer.instrument(self)
+        otel_export = self.config.get("otel_export", OTEL_EXPORT)
+        if otel_export:
+            from .telemetry import BookingTelemetry
+            BookingTelemetry.shared(otel_export).instrument(self)
+
+    @property
+    def solver(self) -> CaptchaSolver:
+        """
+        The process-wide OCR solver. ddddocr (with onnxruntime, numpy, PIL)
+        is only imported and its model loaded on first access.
+        """
+        if self._solver is None:
+            self._solver = CaptchaSolver.shared(self.config.get("captcha_charset", CAPTCHA_CHARSET),
+                                                int(self.config.get("captcha_length", CAPTCHA_LENGTH)))
+        return self._solver
+
+    @solver.setter
+    def solver(self, solver: CaptchaSolver):
+        self._solver = solver
+
+    def _compat_waits(self) -> bool:
+        """True when the legacy fixed-sleep timings (wait_profile=compat) are requested."""
+        return self.config.get("wait_profile", WAIT_PROFILE) == "compat"
+
+    def _click_and_wait_for_navigation(self, selector: str, timeout: int = 15000):
+        """Click selector and wait until the page it navigates to reaches DOMContentLoaded."""
+        from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+        try:
+            with self.page.expect_navigation(wait_until="domcontentloaded", timeout=timeout):
+                self.page.click(selector)
+        except PlaywrightTimeout:
+            print(f"No navigation within {timeout // 1000}s after clicking {selector}")
+
     def start(self):
+        from playwright.sync_api import sync_playwright
+
         print("Launching browser...")
+        # Turbo profile drops slow_mo entirely
+        slow_mo = 0 if self.config.get("wait_profile", WAIT_PROFILE) == "turbo" else self.config["slow_mo"]
         self.playwright = sync_playwright().start()
         self.browser = self.playwright.chromium.launch(
             headless=self.config["headless"],
-            slow_mo=self.config["slow_mo"],
-            args=["--disable-blink-features=AutomationControlled"]
-        )
-        self.context = self.browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800}
+            slow_mo=slow_mo,
+            args=LAUNCH_ARGS
         )
+        metrics.BROWSER_LAUNCHES.inc()
+        self.context = self.browser.new_context(**CONTEXT_OPTIONS)
+        metrics.OPEN_CONTEXTS.inc()
+        if self.config.get("block_resources", BLOCK_RESOURCES):
+            self.resource_policy = ResourcePolicy()
+            self.resource_policy.install(self.context)
         self.page = self.context.new_page()
+        self.page.on("response", self._remember_image_response)
         print("Browser launched successfully.")
+
+    def attach(self, context, page, preloaded: bool = False, image_responses: dict = None):
+        """
+        Use a context and page owned by someone else (the browser daemon)
+        instead of launching a browser. close() leaves them open.
+
+        Args:
+            context: Browser context the page belongs to
+            page: Page to run the booking flow on
+            preloaded: The page already shows the booking form (cookie dialog dismissed)
+            image_responses: Image response cache the owner already fills for this page;
+                if None, a response listener is registered here
+        """
+        self.context = context
+        self.page = page
+        self.page_preloaded = preloaded
+        if image_responses is not None:
+            self._image_responses = image_responses
+        else:
+            self.page.on("response", self._remember_image_response)
     
     def open_booking_page(self):
+        from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
         try:
             print(f"Navigating to {self.config['base_url']}...")
-            self.page.goto(self.config["base_url"], timeout=60000)
+            # Event-driven profiles don't wait for images/fonts (the "load" event)
+            wait_until = "load" if self._compat_waits() else "domcontentloaded"
+            self.page.goto(self.config["base_url"], timeout=60000, wait_until=wait_until)
             self.page.wait_for_load_state("domcontentloaded")
             print("Page loaded successfully!")
             return True
@@ -92,68 +330,269 @@ class BookingAssistant:
         except:
             pass  # No cookie dialog or already dismissed
 
-    def fill_booking_form(self):
-        """Fill the booking form with configured values."""
-        print("\n--- Filling Booking Form ---")
-
-        # Select departure station
-        start_station = self.config["start_station"]
-        print(f"Selecting departure station: {STATIONS.get(start_station, start_station)}")
-        self.page.select_option(Selectors.START_STATION, value=start_station)
+    def _booking_form_fields(self) -> list:
+        """
+        Step 1 fields to set, in page order.
 
-        # Select destination station
-        end_station = self.config["end_station"]
-        print(f"Selecting destination station: {STATIONS.get(end_station, end_station)}")
-        self.page.select_option(Selectors.END_STATION, value=end_station)
+        Each field has "name" and "selector", plus either "value" (exact
+        option/input value) or "count" and "suffix" (ticket rows).
+        "optional" fields hold the page's default value, so the per-field
+        path skips them.
+        """
+        car_type = str(self.config.get("car_type", CAR_TYPE))
+        seat_preference = str(self.config.get("seat_preference", SEAT_PREFERENCE))
+        fields = [
+            # The flow books one-way trips only
+            {"name": "trip_type", "selector": Selectors.TRIP_TYPE, "value": "0", "optional": True},
+            {"name": "start_station", "selector": Selectors.START_STATION,
+             "value": str(self.config["start_station"])},
+            {"name": "end_station", "selector": Selectors.END_STATION,
+             "value": str(self.config["end_station"])},
+            {"name": "car_type", "selector": Selectors.CAR_TYPE,
+             "value": car_type, "optional": car_type == "0"},
+            {"name": "seat_preference", "selector": Selectors.SEAT_PREFERENCE,
+             "value": seat_preference, "optional": seat_preference == "0"},
+        ]
 
-        # Set departure date (if specified)
         travel_date = self.config.get("travel_date", "")
         if travel_date:
-            print(f"Setting departure date: {travel_date}")
+            fields.append({"name": "travel_date", "selector": Selectors.DEPARTURE_DATE, "value": travel_date})
+
+        travel_time = self.config.get("travel_time", "")
+        if travel_time:
+            fields.append({"name": "travel_time", "selector": Selectors.DEPARTURE_TIME,
+                           "value": TIME_VALUES.get(travel_time, travel_time)})
+
+        for key, selector, suffix in TICKET_ROWS:
+            count = int(self.config.get(key, 1 if key == "adult_count" else 0) or 0)
+            fields.append({"name": key, "selector": selector, "count": count, "suffix": suffix,
+                           "optional": key != "adult_count" and count == 0})
+
+        return fields
+
+    def _fill_booking_form_batched(self, fields: list) -> list:
+        """
+        Set all fields in a single page.evaluate and verify the result.
+
+        :param fields: Fields from _booking_form_fields()
+        :return: Fields that didn't end up with the requested value
+        """
+        try:
+            results = self.page.evaluate(FILL_FORM_JS, fields)
+        except Exception as e:
+            print(f"Batched form fill failed: {e}")
+            return fields
+        return self._failed_batch_fields(fields, results)
+
+    @staticmethod
+    def _failed_batch_fields(fields: list, results) -> list:
+        """Fields whose FILL_FORM_JS result isn't the requested value (all of them if results is unusable)."""
+        if not isinstance(results, list) or len(results) != len(fields):
+            return fields
+
+        failed = []
+        for field, result in zip(fields, results):
+            if "count" in field:
+                leading = re.match(r"\d+", result or "")
+                ok = leading is not None and int(leading.group()) == field["count"]
+            else:
+                ok = result == field["value"]
+            if not ok:
+                failed.append(field)
+        return failed
+
+    def _print_field(self, field: dict):
+        """Progress line for a field set on the per-field fill path."""
+        name = field["name"]
+        if name == "start_station":
+            print(f"Selecting departure station: {STATIONS.get(field['value'], field['value'])}")
+        elif name == "end_station":
+            print(f"Selecting destination station: {STATIONS.get(field['value'], field['value'])}")
+        elif name == "travel_date":
+            print(f"Setting departure date: {field['value']}")
+        elif name == "travel_time":
+            print(f"Setting departure time: {self.config.get('travel_time')} ({field['value']})")
+        elif "count" in field:
+            print(f"Setting {name.replace('_count', '')} tickets: {field['count']}")
+
+    def _fill_field(self, field: dict):
+        """Set one field with its own Playwright call (per-field fill path)."""
+        self._print_field(field)
+        if field["name"] == "travel_date":
             # Date picker uses flatpickr which hides the actual input
             # We need to use JavaScript to set the value
             self.page.evaluate(f'''
-                document.querySelector("#toTimeInputField").value = "{travel_date}";
+                document.querySelector("#toTimeInputField").value = "{field['value']}";
                 document.querySelector("#toTimeInputField").dispatchEvent(new Event("change"));
             ''')
+        elif "count" in field:
+            self.page.select_option(field["selector"], value=f"{field['count']}{field['suffix']}")
+        else:
+            self.page.select_option(field["selector"], value=field["value"])
 
-        # Set departure time (if specified)
-        travel_time = self.config.get("travel_time", "")
-        if travel_time:
-            time_value = TIME_VALUES.get(travel_time, travel_time)
-            print(f"Setting departure time: {travel_time} ({time_value})")
-            self.page.select_option(Selectors.DEPARTURE_TIME, value=time_value)
+    def fill_booking_form(self):
+        """
+        Fill the booking form with configured values.
+
+        With batch_fill every field is set by one script (one round trip);
+        anything it couldn't set is retried field by field.
+        """
+        print("\n--- Filling Booking Form ---")
+        fields = self._booking_form_fields()
+
+        batch_fill = self.config.get("batch_fill", BATCH_FILL)
+        if batch_fill:
+            fields = self._fill_booking_form_batched(fields)
+
+        # Fields left at the page default need no per-field round trip
+        fields = [field for field in fields if not field.get("optional")]
+        if batch_fill and fields:
+            names = ", ".join(field["name"] for field in fields)
+            print(f"Batched fill didn't set {names}, filling them one by one")
 
-        # Set ticket count (adult)
-        adult_count = self.config.get("adult_count", 1)
-        ticket_value = f"{adult_count}F"
-        print(f"Setting adult tickets: {adult_count}")
-        self.page.select_option(Selectors.ADULT_TICKETS, value=ticket_value)
+        for field in fields:
+            self._fill_field(field)
 
         print("Form filled successfully!")
 
+    def _remember_image_response(self, response):
+        """Keep recent image responses so the captcha can be read without a screenshot."""
+        remember_image_response(self._image_responses, response)
+
+    def _captcha_bytes_from_network(self):
+        """
+        Original captcha image bytes from its HTTP response.
+
+        :return: Image bytes, or None if the response wasn't captured
+        """
+        try:
+            src = self.page.evaluate(CAPTCHA_SRC_JS, Selectors.CAPTCHA_IMAGE)
+            response = self._image_responses.get(src)
+            if response is None or not response.ok:
+                return None
+            return response.body()
+        except Exception as e:
+            print(f"Network captcha capture failed: {e}")
+            return None
+
     def get_captcha_image(self) -> bytes:
-        """Capture captcha image and return as bytes."""
+        """
+        Capture captcha image and return as bytes.
+
+        With captcha_source=network the bytes come straight from the image's
+        HTTP response (no render/screenshot/PNG re-encode); the element
+        screenshot is the fallback and the screenshot mode.
+        """
+        from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+        if not self._compat_waits():
+            # Page was only awaited to DOMContentLoaded; the image may still be loading
+            try:
+                self.page.wait_for_function(CAPTCHA_LOADED_JS, arg=Selectors.CAPTCHA_IMAGE, timeout=5000)
+            except PlaywrightTimeout:
+                print("Captcha image still loading after 5s, capturing anyway")
+
+        if self.config.get("captcha_source", CAPTCHA_SOURCE) == "network":
+            image_bytes = self._captcha_bytes_from_network()
+            if image_bytes:
+                return image_bytes
+            print("Captcha response not captured, falling back to screenshot")
+
         captcha_img = self.page.locator(Selectors.CAPTCHA_IMAGE)
         return captcha_img.screenshot()
 
+    def _captcha_plausible(self, captcha_text: str, confidences: list = None) -> bool:
+        """
+        Check the OCR result has the length/charset of an HSR captcha and,
+        if confidences are known and captcha_min_confidence is set, that no
+        character is below it. A failing one would most likely be rejected
+        by the server after a full round trip, so it's counted as a submit
+        avoided.
+        """
+        if not is_plausible(captcha_text, int(self.config.get("captcha_length", CAPTCHA_LENGTH)),
+                            self.config.get("captcha_charset", CAPTCHA_CHARSET)):
+            self.submits_avoided += 1
+            print(f"Captcha result {captcha_text!r} is not a plausible captcha, solving a new one")
+            return False
+        confidence = min(confidences, default=0.0) if confidences is not None else None
+        if confidence is not None and confidence < self._min_confidence():
+            self.submits_avoided += 1
+            print(f"Captcha result {captcha_text!r} has low confidence "
+                  f"({confidence:.2f} < {self._min_confidence():.2f}), solving a new one")
+            return False
+        return True
+
+    def _max_resolves(self) -> int:
+        return int(self.config.get("captcha_max_resolves", CAPTCHA_MAX_RESOLVES))
+
+    def _min_confidence(self) -> float:
+        return float(self.config.get("captcha_min_confidence", CAPTCHA_MIN_CONFIDENCE))
+
+    def _recognize(self, image_bytes: bytes) -> tuple:
+        """
+        OCR the captcha image.
+
+        :return: (text, per-character confidences); the confidences are None
+                 unless captcha_min_confidence or captcha_dataset is set, as
+                 the probability output costs extra time per inference
+        """
+        if self._min_confidence() > 0 or self._captcha_dataset() is not None:
+            result = self.solver.solve_detailed(image_bytes)
+            return result.text, result.confidences
+        return self.solver.solve_bytes(image_bytes), None
+
+    def _captcha_dataset(self):
+        """The CaptchaDataset submitted captchas are collected into, or None when collection is off."""
+        directory = self.config.get("captcha_dataset", CAPTCHA_DATASET)
+        if directory and self._dataset is None:
+            self._dataset = CaptchaDataset(directory)
+        return self._dataset if directory else None
+
+    def _record_captcha_outcome(self, outcome: Outcome):
+        """
+        Collect the last submitted captcha with the server's verdict: accepted
+        on Step 2, rejected on a captcha error. Other outcomes say nothing
+        about the captcha and aren't recorded.
+        """
+        submitted, self._submitted_captcha = self._submitted_captcha, None
+        dataset = self._captcha_dataset()
+        if dataset is None or submitted is None or outcome not in (Outcome.STEP2, Outcome.CAPTCHA_ERROR):
+            return
+        image_bytes, guess, confidences = submitted
+        try:
+            dataset.add(image_bytes, guess, accepted=outcome is Outcome.STEP2, confidences=confidences)
+        except OSError as e:
+            print(f"Could not record captcha in {dataset.directory}: {e}")
+
+    def _refresh_captcha_locally(self):
+        """Get a new captcha on the current page without submitting."""
+        self.refresh_captcha()
+
     def solve_and_fill_captcha(self) -> str:
-        """Solve captcha and fill in the answer."""
+        """
+        Solve captcha and fill in the answer. Implausible or low-confidence
+        OCR results are re-solved on a fresh captcha (up to
+        captcha_max_resolves times).
+        """
         print("\n--- Solving Captcha ---")
         
-        # Get captcha image
-        captcha_bytes = self.get_captcha_image()
-        
-        # Solve using OCR
-        captcha_text = self.solver.solve_bytes(captcha_bytes)
-        print(f"Captcha recognized: {captcha_text}")
+        for resolve in range(self._max_resolves() + 1):
+            # Get captcha image and solve using OCR
+            image_bytes = self.get_captcha_image()
+            captcha_text, confidences = self._recognize(image_bytes)
+            print(f"Captcha recognized: {captcha_text}")
+            if resolve == self._max_resolves() or self._captcha_plausible(captcha_text, confidences):
+                break
+            self._refresh_captcha_locally()
+        self._submitted_captcha = (image_bytes, captcha_text, confidences)
         
         # Fill captcha input
         captcha_input = self.page.locator(Selectors.CAPTCHA_INPUT)
         captcha_input.fill(captcha_text)
         
-        # Wait a moment so user can see the filled value
-        time.sleep(0.5)
+        # Wait a moment so user can see the filled value (compat timings only)
+        if self._compat_waits():
+            time.sleep(0.5)
         
         # Verify the fill worked
         filled_value = captcha_input.input_value()
@@ -162,15 +601,53 @@ class BookingAssistant:
         return captcha_text
 
     def refresh_captcha(self):
-        """Click refresh button to get new captcha."""
+        """Click refresh button and wait for the new captcha image to load."""
+        from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+        if self._compat_waits():
+            self.page.click(Selectors.CAPTCHA_REFRESH)
+            time.sleep(1)  # Wait for new captcha to load
+            return
+
+        old_src = self.page.evaluate(CAPTCHA_WATCH_JS, Selectors.CAPTCHA_IMAGE)
         self.page.click(Selectors.CAPTCHA_REFRESH)
-        time.sleep(1)  # Wait for new captcha to load
+        try:
+            self.page.wait_for_function(
+                CAPTCHA_RELOADED_JS, arg=[Selectors.CAPTCHA_IMAGE, old_src], timeout=5000
+            )
+        except PlaywrightTimeout:
+            print("Captcha image did not reload within 5s, continuing anyway")
+
+    def _begin_attempt(self, attempt: int):
+        """Start captcha attempt number attempt (solve, submit, outcome, next captcha)."""
+        self.attempt = attempt
+        self._attempt_started = time.perf_counter()
+        metrics.CAPTCHA_ATTEMPTS.inc()
+
+    def _end_attempt(self, outcome: Outcome, error: str = ""):
+        """
+        Finish the current captcha attempt: after the next captcha is ready
+        on a captcha error, or as soon as Step 1 is left or given up.
+
+        :param outcome: Where the submit landed
+        :param error: #feedMSG text, if any
+        """
+        self.attempt_timings.append((time.perf_counter() - self._attempt_started) * 1000)
+        if outcome is Outcome.CAPTCHA_ERROR:
+            metrics.CAPTCHA_FAILURES.inc()
+
+    def _retry_captcha(self):
+        """Get the next captcha ready after the server rejected one."""
+        self.refresh_captcha()
 
     def submit_form(self):
         """Submit the booking form."""
         print("\n--- Submitting Form ---")
-        self.page.click(Selectors.SUBMIT_BUTTON)
-        self.page.wait_for_load_state("domcontentloaded")
+        if self._compat_waits():
+            self.page.click(Selectors.SUBMIT_BUTTON)
+            self.page.wait_for_load_state("domcontentloaded")
+        else:
+            self._click_and_wait_for_navigation(Selectors.SUBMIT_BUTTON)
 
     def check_for_errors(self) -> str:
         """Check if there are any error messages on the page."""
@@ -182,13 +659,84 @@ class BookingAssistant:
             pass
         return ""
 
+    def probe_outcome(self, *expected: Outcome, timeout: int = 5000):
+        """
+        Detect where a submit/confirm click landed.
+
+        Races the forms for the expected outcomes against #feedMSG and
+        returns as soon as either appears (or the page turns out to be
+        something else). Compat profile falls back to the sequential
+        is_on_step2/is_on_step3 + check_for_errors checks.
+
+        :param expected: Successful outcomes to look for (STEP2, STEP3, or none)
+        :param timeout: Milliseconds to wait for the page to settle
+        :return: (Outcome, error text)
+        """
+        if self._compat_waits():
+            return self._probe_outcome_sequential(expected)
+
+        targets = [[outcome.value, OUTCOME_SELECTORS[outcome]] for outcome in expected]
+        try:
+            result = self.page.evaluate(OUTCOME_PROBE_JS, [targets, Selectors.ERROR_MESSAGE, timeout])
+        except Exception as e:
+            print(f"Outcome probe failed: {e}")
+            return Outcome.UNKNOWN, ""
+
+        if result["kind"] == "error":
+            error = result["text"]
+            return (Outcome.CAPTCHA_ERROR if is_captcha_error(error) else Outcome.OTHER_ERROR), error
+        return Outcome(result["kind"]), ""
+
+    def _probe_outcome_sequential(self, expected):
+        """Legacy outcome detection: check each form, then the error message."""
+        checks = {Outcome.STEP2: self.is_on_step2, Outcome.STEP3: self.is_on_step3}
+        for outcome in expected:
+            if checks[outcome]():
+                return outcome, ""
+
+        error = self.check_for_errors()
+        if error:
+            return (Outcome.CAPTCHA_ERROR if is_captcha_error(error) else Outcome.OTHER_ERROR), error
+        return Outcome.UNKNOWN, ""
+
+    def _report_run(self):
+        """Print the run's summaries and write its trace events (on close, sync and async)."""
+        if self.resource_policy:
+            print(self.resource_policy.summary())
+        if self._solver:
+            print(self._solver.summary())
+        if self.submits_avoided:
+            print(f"Captcha plausibility check avoided {self.submits_avoided} submits")
+        if len(self.attempt_timings) > 1:
+            print(self.attempt_summary())
+        if self.tracer:
+            self._export_trace()
+
     def close(self):
         """Close browser and cleanup."""
+        self._report_run()
         if self.browser:
             self.browser.close()
+            metrics.OPEN_CONTEXTS.dec()
         if self.playwright:
             self.playwright.stop()
 
+    def _export_trace(self):
+        """Print the step timings and append the trace events to trace_file."""
+        path = self.config.get("trace_file", TRACE_FILE)
+        print(self.tracer.summary())
+        try:
+            written = self.tracer.export(path)
+            print(f"Trace: {written} events written to {path}")
+        except OSError as e:
+            print(f"Could not write trace to {path}: {e}")
+
+    def attempt_summary(self) -> str:
+        """Captcha attempts made and the effective attempt rate."""
+        seconds = sum(self.attempt_timings) / 1000
+        rate = len(self.attempt_timings) / seconds if seconds else 0.0
+        return f"Captcha attempts: {len(self.attempt_timings)} in {seconds:.2f}s ({rate:.2f} attempts/s)"
+
     def is_on_step2(self) -> bool:
         """Check if we're on the train selection page (Step 2)."""
         try:
@@ -221,6 +769,7 @@ class BookingAssistant:
         train_code = first_train.get_attribute("QueryCode")
         departure = first_train.get_attribute("QueryDeparture")
         arrival = first_train.get_attribute("QueryArrival")
+        self.selected_train = (train_code, departure, arrival)
         print(f"Selected train: {train_code} ({departure} → {arrival})")
         
         return True
@@ -228,9 +777,12 @@ class BookingAssistant:
     def confirm_train_selection(self):
         """Click the confirm button on Step 2."""
         print("Confirming train selection...")
-        self.page.click(Selectors.CONFIRM_TRAIN)
-        self.page.wait_for_load_state("domcontentloaded")
-        time.sleep(1)
+        if self._compat_waits():
+            self.page.click(Selectors.CONFIRM_TRAIN)
+            self.page.wait_for_load_state("domcontentloaded")
+            time.sleep(1)
+        else:
+            self._click_and_wait_for_navigation(Selectors.CONFIRM_TRAIN)
         print("Train confirmed!")
 
     def is_on_step3(self) -> bool:
@@ -273,9 +825,12 @@ class BookingAssistant:
     def confirm_booking(self):
         """Click confirm booking button on Step 3."""
         print("\n--- Confirming Booking ---")
-        self.page.click(Selectors.CONFIRM_BOOKING)
-        self.page.wait_for_load_state("domcontentloaded")
-        time.sleep(2)
+        if self._compat_waits():
+            self.page.click(Selectors.CONFIRM_BOOKING)
+            self.page.wait_for_load_state("domcontentloaded")
+            time.sleep(2)
+        else:
+            self._click_and_wait_for_navigation(Selectors.CONFIRM_BOOKING)
         print("Booking confirmed!")
 
     def _parse_trigger_time(self, time_str: str):
@@ -314,15 +869,17 @@ class BookingAssistant:
 
         return trigger_time
 
-    def _wait_until_trigger_time(self, time_str: str):
+    def _wait_until_trigger_time(self, time_str: str, lead_seconds: float = 0):
         """
-        Wait until trigger time.
+        Wait until trigger time (or lead_seconds before it).
         - Display remaining time every 60 seconds
         - Support Ctrl+C interruption
 
         :param time_str: Trigger time string
+        :param lead_seconds: Return this many seconds before the trigger time
+        :return: Parsed trigger time (datetime object)
         """
-        from datetime import datetime
+        from datetime import datetime, timedelta
 
         trigger_time = self._parse_trigger_time(time_str)
 
@@ -335,8 +892,10 @@ class BookingAssistant:
             f"⏰ Scheduled Execution Mode\n"
             f"Trigger time: {trigger_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
             f"Time until execution: {int(total_seconds // 3600):02d}:{int((total_seconds % 3600) // 60):02d}:{int(total_seconds % 60):02d}\n"
-            f"Press Ctrl+C to cancel..."
         )
+        if lead_seconds > 0:
+            msg += f"Browser warm-up starts {lead_seconds:g}s before trigger\n"
+        msg += "Press Ctrl+C to cancel..."
 
         if self.on_error:
             # GUI mode: Display wait status (using on_error because it accepts string parameter)
@@ -345,15 +904,42 @@ class BookingAssistant:
             # CLI mode: Direct output
             print(msg)
 
+        self._sleep_until(
+            trigger_time - timedelta(seconds=lead_seconds),
+            remaining_seconds=total_seconds - lead_seconds,
+        )
+        return trigger_time
+
+    def _sleep_until(self, target_time, remaining_seconds: float = None):
+        """
+        Sleep until target_time, returning immediately if it has passed.
+        - Display remaining time every 60 seconds (CLI mode only)
+        - Support Ctrl+C interruption
+        - In clock-sync mode, target_time is read on the server clock and the
+          last second is handed to ServerClock.wait_until for ms precision
+
+        :param target_time: datetime to wait for
+        :param remaining_seconds: Seconds left, if the caller already computed it
+        """
+        from datetime import datetime
+
+        def seconds_left():
+            if self.clock:
+                return self.clock.seconds_until(target_time.timestamp())
+            return (target_time - datetime.now()).total_seconds()
+
+        precise_window = 1.0 if self.clock else 0
+        if remaining_seconds is None or self.clock:
+            remaining_seconds = seconds_left()
+
         # Loop wait, reminder every 60 seconds
-        remaining_seconds = total_seconds
         last_reminder = time.time()
 
         try:
-            while remaining_seconds > 0:
-                sleep_time = min(60, remaining_seconds)
+            while remaining_seconds > precise_window:
+                sleep_time = min(60, remaining_seconds - precise_window)
                 time.sleep(sleep_time)
-                remaining_seconds = (trigger_time - datetime.now()).total_seconds()
+                remaining_seconds = seconds_left()
 
                 # Reminder every 60 seconds (CLI mode only)
                 if not self.on_error and time.time() - last_reminder >= 60:
@@ -363,6 +949,13 @@ class BookingAssistant:
                     print(f"⏳ Time remaining: {hours:02d}:{minutes:02d}:{seconds:02d}")
                     last_reminder = time.time()
 
+            if self.clock:
+                self.trigger_error_ms = self.clock.wait_until(target_time.timestamp())
+                print(
+                    f"🎯 Reached {target_time.strftime('%H:%M:%S')} on server clock "
+                    f"(firing error {self.trigger_error_ms:+.2f} ms)"
+                )
+
         except KeyboardInterrupt:
             msg = "\n❌ Cancelled by user"
             if self.on_error:
@@ -371,6 +964,146 @@ class BookingAssistant:
                 print(msg)
             raise  # Re-raise for outer handler
 
+    def _run_stage(self, name: str, func):
+        """
+        Run one stage of the booking pipeline and record its latency.
+
+        :param name: Stage name (key in self.stage_timings)
+        :param func: Callable performing the stage
+        :return: Whatever func returns
+        """
+        started = time.perf_counter()
+        try:
+            return func()
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stage_timings[name] = elapsed_ms
+            metrics.STEP_SECONDS.labels(metrics.step_name(name)).observe(elapsed_ms / 1000)
+            print(f"⏱ Stage '{name}' took {elapsed_ms:.0f} ms")
+
+    def _sync_clock(self):
+        """Estimate the server clock offset from HTTP Date headers."""
+        clock = self.clock or ServerClock()
+        samples = int(self.config.get("clock_sync_samples", CLOCK_SYNC_SAMPLES))
+        try:
+            clock.sync(self.config["base_url"], samples=samples)
+            print(
+                f"🕒 Server clock offset: {clock.offset * 1000:+.0f} ms "
+                f"(±{clock.uncertainty * 1000:.0f} ms)"
+            )
+        except Exception as e:
+            print(f"Clock sync failed ({e}), falling back to local clock")
+        self.clock = clock
+
+    def _preload(self):
+        """Import Playwright and load + warm up the OCR model (runs in a background thread)."""
+        try:
+            import playwright.sync_api  # noqa: F401
+            self.solver.warm_up()
+        except Exception as e:
+            print(f"Background preload failed: {e}")
+
+    def _start_preload(self):
+        """Start _preload in a background thread (once)."""
+        if self._preload_thread is None:
+            self._preload_thread = threading.Thread(
+                target=self._run_stage, args=("preload", self._preload), daemon=True
+            )
+            self._preload_thread.start()
+        return self._preload_thread
+
+    def _stage_launch(self):
+        """
+        Launch stage: start the browser (unless a page was attached) while
+        the OCR model loads in the background, then wait for both.
+        """
+        preload = self._start_preload()
+        if self.page is None:
+            self.start()
+        preload.join()
+
+    def _stage_prefill(self) -> bool:
+        """Prefill stage: load the booking page and fill the form."""
+        if self.page_preloaded:
+            print("Using preloaded booking page.")
+            self.page_preloaded = False
+        else:
+            if not self.open_booking_page():
+                return False
+            self.dismiss_cookie_dialog()
+        self.fill_booking_form()
+        return True
+
+    def _stage_submit(self):
+        """Submit stage: solve captcha and submit Step 1 (all that is left for T-0)."""
+        self.solve_and_fill_captcha()
+        self.submit_form()
+
+    def _run_pre_trigger_stages(self, time_str: str) -> bool:
+        """
+        Run the launch and prefill stages ahead of the trigger time,
+        then wait for the trigger itself.
+
+        Launch runs at T-prewarm_seconds, prefill at T-prefill_seconds.
+        Heavy imports and the OCR model load start preload_seconds before
+        launch, in the background, so the hours-long wait before them
+        runs on a small process. If a stage overruns, the next one
+        starts right away. With clock
+        sync enabled, the server offset is measured up front and again
+        after launch, so hours-long waits don't accumulate local drift.
+
+        :param time_str: Trigger time string
+        :return: False if the booking page could not be loaded
+        """
+        from datetime import timedelta
+
+        prewarm_seconds = float(self.config.get("prewarm_seconds", PREWARM_SECONDS))
+        prefill_seconds = float(self.config.get("prefill_seconds", PREFILL_SECONDS))
+        preload_seconds = float(self.config.get("preload_seconds", PRELOAD_SECONDS))
+
+        if self.config.get("clock_sync", CLOCK_SYNC):
+            self._run_stage("clock_sync", self._sync_clock)
+
+        trigger_time = self._wait_until_trigger_time(time_str, lead_seconds=prewarm_seconds + preload_seconds)
+        self._start_preload()
+        self._sleep_until(trigger_time - timedelta(seconds=prewarm_seconds))
+        self._run_stage("launch", self._stage_launch)
+        if self.clock:
+            self._run_stage("clock_resync", self._sync_clock)
+
+        self._sleep_until(trigger_time - timedelta(seconds=prefill_seconds))
+        if not self._run_stage("prefill", self._stage_prefill):
+            return False
+
+        self._sleep_until(trigger_time)
+        return True
+
+    def _fail(self, error_msg: str, cli_message: str = None):
+        """Report a booking failure through on_error, or print it in CLI mode."""
+        self._count_booking(metrics.error_class(error_msg))
+        if self.on_error:
+            self.on_error(error_msg)
+        else:
+            print(cli_message or f"{error_msg} - stopping")
+
+    def _count_booking(self, error_class: str = None):
+        """Count the booking as succeeded (or failed with error_class) unless count_bookings is off."""
+        if not self.count_bookings:
+            return
+        if error_class is None:
+            metrics.BOOKINGS_SUCCEEDED.inc()
+        else:
+            metrics.BOOKINGS_FAILED.labels(error_class).inc()
+
+    def _report_success(self):
+        """CLI mode: display success message and keep the browser open."""
+        print("\n" + "="*50)
+        print("🎉 BOOKING COMPLETE!")
+        print("="*50)
+        print("\nPlease check the page for your booking confirmation.")
+        print("Press Enter to close the browser...")
+        input()
+
     def run(self, max_captcha_retries: int = 5):
         """
         Run the booking assistant with automatic captcha retry.
@@ -379,93 +1112,73 @@ class BookingAssistant:
             max_captcha_retries: Maximum number of captcha retry attempts.
         """
         try:
-            # Check if we need to wait for trigger time
+            # Scheduled mode: launch and fill the form before the trigger time
             trigger_time = self.config.get("trigger_time", "")
             if trigger_time:
-                self._wait_until_trigger_time(trigger_time)
-
-            self.start()
+                page_ready = self._run_pre_trigger_stages(trigger_time)
+            else:
+                self._run_stage("launch", self._stage_launch)
+                page_ready = self._run_stage("prefill", self._stage_prefill)
 
-            if not self.open_booking_page():
+            if not page_ready:
                 error_msg = "Failed to load page"
-                if self.on_error:
-                    self.on_error(error_msg)
-                else:
-                    print(f"{error_msg}. Exiting...")
+                self._fail(error_msg, f"{error_msg}. Exiting...")
                 return
 
-            # Dismiss cookie dialog
-            self.dismiss_cookie_dialog()
-
-            # Fill form
-            self.fill_booking_form()
-
             # Try to submit with captcha retry
             for attempt in range(1, max_captcha_retries + 1):
                 print(f"\n=== Attempt {attempt}/{max_captcha_retries} ===")
-
-                # Solve captcha
-                self.solve_and_fill_captcha()
-
-                # Submit form
-                self.submit_form()
-                time.sleep(1)
-
-                # Check if we reached Step 2
-                if self.is_on_step2():
+                self._begin_attempt(attempt)
+
+                # Solve captcha and submit form
+                self._run_stage(f"submit_{attempt}", self._stage_submit)
+                if self._compat_waits():
+                    time.sleep(1)
+
+                # Check if we reached Step 2 or got an error
+                outcome, error = self.probe_outcome(Outcome.STEP2)
+                self._record_captcha_outcome(outcome)
+                if outcome is Outcome.STEP2:
+                    self._end_attempt(outcome)
                     print("✅ Successfully reached train selection page!")
                     break
 
-                # Check for errors
-                error = self.check_for_errors()
                 if error:
                     print(f"❌ Error: {error}")
                     # Check for captcha-related errors
-                    if "驗證碼" in error or "檢測碼" in error or "security" in error.lower():
+                    if outcome is Outcome.CAPTCHA_ERROR:
                         print("Captcha error - refreshing and retrying...")
-                        self.refresh_captcha()
+                        self._retry_captcha()
+                        self._end_attempt(outcome, error)
                         continue
                     else:
-                        error_msg = f"Non-captcha error: {error}"
-                        if self.on_error:
-                            self.on_error(error_msg)
-                        else:
-                            print(f"{error_msg} - stopping")
+                        self._end_attempt(outcome, error)
+                        self._fail(f"Non-captcha error: {error}")
                         return
                 else:
-                    error_msg = "Unknown error after form submission"
-                    if self.on_error:
-                        self.on_error(error_msg)
-                    else:
-                        print(f"{error_msg} - stopping")
+                    self._end_attempt(outcome)
+                    self._fail("Unknown error after form submission")
                     return
             else:
                 error_msg = f"Failed after {max_captcha_retries} captcha attempts"
-                if self.on_error:
-                    self.on_error(error_msg)
-                else:
-                    print(error_msg)
+                self._fail(error_msg, error_msg)
                 return
 
             # === Step 2: Select Train ===
             if not self.select_first_train():
-                error_msg = "No available trains to select"
-                if self.on_error:
-                    self.on_error(error_msg)
-                else:
-                    print(f"{error_msg} - stopping")
+                self._fail("No available trains to select")
                 return
 
             # Confirm train selection
             self.confirm_train_selection()
 
             # === Step 3: Fill Passenger Info ===
-            if not self.is_on_step3():
+            outcome, error = self.probe_outcome(Outcome.STEP3)
+            if outcome is not Outcome.STEP3:
                 error_msg = "Failed to reach passenger info page (Step 3)"
-                if self.on_error:
-                    self.on_error(error_msg)
-                else:
-                    print(f"{error_msg} - stopping")
+                if error:
+                    error_msg += f": {error}"
+                self._fail(error_msg)
                 return
 
             print("\n=== Step 3: Passenger Info ===")
@@ -474,20 +1187,21 @@ class BookingAssistant:
             # Confirm booking
             self.confirm_booking()
 
+            outcome, error = self.probe_outcome()
+            if error:
+                self._fail(f"Booking was not confirmed: {error}")
+                return
+
             # === Step 4: Booking Complete ===
+            self._count_booking()
             if self.on_success:
                 self.on_success()
             else:
-                # CLI mode: display success message
-                print("\n" + "="*50)
-                print("🎉 BOOKING COMPLETE!")
-                print("="*50)
-                print("\nPlease check the page for your booking confirmation.")
-                print("Press Enter to close the browser...")
-                input()
+                self._report_success()
 
         except Exception as e:
             error_msg = str(e)
+            self._count_booking("exception")
             if self.on_error:
                 self.on_error(error_msg)
             else:
@@ -1,21 +1,247 @@
+import threading
+import time
+from collections import deque
+
+from . import metrics
+from .config import CAPTCHA_LENGTH, CAPTCHA_CHARSET, CAPTCHA_PREPROCESS, CAPTCHA_ENSEMBLE, OCR_WORKERS
+from .stats import percentile
+
+
+def is_plausible(text, length: int = CAPTCHA_LENGTH, charset: str = CAPTCHA_CHARSET) -> bool:
+    """
+    Check an OCR result could be an HSR captcha: exactly length characters,
+    all from charset (case-insensitive). Empty results (OCR errors) fail.
+    """
+    if not isinstance(text, str) or len(text) != length:
+        return False
+    allowed = set(charset.upper())
+    return all(char in allowed for char in text.upper())
+
+
+class CaptchaResult:
+    """OCR text with the confidence (0-1) of each of its characters."""
+
+    def __init__(self, text: str, confidences: list):
+        self.text = text
+        self.confidences = confidences
+
+    @property
+    def min_confidence(self) -> float:
+        """The least certain character decides; 0 for an empty result."""
+        return min(self.confidences) if self.confidences else 0.0
+
+    @property
+    def mean_confidence(self) -> float:
+        return sum(self.confidences) / len(self.confidences) if self.confidences else 0.0
+
+    def __repr__(self):
+        confidences = ", ".join(f"{c:.2f}" for c in self.confidences)
+        return f"CaptchaResult({self.text!r}, [{confidences}])"
+
+
+def decode_probabilities(output: dict, charset: str = CAPTCHA_CHARSET) -> CaptchaResult:
+    """
+    Greedy CTC decoding of ddddocr's probability output, limited to charset.
+    Upper and lower case share one class (HSR captchas are case-insensitive),
+    so a letter the model can't place in a case isn't counted as uncertain.
+    A character's confidence is its highest probability over the frames it
+    spans.
+
+    :param output: classification(..., probability=True) result, either the
+                   1.6 format ("probabilities", "charset") or the 1.5 one
+                   ("probability", "charsets")
+    """
+    import numpy as np
+
+    if "probabilities" in output:
+        probabilities, names = output["probabilities"], output["charset"]
+    else:
+        probabilities, names = output["probability"], output["charsets"]
+    frames = np.asarray(probabilities, dtype=np.float32).reshape(-1, len(names))
+
+    # Class 0 is the CTC blank; then one class per allowed character
+    classes = [""] + sorted(set(charset.upper()))
+    index = {char: position for position, char in enumerate(classes)}
+    columns = [[] for _ in classes]
+    for column, name in enumerate(names):
+        position = index.get(name.upper())
+        if position is not None:
+            columns[position].append(column)
+    grouped = np.stack([frames[:, cols].sum(axis=1) for cols in columns], axis=1)
+
+    best = grouped.argmax(axis=1)
+    best_probability = grouped.max(axis=1)
+    text, confidences = [], []
+    previous = 0
+    for position, probability in zip(best.tolist(), best_probability.tolist()):
+        if position != 0 and position == previous:
+            confidences[-1] = max(confidences[-1], probability)
+        elif position != 0:
+            text.append(classes[position])
+            confidences.append(probability)
+        previous = position
+    return CaptchaResult("".join(text), confidences)
 
-import ddddocr
 
 class CaptchaSolver:
-    def __init__(self):
-        self.ocr = ddddocr.DdddOcr(show_ad=False)
+    # Process-wide instance returned by shared(), and the ones for other (charset, length)
+    _shared = None
+    _shared_by_format = {}
+    _shared_lock = threading.Lock()
+    # ddddocr OCR models
+    MODELS = ("default", "beta", "old")
+
+    def __init__(self, preprocess: str = CAPTCHA_PREPROCESS, model: str = "default",
+                 charset: str = CAPTCHA_CHARSET):
+        """
+        :param preprocess: Comma-separated preprocessing steps (see src/preprocess.py),
+                           empty for none
+        :param model: ddddocr OCR model: default, beta or old
+        :param charset: Characters the captchas use; OCR output is limited to them
+        """
+        if model not in self.MODELS:
+            raise ValueError(f"Unknown OCR model '{model}' (use {', '.join(self.MODELS)})")
+        # Imported here: ddddocr pulls in onnxruntime, numpy and PIL (~200 ms)
+        import ddddocr
+        from .preprocess import Pipeline
+
+        self.model = model
+        self.pipeline = Pipeline.from_spec(preprocess)
+
+        started = time.perf_counter()
+        if model == "default":
+            self.ocr = ddddocr.DdddOcr(show_ad=False)
+        else:
+            self.ocr = ddddocr.DdddOcr(show_ad=False, **{model: True})
+        # Only decode characters HSR captchas use, in either case
+        self.charset = charset
+        self.ocr.set_ranges(self.charset.upper() + self.charset.lower())
+        self.load_ms = (time.perf_counter() - started) * 1000
+        # ddddocr keeps per-call state on the model, so inferences are serialized
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=1000)
+        self.inference_count = 0
+        self.warmed_up = False
+
+    @classmethod
+    def shared(cls, charset: str = CAPTCHA_CHARSET, length: int = CAPTCHA_LENGTH):
+        """
+        Process-wide solver, created (model loaded and warmed up) on first
+        use and reused by every booking afterwards. With CAPTCHA_ENSEMBLE
+        set it's an EnsembleSolver, with OCR_WORKERS a PooledSolver.
+        Jobs with their own captcha_charset or captcha_length get a solver
+        of their own, shared by every job with the same pair.
+        """
+        if charset.upper() != CAPTCHA_CHARSET.upper() or length != CAPTCHA_LENGTH:
+            key = (charset.upper(), length)
+            solver = cls._shared_by_format.get(key)
+            if solver is None:
+                with cls._shared_lock:
+                    solver = cls._shared_by_format.get(key)
+                    if solver is None:
+                        solver = cls._shared_by_format[key] = cls._load_shared(charset, length)
+            return solver
+
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls._load_shared(charset, length)
+        return cls._shared
+
+    @classmethod
+    def _load_shared(cls, charset: str, length: int):
+        if CAPTCHA_ENSEMBLE:
+            from .ensemble import EnsembleSolver
+            solver = EnsembleSolver.from_spec(CAPTCHA_ENSEMBLE, charset=charset, length=length)
+        elif OCR_WORKERS > 0:
+            from .ocr_pool import PooledSolver
+            solver = PooledSolver(OCR_WORKERS, charset=charset)
+        else:
+            solver = cls(charset=charset)
+        solver.warm_up()
+        return solver
+
+    @classmethod
+    def shared_stats(cls):
+        """stats() of the shared solver, or None if it hasn't been loaded."""
+        return cls._shared.stats() if cls._shared is not None else None
 
     def solve_bytes(self, image_bytes):
         """
-        Solve captcha from image bytes.
+        Solve captcha from image bytes. Safe to call from several threads.
         """
         try:
-            res = self.ocr.classification(image_bytes)
+            image = self.pipeline(image_bytes) if self.pipeline else image_bytes
+            with self._lock:
+                started = time.perf_counter()
+                res = self.ocr.classification(image)
+                elapsed = time.perf_counter() - started
+                self._latencies_ms.append(elapsed * 1000)
+                self.inference_count += 1
+            metrics.OCR_SECONDS.observe(elapsed)
             return res
         except Exception as e:
             print(f"OCR Error: {e}")
             return ""
 
+    def solve_detailed(self, image_bytes) -> CaptchaResult:
+        """
+        Solve captcha from image bytes, with a confidence per character.
+        Slower than solve_bytes: ddddocr returns the full probability matrix.
+        Safe to call from several threads.
+        """
+        try:
+            image = self.pipeline(image_bytes) if self.pipeline else image_bytes
+            with self._lock:
+                started = time.perf_counter()
+                output = self.ocr.classification(image, probability=True)
+                elapsed = time.perf_counter() - started
+                self._latencies_ms.append(elapsed * 1000)
+                self.inference_count += 1
+            metrics.OCR_SECONDS.observe(elapsed)
+            return decode_probabilities(output, self.charset)
+        except Exception as e:
+            print(f"OCR Error: {e}")
+            return CaptchaResult("", [])
+
+    def warm_up(self):
+        """
+        Run one inference on a blank image so the first real captcha
+        doesn't pay the ONNX session warm-up cost. Only runs once.
+        """
+        if self.warmed_up:
+            return
+        import io
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (128, 48), "white").save(buffer, format="PNG")
+        self.solve_bytes(buffer.getvalue())
+        self.warmed_up = True
+
+    def stats(self) -> dict:
+        """
+        Model load time and inference latency (the last 1000 inferences,
+        warm-up included).
+        """
+        with self._lock:
+            latencies = list(self._latencies_ms)
+            count = self.inference_count
+        return {
+            "load_ms": round(self.load_ms, 1),
+            "inferences": count,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+        }
+
+    def summary(self) -> str:
+        """One-line description of stats()."""
+        stats = self.stats()
+        return (
+            f"OCR model loaded in {stats['load_ms']:.0f} ms, {stats['inferences']} inferences "
+            f"(p50 {stats['p50_ms']:.1f} ms / p95 {stats['p95_ms']:.1f} ms)"
+        )
+
     def solve_file(self, image_path):
         """
         Solve captcha from image file path.
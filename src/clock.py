@@ -0,0 +1,145 @@
+import math
+import time
+
+
+class ServerClock:
+    """
+    Estimate the offset between the local clock and the HSR server clock
+    from HTTP Date headers, and wait for server-time deadlines precisely.
+    """
+
+    def __init__(self, offset: float = 0.0, spin_seconds: float = 0.005):
+        """
+        Initialize ServerClock.
+
+        Args:
+            offset: Known server-minus-local offset in seconds (0 = trust local clock)
+            spin_seconds: Busy-wait for this final slice of every wait instead of sleeping
+        """
+        self.offset = offset
+        self.uncertainty = None  # Half-width of the offset estimate, in seconds
+        self.spin_seconds = spin_seconds
+
+    def _fetch_date(self, conn, path: str) -> float:
+        """Send a HEAD request and return the server Date header as a timestamp."""
+        from email.utils import parsedate_to_datetime
+
+        conn.request("HEAD", path, headers={"Cache-Control": "no-cache"})
+        response = conn.getresponse()
+        response.read()
+        date_header = response.getheader("Date")
+        if not date_header:
+            raise ValueError("Server response has no Date header")
+        return parsedate_to_datetime(date_header).timestamp()
+
+    def sync(self, url: str, samples: int = 8, timeout: float = 5.0) -> float:
+        """
+        Estimate the server clock offset.
+
+        The Date header only has 1-second resolution, so every sample only
+        says the server clock read [date, date + 1) at some moment during
+        the request. Intersecting those intervals (with the request's
+        round trip as the local uncertainty) narrows the estimate well
+        below a second; samples are spread across one second so they hit
+        different sub-second phases.
+
+        :param url: Any URL on the server (the booking page base URL)
+        :param samples: Number of HEAD requests to send
+        :param timeout: Per-request timeout in seconds
+        :return: Estimated offset (server - local) in seconds
+        :raises ValueError: samples < 1, or a response without a Date header
+        """
+        if samples < 1:
+            raise ValueError(f"Clock sync needs at least 1 sample, got {samples}")
+
+        # Only needed when syncing; kept out of the CLI's import path
+        import http.client
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        conn_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        conn = conn_class(parts.hostname, parts.port, timeout=timeout)
+        path = parts.path or "/"
+
+        lower, upper = -math.inf, math.inf
+        try:
+            # Warm-up request so TCP/TLS setup isn't counted as round trip
+            self._fetch_date(conn, path)
+
+            for i in range(samples):
+                sent_wall = time.time()
+                sent = time.monotonic()
+                server_time = self._fetch_date(conn, path)
+                rtt = time.monotonic() - sent
+
+                lower = max(lower, server_time - (sent_wall + rtt))
+                upper = min(upper, server_time + 1 - sent_wall)
+
+                if i < samples - 1:
+                    time.sleep(1.0 / samples)
+        finally:
+            conn.close()
+
+        if lower > upper:
+            # Intervals disagree (a clock stepped mid-sync): trust the last sample
+            lower = upper = server_time + 0.5 - (sent_wall + rtt / 2)
+
+        self.offset = (lower + upper) / 2
+        self.uncertainty = (upper - lower) / 2
+        return self.offset
+
+    def now(self) -> float:
+        """Current server time as a Unix timestamp."""
+        return time.time() + self.offset
+
+    def seconds_until(self, server_timestamp: float) -> float:
+        """Seconds from now until server_timestamp on the server clock."""
+        return server_timestamp - self.now()
+
+    def wait_until(self, server_timestamp: float) -> float:
+        """
+        Block until server_timestamp on the server clock.
+
+        The deadline is converted to time.monotonic() once, so wall-clock
+        adjustments during the wait don't move it. Sleeps until the last
+        spin_seconds, then busy-waits.
+
+        :param server_timestamp: Target server time as a Unix timestamp
+        :return: Firing error in milliseconds (positive = late)
+        """
+        deadline = time.monotonic() + self.seconds_until(server_timestamp)
+
+        remaining = deadline - time.monotonic()
+        while remaining > self.spin_seconds:
+            time.sleep(remaining - self.spin_seconds)
+            remaining = deadline - time.monotonic()
+
+        while time.monotonic() < deadline:
+            pass
+
+        return (time.monotonic() - deadline) * 1000
+
+    async def wait_until_async(self, server_timestamp: float) -> float:
+        """
+        wait_until for asyncio: sleeps on the event loop until the last
+        spin_seconds, then busy-waits on the loop itself. The spin blocks
+        the loop for at most spin_seconds, and jobs sharing a trigger time
+        find it already passed, so a whole batch fires together without
+        waiting for executor threads.
+
+        :param server_timestamp: Target server time as a Unix timestamp
+        :return: Firing error in milliseconds (positive = late)
+        """
+        import asyncio
+
+        deadline = time.monotonic() + self.seconds_until(server_timestamp)
+
+        remaining = deadline - time.monotonic()
+        while remaining > self.spin_seconds:
+            await asyncio.sleep(remaining - self.spin_seconds)
+            remaining = deadline - time.monotonic()
+
+        while time.monotonic() < deadline:
+            pass
+
+        return (time.monotonic() - deadline) * 1000
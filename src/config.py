@@ -15,6 +15,8 @@ START_STATION = os.getenv("START_STATION", "1")  # Default: Nangang
 END_STATION = os.getenv("END_STATION", "12")     # Default: Zuoying
 TRAVEL_DATE = os.getenv("TRAVEL_DATE", "")
 TRAVEL_TIME = os.getenv("TRAVEL_TIME", "")
+CAR_TYPE = os.getenv("CAR_TYPE", "0")                # 0=標準, 1=商務
+SEAT_PREFERENCE = os.getenv("SEAT_PREFERENCE", "0")  # 0=無, 1=靠窗, 2=走道
 
 # Ticket Count
 ADULT_COUNT = int(os.getenv("ADULT_COUNT", "1"))
@@ -28,13 +30,119 @@ PASSENGER_ID = os.getenv("PASSENGER_ID", "")
 PASSENGER_PHONE = os.getenv("PASSENGER_PHONE", "")
 PASSENGER_EMAIL = os.getenv("PASSENGER_EMAIL", "")
 
+# Booking engine: browser = Playwright/Chromium, http = plain HTTP requests (no browser)
+ENGINE = os.getenv("ENGINE", "browser").lower()
+
 # Browser Settings
 HEADLESS = os.getenv("HEADLESS", "false").lower() == "true"
 SLOW_MO = int(os.getenv("SLOW_MO", "500"))
 
+# Wait profile: how the flow waits between steps
+# event  = wait for concrete page conditions (navigation, captcha reload, next form)
+# turbo  = event waits + slow_mo forced to 0
+# compat = legacy fixed time.sleep() timings
+WAIT_PROFILE = os.getenv("WAIT_PROFILE", "event").lower()
+
+# Captcha source: "network" = original bytes from the image response,
+# "screenshot" = element screenshot (always used as fallback)
+CAPTCHA_SOURCE = os.getenv("CAPTCHA_SOURCE", "network").lower()
+
+# Captcha plausibility check: HSR captchas are CAPTCHA_LENGTH characters from
+# CAPTCHA_CHARSET (case-insensitive). Any other OCR result is not submitted; the
+# captcha is refreshed and re-solved locally, up to CAPTCHA_MAX_RESOLVES times
+CAPTCHA_LENGTH = int(os.getenv("CAPTCHA_LENGTH", "4"))
+CAPTCHA_CHARSET = os.getenv("CAPTCHA_CHARSET", "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+CAPTCHA_MAX_RESOLVES = int(os.getenv("CAPTCHA_MAX_RESOLVES", "3"))
+
+# Minimum per-character OCR confidence (0-1) to submit a captcha; below it the
+# captcha is refreshed like an implausible one. 0 = off (plain text decoding,
+# no probability output). Calibrate with benchmarks/captcha_eval.py
+CAPTCHA_MIN_CONFIDENCE = float(os.getenv("CAPTCHA_MIN_CONFIDENCE", "0"))
+
+# Image preprocessing before OCR: comma-separated steps from src/preprocess.py
+# (grayscale, binarize, remove_curve, denoise), applied in order. Empty = off
+CAPTCHA_PREPROCESS = os.getenv("CAPTCHA_PREPROCESS", "")
+
+# Ensemble OCR: members separated by ";", each "model[:preprocessing steps]" with
+# model default, beta or old. They run in parallel and vote per position; the
+# others get CAPTCHA_ENSEMBLE_BUDGET_MS past the first. Empty = single model
+CAPTCHA_ENSEMBLE = os.getenv("CAPTCHA_ENSEMBLE", "")
+CAPTCHA_ENSEMBLE_BUDGET_MS = float(os.getenv("CAPTCHA_ENSEMBLE_BUDGET_MS", "50"))
+
+# Collect every submitted captcha (image, OCR guess, confidence, accepted or not)
+# into this directory (see src/dataset.py). Empty = off
+CAPTCHA_DATASET = os.getenv("CAPTCHA_DATASET", "")
+
+# Run OCR in this many warm worker processes (images passed through shared
+# memory, see src/ocr_pool.py). 0 = in the calling thread
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+
+# Fill the whole Step 1 form in one page.evaluate (false = one Playwright call per field)
+BATCH_FILL = os.getenv("BATCH_FILL", "true").lower() == "true"
+
+# Block images (except the captcha), fonts, media and tracking domains
+BLOCK_RESOURCES = os.getenv("BLOCK_RESOURCES", "true").lower() == "true"
+
 # Trigger Time (optional, empty means immediate execution)
 TRIGGER_TIME = os.getenv("TRIGGER_TIME", "")
 
+# Pre-trigger stages (seconds before TRIGGER_TIME)
+# Launch browser + load OCR model at T-PREWARM_SECONDS,
+# open and fill the booking form at T-PREFILL_SECONDS
+PREWARM_SECONDS = float(os.getenv("PREWARM_SECONDS", "30"))
+PREFILL_SECONDS = float(os.getenv("PREFILL_SECONDS", "5"))
+# Import Playwright/ddddocr and load the OCR model in the background this many
+# seconds before the launch stage (until then the waiting process stays small)
+PRELOAD_SECONDS = float(os.getenv("PRELOAD_SECONDS", "15"))
+
+# Clock Sync (align TRIGGER_TIME to the HSR server clock via HTTP Date headers)
+CLOCK_SYNC = os.getenv("CLOCK_SYNC", "false").lower() == "true"
+CLOCK_SYNC_SAMPLES = int(os.getenv("CLOCK_SYNC_SAMPLES", "8"))
+
+# Booking daemon (python -m src.daemon): warm browsers serving jobs over a local API
+DAEMON_HOST = os.getenv("DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.getenv("DAEMON_PORT", "8765"))
+DAEMON_SOCKET = os.getenv("DAEMON_SOCKET", "")  # Unix socket path, replaces host/port when set
+DAEMON_WORKERS = int(os.getenv("DAEMON_WORKERS", "1"))  # Browsers, i.e. concurrent jobs
+DAEMON_WARM_CONTEXTS = int(os.getenv("DAEMON_WARM_CONTEXTS", "2"))  # Preloaded pages per browser
+DAEMON_MAX_JOBS_PER_CONTEXT = int(os.getenv("DAEMON_MAX_JOBS_PER_CONTEXT", "5"))
+# Recycle a context once its page's JS heap (performance.memory, Chromium only) passes this:
+# a heuristic for page leaks, not the renderer's memory. DAEMON_MAX_HEAP_MB is the old name
+DAEMON_MAX_JS_HEAP_MB = float(os.getenv("DAEMON_MAX_JS_HEAP_MB", os.getenv("DAEMON_MAX_HEAP_MB", "256")))
+DAEMON_MAX_PAGE_AGE = float(os.getenv("DAEMON_MAX_PAGE_AGE", "300"))  # Seconds before a warm page is reloaded
+
+# Racing mode: run Step 1 in this many browser contexts at once and continue
+# with the first to reach the train list (1 = off)
+RACE_LANES = int(os.getenv("RACE_LANES", "1"))
+
+# Pipelined retries: keep a second context with the form filled and a captcha
+# solved while each submit is in flight, and switch to it on a captcha error
+PIPELINE_RETRIES = os.getenv("PIPELINE_RETRIES", "false").lower() == "true"
+
+# Batch mode (python -m src.batch jobs.csv): jobs booking at a time, seconds per job from
+# its trigger (0 = no limit), and the job key scheduled round-robin so no traveller hogs the slots
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_JOB_TIMEOUT = float(os.getenv("BATCH_JOB_TIMEOUT", "300"))
+BATCH_FAIR_KEY = os.getenv("BATCH_FAIR_KEY", "passenger_id")
+
+# Per-step trace events (see src/instrumentation.py), appended as JSON lines
+# to this file when the assistant closes. Empty = off
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+
+# OpenTelemetry spans (see src/telemetry.py; needs opentelemetry-sdk): "console",
+# or a file that gets one OTLP/JSON export request per line. Empty = off
+OTEL_EXPORT = os.getenv("OTEL_EXPORT", "")
+
+# Sampling profiler (python -m src.main --profile, see src/profiler.py): folded
+# stacks go to PROFILE_OUTPUT unless --profile names a file
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "profile.folded")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Serve Prometheus metrics (see src/metrics.py) on http://METRICS_HOST:METRICS_PORT/metrics
+# from the CLI and batch mode. 0 = off; the daemon always serves GET /metrics on its API
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
 # Station Mapping (code -> name)
 STATIONS = {
     "1": "南港",
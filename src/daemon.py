@@ -0,0 +1,462 @@
+"""
+Long-lived booking daemon: keeps warm browsers with pre-loaded booking
+pages and runs jobs submitted over a local HTTP API.
+
+Usage:
+    uv run python -m src.daemon                          # http://127.0.0.1:8765
+    uv run python -m src.daemon --socket /tmp/hsr.sock   # Unix socket
+
+    curl -X POST localhost:8765/jobs -d '{"travel_date": "2026/01/20", "travel_time": "08:00"}'
+    curl localhost:8765/jobs/<id>
+    curl localhost:8765/status
+    curl localhost:8765/metrics
+"""
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import metrics
+from .booking import BookingAssistant, CONTEXT_OPTIONS, LAUNCH_ARGS, remember_image_response
+from .config import (
+    BASE_URL, HEADLESS, BLOCK_RESOURCES,
+    DAEMON_HOST, DAEMON_PORT, DAEMON_SOCKET, DAEMON_WORKERS, DAEMON_WARM_CONTEXTS,
+    DAEMON_MAX_JOBS_PER_CONTEXT, DAEMON_MAX_JS_HEAP_MB, DAEMON_MAX_PAGE_AGE
+)
+from .captcha import CaptchaSolver
+from .resources import ResourcePolicy
+
+# JS heap of the page in bytes (Chromium only, 0 elsewhere). Only a leak
+# heuristic: it leaves out the DOM, images and the rest of the renderer
+JS_HEAP_JS = "() => performance.memory ? performance.memory.usedJSHeapSize : 0"
+
+
+class Job:
+    """A booking request and its result."""
+
+    def __init__(self, overrides: dict):
+        """
+        Initialize Job.
+
+        Args:
+            overrides: Config values applied on top of the .env configuration
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.overrides = overrides
+        self.status = "queued"  # queued -> running -> succeeded | failed
+        self.error = None
+        self.stage_timings = {}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "stage_timings": self.stage_timings,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class WarmSlot:
+    """A browser context with a page that has the booking form loaded."""
+
+    def __init__(self, context, policy: ResourcePolicy = None):
+        self.context = context
+        self.policy = policy
+        self.page = None
+        self.image_responses = {}  # Fed by the page's response listener
+        self.loaded_at = None  # time.monotonic() of the last preload
+        self.jobs_served = 0
+
+
+class BrowserWorker:
+    """
+    One browser, owned by one thread (the sync Playwright API must stay on
+    the thread that started it). Keeps warm_contexts slots preloaded and
+    runs jobs from the shared queue one at a time.
+    """
+
+    def __init__(self, name: str, jobs: queue.Queue, base_url: str = BASE_URL,
+                 headless: bool = HEADLESS, block_resources: bool = BLOCK_RESOURCES,
+                 warm_contexts: int = DAEMON_WARM_CONTEXTS,
+                 max_jobs_per_context: int = DAEMON_MAX_JOBS_PER_CONTEXT,
+                 max_js_heap_mb: float = DAEMON_MAX_JS_HEAP_MB,
+                 max_page_age: float = DAEMON_MAX_PAGE_AGE):
+        """
+        Initialize BrowserWorker.
+
+        Args:
+            name: Worker name (used in logs and /status)
+            jobs: Shared job queue; None is the stop sentinel
+            base_url: Booking page to preload
+            headless: Launch the browser headless
+            block_resources: Install a ResourcePolicy on every context
+            warm_contexts: Number of preloaded slots to keep ready
+            max_jobs_per_context: Recycle a context after this many jobs
+            max_js_heap_mb: Recycle a context whose page JS heap grew past this
+                (Chromium only; max_jobs_per_context bounds the rest)
+            max_page_age: Reload a warm page older than this (seconds), so
+                its session and captcha are fresh when leased
+        """
+        self.name = name
+        self.jobs = jobs
+        self.base_url = base_url
+        self.headless = headless
+        self.block_resources = block_resources
+        self.warm_contexts = warm_contexts
+        self.max_jobs_per_context = max_jobs_per_context
+        self.max_js_heap_mb = max_js_heap_mb
+        self.max_page_age = max_page_age
+
+        self.playwright = None
+        self.browser = None
+        self.ready_slots = []  # Preloaded, waiting for a job
+        self.dirty_slots = []  # Used by a job, waiting to be reset
+        self.jobs_done = 0
+        self.contexts_recycled = 0
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        try:
+            self._launch()
+            self._top_up()
+        except Exception as e:
+            print(f"❌ [{self.name}] Browser launch failed: {e}")
+            self.ready.set()
+            return
+        self.ready.set()
+        print(f"✅ [{self.name}] Ready with {len(self.ready_slots)} warm contexts")
+
+        while True:
+            try:
+                job = self.jobs.get(timeout=0.05 if self.dirty_slots else 1.0)
+            except queue.Empty:
+                self._maintain()
+                continue
+            if job is None:
+                break
+            self.run_job(job)
+
+        self._shutdown()
+
+    def _launch(self):
+        from playwright.sync_api import sync_playwright
+
+        self.playwright = sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        metrics.BROWSER_LAUNCHES.inc()
+
+    def _shutdown(self):
+        for slot in self.ready_slots + self.dirty_slots:
+            self._close_slot(slot)
+        self.ready_slots, self.dirty_slots = [], []
+        if self.browser:
+            self.browser.close()
+        if self.playwright:
+            self.playwright.stop()
+
+    def _new_slot(self) -> WarmSlot:
+        """Create a context and preload the booking page in it."""
+        context = self.browser.new_context(**CONTEXT_OPTIONS)
+        metrics.OPEN_CONTEXTS.inc()
+        policy = None
+        if self.block_resources:
+            policy = ResourcePolicy()
+            policy.install(context)
+        slot = WarmSlot(context, policy)
+        self._preload(slot)
+        return slot
+
+    def _preload(self, slot: WarmSlot):
+        """Open a fresh page in the slot's context on the booking form."""
+        if slot.page is not None:
+            slot.page.close()
+        slot.image_responses = {}
+        slot.page = slot.context.new_page()
+        slot.page.on("response", lambda response: remember_image_response(slot.image_responses, response))
+        slot.page.goto(self.base_url, timeout=60000, wait_until="domcontentloaded")
+        try:
+            cookie_btn = slot.page.locator("#cookieAccpetBtn")
+            cookie_btn.click(timeout=2000)
+        except Exception:
+            pass  # No cookie dialog or already dismissed
+        slot.loaded_at = time.monotonic()
+
+    def _close_slot(self, slot: WarmSlot):
+        metrics.OPEN_CONTEXTS.dec()
+        try:
+            slot.context.close()
+        except Exception:
+            pass
+
+    def _js_heap_mb(self, page) -> float:
+        try:
+            return page.evaluate(JS_HEAP_JS) / (1024 * 1024)
+        except Exception:
+            return 0.0
+
+    def _top_up(self):
+        while len(self.ready_slots) < self.warm_contexts:
+            self.ready_slots.append(self._new_slot())
+
+    def _maintain(self):
+        """Idle work: reset one used slot, or reload the stalest warm page."""
+        try:
+            if self.dirty_slots:
+                self._reset(self.dirty_slots.pop(0))
+            elif self.ready_slots:
+                stalest = min(self.ready_slots, key=lambda slot: slot.loaded_at)
+                if time.monotonic() - stalest.loaded_at > self.max_page_age:
+                    self._preload(stalest)
+            self._top_up()
+        except Exception as e:
+            print(f"[{self.name}] Warm pool maintenance failed: {e}")
+
+    def _reset(self, slot: WarmSlot):
+        """Return a used slot to the pool, or replace its context if it's due for recycling."""
+        js_heap_mb = self._js_heap_mb(slot.page)
+        if slot.jobs_served >= self.max_jobs_per_context or js_heap_mb > self.max_js_heap_mb:
+            print(f"[{self.name}] Recycling context after {slot.jobs_served} jobs ({js_heap_mb:.0f} MB JS heap)")
+            self._close_slot(slot)
+            self.contexts_recycled += 1
+            return  # _top_up creates the replacement
+        slot.context.clear_cookies()  # New booking session
+        self._preload(slot)
+        self.ready_slots.append(slot)
+
+    def lease(self) -> WarmSlot:
+        """Take a warm slot (creating one if the pool is empty)."""
+        if not self.ready_slots:
+            return self._new_slot()
+        slot = self.ready_slots.pop(0)
+        if time.monotonic() - slot.loaded_at > self.max_page_age:
+            self._preload(slot)
+        return slot
+
+    def run_job(self, job: Job):
+        """Run one booking job on a leased warm page."""
+        job.status = "running"
+        job.started_at = time.time()
+        result = {}
+
+        def on_success():
+            result["ok"] = True
+
+        def on_error(message):
+            result["error"] = message
+
+        slot = None
+        try:
+            slot = self.lease()
+            assistant = BookingAssistant(on_success=on_success, on_error=on_error)
+            assistant.config.update(job.overrides)
+            # Scheduled jobs load the page themselves at T-prefill_seconds
+            preloaded = not assistant.config.get("trigger_time")
+            assistant.attach(slot.context, slot.page, preloaded=preloaded,
+                             image_responses=slot.image_responses)
+            assistant.run()
+            job.stage_timings = assistant.stage_timings
+        except Exception as e:
+            result.setdefault("error", str(e))
+        finally:
+            if slot is not None:
+                slot.jobs_served += 1
+                self.dirty_slots.append(slot)
+            self.jobs_done += 1
+
+        if result.get("ok") and "error" not in result:
+            job.status = "succeeded"
+        else:
+            job.status = "failed"
+            job.error = result.get("error", "Finished without a result")
+        job.finished_at = time.time()
+        print(f"[{self.name}] Job {job.id} {job.status}")
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "ready": self.ready.is_set() and self.browser is not None,
+            "warm_contexts": len(self.ready_slots),
+            "recycling": len(self.dirty_slots),
+            "jobs_done": self.jobs_done,
+            "contexts_recycled": self.contexts_recycled,
+        }
+
+
+class BookingDaemon:
+    """Job registry and queue in front of a pool of BrowserWorkers."""
+
+    def __init__(self, workers: int = DAEMON_WORKERS, **worker_options):
+        """
+        Initialize BookingDaemon.
+
+        Args:
+            workers: Number of browsers (jobs that can run at the same time)
+            worker_options: Passed to every BrowserWorker
+        """
+        self.queue = queue.Queue()
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.workers = [
+            BrowserWorker(f"worker-{i + 1}", self.queue, **worker_options)
+            for i in range(workers)
+        ]
+
+    def start(self, wait: bool = True):
+        """Start the workers; with wait=True block until their pools are warm."""
+        threading.Thread(target=CaptchaSolver.shared, name="ocr-preload", daemon=True).start()
+        for worker in self.workers:
+            worker.start()
+        if wait:
+            for worker in self.workers:
+                worker.ready.wait()
+
+    def stop(self):
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.thread.join(timeout=30)
+
+    def submit(self, overrides: dict) -> Job:
+        job = Job(overrides)
+        with self.lock:
+            self.jobs[job.id] = job
+        self.queue.put(job)
+        return job
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status(self) -> dict:
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "queued": self.queue.qsize(),
+            "jobs": counts,
+            "ocr": CaptchaSolver.shared_stats(),
+            "workers": [worker.status() for worker in self.workers],
+        }
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs        body: JSON config overrides -> 202 {"id", "status"}
+    GET  /jobs/<id>   job status and result
+    GET  /status      pool status
+    GET  /metrics     Prometheus metrics
+    """
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        daemon = self.server.booking_daemon
+        if self.path == "/status":
+            self._send_json(200, daemon.status())
+        elif self.path == "/metrics":
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", metrics.CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith("/jobs/"):
+            job = daemon.get(self.path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "Unknown job"})
+            else:
+                self._send_json(200, job.to_dict())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            overrides = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Body must be JSON"})
+            return
+        if not isinstance(overrides, dict):
+            self._send_json(400, {"error": "Body must be a JSON object of config values"})
+            return
+        job = self.server.booking_daemon.submit(overrides)
+        self._send_json(202, {"id": job.id, "status": job.status})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(daemon: BookingDaemon, host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                socket_path: str = DAEMON_SOCKET):
+    """
+    Create the HTTP API server for a daemon.
+
+    :param socket_path: Serve on this Unix socket instead of host:port
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, DaemonRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), DaemonRequestHandler)
+    server.booking_daemon = daemon
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the HSR booking daemon")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    parser.add_argument("--socket", default=DAEMON_SOCKET, help="Unix socket path (instead of host/port)")
+    parser.add_argument("--workers", type=int, default=DAEMON_WORKERS)
+    parser.add_argument("--warm-contexts", type=int, default=DAEMON_WARM_CONTEXTS)
+    args = parser.parse_args(argv)
+
+    daemon = BookingDaemon(workers=args.workers, warm_contexts=args.warm_contexts)
+    print("Starting browsers...")
+    daemon.start()
+
+    server = make_server(daemon, args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"Booking daemon listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        daemon.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,92 @@
+"""
+Captcha dataset: every submitted captcha with the OCR guess, its
+confidence and whether the server accepted it (Step 2 reached) or
+rejected it (captcha error). Accepted guesses are the captcha's true
+text, so the dataset grows into a labelled corpus from normal runs.
+
+Layout (append-only, safe to copy while a run writes to it):
+    <directory>/index.jsonl        one record per submitted captcha
+    <directory>/images/<hash>.png  original image bytes, stored once per image
+
+Enable with CAPTCHA_DATASET=<directory>; replay it through any solver
+configuration with benchmarks/captcha_replay.py.
+"""
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+
+def image_suffix(image_bytes: bytes) -> str:
+    """File extension from the image's magic bytes."""
+    if image_bytes.startswith(b"\x89PNG"):
+        return ".png"
+    if image_bytes.startswith(b"\xff\xd8"):
+        return ".jpg"
+    if image_bytes[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    return ".bin"
+
+
+class CaptchaDataset:
+    """Append-only captcha dataset in one directory."""
+
+    # Bookings share a dataset across threads (daemon, batch), and the index is appended to
+    _lock = threading.Lock()
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.index_path = self.directory / "index.jsonl"
+
+    def add(self, image_bytes: bytes, guess: str, accepted: bool, confidences: list = None) -> dict:
+        """
+        Store one submitted captcha.
+
+        Args:
+            image_bytes: The captcha image as OCR saw it (before preprocessing)
+            guess: The submitted text
+            accepted: True if the server accepted it, False on a captcha error
+            confidences: Per-character confidences, if they were computed
+
+        :return: The record written to the index
+        """
+        digest = hashlib.sha1(image_bytes).hexdigest()[:20]
+        image = f"images/{digest}{image_suffix(image_bytes)}"
+        record = {
+            "image": image,
+            "guess": guess,
+            "accepted": accepted,
+            "confidence": round(min(confidences), 4) if confidences else None,
+            "confidences": [round(c, 4) for c in confidences] if confidences else None,
+            "time": round(time.time(), 3),
+        }
+        with self._lock:
+            image_path = self.directory / image
+            if not image_path.exists():
+                image_path.parent.mkdir(parents=True, exist_ok=True)
+                image_path.write_bytes(image_bytes)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    def records(self) -> list:
+        """Every record in the index, oldest first (an unfinished last line is skipped)."""
+        if not self.index_path.exists():
+            return []
+        records = []
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def image(self, record: dict) -> bytes:
+        return (self.directory / record["image"]).read_bytes()
+
+    @staticmethod
+    def label(record: dict):
+        """The captcha's true text if the server accepted the guess, else None (only the guess is known wrong)."""
+        return record["guess"].upper() if record["accepted"] else None
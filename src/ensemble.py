@@ -0,0 +1,154 @@
+"""
+Ensemble captcha solving: several OCR members (the raw image, preprocessed
+variants, ddddocr's beta/old models) decode the same captcha in parallel
+and vote position by position, weighted by each character's confidence.
+
+Members run on a thread pool: onnxruntime releases the GIL during
+inference, so threads run the models in parallel without copying images
+to other processes. The first member is the primary; the others only get
+budget_ms past it, so the ensemble never adds more than that to a solve.
+
+Configured with CAPTCHA_ENSEMBLE, members separated by ";", each
+"model[:preprocessing steps]":
+    CAPTCHA_ENSEMBLE=default;default:grayscale,binarize;beta;old
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .captcha import CaptchaResult, CaptchaSolver
+from .config import CAPTCHA_CHARSET, CAPTCHA_ENSEMBLE_BUDGET_MS, CAPTCHA_LENGTH
+from .stats import percentile
+
+
+def vote(results: list, length: int = CAPTCHA_LENGTH) -> CaptchaResult:
+    """
+    Combine member results by per-position confidence voting.
+
+    Only results of one length vote: the captcha length if any member has
+    it, otherwise the most common length. At each position the character
+    with the highest summed confidence wins; ties go to the earlier member.
+    Its confidence is that sum divided by the number of voters, so
+    disagreement lowers it (and CAPTCHA_MIN_CONFIDENCE can act on it).
+    """
+    lengths = [len(result.text) for result in results if result.text]
+    if not lengths:
+        return CaptchaResult("", [])
+    voting_length = length if length in lengths else max(lengths, key=lengths.count)
+    voters = [result for result in results if len(result.text) == voting_length]
+
+    text, confidences = [], []
+    for position in range(voting_length):
+        scores = {}
+        for result in voters:
+            char = result.text[position].upper()
+            scores[char] = scores.get(char, 0.0) + result.confidences[position]
+        winner = max(scores, key=scores.get)
+        text.append(winner)
+        confidences.append(scores[winner] / len(voters))
+    return CaptchaResult("".join(text), confidences)
+
+
+class EnsembleSolver(CaptchaSolver):
+    """CaptchaSolver that votes over several member solvers."""
+
+    def __init__(self, members: list, budget_ms: float = CAPTCHA_ENSEMBLE_BUDGET_MS, length: int = CAPTCHA_LENGTH):
+        """
+        Args:
+            members: CaptchaSolvers, the primary first
+            budget_ms: How long after the primary the other members are waited for
+            length: Captcha length the members' results vote at (see vote())
+        """
+        if not members:
+            raise ValueError("An ensemble needs at least one member")
+        self.members = members
+        self.budget_ms = budget_ms
+        self.length = length
+        self.load_ms = sum(member.load_ms for member in members)
+        self._pool = ThreadPoolExecutor(max_workers=len(members), thread_name_prefix="ocr-member")
+        self._lock = threading.Lock()  # Guards the counters only; members lock their own models
+        self._latencies_ms = deque(maxlen=1000)
+        self.inference_count = 0
+        self.unanimous = 0
+        self.late = 0
+        self.warmed_up = False
+
+    @classmethod
+    def from_spec(cls, spec: str, budget_ms: float = CAPTCHA_ENSEMBLE_BUDGET_MS, charset: str = CAPTCHA_CHARSET,
+                  length: int = CAPTCHA_LENGTH):
+        """
+        Build the ensemble from a CAPTCHA_ENSEMBLE string (loads every member's model,
+        each limited to charset) for captchas of length characters.
+
+        :raises ValueError: Empty spec, unknown model or preprocessing step
+        """
+        members = []
+        for member in (part.strip() for part in (spec or "").split(";")):
+            if member:
+                model, _, steps = member.partition(":")
+                members.append(CaptchaSolver(preprocess=steps, model=model.strip() or "default", charset=charset))
+        return cls(members, budget_ms, length)
+
+    def solve_detailed(self, image_bytes) -> CaptchaResult:
+        """
+        Run every member on the image and vote. Members that miss the
+        budget are left out (and counted as late).
+        """
+        started = time.perf_counter()
+        futures = [self._pool.submit(member.solve_detailed, image_bytes) for member in self.members]
+        results = [futures[0].result()]
+        done, not_done = wait(futures[1:], timeout=self.budget_ms / 1000)
+        results += [future.result() for future in futures[1:] if future in done]
+        result = vote(results, self.length)
+
+        texts = {member_result.text.upper() for member_result in results}
+        with self._lock:
+            self._latencies_ms.append((time.perf_counter() - started) * 1000)
+            self.inference_count += 1
+            self.unanimous += len(results) == len(self.members) and len(texts) == 1
+            self.late += len(not_done)
+        return result
+
+    def solve_bytes(self, image_bytes):
+        """Solve captcha from image bytes with the ensemble. Safe to call from several threads."""
+        return self.solve_detailed(image_bytes).text
+
+    def warm_up(self):
+        """Warm up every member (each has its own ONNX session). Only runs once."""
+        if self.warmed_up:
+            return
+        for member in self.members:
+            member.warm_up()
+        self.warmed_up = True
+
+    def stats(self) -> dict:
+        """
+        CaptchaSolver.stats() for whole ensemble solves, plus how often all
+        members agreed and how many member results came in too late.
+        """
+        with self._lock:
+            latencies = list(self._latencies_ms)
+            count = self.inference_count
+            unanimous = self.unanimous
+            late = self.late
+        return {
+            "load_ms": round(self.load_ms, 1),
+            "inferences": count,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "members": len(self.members),
+            "agreement": round(unanimous / count, 3) if count else 0.0,
+            "late": late,
+        }
+
+    def close(self):
+        """Shut down the member threads; members still running finish in the background. Safe to call twice."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (
+            f"{super().summary()}; {stats['members']} members agreed on {stats['agreement']:.0%}, "
+            f"{stats['late']} late"
+        )
@@ -9,10 +9,14 @@ def gui():
         return
 
     import flet as ft
-    from .config import STATIONS, TIME_VALUES
+    from .config import PROFILE_OUTPUT, STATIONS, TIME_VALUES
     from .booking import BookingAssistant
+    from .captcha import CaptchaSolver
 
     def main(page: ft.Page):
+        # Load the OCR model while the form is being filled in; every booking reuses it
+        threading.Thread(target=CaptchaSolver.shared, daemon=True).start()
+
         page.title = "高鐵訂票助手"
         page.window.width = 600
         page.window.height = 900
@@ -127,6 +131,22 @@ def gui():
             keyboard_type=ft.KeyboardType.NUMBER,
         )
 
+        wait_profile = ft.Dropdown(
+            label="等待模式",
+            options=[
+                ft.dropdown.Option(key="event", text="事件 (event)"),
+                ft.dropdown.Option(key="turbo", text="極速 (turbo)"),
+                ft.dropdown.Option(key="compat", text="相容 (compat)"),
+            ],
+            value="event",
+            width=160,
+        )
+
+        profile = ft.Checkbox(
+            label=f"效能分析 (寫入 {PROFILE_OUTPUT})",
+            value=False,
+        )
+
         status_text = ft.Text(
             "狀態: 等待中",
             size=16,
@@ -163,6 +183,7 @@ def gui():
                 "passenger_phone": "",  # GUI 不輸入
                 "headless": headless.value,
                 "slow_mo": int(slow_mo.value) if slow_mo.value else 300,
+                "wait_profile": wait_profile.value,
                 "trigger_time": trigger_time.value.strip(),
             }
 
@@ -183,12 +204,18 @@ def gui():
 
             # Run booking in background
             def run_booking():
+                profiler = None
                 try:
                     assistant = BookingAssistant(
                         config=config,
                         on_success=on_success,
                         on_error=on_error,
                     )
+                    if profile.value:
+                        from .profiler import SamplingProfiler
+                        profiler = SamplingProfiler()
+                        profiler.instrument(assistant)
+                        profiler.start()
                     assistant.run()
                 except ValueError as e:
                     # Time format error or time has passed
@@ -199,6 +226,10 @@ def gui():
                 except Exception as e:
                     # Other unexpected errors
                     on_error(f"未預期錯誤：{e}")
+                finally:
+                    if profiler:
+                        profiler.stop()
+                        profiler.report(PROFILE_OUTPUT)
 
             threading.Thread(target=run_booking, daemon=True).start()
 
@@ -223,7 +254,8 @@ def gui():
             trigger_time,
             ft.Divider(),
             ft.Text("設定", size=18, weight=ft.FontWeight.BOLD),
-            ft.Row([headless, slow_mo]),
+            ft.Row([headless, slow_mo, wait_profile]),
+            profile,
             ft.Divider(),
             ft.Row(
                 [start_btn],
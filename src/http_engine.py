@@ -0,0 +1,597 @@
+"""
+Browser-less booking engine: the same steps as BookingAssistant, done
+with plain HTTP requests against the server-rendered Wicket forms.
+"""
+import gzip
+import http.client
+import http.cookiejar
+import re
+import urllib.request
+from html.parser import HTMLParser
+from urllib.parse import urlencode, urljoin, urlsplit
+
+from .booking import BookingAssistant, CONTEXT_OPTIONS, Outcome, OUTCOME_SELECTORS, is_captcha_error
+from .config import Selectors, STATIONS
+
+# Elements that never have a closing tag
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+def selector_target(selector: str):
+    """
+    Turn one of the simple Selectors into ("id", value) or ("name", value).
+
+    Supports '#id' and 'tag[name="value"]' (with an optional :pseudo suffix).
+    """
+    if selector.startswith("#"):
+        return "id", selector[1:]
+    match = re.search(r'\[name="([^"]+)"\]', selector)
+    if match:
+        return "name", match.group(1)
+    raise ValueError(f"Unsupported selector for the HTTP engine: {selector}")
+
+
+class HtmlForm:
+    """A parsed <form> and its controls, with browser-like submission values."""
+
+    def __init__(self, attrs: dict):
+        self.id = attrs.get("id", "")
+        self.action = attrs.get("action", "")
+        self.method = attrs.get("method", "get").upper()
+        self.controls = []  # dicts: tag, type, name, id, value, checked, options, attrs
+
+    def find(self, selector: str) -> list:
+        """Controls matching a '#id' or '[name="..."]' selector."""
+        key, value = selector_target(selector)
+        return [control for control in self.controls if control.get(key) == value]
+
+    def find_one(self, selector: str) -> dict:
+        controls = self.find(selector)
+        if not controls:
+            raise LookupError(f"No form control matches {selector}")
+        return controls[0]
+
+    def set(self, selector: str, value: str) -> str:
+        """
+        Set a control's value like a user would. Selects only accept one of
+        their options, radios check the matching button.
+
+        :return: The value that was set
+        """
+        control = self.find_one(selector)
+        if control["tag"] == "select":
+            if value not in [option for option, _ in control["options"]]:
+                raise ValueError(f"{selector} has no option {value!r}")
+            control["options"] = [(option, option == value) for option, _ in control["options"]]
+        elif control["type"] == "radio":
+            for radio in self.controls:
+                if radio["name"] == control["name"] and radio["type"] == "radio":
+                    radio["checked"] = radio["value"] == value
+        elif control["type"] == "checkbox":
+            control["checked"] = bool(value)
+        else:
+            control["value"] = value
+        return value
+
+    def select_count(self, selector: str, count: int) -> str:
+        """Pick the option whose value starts with count (ticket rows)."""
+        control = self.find_one(selector)
+        for option, _ in control["options"]:
+            leading = re.match(r"\d+", option)
+            if leading and int(leading.group()) == count:
+                return self.set(selector, option)
+        raise ValueError(f"{selector} has no option for {count}")
+
+    def value(self, selector: str) -> str:
+        """Current submission value of a control (None if it submits nothing)."""
+        control = self.find_one(selector)
+        for name, value in self._control_values(control):
+            return value
+        return None
+
+    def _control_values(self, control: dict):
+        if not control.get("name") or control.get("disabled"):
+            return []
+        kind = control["type"]
+        if control["tag"] == "select":
+            options = control["options"]
+            selected = [option for option, is_selected in options if is_selected]
+            if not selected and options:
+                selected = [options[0][0]]
+            return [(control["name"], option) for option in selected[:1]]
+        if kind in ("radio", "checkbox"):
+            return [(control["name"], control["value"] or "on")] if control["checked"] else []
+        if kind in ("submit", "button", "image", "reset", "file"):
+            return []
+        return [(control["name"], control["value"] or "")]
+
+    def submission(self, button: str = None) -> list:
+        """
+        (name, value) pairs the browser would post.
+
+        :param button: Selector of the submit button that was "clicked"
+        """
+        pairs = []
+        for control in self.controls:
+            pairs.extend(self._control_values(control))
+        if button:
+            control = self.find_one(button)
+            if control.get("name"):
+                pairs.append((control["name"], control["value"] or ""))
+        return pairs
+
+
+class HtmlPage(HTMLParser):
+    """
+    Minimal DOM summary of a server-rendered page: forms with their
+    controls, image sources and the text of every element with an id.
+    """
+
+    def __init__(self, html: str, url: str = ""):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.forms = {}  # id -> HtmlForm
+        self.images = {}  # id -> src
+        self.texts = {}  # id -> text content
+        self.title = ""
+        self._form = None
+        self._select = None
+        self._option = None
+        self._textarea = None
+        self._open = []  # (tag, id or None) of open elements
+        self._skip = 0  # Inside <script>/<style>
+        self._in_title = False
+        self.feed(html)
+        self.close()
+
+    def handle_starttag(self, tag, attr_list):
+        attrs = {name: (value if value is not None else "") for name, value in attr_list}
+        element_id = attrs.get("id")
+
+        if tag in ("script", "style"):
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "form":
+            self._form = HtmlForm(attrs)
+            self.forms[self._form.id] = self._form
+        elif tag == "img" and element_id:
+            self.images[element_id] = attrs.get("src", "")
+        elif tag in ("input", "button") and self._form is not None:
+            self._form.controls.append({
+                "tag": tag,
+                "type": attrs.get("type", "submit" if tag == "button" else "text").lower(),
+                "name": attrs.get("name"),
+                "id": element_id,
+                "value": attrs.get("value", ""),
+                "checked": "checked" in attrs,
+                "disabled": "disabled" in attrs,
+                "attrs": attrs,
+            })
+        elif tag == "select" and self._form is not None:
+            self._select = {
+                "tag": "select", "type": "select", "name": attrs.get("name"), "id": element_id,
+                "options": [], "disabled": "disabled" in attrs, "attrs": attrs,
+            }
+            self._form.controls.append(self._select)
+        elif tag == "option" and self._select is not None:
+            self._finish_option()  # <option> end tags are optional
+            self._option = [attrs.get("value"), "selected" in attrs, ""]
+            self._select["options"].append(None)  # Filled in when the option closes
+        elif tag == "textarea" and self._form is not None:
+            self._textarea = {
+                "tag": "textarea", "type": "textarea", "name": attrs.get("name"), "id": element_id,
+                "value": "", "disabled": "disabled" in attrs, "attrs": attrs,
+            }
+            self._form.controls.append(self._textarea)
+
+        if tag not in VOID_TAGS:
+            self._open.append((tag, element_id))
+            if element_id:
+                self.texts.setdefault(element_id, "")
+
+    def handle_startendtag(self, tag, attr_list):
+        self.handle_starttag(tag, attr_list)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag == "form":
+            self._form = None
+        elif tag == "select":
+            self._finish_option()
+            self._select = None
+        elif tag == "option":
+            self._finish_option()
+        elif tag == "textarea":
+            self._textarea = None
+
+        # Close up to the matching open element (tolerates unclosed tags)
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0] == tag:
+                del self._open[index:]
+                break
+
+    def _finish_option(self):
+        if self._option is None:
+            return
+        value, selected, text = self._option
+        self._select["options"][-1] = (value if value is not None else text.strip(), selected)
+        self._option = None
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._in_title:
+            self.title += data
+        if self._option is not None:
+            self._option[2] += data
+        if self._textarea is not None:
+            self._textarea["value"] += data
+        for _, element_id in self._open:
+            if element_id:
+                self.texts[element_id] += data
+
+    def text(self, selector: str) -> str:
+        """Whitespace-collapsed text of the element with this '#id'."""
+        _, element_id = selector_target(selector)
+        return " ".join(self.texts.get(element_id, "").split())
+
+    def form(self, selector: str):
+        """The form with this '#id', or None."""
+        _, form_id = selector_target(selector)
+        return self.forms.get(form_id)
+
+
+class HttpResponse:
+    """Status, final URL, headers and body of one HTTP exchange."""
+
+    def __init__(self, url: str, status: int, headers, body: bytes):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def text(self) -> str:
+        match = re.search(r"charset=([\w-]+)", self.headers.get("Content-Type", ""))
+        return self.body.decode(match.group(1) if match else "utf-8", errors="replace")
+
+
+class HttpSession:
+    """
+    Keep-alive HTTP(S) connections (one per host) with a cookie jar.
+    Redirects are followed; gzip bodies are decoded.
+    """
+
+    def __init__(self, timeout: float = 15.0, user_agent: str = CONTEXT_OPTIONS["user_agent"]):
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.cookies = http.cookiejar.CookieJar()
+        self._connections = {}  # (scheme, netloc) -> HTTPConnection
+        self.connections_opened = 0
+        self.requests_sent = 0
+
+    def _connection(self, scheme: str, netloc: str):
+        key = (scheme, netloc)
+        if key not in self._connections:
+            conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            self._connections[key] = conn_class(netloc, timeout=self.timeout)
+            self.connections_opened += 1
+        return self._connections[key]
+
+    def _send(self, method: str, url: str, body: bytes, headers: dict):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        request = urllib.request.Request(url, method=method, headers=headers)
+        self.cookies.add_cookie_header(request)
+        send_headers = dict(request.header_items())
+
+        for attempt in range(2):
+            reused = (parts.scheme, parts.netloc) in self._connections
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request(method, path, body=body, headers=send_headers)
+                response = conn.getresponse()
+                payload = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Server closed an idle keep-alive connection: reconnect once
+                conn.close()
+                del self._connections[(parts.scheme, parts.netloc)]
+                if attempt or not reused:
+                    raise
+        self.requests_sent += 1
+
+        self.cookies.extract_cookies(response, request)
+        if response.getheader("Content-Encoding", "").lower() == "gzip":
+            payload = gzip.decompress(payload)
+        if response.will_close:
+            conn.close()
+            del self._connections[(parts.scheme, parts.netloc)]
+        return response, payload
+
+    def request(self, method: str, url: str, fields: list = None, referer: str = None,
+                max_redirects: int = 5) -> HttpResponse:
+        """
+        Send a request and follow redirects.
+
+        :param fields: (name, value) pairs, sent form-encoded
+        :param referer: Referer header (the page the form came from)
+        """
+        body = urlencode(fields).encode("utf-8") if fields is not None else None
+        headers = {
+            "User-Agent": self.user_agent,
+            "Accept": "text/html,application/xhtml+xml,image/*,*/*;q=0.8",
+            "Accept-Encoding": "gzip",
+            "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
+        }
+        if referer:
+            headers["Referer"] = referer
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        for _ in range(max_redirects + 1):
+            response, payload = self._send(method, url, body, headers)
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                if response.status not in (307, 308):
+                    method, body = "GET", None
+                    headers.pop("Content-Type", None)
+                continue
+            return HttpResponse(url, response.status, response.headers, payload)
+        raise RuntimeError(f"Too many redirects (last: {url})")
+
+    def close(self):
+        for conn in self._connections.values():
+            conn.close()
+        self._connections = {}
+
+
+class HttpBookingEngine(BookingAssistant):
+    """
+    Same flow, config and callbacks as BookingAssistant, without a browser:
+    pages are fetched with a keep-alive HTTP session and forms are parsed
+    and posted directly. run() (scheduling, stages, captcha retries) is
+    inherited; only the page-level steps are replaced.
+    """
+
+    def __init__(self, config: dict = None, on_success=None, on_error=None):
+        """
+        Initialize HttpBookingEngine.
+
+        Args:
+            config: Optional configuration dict. If None, will read from .env via config.py
+            on_success: Optional callback function called on successful booking
+            on_error: Optional callback function called on error, receives error message string
+        """
+        super().__init__(config=config, on_success=on_success, on_error=on_error)
+        self.session = None
+        self.current = None  # HtmlPage of the last response
+
+    def _compat_waits(self) -> bool:
+        """No rendering to wait for: every step returns the next page."""
+        return False
+
+    def _preload(self):
+        """Load and warm up the OCR model (no Playwright to import)."""
+        try:
+            self.solver.warm_up()
+        except Exception as e:
+            print(f"Background preload failed: {e}")
+
+    def start(self):
+        print("Opening HTTP session...")
+        self.session = HttpSession()
+        print("HTTP session ready.")
+
+    def _stage_launch(self):
+        """Launch stage: open the HTTP session while the OCR model loads in the background."""
+        preload = self._start_preload()
+        if self.session is None:
+            self.start()
+        preload.join()
+
+    def _load(self, response: HttpResponse) -> HtmlPage:
+        self.current = HtmlPage(response.text, response.url)
+        return self.current
+
+    def _current_form(self, selector: str) -> HtmlForm:
+        form = self.current.form(selector) if self.current else None
+        if form is None:
+            raise RuntimeError(f"Form {selector} not found on {self.current.url if self.current else 'page'}")
+        return form
+
+    def _post(self, form_selector: str, button: str) -> HtmlPage:
+        """Submit a form of the current page as if button was clicked."""
+        form = self._current_form(form_selector)
+        action = urljoin(self.current.url, form.action or self.current.url)
+        response = self.session.request(form.method, action, fields=form.submission(button),
+                                        referer=self.current.url)
+        return self._load(response)
+
+    def open_booking_page(self):
+        try:
+            print(f"Fetching {self.config['base_url']}...")
+            response = self.session.request("GET", self.config["base_url"])
+            page = self._load(response)
+            if not response.ok or page.form(Selectors.FORM) is None:
+                print(f"Booking form not found (HTTP {response.status})")
+                return False
+            print("Page loaded successfully!")
+            return True
+        except Exception as e:
+            print(f"Error opening page: {e}")
+            return False
+
+    def dismiss_cookie_dialog(self):
+        """The cookie dialog is client-side only."""
+
+    def fill_booking_form(self):
+        """Set the Step 1 fields in the parsed form."""
+        print("\n--- Filling Booking Form ---")
+        form = self._current_form(Selectors.FORM)
+
+        for field in self._booking_form_fields():
+            try:
+                if "count" in field:
+                    form.select_count(field["selector"], field["count"])
+                else:
+                    form.set(field["selector"], field["value"])
+            except (LookupError, ValueError) as e:
+                if not field.get("optional"):
+                    raise ValueError(f"Cannot set {field['name']}: {e}")
+
+        start, end = form.value(Selectors.START_STATION), form.value(Selectors.END_STATION)
+        print(f"Route: {STATIONS.get(start, start)} → {STATIONS.get(end, end)}")
+        print("Form filled successfully!")
+
+    def get_captcha_image(self) -> bytes:
+        """Download the captcha image of the current Step 1 page."""
+        _, image_id = selector_target(Selectors.CAPTCHA_IMAGE)
+        src = self.current.images.get(image_id)
+        if not src:
+            raise RuntimeError("Captcha image not found on page")
+        response = self.session.request("GET", urljoin(self.current.url, src), referer=self.current.url)
+        if not response.ok:
+            raise RuntimeError(f"Captcha download failed (HTTP {response.status})")
+        return response.body
+
+    def solve_and_fill_captcha(self) -> str:
+        """Solve captcha (re-solving implausible results) and fill in the answer."""
+        print("\n--- Solving Captcha ---")
+        for resolve in range(self._max_resolves() + 1):
+            image_bytes = self.get_captcha_image()
+            captcha_text, confidences = self._recognize(image_bytes)
+            print(f"Captcha recognized: {captcha_text}")
+            if resolve == self._max_resolves() or self._captcha_plausible(captcha_text, confidences):
+                break
+            self._refresh_captcha_locally()
+        self._submitted_captcha = (image_bytes, captcha_text, confidences)
+        self._current_form(Selectors.FORM).set(Selectors.CAPTCHA_INPUT, captcha_text)
+        return captcha_text
+
+    def refresh_captcha(self):
+        """
+        A rejected Step 1 comes back as a new Step 1 page with a new
+        captcha; refill it (or reload the booking page if it didn't).
+        """
+        if self.current is None or self.current.form(Selectors.FORM) is None:
+            if not self.open_booking_page():
+                raise RuntimeError("Failed to reload booking page")
+        self.fill_booking_form()
+
+    def _refresh_captcha_locally(self):
+        """Load a fresh booking page (new captcha) and refill it; nothing is posted."""
+        if not self.open_booking_page():
+            raise RuntimeError("Failed to reload booking page")
+        self.fill_booking_form()
+
+    def submit_form(self):
+        """Post Step 1."""
+        print("\n--- Submitting Form ---")
+        self._post(Selectors.FORM, Selectors.SUBMIT_BUTTON)
+
+    def check_for_errors(self) -> str:
+        return self.current.text(Selectors.ERROR_MESSAGE) if self.current else ""
+
+    def probe_outcome(self, *expected: Outcome, timeout: int = 5000):
+        """
+        Classify the current page (no waiting: the response is complete).
+
+        :return: (Outcome, error text or "")
+        """
+        for outcome in expected:
+            if self.current is not None and self.current.form(OUTCOME_SELECTORS[outcome]) is not None:
+                return outcome, ""
+        error = self.check_for_errors()
+        if error:
+            return (Outcome.CAPTCHA_ERROR if is_captcha_error(error) else Outcome.OTHER_ERROR), error
+        return Outcome.UNKNOWN, ""
+
+    def is_on_step2(self) -> bool:
+        return self.current is not None and self.current.form(Selectors.STEP2_FORM) is not None
+
+    def is_on_step3(self) -> bool:
+        return self.current is not None and self.current.form(Selectors.STEP3_FORM) is not None
+
+    def select_first_train(self):
+        """Select the first available train on Step 2."""
+        print("\n--- Selecting Train ---")
+        form = self._current_form(Selectors.STEP2_FORM)
+        trains = form.find(Selectors.TRAIN_RADIO)
+        print(f"Found {len(trains)} available trains")
+        if not trains:
+            print("No trains available!")
+            return False
+
+        first_train = trains[0]
+        form.set(Selectors.TRAIN_RADIO, first_train["value"])
+        attrs = first_train["attrs"]
+        self.selected_train = (attrs.get("querycode"), attrs.get("querydeparture"), attrs.get("queryarrival"))
+        print("Selected train: {} ({} → {})".format(*self.selected_train))
+        return True
+
+    def confirm_train_selection(self):
+        """Post Step 2."""
+        print("Confirming train selection...")
+        self._post(Selectors.STEP2_FORM, Selectors.CONFIRM_TRAIN)
+        print("Train confirmed!")
+
+    def fill_passenger_info(self):
+        """Fill passenger information on Step 3."""
+        print("\n--- Filling Passenger Info ---")
+        form = self._current_form(Selectors.STEP3_FORM)
+
+        passenger_id = self.config.get("passenger_id", "")
+        if passenger_id:
+            print(f"Filling ID: {passenger_id[:3]}***")
+            form.set(Selectors.PASSENGER_ID, passenger_id)
+
+        passenger_phone = self.config.get("passenger_phone", "")
+        if passenger_phone:
+            print(f"Filling phone: {passenger_phone[:4]}***")
+            form.set(Selectors.PASSENGER_PHONE, passenger_phone)
+
+        passenger_email = self.config.get("passenger_email", "")
+        if passenger_email:
+            print(f"Filling email: {passenger_email}")
+            form.set(Selectors.PASSENGER_EMAIL, passenger_email)
+
+        print("Checking agreement checkbox...")
+        form.set(Selectors.AGREE_CHECKBOX, "on")
+        print("Passenger info filled!")
+
+    def confirm_booking(self):
+        """Post Step 3."""
+        print("\n--- Confirming Booking ---")
+        self._post(Selectors.STEP3_FORM, Selectors.CONFIRM_BOOKING)
+
+    def _report_success(self):
+        """CLI mode: display success message with the confirmation page's text."""
+        print("\n" + "="*50)
+        print("🎉 BOOKING COMPLETE!")
+        print("="*50)
+        if self.current is not None:
+            print(f"\n{self.current.title.strip()}")
+            for form in self.current.forms.values():
+                if form.id:
+                    print(self.current.text(f"#{form.id}")[:500])
+
+    def close(self):
+        """Close the HTTP session."""
+        super().close()
+        if self.session:
+            self.session.close()
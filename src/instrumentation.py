@@ -0,0 +1,141 @@
+"""
+Per-step trace events for BookingAssistant. Tracer.instrument() wraps the
+booking steps on one assistant instance; each call then records a
+structured event:
+
+    {"seq": 3, "step": "ocr", "attempt": 1, "start_ms": 812.4, "duration_ms": 21.7,
+     "outcome": "ok", "result": "AB12", "thread": "MainThread"}
+
+start_ms is monotonic (time.perf_counter) and relative to the tracer's
+creation. Untraced assistants are not wrapped at all, so tracing costs
+nothing unless it is switched on (TRACE_FILE).
+"""
+import inspect
+import json
+import threading
+import time
+from enum import Enum
+
+from .stats import summarize_ms
+
+# Instrumented BookingAssistant methods -> step name in the trace
+STEPS = {
+    "start": "start",
+    "open_booking_page": "open_booking_page",
+    "dismiss_cookie_dialog": "dismiss_cookie_dialog",
+    "fill_booking_form": "fill_booking_form",
+    "get_captcha_image": "get_captcha_image",
+    "_recognize": "ocr",
+    "submit_form": "submit_form",
+    "probe_outcome": "probe_outcome",  # Outcome detection (event/turbo profiles)
+    "is_on_step2": "is_on_step2",  # Compat profile, called from probe_outcome
+    "select_first_train": "select_first_train",
+    "confirm_train_selection": "confirm_train_selection",
+    "fill_passenger_info": "fill_passenger_info",
+    "confirm_booking": "confirm_booking",
+}
+
+
+def result_field(result):
+    """The part of a step's return value worth keeping: bools, strings, the OCR text and outcomes."""
+    if isinstance(result, (bool, str)):
+        return result
+    if isinstance(result, tuple) and result and isinstance(result[0], Enum):
+        return result[0].value  # probe_outcome: (Outcome, error text)
+    if isinstance(result, tuple) and result and isinstance(result[0], str):
+        return result[0]  # _recognize: (text, confidences)
+    return None
+
+
+class Tracer:
+    """Collects step events in memory until they are exported."""
+
+    def __init__(self):
+        self.events = []
+        self._origin_ns = time.perf_counter_ns()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def instrument(self, assistant, steps: dict = None):
+        """
+        Wrap the steps of one assistant instance (the class is left alone).
+
+        Args:
+            assistant: BookingAssistant (or subclass) to trace
+            steps: Method name -> step name; defaults to STEPS
+        """
+        for method, step in (steps or STEPS).items():
+            func = getattr(assistant, method, None)
+            if func is not None:
+                setattr(assistant, method, self._wrap(assistant, step, func))
+
+    def _wrap(self, assistant, step: str, func):
+        def failed(started: int, e: BaseException):
+            self.record(step, started, getattr(assistant, "attempt", 0), "error", error=f"{type(e).__name__}: {e}")
+
+        def finished(started: int, result):
+            self.record(step, started, getattr(assistant, "attempt", 0), "ok", result=result_field(result))
+
+        if inspect.iscoroutinefunction(func):
+            # AsyncBookingAssistant: time the awaited step, not the coroutine creation
+            async def traced(*args, **kwargs):
+                started = time.perf_counter_ns()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException as e:
+                    failed(started, e)
+                    raise
+                finished(started, result)
+                return result
+        else:
+            def traced(*args, **kwargs):
+                started = time.perf_counter_ns()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException as e:
+                    failed(started, e)
+                    raise
+                finished(started, result)
+                return result
+
+        traced.__wrapped__ = func
+        return traced
+
+    def record(self, step: str, started_ns: int, attempt: int, outcome: str, result=None, error: str = None):
+        """Append one event for a step that began at started_ns (perf_counter_ns) and ends now."""
+        ended = time.perf_counter_ns()
+        event = {
+            "step": step,
+            "attempt": attempt,
+            "start_ms": round((started_ns - self._origin_ns) / 1e6, 3),
+            "duration_ms": round((ended - started_ns) / 1e6, 3),
+            "outcome": outcome,
+            "thread": threading.current_thread().name,
+        }
+        if result is not None:
+            event["result"] = result
+        if error is not None:
+            event["error"] = error
+        with self._lock:
+            self._seq += 1
+            event = {"seq": self._seq, **event}
+            self.events.append(event)
+        return event
+
+    def export(self, path: str) -> int:
+        """Append the collected events to path as JSON lines; returns how many were written."""
+        with self._lock:
+            events, self.events = self.events, []
+        with open(path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        return len(events)
+
+    def summary(self) -> str:
+        """Per-step call count and latency of the events not yet exported."""
+        durations = {}
+        with self._lock:
+            for event in self.events:
+                durations.setdefault(event["step"], []).append(event["duration_ms"])
+        lines = [f"  {step}: {len(values)}x, {summarize_ms(values)}" for step, values in durations.items()]
+        return "\n".join(["Step timings:"] + lines)
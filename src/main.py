@@ -1,12 +1,63 @@
+import argparse
+import sys
 
 from src.booking import BookingAssistant
+from src.config import ENGINE, METRICS_PORT, PIPELINE_RETRIES, PROFILE_OUTPUT, RACE_LANES
+
+def mode_conflict() -> str:
+    """Describe a combination of run modes that can't be honoured together, or return ""."""
+    if RACE_LANES > 1 and ENGINE == "http":
+        return "RACE_LANES > 1 races browser contexts and can't be combined with ENGINE=http"
+    if RACE_LANES > 1 and PIPELINE_RETRIES:
+        return "RACE_LANES > 1 and PIPELINE_RETRIES=true can't be combined, choose one"
+    if ENGINE == "http" and PIPELINE_RETRIES:
+        return "PIPELINE_RETRIES=true needs a browser and can't be combined with ENGINE=http"
+    return ""
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Run the HSR booking assistant (settings from .env)")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_OUTPUT, metavar="FILE",
+                        help=f"Sample the run and write folded stacks (default: {PROFILE_OUTPUT})")
+    args = parser.parse_args(argv)
 
-def main():
     print("Starting HSR Booking Assistant...")
+    conflict = mode_conflict()
+    if conflict:
+        print(f"\n❌ Error: {conflict}")
+        return 1
+    if METRICS_PORT:
+        from src import metrics
+        metrics.serve(METRICS_PORT)
+        print(f"Metrics on http://{metrics.METRICS_HOST}:{METRICS_PORT}/metrics")
+
+    profiler = None
+    if args.profile:
+        from src.profiler import SamplingProfiler
+        profiler = SamplingProfiler()
+        profiler.start()
 
     try:
-        assistant = BookingAssistant()
-        assistant.run()
+        if RACE_LANES > 1:
+            # Racing mode: several contexts race through Step 1 (async engine)
+            import asyncio
+            from src.race import BookingRace
+            if profiler:
+                # The lanes are tasks on one thread, so their stage labels would mix
+                print("Profiling the race without stage/step labels")
+            asyncio.run(BookingRace().run())
+        else:
+            if ENGINE == "http":
+                from src.http_engine import HttpBookingEngine
+                assistant = HttpBookingEngine()
+            elif PIPELINE_RETRIES:
+                # Pipelined retries: a spare context prepares the next captcha during each submit
+                from src.pipeline import PipelinedBookingAssistant
+                assistant = PipelinedBookingAssistant()
+            else:
+                assistant = BookingAssistant()
+            if profiler:
+                profiler.instrument(assistant)
+            assistant.run()
     except ValueError as e:
         # Time format error or time has passed
         print(f"\n❌ Error: {e}")
@@ -15,9 +66,13 @@ def main():
         # User pressed Ctrl+C to cancel
         print("\n\nCancelled by user")
         return 0
+    finally:
+        if profiler:
+            profiler.stop()
+            profiler.report(args.profile)
 
     print("Assistant finished.")
     return 0
 
 if __name__ == "__main__":
-    exit(main())
+    exit(main(sys.argv[1:]))
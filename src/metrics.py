@@ -0,0 +1,294 @@
+"""
+Process-wide metrics in the Prometheus text format, for the booking daemon
+(GET /metrics on its API) and other long-running modes (METRICS_PORT).
+
+Recording is a deque.append, which is atomic under the GIL: the booking
+flow never takes a lock or does bucket arithmetic. Pending values are
+folded into the totals when the endpoint is scraped, or by the recording
+thread itself once a series has MAX_PENDING values waiting.
+
+Usage:
+    curl localhost:8765/metrics                           # daemon
+    METRICS_PORT=9464 uv run python -m src.main           # CLI / batch
+"""
+import bisect
+import os
+import re
+import sys
+import threading
+from collections import deque
+
+from .config import METRICS_HOST
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Fold pending values in on the recording thread past this many (nobody scraping)
+MAX_PENDING = 1024
+
+# Histogram buckets in seconds: OCR (ms) up to browser launch and page loads (s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Series:
+    """One labelled series: values appended lock-free, folded in under a lock on read."""
+
+    def __init__(self):
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def _record(self, value: float):
+        self._pending.append(value)
+        if len(self._pending) > MAX_PENDING:
+            self._fold()
+
+    def _fold(self):
+        with self._lock:
+            while True:
+                try:
+                    value = self._pending.popleft()
+                except IndexError:
+                    return
+                self._add(value)
+
+    def _add(self, value: float):
+        raise NotImplementedError
+
+
+class _CounterSeries(_Series):
+    def __init__(self):
+        super().__init__()
+        self.total = 0.0
+
+    def inc(self, amount: float = 1):
+        self._record(amount)
+
+    def _add(self, value: float):
+        self.total += value
+
+    def value(self) -> float:
+        self._fold()
+        return self.total
+
+
+class _GaugeSeries(_CounterSeries):
+    def dec(self, amount: float = 1):
+        self._record(-amount)
+
+
+class _HistogramSeries(_Series):
+    def __init__(self, buckets: tuple):
+        super().__init__()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._record(value)
+
+    def _add(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def snapshot(self) -> tuple:
+        """(cumulative bucket counts, sum, count)."""
+        self._fold()
+        with self._lock:
+            cumulative, running = [], 0
+            for count in self.counts:
+                running += count
+                cumulative.append(running)
+            return cumulative, self.sum, running
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), registry: list = REGISTRY):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self.labels()  # Exported as 0 before the first event
+        registry.append(self)
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The series for these label values (created on first use)."""
+        series = self._children.get(values)
+        if series is None:
+            series = self._children.setdefault(values, self._new_series())
+        return series
+
+    def _samples(self) -> list:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. captcha attempts."""
+
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _samples(self) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {series.value():g}"
+                for values, series in list(self._children.items())]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, or is read from function at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), function=None,
+                 registry: list = REGISTRY):
+        super().__init__(name, help_text, labelnames, registry)
+        self.function = function
+
+    def _new_series(self):
+        return _GaugeSeries()
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def _samples(self) -> list:
+        if self.function is not None:
+            return [f"{self.name} {self.function():g}"]
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies in seconds)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS,
+                 registry: list = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames, registry)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self) -> list:
+        lines = []
+        for values, series in list(self._children.items()):
+            cumulative, total, count = series.snapshot()
+            bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+            for bound, running in zip(bounds, cumulative):
+                labels = _format_labels(self.labelnames, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {running}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {total:g}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def resident_memory_bytes() -> float:
+    """Current RSS of this process; where /proc is missing (macOS, BSD), the peak RSS so far."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Bytes on macOS, KiB elsewhere
+    except ImportError:
+        return 0.0  # Windows
+
+
+STEP_SECONDS = Histogram("hsr_step_duration_seconds", "Booking stage latency", ("step",))
+OCR_SECONDS = Histogram("hsr_ocr_duration_seconds", "Captcha OCR inference latency")
+CAPTCHA_ATTEMPTS = Counter("hsr_captcha_attempts_total", "Step 1 submits with a solved captcha")
+CAPTCHA_FAILURES = Counter("hsr_captcha_failures_total", "Captchas the server rejected")
+BOOKINGS_SUCCEEDED = Counter("hsr_bookings_succeeded_total", "Bookings that reached the confirmation")
+BOOKINGS_FAILED = Counter("hsr_bookings_failed_total", "Bookings that stopped with an error", ("error_class",))
+BROWSER_LAUNCHES = Counter("hsr_browser_launches_total", "Chromium processes launched")
+OPEN_CONTEXTS = Gauge("hsr_open_contexts", "Browser contexts currently open")
+RESIDENT_MEMORY = Gauge("hsr_process_resident_memory_bytes",
+                        "Resident memory of this process (peak resident memory where /proc is missing)",
+                        function=resident_memory_bytes)
+
+# on_error message prefix -> error_class label
+ERROR_CLASSES = (
+    ("Failed to load page", "page_load"),
+    ("Failed after", "captcha_retries"),
+    ("Non-captcha error", "rejected"),
+    ("Unknown error after form submission", "unknown_outcome"),
+    ("No available trains", "no_trains"),
+    ("Failed to reach passenger info", "step3"),
+    ("Booking was not confirmed", "not_confirmed"),
+)
+
+
+def error_class(message: str) -> str:
+    """Bounded label for an on_error message; anything unexpected is an exception."""
+    for prefix, label in ERROR_CLASSES:
+        if message.startswith(prefix):
+            return label
+    return "exception"
+
+
+def step_name(stage: str) -> str:
+    """Stage name without its attempt number (submit_3 -> submit), to keep label values bounded."""
+    return re.sub(r"_\d+$", "", stage)
+
+
+def render(registry: list = REGISTRY) -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+def serve(port: int, host: str = METRICS_HOST):
+    """Serve GET /metrics on host:port from a daemon thread; stop with server.shutdown()."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
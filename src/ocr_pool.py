@@ -0,0 +1,176 @@
+"""
+OCR in a pool of worker processes. Every worker loads and warms up its own
+model once, when the pool starts, so inference (and the Python pre/post
+processing around it) runs outside the calling process and its GIL.
+
+Images go to the workers through shared memory: the pool owns a fixed set
+of slots, a caller writes its image into a free slot and only the slot
+name and image size are sent. Workers attach to each slot once and keep it.
+
+Enable with OCR_WORKERS=<n>; CaptchaSolver.shared() then returns a
+PooledSolver. Workers are spawned, not forked, so they don't inherit the
+browser's threads and the pool works the same on Windows.
+"""
+import atexit
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing.shared_memory import SharedMemory
+
+from . import metrics
+from .captcha import CaptchaResult, CaptchaSolver
+from .config import CAPTCHA_CHARSET, CAPTCHA_PREPROCESS, OCR_WORKERS
+from .stats import percentile
+
+# Largest image passed through shared memory; bigger ones are pickled instead
+SLOT_BYTES = 256 * 1024
+
+# Worker process state
+_solver = None
+_attached = {}
+
+
+def _init_worker(preprocess: str, model: str, charset: str, ready):
+    """Pool initializer: load and warm up this worker's model, then signal ready."""
+    global _solver
+    _solver = CaptchaSolver(preprocess=preprocess, model=model, charset=charset)
+    _solver.warm_up()
+    ready.release()
+
+
+def _read_slot(name: str, size: int) -> bytes:
+    shm = _attached.get(name)
+    if shm is None:
+        # Spawned workers share the parent's resource tracker, which already
+        # tracks the slot, so attaching doesn't make the worker an owner
+        shm = SharedMemory(name=name)
+        _attached[name] = shm
+    return bytes(shm.buf[:size])
+
+
+def _solve(name: str, size: int, image_bytes: bytes, detailed: bool) -> tuple:
+    """Worker task: (text, confidences or None) for the image in slot name (or image_bytes)."""
+    if name is not None:
+        image_bytes = _read_slot(name, size)
+    if detailed:
+        result = _solver.solve_detailed(image_bytes)
+        return result.text, result.confidences
+    return _solver.solve_bytes(image_bytes), None
+
+
+class PooledSolver(CaptchaSolver):
+    """CaptchaSolver that runs OCR in warm worker processes."""
+
+    def __init__(self, workers: int = OCR_WORKERS, preprocess: str = CAPTCHA_PREPROCESS,
+                 model: str = "default", ready_timeout: float = 120, charset: str = CAPTCHA_CHARSET):
+        """
+        Start the workers and wait until every one has its model loaded.
+
+        Args:
+            workers: Worker processes
+            preprocess: Preprocessing steps each worker applies (see src/preprocess.py)
+            model: ddddocr OCR model: default, beta or old
+            ready_timeout: Seconds to wait for the workers to load their models
+            charset: Characters the captchas use; OCR output is limited to them
+        """
+        if model not in self.MODELS:
+            raise ValueError(f"Unknown OCR model '{model}' (use {', '.join(self.MODELS)})")
+        self.workers = max(1, workers)
+        self.model = model
+        self.charset = charset
+        context = multiprocessing.get_context("spawn")
+
+        # Two slots per worker, so callers can fill one while the worker reads the other
+        self._slots = [SharedMemory(create=True, size=SLOT_BYTES) for _ in range(self.workers * 2)]
+        self._free = queue.Queue()
+        for index in range(len(self._slots)):
+            self._free.put(index)
+
+        started = time.perf_counter()
+        ready = context.Semaphore(0)
+        self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(preprocess, model, charset, ready))
+        atexit.register(self.close)
+        for _ in range(self.workers):
+            if not ready.acquire(timeout=ready_timeout):
+                self.close()
+                raise RuntimeError(f"OCR workers not ready after {ready_timeout:g}s")
+        self.load_ms = (time.perf_counter() - started) * 1000
+
+        self._lock = threading.Lock()  # Guards the counters; the pool serializes nothing
+        self._latencies_ms = deque(maxlen=1000)
+        self.inference_count = 0
+        self.pickled = 0  # Images too big for a slot
+        self.warmed_up = True  # Workers warm up in their initializer
+        self._closed = False
+
+    def _run(self, image_bytes: bytes, detailed: bool) -> tuple:
+        slot = self._free.get()
+        try:
+            shm = self._slots[slot]
+            size = len(image_bytes)
+            if size <= shm.size:
+                shm.buf[:size] = image_bytes
+                args = (shm.name, size, None, detailed)
+            else:
+                args = (None, size, image_bytes, detailed)
+            started = time.perf_counter()
+            result = self._pool.apply(_solve, args)
+        finally:
+            self._free.put(slot)
+        elapsed = time.perf_counter() - started
+        metrics.OCR_SECONDS.observe(elapsed)
+        with self._lock:
+            self._latencies_ms.append(elapsed * 1000)
+            self.inference_count += 1
+            self.pickled += args[0] is None
+        return result
+
+    def solve_bytes(self, image_bytes):
+        """Solve captcha from image bytes in a worker. Safe to call from several threads."""
+        try:
+            return self._run(image_bytes, detailed=False)[0]
+        except Exception as e:
+            print(f"OCR Error: {e}")
+            return ""
+
+    def solve_detailed(self, image_bytes) -> CaptchaResult:
+        """Solve captcha in a worker, with a confidence per character."""
+        try:
+            text, confidences = self._run(image_bytes, detailed=True)
+            return CaptchaResult(text, confidences)
+        except Exception as e:
+            print(f"OCR Error: {e}")
+            return CaptchaResult("", [])
+
+    def warm_up(self):
+        """Workers are warmed up when the pool starts."""
+
+    def stats(self) -> dict:
+        """CaptchaSolver.stats() measured round trip (including the hand-off to a worker)."""
+        with self._lock:
+            latencies = list(self._latencies_ms)
+            count = self.inference_count
+        return {
+            "load_ms": round(self.load_ms, 1),
+            "inferences": count,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "workers": self.workers,
+        }
+
+    def summary(self) -> str:
+        return f"{super().summary()} in {self.workers} worker process(es)"
+
+    def close(self):
+        """Stop the workers and free the shared memory. Safe to call twice."""
+        if getattr(self, "_closed", False):
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._pool.terminate()
+        self._pool.join()
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,169 @@
+"""
+Pipelined captcha retries. A second context on the same browser (the spare
+lane) keeps the Step 1 form filled and a captcha solved. While a submit is
+in flight, the spare lane refreshes and solves its next captcha; when the
+server rejects the submitted one, the assistant switches straight to the
+spare lane and submits it, and the rejected page becomes the new spare.
+
+A retry then costs one submit round trip instead of submit, refresh and
+OCR back to back.
+
+Usage:
+    PIPELINE_RETRIES=true uv run python -m src.main
+"""
+from contextlib import contextmanager
+
+from . import metrics
+from .booking import CONTEXT_OPTIONS, BookingAssistant, remember_image_response
+from .config import Selectors
+
+# Per-lane state; everything else (config, solver, stats) is shared by both lanes
+LANE_ATTRS = ("context", "page", "_image_responses", "_submitted_captcha", "captcha_ready")
+
+
+class SpareLane:
+    """The context not currently submitting, and whether its captcha is solved and filled in."""
+
+    def __init__(self, context, page, image_responses: dict):
+        self.context = context
+        self.page = page
+        self._image_responses = image_responses
+        self._submitted_captcha = None
+        self.captcha_ready = False
+
+
+class PipelinedBookingAssistant(BookingAssistant):
+    """BookingAssistant that prepares the next captcha attempt in a spare context during each submit."""
+
+    def __init__(self, config: dict = None, on_success=None, on_error=None):
+        super().__init__(config=config, on_success=on_success, on_error=on_error)
+        self.spare = None  # SpareLane once the second context is open
+        self.captcha_ready = False  # The active page has a solved captcha filled in
+        self.lane_switches = 0
+
+    def _swap_lanes(self):
+        for name in LANE_ATTRS:
+            active = getattr(self, name)
+            setattr(self, name, getattr(self.spare, name))
+            setattr(self.spare, name, active)
+
+    @contextmanager
+    def _on_spare(self):
+        """Run the regular page steps (fill, refresh, solve) against the spare lane."""
+        self._swap_lanes()
+        try:
+            yield
+        finally:
+            self._swap_lanes()
+
+    @staticmethod
+    def _listen_for_images(page, responses: dict):
+        # Lanes trade pages, so each page fills its own cache rather than self._image_responses
+        page.on("response", lambda response: remember_image_response(responses, response))
+
+    def _open_spare(self):
+        """Open the spare context, load and fill the booking form and solve its captcha."""
+        self.page.remove_listener("response", self._remember_image_response)
+        self._listen_for_images(self.page, self._image_responses)
+
+        context = self.browser.new_context(**CONTEXT_OPTIONS)
+        metrics.OPEN_CONTEXTS.inc()
+        if self.resource_policy:
+            self.resource_policy.install(context)
+        page = context.new_page()
+        self.spare = SpareLane(context, page, {})
+        self._listen_for_images(page, self.spare._image_responses)
+
+        print("\n--- Preparing spare lane ---")
+        with self._on_spare():
+            if not self.open_booking_page():
+                raise RuntimeError("booking page did not load")
+            self.dismiss_cookie_dialog()
+            self.fill_booking_form()
+            self.solve_and_fill_captcha()
+            self.captcha_ready = True
+
+    def _close_spare(self):
+        spare, self.spare = self.spare, None
+        if spare is None:
+            return
+        metrics.OPEN_CONTEXTS.dec()
+        try:
+            spare.context.close()
+        except Exception as e:
+            print(f"Closing spare lane failed: {e}")
+
+    def _prepare_spare(self):
+        """Refresh and solve the spare lane's captcha unless it is already ready."""
+        if self.spare is None or self.spare.captcha_ready:
+            return
+        print("Preparing the next captcha on the spare lane")
+        try:
+            with self._on_spare():
+                self.refresh_captcha()
+                self.solve_and_fill_captcha()
+                self.captcha_ready = True
+        except Exception as e:
+            print(f"Spare lane not prepared: {e}")
+
+    def _stage_prefill(self) -> bool:
+        """Prefill stage: the regular prefill, then the spare lane (pipelining stays off if it fails)."""
+        if not super()._stage_prefill():
+            return False
+        if self.browser is None:
+            print("Page attached from elsewhere, retries not pipelined")
+            return True
+        try:
+            self._open_spare()
+        except Exception as e:
+            print(f"Spare lane failed ({e}), retries not pipelined")
+            self._close_spare()
+        return True
+
+    def _stage_submit(self):
+        """Submit stage: solve the captcha unless this lane was prepared, then submit."""
+        if not self.captcha_ready:
+            self.solve_and_fill_captcha()
+        self.captcha_ready = False  # Whatever the outcome, this captcha is used up
+        self.submit_form()
+
+    def submit_form(self):
+        """Submit the booking form, preparing the spare lane while the request is in flight."""
+        from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+        if self.spare is None:
+            super().submit_form()
+            return
+
+        print("\n--- Submitting Form ---")
+        if self._compat_waits():
+            self.page.click(Selectors.SUBMIT_BUTTON)
+            self._prepare_spare()
+            self.page.wait_for_load_state("domcontentloaded")
+            return
+        try:
+            with self.page.expect_navigation(wait_until="domcontentloaded", timeout=15000):
+                self.page.click(Selectors.SUBMIT_BUTTON)
+                self._prepare_spare()
+        except PlaywrightTimeout:
+            print(f"No navigation within 15s after clicking {Selectors.SUBMIT_BUTTON}")
+
+    def _retry_captcha(self):
+        """Switch to the spare lane if its captcha is ready; refresh this one otherwise."""
+        if self.spare is None or not self.spare.captcha_ready:
+            super()._retry_captcha()
+            return
+        self._swap_lanes()
+        self.lane_switches += 1
+        print("Switched to the prepared lane")
+
+    def select_first_train(self) -> bool:
+        self._close_spare()  # Step 1 is done, the spare lane is no longer needed
+        return super().select_first_train()
+
+    def close(self):
+        """Close the spare lane, then the browser."""
+        if self.lane_switches:
+            print(f"Pipelined retries switched lanes {self.lane_switches} times")
+        self._close_spare()
+        super().close()
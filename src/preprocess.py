@@ -0,0 +1,133 @@
+"""
+Captcha image preprocessing before OCR: grayscale, binarization, removal
+of the arc HSR draws across the characters, and denoising. Every step is
+a function from one NumPy image array to another, vectorized over the
+whole array (no per-pixel Python loops).
+
+Steps are looked up by name in STEPS, so a pipeline is configured as a
+comma-separated list (CAPTCHA_PREPROCESS=grayscale,binarize,remove_curve,denoise)
+and new steps can be added to STEPS. Measure a pipeline with
+benchmarks/captcha_eval.py before turning it on.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+# Luma weights (ITU-R BT.601)
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def grayscale(image: np.ndarray) -> np.ndarray:
+    """RGB(A) to 8-bit gray; gray images are returned as they are."""
+    if image.ndim == 2:
+        return image
+    return (image[..., :3].astype(np.float32) @ GRAY_WEIGHTS).astype(np.uint8)
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Gray level that best separates the histogram into two classes (Otsu)."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * np.arange(256))
+    total = weight[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight / total - mean) ** 2 / (weight * (total - weight))
+    return int(np.nanargmax(np.nan_to_num(between, nan=0.0, posinf=0.0)))
+
+
+def binarize(image: np.ndarray) -> np.ndarray:
+    """Black (0) ink on white (255), split at the Otsu threshold."""
+    gray = grayscale(image)
+    return np.where(gray > otsu_threshold(gray), 255, 0).astype(np.uint8)
+
+
+def remove_curve(image: np.ndarray, margin: float = 0.12, thickness: int = 4) -> np.ndarray:
+    """
+    Erase the arc drawn across the captcha. The characters sit in the
+    middle, so ink in the left and right margins belongs to the arc: a
+    quadratic is fitted to it, and ink in a band of thickness pixels along
+    the fitted curve is set to white. Where a character's stroke crosses
+    the band, its ink runs on across the curve (longer than the arc is
+    thick), so it is kept.
+
+    :param margin: Fraction of the width on each side used for the fit
+    """
+    binary = binarize(image) if image.ndim == 3 else image
+    height, width = binary.shape
+    ys, xs = np.nonzero(binary == 0)
+    edge = int(width * margin)
+    in_margins = (xs < edge) | (xs >= width - edge)
+    if np.count_nonzero(in_margins) < 10:
+        return binary  # No arc to fit
+    coefficients = np.polyfit(xs[in_margins], ys[in_margins], 2)
+    columns = np.arange(width)
+    curve = np.polyval(coefficients, columns)
+    rows = np.arange(height)[:, None]
+    band = np.abs(rows - curve[None, :]) <= thickness / 2
+
+    # Length of the vertical ink run through each pixel
+    ink = binary == 0
+    run_start = np.maximum.accumulate(np.where(ink, -1, rows), axis=0)
+    run_end = np.minimum.accumulate(np.where(ink, height, rows)[::-1], axis=0)[::-1]
+    run = run_end - run_start - 1
+    # A band-thick stroke along the curve spans this many rows where the curve is sloped
+    slope = np.polyval(np.polyder(coefficients), columns)
+    arc_run = (thickness + 1) * np.sqrt(1 + slope ** 2)
+    return np.where(band & ink & (run <= arc_run[None, :]), 255, binary).astype(np.uint8)
+
+
+def denoise(image: np.ndarray, min_neighbours: int = 2) -> np.ndarray:
+    """Drop ink pixels with fewer than min_neighbours inked pixels among their 8 neighbours."""
+    binary = binarize(image) if image.ndim == 3 else image
+    ink = np.pad(binary == 0, 1)
+    height, width = binary.shape
+    neighbours = sum(
+        ink[1 + dy:1 + dy + height, 1 + dx:1 + dx + width].astype(np.uint8)
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx
+    )
+    keep = ink[1:-1, 1:-1] & (neighbours >= min_neighbours)
+    return np.where(keep, 0, 255).astype(np.uint8)
+
+
+# Available steps by name; each takes and returns an image array
+STEPS = {
+    "grayscale": grayscale,
+    "binarize": binarize,
+    "remove_curve": remove_curve,
+    "denoise": denoise,
+}
+
+
+class Pipeline:
+    """Steps from STEPS applied in order to a decoded captcha image."""
+
+    def __init__(self, steps: list):
+        """
+        :param steps: Step names, in order
+        :raises ValueError: Unknown step name
+        """
+        unknown = [name for name in steps if name not in STEPS]
+        if unknown:
+            raise ValueError(f"Unknown preprocessing step(s) {', '.join(unknown)} "
+                             f"(available: {', '.join(STEPS)})")
+        self.steps = list(steps)
+
+    @classmethod
+    def from_spec(cls, spec: str):
+        """Pipeline from a comma-separated step list, or None for an empty one."""
+        steps = [name.strip() for name in (spec or "").split(",") if name.strip()]
+        return cls(steps) if steps else None
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        for name in self.steps:
+            image = STEPS[name](image)
+        return image
+
+    def __call__(self, image_bytes: bytes) -> Image.Image:
+        """Decode, preprocess and return a PIL image ddddocr takes without re-encoding."""
+        image = np.asarray(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+        return Image.fromarray(self.apply(image))
+
+    def __repr__(self):
+        return f"Pipeline({','.join(self.steps)})"
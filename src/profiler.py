@@ -0,0 +1,197 @@
+"""
+Sampling profiler for a booking run (python -m src.main --profile, or the
+GUI's profile checkbox). A background thread reads the profiled thread's
+stack every PROFILE_INTERVAL_MS via sys._current_frames() and writes folded
+stacks, one "frame;frame;... count" line per distinct stack, for
+flamegraph.pl, inferno or speedscope.
+
+The Playwright sync API waits for the driver on a separate greenlet whose
+stack doesn't reach back into the booking code, so each sample is also
+prefixed with the stage and step in progress (stage:submit;step:submit_form).
+
+Every sample falls into one category for the summary:
+    ocr         inside the OCR stack (ddddocr/onnxruntime, solver, OCR pool)
+    playwright  waiting on the Playwright driver (or an idle event loop)
+    sleep       blocked in a sleep or wait call
+    python      everything else: our own code running
+"""
+import inspect
+import linecache
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from .config import PROFILE_INTERVAL_MS
+from .instrumentation import STEPS
+from .metrics import step_name
+
+CATEGORIES = ("python", "playwright", "ocr", "sleep")
+
+# Module prefixes whose frames put a sample in a category
+OCR_MODULES = ("ddddocr", "onnxruntime", "src.captcha", "src.ocr_pool", "src.ensemble", "src.preprocess")
+PLAYWRIGHT_MODULES = ("playwright", "greenlet")
+
+# Source of a leaf frame that's blocked rather than running
+SLEEP_CALLS = ("sleep(", ".wait(", ".acquire(")
+
+
+class SamplingProfiler:
+    """Samples one thread's stacks between start() and stop()."""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = Counter()  # (labels, frames, category) -> samples
+        self.elapsed = 0.0
+        self._started = None
+        self._labels = {}  # thread id -> stage/step labels in progress
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._line_cache = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Start sampling the calling thread."""
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        self.elapsed += time.perf_counter() - self._started
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._sample(frame, tuple(self._labels.get(self._thread_id, ())))
+
+    def _sample(self, frame, labels: tuple):
+        leaf = frame
+        frames = []
+        category = None
+        while frame is not None:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", "?")
+            if category is None and module.startswith(OCR_MODULES):
+                category = "ocr"
+            elif category is None and module.startswith(PLAYWRIGHT_MODULES):
+                category = "playwright"
+            frames.append(f"{module}:{code.co_qualname}")
+            frame = frame.f_back
+        if category is None:
+            category = self._leaf_category(leaf)
+        frames.reverse()
+        self.samples[(labels, tuple(frames), category)] += 1
+
+    def _leaf_category(self, leaf) -> str:
+        key = (leaf.f_code, leaf.f_lineno)
+        category = self._line_cache.get(key)
+        if category is None:
+            if leaf.f_globals.get("__name__") == "selectors":
+                category = "playwright"  # Event loop idle: async engines await the driver
+            else:
+                line = linecache.getline(leaf.f_code.co_filename, leaf.f_lineno)
+                category = "sleep" if any(call in line for call in SLEEP_CALLS) else "python"
+            self._line_cache[key] = category
+        return category
+
+    @contextmanager
+    def label(self, name: str):
+        """Mark samples of the calling thread with name (stage or step) while the block runs."""
+        labels = self._labels.setdefault(threading.get_ident(), [])
+        labels.append(name)
+        try:
+            yield
+        finally:
+            labels.pop()
+
+    def instrument(self, assistant):
+        """Label samples with the stage and step a BookingAssistant is in (sync methods only)."""
+        run_stage = assistant._run_stage
+
+        def labelled_stage(name: str, func):
+            with self.label(f"stage:{step_name(name)}"):
+                return run_stage(name, func)
+
+        assistant._run_stage = labelled_stage
+        for method, step in STEPS.items():
+            func = getattr(assistant, method, None)
+            if func is None or inspect.iscoroutinefunction(func):
+                continue  # Concurrent tasks share the thread, so their labels would mix
+
+            def labelled(*args, func=func, step=step, **kwargs):
+                with self.label(f"step:{step}"):
+                    return func(*args, **kwargs)
+
+            labelled.__wrapped__ = func
+            setattr(assistant, method, labelled)
+
+    def folded(self) -> str:
+        """Folded stacks (stage/step labels first, then frames from the root), heaviest first."""
+        stacks = Counter()
+        for (labels, frames, _), count in self.samples.items():
+            stacks[";".join(labels + frames)] += count
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+
+    def _seconds(self, samples: int) -> float:
+        # Sampling drifts from the nominal interval: scale counts to the measured duration
+        total = sum(self.samples.values())
+        return self.elapsed * samples / total if total else 0.0
+
+    def summary(self, top: int = 10) -> str:
+        """Time per category, then the top entries by where the time was spent."""
+        total = sum(self.samples.values())
+        if not total:
+            return "Profile: no samples"
+        by_category = Counter()
+        by_site = Counter()
+        for (labels, frames, category), count in self.samples.items():
+            by_category[category] += count
+            by_site[(category, self._site(labels, frames))] += count
+
+        lines = [f"Profile: {total} samples over {self.elapsed:.2f}s"]
+        for category in CATEGORIES:
+            count = by_category[category]
+            lines.append(f"  {category:<11}{self._seconds(count):7.2f}s {count / total:6.1%}")
+        lines.append(f"Top {top}:")
+        for (category, site), count in by_site.most_common(top):
+            lines.append(f"  {self._seconds(count):7.2f}s {count / total:6.1%}  {category:<11}{site}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _site(labels: tuple, frames: tuple) -> str:
+        """Innermost frame of our own code, else the step in progress (driver waits), else the leaf."""
+        for frame in reversed(frames):
+            if frame.startswith("src.") and not frame.startswith("src.profiler"):
+                return frame
+        if labels:
+            return labels[-1]
+        return frames[-1] if frames else "?"
+
+    def report(self, path: str):
+        """Write the folded stacks to path and print the summary."""
+        try:
+            self.write(path)
+            print(f"Profile: folded stacks written to {path}")
+        except OSError as e:
+            print(f"Could not write profile to {path}: {e}")
+        print(self.summary())
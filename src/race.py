@@ -0,0 +1,167 @@
+"""
+Racing mode: run Step 1 of the same booking in K independent browser
+contexts at once and continue with whichever lane reaches the train list
+first. The other lanes are cancelled and their contexts closed, so one
+lane's captcha miss no longer costs a full retry cycle.
+
+Usage:
+    RACE_LANES=3 uv run python -m src.main
+"""
+import asyncio
+import time
+
+from . import metrics
+from .async_booking import AsyncBookingAssistant, launch_browser
+from .config import RACE_LANES
+
+
+class Lane:
+    """One racing context: its assistant, task and result."""
+
+    def __init__(self, index: int, assistant: AsyncBookingAssistant):
+        self.index = index
+        self.assistant = assistant
+        self.task = None
+        self.status = "running"  # running -> won | lost | failed | cancelled
+        self.error = None
+        self.elapsed_ms = None  # From race start until Step 2, failure or cancellation
+
+
+class BookingRace:
+    """Race K AsyncBookingAssistants through Step 1 on one browser."""
+
+    def __init__(self, config: dict = None, on_success=None, on_error=None, lanes: int = RACE_LANES,
+                 browser=None):
+        """
+        Initialize BookingRace.
+
+        Args:
+            config: Optional configuration dict. If None, will read from .env via config.py
+            on_success: Optional callback function called on successful booking
+            on_error: Optional callback function called on error, receives error message string
+            lanes: Independent contexts racing through Step 1
+            browser: Optional shared async Browser; one is launched if None
+        """
+        self.config = config
+        self.on_success = on_success
+        self.on_error = on_error
+        self.browser = browser
+        self.lanes = []
+        self.winner = None
+        self._lane_count = max(1, lanes)
+
+    def _new_lane(self, index: int, browser) -> Lane:
+        def lane_error(message):
+            lane.error = message
+
+        lane = Lane(index, AsyncBookingAssistant(config=dict(self.config) if self.config else None,
+                                                 on_error=lane_error, browser=browser))
+        lane.assistant.count_bookings = False  # A lost or failed lane isn't a failed booking
+        return lane
+
+    async def _run_lane(self, lane: Lane, started: float, max_captcha_retries: int) -> bool:
+        try:
+            reached = await lane.assistant.run_until_step2(max_captcha_retries)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            lane.error = str(e)
+            reached = False
+        lane.elapsed_ms = (time.perf_counter() - started) * 1000
+        if not reached:
+            lane.status = "failed"
+        return reached
+
+    async def _cancel(self, lanes: list, started: float):
+        """Cancel the losing lanes and close their contexts."""
+        for lane in lanes:
+            if not lane.task.done():
+                lane.task.cancel()
+        await asyncio.gather(*(lane.task for lane in lanes), return_exceptions=True)
+        for lane in lanes:
+            if lane.task.cancelled():
+                lane.status = "cancelled"
+                lane.elapsed_ms = (time.perf_counter() - started) * 1000
+            elif lane.status == "running":
+                lane.status = "lost"  # Reached Step 2 too, but after the winner
+            try:
+                await lane.assistant.close()
+            except Exception as e:
+                print(f"Closing lane {lane.index} failed: {e}")
+
+    def _report(self, message: str):
+        if self.on_error:
+            self.on_error(message)
+        else:
+            print(f"{message} - stopping")
+
+    async def run(self, max_captcha_retries: int = 5):
+        """
+        Race every lane through Step 1, then finish the booking on the winner.
+
+        Args:
+            max_captcha_retries: Captcha attempts per lane
+        """
+        playwright = None
+        browser = self.browser
+        try:
+            if browser is None:
+                print("Launching browser...")
+                playwright, browser = await launch_browser(self.config or {})
+
+            started = time.perf_counter()
+            self.lanes = [self._new_lane(index, browser) for index in range(1, self._lane_count + 1)]
+            for lane in self.lanes:
+                lane.task = asyncio.ensure_future(self._run_lane(lane, started, max_captcha_retries))
+            print(f"🏁 Racing {len(self.lanes)} lanes through Step 1")
+
+            pending = {lane.task for lane in self.lanes}
+            while pending and self.winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for lane in self.lanes:
+                    if lane.task in done and lane.task.result() and self.winner is None:
+                        lane.status = "won"
+                        self.winner = lane
+
+            await self._cancel([lane for lane in self.lanes if lane is not self.winner], started)
+            print(self.summary())
+
+            if self.winner is None:
+                first_error = next((lane.error for lane in self.lanes if lane.error), "")
+                metrics.BOOKINGS_FAILED.labels(metrics.error_class(first_error)).inc()
+                errors = "; ".join(f"lane {lane.index}: {lane.error}" for lane in self.lanes if lane.error)
+                self._report(f"No lane reached Step 2 ({errors or 'no error reported'})")
+                return
+
+            # Continue on the winning context with the caller's callbacks; its result is the race's
+            assistant = self.winner.assistant
+            assistant.on_success = self.on_success
+            assistant.on_error = self.on_error
+            assistant.count_bookings = True
+            try:
+                await assistant.complete_booking()
+            finally:
+                await assistant.close()
+
+        except Exception as e:
+            metrics.BOOKINGS_FAILED.labels("exception").inc()
+            if self.on_error:
+                self.on_error(str(e))
+            else:
+                print(f"An error occurred: {e}")
+        finally:
+            if playwright is not None:
+                await browser.close()
+                await playwright.stop()
+
+    def summary(self) -> str:
+        """Which lane won and how long each lane took."""
+        lines = []
+        for lane in self.lanes:
+            elapsed = f"{lane.elapsed_ms:.0f} ms" if lane.elapsed_ms is not None else "-"
+            line = f"  lane {lane.index}: {lane.status} after {elapsed}"
+            if lane.error and lane.status != "won":
+                line += f" ({lane.error})"
+            lines.append(line)
+        head = f"🏁 Lane {self.winner.index} won" if self.winner else "🏁 No lane reached Step 2"
+        return "\n".join([head] + lines)
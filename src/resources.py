@@ -0,0 +1,139 @@
+import re
+
+# Static assets the booking flow never needs (the captcha is served by a
+# Wicket resource URL without a file extension, so it isn't matched here)
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "bmp")
+FONT_EXTENSIONS = ("woff", "woff2", "ttf", "otf", "eot")
+MEDIA_EXTENSIONS = ("mp4", "webm", "ogg", "mp3", "wav", "m4a")
+
+# Analytics / ads / social hosts
+TRACKING_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "connect.facebook.net",
+    "clarity.ms",
+    "hotjar.com",
+    "linkedin.com",
+    "twitter.com",
+    "ads-twitter.com",
+    "youtube.com",
+    "ytimg.com",
+)
+
+# Rough transfer size in bytes of one blocked request per Playwright resource
+# type (HTTP Archive medians), used for bytes_saved when there's no size hint:
+# a blocked request never gets a response to measure
+TYPICAL_BYTES = {
+    "image": 12 * 1024,
+    "font": 25 * 1024,
+    "media": 250 * 1024,
+    "script": 30 * 1024,
+    "stylesheet": 10 * 1024,
+    "document": 20 * 1024,
+}
+TYPICAL_BYTES_OTHER = 1024  # Beacons, pings and tracking XHRs
+
+# Never block anything that looks like the captcha image
+CAPTCHA_URL_PATTERN = re.compile(r"captcha", re.IGNORECASE)
+
+
+class ResourcePolicy:
+    """
+    Abort requests for images (except the captcha), fonts, media and known
+    tracking domains via context.route, and count what was blocked.
+    """
+
+    def __init__(self, block_images: bool = True, block_fonts: bool = True,
+                 block_media: bool = True, block_tracking: bool = True,
+                 size_hints: dict = None):
+        """
+        Initialize ResourcePolicy.
+
+        Args:
+            block_images: Block image files (the captcha is always allowed)
+            block_fonts: Block web fonts
+            block_media: Block audio/video
+            block_tracking: Block requests to TRACKING_DOMAINS
+            size_hints: Optional URL -> response size in bytes (e.g. from a HAR)
+                for bytes_saved; other URLs count TYPICAL_BYTES for their type
+        """
+        extensions = []
+        if block_images:
+            extensions += IMAGE_EXTENSIONS
+        if block_fonts:
+            extensions += FONT_EXTENSIONS
+        if block_media:
+            extensions += MEDIA_EXTENSIONS
+
+        alternatives = []
+        if extensions:
+            alternatives.append(r"^[^?#]*\.(?:" + "|".join(extensions) + r")(?:[?#].*)?$")
+        if block_tracking:
+            domains = "|".join(re.escape(domain) for domain in TRACKING_DOMAINS)
+            alternatives.append(r"^[a-z]+://(?:[^/?#]*\.)?(?:" + domains + r")(?::\d+)?(?:[/?#]|$)")
+
+        # Only matching URLs are routed through Python; everything else stays in the browser
+        self.pattern = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+        self.size_hints = size_hints or {}
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self.bytes_saved = 0
+
+    def should_block(self, url: str) -> bool:
+        """Check whether a URL is blocked by this policy."""
+        if self.pattern is None or CAPTCHA_URL_PATTERN.search(url):
+            return False
+        return bool(self.pattern.search(url))
+
+    def install(self, context):
+        """Register the policy on a browser context (applies to all its pages)."""
+        if self.pattern is not None:
+            context.route(self.pattern, self._handle_route)
+
+    async def install_async(self, context):
+        """install() for a playwright.async_api context."""
+        if self.pattern is not None:
+            await context.route(self.pattern, self._handle_route_async)
+
+    def _handle_route(self, route):
+        """Abort a matched request and update counters."""
+        request = route.request
+        if CAPTCHA_URL_PATTERN.search(request.url):
+            route.fallback()
+            return
+
+        route.abort("blockedbyclient")
+        self._count_blocked(request)
+
+    async def _handle_route_async(self, route):
+        request = route.request
+        if CAPTCHA_URL_PATTERN.search(request.url):
+            await route.fallback()
+            return
+
+        await route.abort("blockedbyclient")
+        self._count_blocked(request)
+
+    def _count_blocked(self, request):
+        self.blocked_requests += 1
+        resource_type = request.resource_type
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        size = self.size_hints.get(request.url)
+        if size is None:
+            size = TYPICAL_BYTES.get(resource_type, TYPICAL_BYTES_OTHER)
+        self.bytes_saved += size
+
+    def summary(self) -> str:
+        """One-line description of what was blocked."""
+        if not self.blocked_requests:
+            return "Resource policy blocked no requests"
+        by_type = ", ".join(f"{kind}={count}" for kind, count in sorted(self.blocked_by_type.items()))
+        text = f"Resource policy blocked {self.blocked_requests} requests ({by_type})"
+        if self.bytes_saved:
+            text += f", ~{self.bytes_saved / 1024:.0f} KiB saved"
+        return text
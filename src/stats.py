@@ -0,0 +1,28 @@
+# Small statistics helpers for latency reporting
+
+
+def percentile(values, pct: float) -> float:
+    """
+    Percentile with linear interpolation between closest ranks.
+
+    :param values: Iterable of numbers
+    :param pct: Percentile in [0, 100]
+    :return: The percentile, or 0.0 for an empty input
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize_ms(values) -> str:
+    """Format latencies (ms) as 'p50 / p95 / max' for reports."""
+    values = list(values)
+    return (
+        f"p50 {percentile(values, 50):.1f} ms / "
+        f"p95 {percentile(values, 95):.1f} ms / "
+        f"max {max(values, default=0):.1f} ms"
+    )
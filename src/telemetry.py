@@ -0,0 +1,364 @@
+"""
+OpenTelemetry spans for the booking flow (optional, needs opentelemetry-sdk).
+Every run() is one trace:
+
+    booking                         stations, date, time slot, train code; "trigger" event
+    ├── stage launch
+    │   └── start
+    ├── stage prefill
+    │   ├── open_booking_page       + "navigation" event (performance.timing)
+    │   └── fill_booking_form
+    ├── captcha_attempt             attempt number, outcome, #feedMSG text
+    │   └── stage submit
+    │       ├── get_captcha_image
+    │       ├── ocr
+    │       └── submit_form         + "navigation" event
+    ├── select_first_train          train code
+    └── ...
+
+Spans go to a local exporter, so traces can be inspected offline:
+OTEL_EXPORT=console prints them, any other value is a file that gets one
+OTLP/JSON ExportTraceServiceRequest per line (the format OTLP-aware viewers
+and the collector's file receiver read).
+"""
+import inspect
+import json
+import threading
+
+from .booking import Outcome
+from .instrumentation import STEPS, result_field
+from .metrics import error_class, step_name
+
+try:
+    from opentelemetry import context as otel_context, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+    )
+except ImportError:
+    trace = None
+    SpanExporter = object
+
+# performance.timing of the page's current document, in ms since navigationStart
+NAVIGATION_TIMING_JS = """
+() => {
+    const t = performance.timing;
+    const since = (mark) => t[mark] > 0 ? t[mark] - t.navigationStart : null;
+    return {
+        url: location.href,
+        dns_ms: t.domainLookupEnd - t.domainLookupStart,
+        connect_ms: t.connectEnd - t.connectStart,
+        ttfb_ms: since("responseStart"),
+        response_end_ms: since("responseEnd"),
+        dom_interactive_ms: since("domInteractive"),
+        dom_content_loaded_ms: since("domContentLoadedEventEnd"),
+        load_ms: since("loadEventEnd"),
+    };
+}
+"""
+
+# Steps that navigate: their span gets the new document's timings
+NAVIGATION_STEPS = ("open_booking_page", "submit_form", "confirm_train_selection", "confirm_booking")
+
+# Booking config -> root span attribute
+CONFIG_ATTRIBUTES = {
+    "start_station": "hsr.start_station",
+    "end_station": "hsr.end_station",
+    "travel_date": "hsr.travel_date",
+    "travel_time": "hsr.travel_time",
+    "car_type": "hsr.car_type",
+    "trigger_time": "hsr.trigger_time",
+}
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in (attributes or {}).items()]
+
+
+def otlp_json(spans) -> dict:
+    """Finished SDK spans as an OTLP/JSON ExportTraceServiceRequest (one resource and scope per group)."""
+    groups = {}
+    for span in spans:
+        key = (id(span.resource), span.instrumentation_scope.name if span.instrumentation_scope else "")
+        groups.setdefault(key, []).append(span)
+
+    resource_spans = {}
+    for (resource_id, scope_name), group in groups.items():
+        resource = group[0].resource
+        entry = resource_spans.setdefault(resource_id, {
+            "resource": {"attributes": _otlp_attributes(resource.attributes if resource else {})},
+            "scopeSpans": [],
+        })
+        entry["scopeSpans"].append({
+            "scope": {"name": scope_name},
+            "spans": [_otlp_span(span) for span in group],
+        })
+    return {"resourceSpans": list(resource_spans.values())}
+
+
+def _otlp_span(span) -> dict:
+    context = span.context
+    encoded = {
+        "traceId": f"{context.trace_id:032x}",
+        "spanId": f"{context.span_id:016x}",
+        "name": span.name,
+        "kind": span.kind.value + 1,  # SDK INTERNAL=0 -> OTLP SPAN_KIND_INTERNAL=1
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano": str(span.end_time),
+        "attributes": _otlp_attributes(span.attributes),
+        "events": [
+            {"timeUnixNano": str(event.timestamp), "name": event.name,
+             "attributes": _otlp_attributes(event.attributes)}
+            for event in span.events
+        ],
+        "status": {"code": span.status.status_code.value},
+    }
+    if span.parent is not None:
+        encoded["parentSpanId"] = f"{span.parent.span_id:016x}"
+    if span.status.description:
+        encoded["status"]["message"] = span.status.description
+    return encoded
+
+
+class OtlpJsonFileExporter(SpanExporter):
+    """Append each exported batch to a file as one line of OTLP/JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        line = json.dumps(otlp_json(spans), ensure_ascii=False)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Could not write spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+class BookingTelemetry:
+    """A tracer provider with a local exporter, and the span wrappers for assistants."""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, export: str, exporter=None):
+        """
+        Set up a tracer provider (not the global one) exporting in the background.
+
+        Args:
+            export: "console", or a file path for OTLP/JSON lines
+            exporter: Optional SpanExporter to use instead (tests)
+        :raises ValueError: opentelemetry-sdk is not installed
+        """
+        if trace is None:
+            raise ValueError("OTEL_EXPORT needs the OpenTelemetry SDK: uv pip install opentelemetry-sdk")
+        if exporter is None:
+            exporter = ConsoleSpanExporter() if export == "console" else OtlpJsonFileExporter(export)
+        self.export = export
+        self.provider = TracerProvider(resource=Resource.create({"service.name": "hsr-booking"}))
+        self.provider.add_span_processor(BatchSpanProcessor(exporter))
+        self.tracer = self.provider.get_tracer("hsr-booking")
+
+    @classmethod
+    def shared(cls, export: str):
+        """The process-wide telemetry for export (one provider, so concurrent jobs share the exporter)."""
+        with cls._shared_lock:
+            if cls._shared is None or cls._shared.export != export:
+                cls._shared = cls(export)
+            return cls._shared
+
+    def flush(self):
+        self.provider.force_flush()
+
+    def instrument(self, assistant):
+        """Wrap run(), its stages, captcha attempts and steps of one assistant instance in spans."""
+        state = {"root": None, "attempt": None}
+        tracer = self.tracer
+
+        def span(name: str, attributes: dict = None):
+            # Executor threads (async OCR, preload) don't inherit the context: parent them explicitly
+            parent = None
+            if not trace.get_current_span().get_span_context().is_valid:
+                current = state["attempt"][0] if state["attempt"] else state["root"]
+                if current is not None:
+                    parent = trace.set_span_in_context(current)
+            return tracer.start_as_current_span(name, context=parent, attributes=attributes)
+
+        def annotate(current, step: str, result, timing):
+            value = result_field(result)
+            if value is not None:
+                current.set_attribute("hsr.result", value)
+            if timing:
+                current.add_event("navigation", {key: value for key, value in timing.items() if value is not None})
+            if step == "select_first_train" and assistant.selected_train:
+                code, departure, arrival = assistant.selected_train
+                for target in (current, state["root"]):
+                    if target is not None:
+                        target.set_attributes({"hsr.train_code": code or "", "hsr.departure": departure or "",
+                                               "hsr.arrival": arrival or ""})
+
+        def wrap_step(method: str, step: str):
+            func = getattr(assistant, method, None)
+            if func is None:
+                return
+            if inspect.iscoroutinefunction(func):
+                async def traced(*args, **kwargs):
+                    with span(step) as current:
+                        result = await func(*args, **kwargs)
+                        timing = None
+                        if step in NAVIGATION_STEPS:
+                            try:
+                                timing = await assistant.page.evaluate(NAVIGATION_TIMING_JS)
+                            except Exception:
+                                pass  # Page gone; the span still has its duration
+                        annotate(current, step, result, timing)
+                        return result
+            else:
+                def traced(*args, **kwargs):
+                    with span(step) as current:
+                        result = func(*args, **kwargs)
+                        timing = None
+                        if step in NAVIGATION_STEPS:
+                            try:
+                                timing = assistant.page.evaluate(NAVIGATION_TIMING_JS)
+                            except Exception:
+                                pass  # Page gone; the span still has its duration
+                        annotate(current, step, result, timing)
+                        return result
+            traced.__wrapped__ = func
+            setattr(assistant, method, traced)
+
+        def close_attempt():
+            if state["attempt"] is not None:
+                span, token = state["attempt"]
+                state["attempt"] = None
+                span.end()
+                otel_context.detach(token)
+
+        def root_span():
+            root = tracer.start_span("booking", attributes={
+                attribute: str(assistant.config[key])
+                for key, attribute in CONFIG_ATTRIBUTES.items() if assistant.config.get(key)
+            })
+            state["root"] = root
+            return trace.use_span(root, end_on_exit=True)
+
+        def finish_root():
+            close_attempt()  # Left open by an exception mid-attempt
+            state["root"].set_attribute("hsr.attempts", assistant.attempt)
+            state["root"] = None
+
+        run = assistant.run
+        if inspect.iscoroutinefunction(run):
+            async def traced_run(*args, **kwargs):
+                try:
+                    with root_span():
+                        try:
+                            return await run(*args, **kwargs)
+                        finally:
+                            finish_root()
+                finally:
+                    self.flush()
+        else:
+            def traced_run(*args, **kwargs):
+                try:
+                    with root_span():
+                        try:
+                            return run(*args, **kwargs)
+                        finally:
+                            finish_root()
+                finally:
+                    self.flush()
+        assistant.run = traced_run
+
+        run_stage = assistant._run_stage
+
+        def traced_stage(name: str, func):
+            def run_in_span():
+                with span(f"stage {step_name(name)}", {"hsr.stage": name}):
+                    return func()
+            return run_stage(name, run_in_span)
+
+        assistant._run_stage = traced_stage
+        run_stage_async = getattr(assistant, "_run_stage_async", None)
+        if run_stage_async is not None:
+            def traced_stage_async(name: str, coro_func):
+                async def run_in_span():
+                    with span(f"stage {step_name(name)}", {"hsr.stage": name}):
+                        return await coro_func()
+                return run_stage_async(name, run_in_span)
+
+            assistant._run_stage_async = traced_stage_async
+
+        begin_attempt, end_attempt = assistant._begin_attempt, assistant._end_attempt
+
+        def traced_begin_attempt(attempt: int):
+            close_attempt()
+            begin_attempt(attempt)
+            current = tracer.start_span("captcha_attempt", attributes={"hsr.attempt": attempt})
+            state["attempt"] = (current, otel_context.attach(trace.set_span_in_context(current)))
+
+        def traced_end_attempt(outcome: Outcome, error: str = ""):
+            end_attempt(outcome, error)
+            if state["attempt"] is not None:
+                current = state["attempt"][0]
+                current.set_attribute("hsr.outcome", outcome.value)
+                if error:
+                    current.set_attribute("hsr.feed_msg", error)
+            close_attempt()
+
+        assistant._begin_attempt = traced_begin_attempt
+        assistant._end_attempt = traced_end_attempt
+
+        fail = assistant._fail
+
+        def traced_fail(error_msg: str, cli_message: str = None):
+            if state["root"] is not None:
+                state["root"].set_attribute("hsr.error_class", error_class(error_msg))
+                state["root"].set_status(trace.Status(trace.StatusCode.ERROR, error_msg))
+            fail(error_msg, cli_message)
+
+        assistant._fail = traced_fail
+
+        pre_trigger = assistant._run_pre_trigger_stages
+
+        def mark_trigger(page_ready):
+            if state["root"] is not None:
+                attributes = {"hsr.page_ready": bool(page_ready)}
+                if assistant.trigger_error_ms is not None:
+                    attributes["hsr.trigger_error_ms"] = assistant.trigger_error_ms
+                state["root"].add_event("trigger", attributes)
+            return page_ready
+
+        if inspect.iscoroutinefunction(pre_trigger):
+            async def traced_pre_trigger(time_str: str):
+                return mark_trigger(await pre_trigger(time_str))
+        else:
+            def traced_pre_trigger(time_str: str):
+                return mark_trigger(pre_trigger(time_str))
+        assistant._run_pre_trigger_stages = traced_pre_trigger
+
+        for method, step in STEPS.items():
+            wrap_step(method, step)
@@ -0,0 +1,233 @@
+"""
+Local stand-in for the HSR booking site (Steps 1-3 and the result page),
+close enough to the real Wicket markup for the HTTP engine tests.
+"""
+import gzip
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from src.config import STATIONS, TIME_VALUES
+
+TICKET_SUFFIXES = ["F", "H", "W", "E", "P"]
+
+STEP1_ACTION = "/IMINT/;jsessionid={session}?wicket:interface=:0:BookingS1Form::IFormSubmitListener::"
+STEP2_ACTION = "/IMINT/?wicket:interface=:1:BookingS2Form::IFormSubmitListener::"
+STEP3_ACTION = "/IMINT/?wicket:interface=:2:BookingS3Form::IFormSubmitListener::"
+CAPTCHA_PATH = "/IMINT/?wicket:interface=:0:BookingS1Form:homeCaptcha:passCode::IResourceListener&random={n}"
+
+
+def options(values, selected=None) -> str:
+    html = ""
+    for value, label in values:
+        selected_attr = ' selected="selected"' if value == selected else ""
+        html += f'<option value="{value}"{selected_attr}>{label}</option>'
+    return html
+
+
+def step1_page(session: str, captcha_n: int, error: str = "") -> str:
+    stations = list(STATIONS.items())
+    times = [(value, label) for label, value in TIME_VALUES.items()]
+    tickets = "".join(
+        f'<select name="ticketPanel:rows:{row}:ticketAmount">'
+        + options([(f"{n}{suffix}", str(n)) for n in range(11)], "1F" if row == 0 else f"0{suffix}")
+        + "</select>"
+        for row, suffix in enumerate(TICKET_SUFFIXES)
+    )
+    return f"""<!DOCTYPE html>
+<html><head><title>台灣高鐵 網路訂票</title>
+<script>var tpl = "<form id='fake'><input name='x'></form>";</script></head>
+<body>
+<div id="cookieAccpetBtn">OK</div>
+<form id="BookingS1Form" method="post" action="{STEP1_ACTION.format(session=session)}">
+<div><input type="hidden" name="BookingS1Form:hf:0" id="BookingS1Form_hf_0"/></div>
+<select name="tripCon:typesoftrip">{options([("0", "單程"), ("1", "去回")], "0")}</select>
+<select name="selectStartStation">{options(stations, "1")}</select>
+<select name="selectDestinationStation">{options(stations, "1")}</select>
+<select name="trainCon:trainRadioGroup">{options([("0", "標準"), ("1", "商務")], "0")}</select>
+<select name="seatCon:seatRadioGroup">{options([("0", "無"), ("1", "靠窗"), ("2", "走道")], "0")}</select>
+<input type="radio" name="bookingMethod" value="radio31" checked="checked"/>
+<input type="radio" name="bookingMethod" value="radio33"/>
+<input type="text" name="toTimeInputField" id="toTimeInputField" value="2024/01/01" readonly>
+<select name="toTimeTable"><option value="">--</option>{options(times)}</select>
+{tickets}
+<img id="BookingS1Form_homeCaptcha_passCode" src="{CAPTCHA_PATH.format(n=captcha_n)}" alt="captcha"/>
+<a id="BookingS1Form_homeCaptcha_reCodeLink" href="#" onclick="var img = document.getElementById('BookingS1Form_homeCaptcha_passCode'); img.src = img.src.split('&random=')[0] + '&random=' + Date.now(); return false;">重新產生</a>
+<input type="text" name="homeCaptcha:securityCode" id="securityCode" value="">
+<input type="submit" name="SubmitButton" id="SubmitButton" value="開始查詢"/>
+</form>
+<div id="feedMSG"><span class="error">{error}</span></div>
+</body></html>"""
+
+
+def step2_page(trains) -> str:
+    radios = "".join(
+        f'<label><input type="radio" name="TrainQueryDataViewPanel:TrainGroup" value="radio{i}" '
+        f'QueryCode="{code}" QueryDeparture="{dep}" QueryArrival="{arr}"{" checked" if i == 0 else ""}>'
+        f'{code} {dep}-{arr}</label>'
+        for i, (code, dep, arr) in enumerate(trains)
+    )
+    return f"""<html><head><title>台灣高鐵 選擇車次</title></head><body>
+<form id="BookingS2Form" method="post" action="{STEP2_ACTION}">
+<div class="result-listing">{radios}</div>
+<input type="submit" name="SubmitButton" value="確認車次">
+</form></body></html>"""
+
+
+def step3_page(error: str = "") -> str:
+    return f"""<html><head><title>台灣高鐵 取票資訊</title></head><body>
+<form id="BookingS3FormSP" method="post" action="{STEP3_ACTION}">
+<input type="radio" id="idInputRadio" name="idInputRadio" value="0" checked>
+<input type="text" id="idNumber" name="dummyId" value="">
+<input type="text" id="mobilePhone" name="dummyPhone" value="">
+<input type="text" id="email" name="email" value="">
+<input type="checkbox" name="agree" value="on">
+<input type="submit" id="isSubmit" name="isSubmit" value="完成訂位">
+</form>
+<div id="feedMSG">{error}</div>
+</body></html>"""
+
+
+def result_page(pnr: str) -> str:
+    return f"""<html><head><title>台灣高鐵 訂位完成</title></head><body>
+<form id="BookingS4Form"><p>訂位代號 <span id="pnr">{pnr}</span></p></form>
+</body></html>"""
+
+
+class HsrStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; don't let Nagle delay the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _session(self):
+        cookie = self.headers.get("Cookie", "")
+        for part in cookie.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "JSESSIONID" and value in self.server.sessions:
+                return value
+        return None
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "text/html; charset=utf-8",
+              headers: dict = None):
+        if body and "gzip" in self.headers.get("Accept-Encoding", "") and content_type.startswith("text/"):
+            body = gzip.compress(body)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _html(self, html: str, headers: dict = None):
+        self._send(200, html.encode("utf-8"), headers=headers)
+
+    def _redirect(self, location: str):
+        self._send(302, headers={"Location": location})
+
+    def do_GET(self):
+        server = self.server
+        server.log.append(("GET", self.path, None))
+        path, query = urlsplit(self.path)[2:4]
+        if not path.startswith("/IMINT/"):
+            self._send(404)
+            return
+
+        if "IResourceListener" in query:
+            session = self._session()
+            if session is None:
+                self._send(404)
+                return
+            n = server.sessions[session]["captcha_n"]
+            self._send(200, server.captcha_image(n) if server.captcha_image else f"PNG-{n}".encode(), "image/png")
+            return
+
+        if "wicket:interface=:1::" in query:
+            self._html(step2_page(server.trains))
+            return
+        if "wicket:interface=:2::" in query:
+            self._html(step3_page())
+            return
+
+        session = uuid.uuid4().hex
+        server.sessions[session] = {"captcha_n": 1}
+        self._html(step1_page(session, 1),
+                   headers={"Set-Cookie": f"JSESSIONID={session}; Path=/IMINT/; HttpOnly"})
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode("utf-8"),
+                                                             keep_blank_values=True).items()}
+        server.log.append(("POST", self.path, form))
+
+        session = self._session()
+        if session is None:
+            self._html(step1_page("expired", 0, "您的連線已逾時"))
+            return
+        state = server.sessions[session]
+
+        if "BookingS1Form" in self.path:
+            time.sleep(server.submit_delay)
+            state["step1"] = form
+            if form.get("homeCaptcha:securityCode") != server.captcha_code:
+                state["captcha_n"] += 1
+                self._html(step1_page(session, state["captcha_n"], "檢測碼輸入錯誤，請確認後重新輸入"))
+            elif form.get("selectStartStation") == form.get("selectDestinationStation"):
+                self._html(step1_page(session, state["captcha_n"], "起程站與到達站不可相同"))
+            elif not server.trains:
+                self._html(step1_page(session, state["captcha_n"], "去程查無可售車次或選購的車票已售完"))
+            else:
+                self._redirect("/IMINT/?wicket:interface=:1::")
+        elif "BookingS2Form" in self.path:
+            state["step2"] = form
+            self._redirect("/IMINT/?wicket:interface=:2::")
+        elif "BookingS3Form" in self.path:
+            state["step3"] = form
+            if form.get("agree") != "on" or not form.get("dummyId"):
+                self._html(step3_page("請確認乘客資料並勾選同意"))
+            else:
+                self._html(result_page("08123456"))
+        else:
+            self._send(404)
+
+
+class HsrStubServer(ThreadingHTTPServer):
+    """Run with start(); booking base URL is .url."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), HsrStubHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.sessions = {}
+        self.log = []  # (method, path, form)
+        self.captcha_code = "ABCD"
+        self.captcha_image = None  # n -> image bytes; None serves a b"PNG-<n>" placeholder
+        self.submit_delay = 0.0  # Seconds before answering a Step 1 submit (server round trip)
+        self.trains = [("0603", "08:16", "09:45"), ("0605", "08:46", "10:15")]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/IMINT/"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
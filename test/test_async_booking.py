@@ -0,0 +1,347 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from src.async_booking import AsyncBookingAssistant
+from src.booking import FILL_FORM_JS, Outcome
+from src.captcha import CaptchaResult
+from src.dataset import CaptchaDataset
+from src.config import Selectors
+
+
+def make_page():
+    """Async Playwright page stand-in: page methods are coroutines, locator() is not."""
+    page = MagicMock()
+    for name in ("goto", "evaluate", "fill", "click", "select_option", "wait_for_function",
+                 "wait_for_selector", "wait_for_load_state"):
+        setattr(page, name, AsyncMock())
+    locator = MagicMock()
+    for name in ("is_visible", "click", "inner_text", "is_checked", "count", "screenshot", "get_attribute"):
+        setattr(locator, name, AsyncMock())
+    locator.first = locator
+    page.locator.return_value = locator
+    return page
+
+
+def make_browser(page):
+    """Async Browser stand-in whose contexts all open the given page."""
+    context = MagicMock(route=AsyncMock(), close=AsyncMock(), new_page=AsyncMock(return_value=page))
+    return MagicMock(new_context=AsyncMock(return_value=context), close=AsyncMock())
+
+
+class TestAsyncBookingAssistant:
+    """Test cases for AsyncBookingAssistant class."""
+
+    @pytest.fixture
+    def assistant(self):
+        """AsyncBookingAssistant on a shared mocked browser, with a mocked solver."""
+        page = make_page()
+        assistant = AsyncBookingAssistant(browser=make_browser(page))
+        assistant.solver = Mock()
+        assistant.test_page = page
+        return assistant
+
+    def test_init(self):
+        """Test the assistant owns its browser unless one is passed in."""
+        assert AsyncBookingAssistant()._owns_browser is True
+        assert AsyncBookingAssistant(browser=Mock())._owns_browser is False
+
+    def test_start_shared_browser(self, assistant):
+        """Test a shared browser only gets a new context (with the resource policy) and page."""
+        assistant.config["block_resources"] = True
+
+        asyncio.run(assistant.start())
+
+        assistant.browser.new_context.assert_awaited_once()
+        assistant.context.route.assert_awaited_once()
+        assert assistant.page is assistant.test_page
+        assistant.page.on.assert_called_once_with("response", assistant._remember_image_response)
+
+    def test_start_launches_browser(self):
+        """Test a browser is launched with async_playwright when none is shared."""
+        page = make_page()
+        browser = make_browser(page)
+        playwright = MagicMock()
+        playwright.chromium.launch = AsyncMock(return_value=browser)
+        assistant = AsyncBookingAssistant()
+        assistant.config["block_resources"] = False
+
+        with patch("playwright.async_api.async_playwright") as mock_async_playwright:
+            mock_async_playwright.return_value.start = AsyncMock(return_value=playwright)
+            asyncio.run(assistant.start())
+
+        playwright.chromium.launch.assert_awaited_once()
+        assert assistant.browser is browser
+        assert assistant.page is page
+
+    def test_close_shared_browser(self, assistant):
+        """Test closing leaves a shared browser running and only closes the context."""
+        asyncio.run(assistant.start())
+
+        asyncio.run(assistant.close())
+
+        assistant.context.close.assert_awaited_once()
+        assistant.browser.close.assert_not_awaited()
+
+    def test_close_exports_trace(self, tmp_path, capsys):
+        """Test close() writes the trace events and attempt summary like the sync version."""
+        path = tmp_path / "trace.jsonl"
+        assistant = AsyncBookingAssistant(config={"trace_file": str(path)}, browser=AsyncMock())
+        assistant.tracer.record("submit_form", assistant.tracer._origin_ns, 1, "ok")
+        assistant.attempt_timings = [800.0, 700.0]
+
+        asyncio.run(assistant.close())
+
+        assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+        out = capsys.readouterr().out
+        assert "Trace: 1 events written" in out
+        assert "Captcha attempts: 2" in out
+
+    def test_pre_trigger_stages_scheduled(self, assistant, capsys):
+        """Test preload, launch, clock resync and prefill run on the sync schedule, then the trigger fires precisely."""
+        from datetime import datetime, timedelta
+        from src.clock import ServerClock
+
+        trigger = datetime.now() + timedelta(seconds=0.3)
+        assistant.config.update({"prewarm_seconds": 0.2, "prefill_seconds": 0.1, "preload_seconds": 0.05,
+                                 "clock_sync": False})
+        assistant.clock = ServerClock()
+        order = []
+        with patch.object(assistant, '_parse_trigger_time', return_value=trigger), \
+             patch.object(assistant, '_preload', lambda: order.append("preload")), \
+             patch.object(assistant, '_sync_clock', lambda: order.append("resync")), \
+             patch.object(assistant, '_stage_prefill', AsyncMock(side_effect=lambda: order.append("prefill") or True)):
+
+            assert asyncio.run(assistant._run_pre_trigger_stages("ignored")) is True
+
+        assert order == ["preload", "resync", "prefill"]
+        assert datetime.now() >= trigger
+        assert 0 <= assistant.trigger_error_ms < 5
+        assert "firing error" in capsys.readouterr().out
+
+    def test_close_owned_browser(self):
+        """Test closing stops the browser and Playwright it launched."""
+        assistant = AsyncBookingAssistant()
+        assistant.browser = MagicMock(close=AsyncMock())
+        assistant.playwright = MagicMock(stop=AsyncMock())
+
+        asyncio.run(assistant.close())
+
+        assistant.browser.close.assert_awaited_once()
+        assistant.playwright.stop.assert_awaited_once()
+
+    def test_fill_booking_form_batched(self, assistant, capsys):
+        """Test the batched fill is one evaluate when every field is set."""
+        assistant.page = assistant.test_page
+        fields = assistant._booking_form_fields()
+        assistant.page.evaluate.return_value = [
+            f"{field['count']}{field['suffix']}" if "count" in field else field["value"] for field in fields
+        ]
+
+        asyncio.run(assistant.fill_booking_form())
+
+        assistant.page.evaluate.assert_awaited_once_with(FILL_FORM_JS, fields)
+        assistant.page.select_option.assert_not_awaited()
+        assert "Form filled successfully!" in capsys.readouterr().out
+
+    def test_fill_booking_form_batched_error_falls_back(self, assistant, capsys):
+        """Test a failed batched fill falls back to per-field calls for required fields, with progress lines."""
+        assistant.page = assistant.test_page
+        assistant.config.update(start_station="2", end_station="12", travel_date="", travel_time="")
+        assistant.page.evaluate.side_effect = Exception("boom")
+
+        asyncio.run(assistant.fill_booking_form())
+
+        selectors = [call.args[0] for call in assistant.page.select_option.await_args_list]
+        assert selectors[:2] == [Selectors.START_STATION, Selectors.END_STATION]
+        out = capsys.readouterr().out
+        assert "Selecting departure station:" in out
+        assert "Setting adult tickets: 1" in out
+
+    def test_solve_and_fill_captcha_in_executor(self, assistant, sample_image_bytes):
+        """Test OCR runs off the event loop thread."""
+        assistant.page = assistant.test_page
+        threads = []
+        assistant.solver.solve_bytes.side_effect = lambda image: threads.append(threading.current_thread()) or "AB12"
+
+        with patch.object(assistant, "get_captcha_image", return_value=sample_image_bytes):
+            result = asyncio.run(assistant.solve_and_fill_captcha())
+
+        assert result == "AB12"
+        assert threads and threads[0] is not threading.main_thread()
+        assistant.page.fill.assert_awaited_once_with(Selectors.CAPTCHA_INPUT, "AB12")
+
+    def test_solve_and_fill_captcha_resolves_implausible(self, assistant, sample_image_bytes):
+        """Test an implausible OCR result refreshes the captcha instead of filling it."""
+        assistant.page = assistant.test_page
+        assistant.solver.solve_bytes.side_effect = ["A", "AB12"]
+
+        with patch.object(assistant, "get_captcha_image", return_value=sample_image_bytes), \
+             patch.object(assistant, "refresh_captcha") as mock_refresh:
+            result = asyncio.run(assistant.solve_and_fill_captcha())
+
+        assert result == "AB12"
+        mock_refresh.assert_awaited_once()
+        assert assistant.submits_avoided == 1
+        assistant.page.fill.assert_awaited_once_with(Selectors.CAPTCHA_INPUT, "AB12")
+
+    def test_solve_and_fill_captcha_uses_refresh_hook(self, assistant, sample_image_bytes):
+        """Test re-solves go through _refresh_captcha_locally, which subclasses override."""
+        assistant.page = assistant.test_page
+        assistant.solver.solve_bytes.side_effect = ["A", "AB12"]
+
+        with patch.object(assistant, "get_captcha_image", return_value=sample_image_bytes), \
+             patch.object(assistant, "_refresh_captcha_locally") as mock_hook:
+            asyncio.run(assistant.solve_and_fill_captcha())
+
+        mock_hook.assert_awaited_once()
+
+    def test_solve_and_fill_captcha_low_confidence(self, assistant, sample_image_bytes):
+        """Test a low-confidence result is refreshed when a minimum confidence is set."""
+        assistant.page = assistant.test_page
+        assistant.config["captcha_min_confidence"] = 0.8
+        assistant.solver.solve_detailed.side_effect = [
+            CaptchaResult("AB12", [0.5, 0.9, 0.9, 0.9]), CaptchaResult("CD34", [0.9, 0.9, 0.9, 0.9]),
+        ]
+
+        with patch.object(assistant, "get_captcha_image", return_value=sample_image_bytes), \
+             patch.object(assistant, "refresh_captcha") as mock_refresh:
+            result = asyncio.run(assistant.solve_and_fill_captcha())
+
+        assert result == "CD34"
+        mock_refresh.assert_awaited_once()
+        assert assistant.submits_avoided == 1
+
+    def test_get_captcha_image_from_network(self, assistant, sample_image_bytes):
+        """Test the captcha bytes come from the captured image response."""
+        assistant.page = assistant.test_page
+        assistant.page.evaluate.return_value = "https://example.com/captcha"
+        assistant._image_responses["https://example.com/captcha"] = MagicMock(
+            ok=True, body=AsyncMock(return_value=sample_image_bytes)
+        )
+
+        assert asyncio.run(assistant.get_captcha_image()) == sample_image_bytes
+        assistant.page.locator.return_value.screenshot.assert_not_awaited()
+
+    def test_probe_outcome(self, assistant):
+        """Test the outcome probe classifies captcha errors."""
+        assistant.page = assistant.test_page
+        assistant.page.evaluate.return_value = {"kind": "error", "text": "檢測碼輸入錯誤"}
+
+        assert asyncio.run(assistant.probe_outcome(Outcome.STEP2)) == (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤")
+
+    def test_select_first_train(self, assistant, capsys):
+        """Test the first train is selected and reported."""
+        assistant.page = assistant.test_page
+        trains = assistant.page.locator.return_value
+        trains.count.return_value = 2
+        trains.is_checked.return_value = False
+        trains.get_attribute.side_effect = ["0603", "08:16", "09:45"]
+
+        assert asyncio.run(assistant.select_first_train()) is True
+        trains.click.assert_awaited_once()
+        assert "Selected train: 0603 (08:16 → 09:45)" in capsys.readouterr().out
+
+    def run_flow(self, assistant, probe_results, **patches):
+        """Run the whole flow with every step mocked; returns the callback results."""
+        results = {"success": 0, "errors": []}
+        assistant.on_success = lambda: results.__setitem__("success", results["success"] + 1)
+        assistant.on_error = results["errors"].append
+        steps = dict(
+            start=None, open_booking_page=True, dismiss_cookie_dialog=None, fill_booking_form=None,
+            solve_and_fill_captcha="AB12", submit_form=None, refresh_captcha=None, select_first_train=True,
+            confirm_train_selection=None, fill_passenger_info=None, confirm_booking=None,
+        )
+        steps.update(patches)
+        mocks = {name: patch.object(assistant, name, return_value=value) for name, value in steps.items()}
+        mocks["probe_outcome"] = patch.object(assistant, "probe_outcome", side_effect=probe_results)
+        started = {name: mock.start() for name, mock in mocks.items()}
+        try:
+            asyncio.run(assistant.run(max_captcha_retries=3))
+        finally:
+            for mock in mocks.values():
+                mock.stop()
+        results["mocks"] = started
+        return results
+
+    def test_run_success(self, assistant):
+        """Test a full run reports success through on_success."""
+        results = self.run_flow(assistant, [(Outcome.STEP2, ""), (Outcome.STEP3, ""), (Outcome.UNKNOWN, "")])
+
+        assert results["success"] == 1
+        assert results["errors"] == []
+        assert {"launch", "prefill", "submit_1"} <= set(assistant.stage_timings)
+
+    def test_run_captcha_retry(self, assistant):
+        """Test a captcha error refreshes and retries."""
+        results = self.run_flow(assistant, [
+            (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤"), (Outcome.STEP2, ""), (Outcome.STEP3, ""), (Outcome.UNKNOWN, ""),
+        ])
+
+        assert results["success"] == 1
+        results["mocks"]["refresh_captcha"].assert_awaited_once()
+        assert results["mocks"]["solve_and_fill_captcha"].await_count == 2
+
+    def test_run_records_captcha_outcomes(self, assistant, tmp_path):
+        """Test the submitted captcha is collected with the server's verdict."""
+        assistant.config["captcha_dataset"] = str(tmp_path)
+        assistant._submitted_captcha = (b"img", "AB12", [0.9, 0.9, 0.9, 0.9])
+
+        self.run_flow(assistant, [(Outcome.STEP2, ""), (Outcome.STEP3, ""), (Outcome.UNKNOWN, "")])
+
+        records = CaptchaDataset(str(tmp_path)).records()
+        assert [(r["guess"], r["accepted"]) for r in records] == [("AB12", True)]
+
+    def test_run_other_error(self, assistant):
+        """Test a non-captcha error stops the run."""
+        results = self.run_flow(assistant, [(Outcome.OTHER_ERROR, "去程查無可售車次")])
+
+        assert results["success"] == 0
+        assert results["errors"] == ["Non-captcha error: 去程查無可售車次"]
+
+    def test_run_on_trigger_after_scheduled_prefill(self, assistant):
+        """Test on_trigger is awaited once the scheduled stages reach the trigger, before the first submit."""
+        order = []
+
+        async def on_trigger():
+            order.append("trigger")
+
+        assistant.on_trigger = on_trigger
+        assistant.config["trigger_time"] = "12:00"
+        with patch.object(assistant, '_run_pre_trigger_stages', AsyncMock(side_effect=lambda _: order.append("wait") or True)):
+            results = self.run_flow(assistant, [(Outcome.STEP2, ""), (Outcome.STEP3, ""), (Outcome.UNKNOWN, "")])
+
+        assert results["success"] == 1
+        assert order == ["wait", "trigger"]
+
+    def test_run_page_load_failure(self, assistant):
+        """Test a page load failure is reported."""
+        results = self.run_flow(assistant, [], open_booking_page=False)
+
+        assert results["errors"] == ["Failed to load page"]
+
+    def test_run_many_on_one_loop(self, sample_image_bytes):
+        """Test several assistants run concurrently on one event loop and browser."""
+        page = make_page()
+        browser = make_browser(page)
+        results = []
+
+        async def run_all():
+            assistants = []
+            for _ in range(5):
+                assistant = AsyncBookingAssistant(browser=browser, on_success=lambda: results.append("ok"),
+                                                  on_error=results.append)
+                assistant.solver = Mock()
+                assistant.probe_outcome = AsyncMock(side_effect=[
+                    (Outcome.STEP2, ""), (Outcome.STEP3, ""), (Outcome.UNKNOWN, ""),
+                ])
+                assistant.get_captcha_image = AsyncMock(return_value=sample_image_bytes)
+                assistant.select_first_train = AsyncMock(return_value=True)
+                assistants.append(assistant)
+            await asyncio.gather(*(assistant.run() for assistant in assistants))
+
+        asyncio.run(run_all())
+
+        assert results == ["ok"] * 5
+        assert browser.new_context.await_count == 5
+        browser.close.assert_not_awaited()
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from src.batch import BatchRunner, coerce_job, fair_order, load_jobs, main
+
+
+def fake_assistant_class(durations: dict = None, errors: dict = None, running: dict = None, waits: dict = None):
+    """AsyncBookingAssistant stand-in: run() waits for its trigger, sleeps, then reports through the callbacks."""
+    durations = durations or {}
+    errors = errors or {}
+    waits = waits or {}
+    instances = []
+
+    class FakeAssistant:
+        def __init__(self, browser=None, on_success=None, on_error=None, on_trigger=None):
+            self.browser = browser
+            self.on_success = on_success
+            self.on_error = on_error
+            self.on_trigger = on_trigger
+            self.triggered_at = None
+            self.config = {"trigger_time": "2099-01-01T00:00"}
+            self.stage_timings = {}
+            self.submits_avoided = 0
+            instances.append(self)
+
+        async def _in_executor(self, func, *args):
+            return func(*args)
+
+        def _preload(self):
+            pass
+
+        async def run(self):
+            key = self.config["passenger_id"]
+            await asyncio.sleep(waits.get(key, 0))
+            self.triggered_at = asyncio.get_running_loop().time()
+            await self.on_trigger()
+            if running is not None:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            try:
+                await asyncio.sleep(durations.get(key, 0.01))
+                self.stage_timings["submit_1"] = 5.0
+                if key in errors:
+                    self.on_error(errors[key])
+                else:
+                    self.on_success()
+            finally:
+                if running is not None:
+                    running["now"] -= 1
+
+    FakeAssistant.instances = instances
+    return FakeAssistant
+
+
+class TestLoadJobs:
+    """Test cases for jobs file loading."""
+
+    def test_csv(self, tmp_path):
+        """Test CSV rows become typed jobs; empty cells are dropped."""
+        path = tmp_path / "jobs.csv"
+        path.write_text("id,passenger_id,travel_date,adult_count,child_count,block_resources\n"
+                        "a,A1,2026/01/20,2,,false\n"
+                        ",B2,2026/01/21,1,1,\n", encoding="utf-8")
+
+        jobs = load_jobs(str(path))
+
+        assert jobs == [
+            {"id": "a", "passenger_id": "A1", "travel_date": "2026/01/20", "adult_count": 2,
+             "block_resources": False},
+            {"id": "job-2", "passenger_id": "B2", "travel_date": "2026/01/21", "adult_count": 1,
+             "child_count": 1},
+        ]
+
+    def test_jsonl(self, tmp_path):
+        """Test JSONL lines are read and numbers become strings where config expects them."""
+        path = tmp_path / "jobs.jsonl"
+        path.write_text('{"passenger_id": "A1", "start_station": 2}\n\n{"passenger_id": "B2"}\n',
+                        encoding="utf-8")
+
+        jobs = load_jobs(str(path))
+
+        assert jobs[0] == {"id": "job-1", "passenger_id": "A1", "start_station": "2"}
+        assert jobs[1]["id"] == "job-2"
+
+    def test_yaml(self, tmp_path):
+        """Test YAML files with a top-level jobs list."""
+        pytest.importorskip("yaml")
+        path = tmp_path / "jobs.yaml"
+        path.write_text("jobs:\n  - passenger_id: A1\n    adult_count: 2\n", encoding="utf-8")
+
+        assert load_jobs(str(path)) == [{"id": "job-1", "passenger_id": "A1", "adult_count": 2}]
+
+    def test_yaml_without_pyyaml(self, tmp_path):
+        """Test a clear error when PyYAML isn't installed."""
+        path = tmp_path / "jobs.yml"
+        path.write_text("- passenger_id: A1\n", encoding="utf-8")
+
+        with patch.dict("sys.modules", {"yaml": None}):
+            with pytest.raises(ValueError, match="PyYAML"):
+                load_jobs(str(path))
+
+    def test_unsupported_type(self, tmp_path):
+        """Test unknown extensions are rejected."""
+        path = tmp_path / "jobs.txt"
+        path.write_text("", encoding="utf-8")
+
+        with pytest.raises(ValueError, match="Unsupported jobs file type"):
+            load_jobs(str(path))
+
+    def test_row_not_mapping(self, tmp_path):
+        """Test a JSONL line that isn't an object is rejected."""
+        path = tmp_path / "jobs.jsonl"
+        path.write_text("[1, 2]\n", encoding="utf-8")
+
+        with pytest.raises(ValueError, match="not a mapping"):
+            load_jobs(str(path))
+
+    def test_coerce_job(self):
+        """Test value conversion."""
+        job = coerce_job({" travel_time ": " 08:00 ", "prefill_seconds": "2.5", "clock_sync": "yes",
+                          "headless": True, None: "extra"})
+
+        assert job == {"travel_time": "08:00", "prefill_seconds": 2.5, "clock_sync": True, "headless": True}
+
+
+class TestFairOrder:
+    """Test cases for fair_order function."""
+
+    def test_round_robin(self):
+        """Test jobs are interleaved by key, keeping order within a group."""
+        jobs = [{"id": "a1", "p": "A"}, {"id": "a2", "p": "A"}, {"id": "a3", "p": "A"},
+                {"id": "b1", "p": "B"}, {"id": "c1", "p": "C"}, {"id": "c2", "p": "C"}]
+
+        ordered = [job["id"] for job in fair_order(jobs, "p")]
+
+        assert ordered == ["a1", "b1", "c1", "a2", "c2", "a3"]
+
+    def test_no_key(self):
+        """Test an empty key keeps file order."""
+        jobs = [{"id": "a"}, {"id": "b"}]
+
+        assert fair_order(jobs, "") == jobs
+
+
+class TestBatchRunner:
+    """Test cases for BatchRunner class."""
+
+    def jobs(self, *passengers):
+        return [{"id": f"job-{i}", "passenger_id": p} for i, p in enumerate(passengers, start=1)]
+
+    def test_run_streams_results(self, tmp_path):
+        """Test every job's result is appended to the output as it finishes."""
+        output = tmp_path / "results.jsonl"
+        fake = fake_assistant_class(durations={"A": 0.05, "B": 0.01}, errors={"C": "No available trains"})
+        runner = BatchRunner(self.jobs("A", "B", "C"), str(output), concurrency=3, job_timeout=5)
+
+        with patch("src.batch.AsyncBookingAssistant", fake):
+            asyncio.run(runner.run(browser=MagicMock()))
+
+        lines = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+        assert [line["id"] for line in lines] == ["job-2", "job-3", "job-1"]  # Completion order
+        assert {line["id"]: line["status"] for line in lines} == {
+            "job-1": "succeeded", "job-2": "succeeded", "job-3": "failed",
+        }
+        assert lines[1]["error"] == "No available trains"
+        assert lines[0]["stage_timings"] == {"submit_1": 5.0}
+
+    def test_run_job_config(self, tmp_path):
+        """Test jobs get their row as config, without the id and with no trigger time."""
+        fake = fake_assistant_class()
+        browser = MagicMock()
+        runner = BatchRunner(self.jobs("A"), str(tmp_path / "out.jsonl"))
+
+        with patch("src.batch.AsyncBookingAssistant", fake):
+            asyncio.run(runner.run(browser=browser))
+
+        job_assistant = fake.instances[-1]
+        assert job_assistant.browser is browser
+        assert job_assistant.config == {"trigger_time": "", "passenger_id": "A"}
+
+    def test_concurrency_bound(self, tmp_path):
+        """Test no more than concurrency jobs run at once."""
+        running = {"now": 0, "max": 0}
+        fake = fake_assistant_class(durations={p: 0.02 for p in "ABCDEF"}, running=running)
+        runner = BatchRunner(self.jobs(*"ABCDEF"), str(tmp_path / "out.jsonl"), concurrency=2)
+
+        with patch("src.batch.AsyncBookingAssistant", fake):
+            asyncio.run(runner.run(browser=MagicMock()))
+
+        assert running["max"] == 2
+        assert len(runner.results) == 6
+
+    def test_timeout(self, tmp_path):
+        """Test a job over its timeout is cancelled and recorded."""
+        fake = fake_assistant_class(durations={"A": 5})
+        runner = BatchRunner(self.jobs("A", "B"), str(tmp_path / "out.jsonl"), job_timeout=0.05)
+
+        with patch("src.batch.AsyncBookingAssistant", fake):
+            asyncio.run(runner.run(browser=MagicMock()))
+
+        statuses = {result["id"]: result["status"] for result in runner.results}
+        assert statuses == {"job-1": "timeout", "job-2": "succeeded"}
+
+    def test_scheduled_jobs_wait_outside_slots_and_timeout(self, tmp_path):
+        """Test jobs whose trigger is further out than the timeout all fire, then share the slots."""
+        running = {"now": 0, "max": 0}
+        passengers = "ABCDEF"
+        fake = fake_assistant_class(durations={p: 0.02 for p in passengers}, running=running,
+                                    waits={p: 0.2 for p in passengers})
+        runner = BatchRunner(self.jobs(*passengers), str(tmp_path / "out.jsonl"), concurrency=2, job_timeout=0.1)
+
+        with patch("src.batch.AsyncBookingAssistant", fake):
+            asyncio.run(runner.run(browser=MagicMock()))
+
+        assert {result["status"] for result in runner.results} == {"succeeded"}
+        assert running["max"] == 2
+        triggered = [instance.triggered_at for instance in fake.instances[1:]]
+        assert max(triggered) - min(triggered) < 0.05  # Nobody queued for a slot before the trigger
+        assert all(result["waited_ms"] >= 200 for result in runner.results)
+        assert all(result["elapsed_ms"] < 100 for result in runner.results)
+
+    def test_summary(self, tmp_path):
+        """Test the summary reports counts, throughput and latency percentiles."""
+        fake = fake_assistant_class(errors={"B": "boom"})
+        runner = BatchRunner(self.jobs("A", "B"), str(tmp_path / "out.jsonl"))
+
+        with patch("src.batch.AsyncBookingAssistant", fake):
+            asyncio.run(runner.run(browser=MagicMock()))
+        summary = runner.summary()
+
+        assert "Batch: 2 jobs in" in summary
+        assert "jobs/min" in summary
+        assert "failed=1, succeeded=1" in summary
+        assert "p50" in summary and "p95" in summary
+
+
+class TestMain:
+    """Test cases for the batch CLI."""
+
+    def test_main(self, tmp_path, capsys):
+        """Test the CLI runs the file and writes results next to it."""
+        jobs_file = tmp_path / "jobs.jsonl"
+        jobs_file.write_text('{"passenger_id": "A"}\n', encoding="utf-8")
+
+        with patch("src.batch.AsyncBookingAssistant", fake_assistant_class()), \
+             patch.object(BatchRunner, "_launch_browser") as mock_launch:
+            playwright, browser = MagicMock(), MagicMock()
+            playwright.stop = MagicMock(side_effect=lambda: asyncio.sleep(0))
+            browser.close = MagicMock(side_effect=lambda: asyncio.sleep(0))
+            mock_launch.return_value = (playwright, browser)
+            result = main([str(jobs_file)])
+
+        assert result == 0
+        assert (tmp_path / "jobs.results.jsonl").exists()
+        assert "Batch: 1 jobs" in capsys.readouterr().out
+
+    def test_main_bad_file(self, tmp_path, capsys):
+        """Test an unreadable jobs file exits with an error."""
+        result = main([str(tmp_path / "missing.csv")])
+
+        assert result == 1
+        assert "Error" in capsys.readouterr().out
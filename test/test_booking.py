@@ -1,6 +1,9 @@
 import pytest
 from unittest.mock import Mock, patch, MagicMock, call
-from src.booking import BookingAssistant
+from src.booking import BookingAssistant, Outcome, is_captcha_error, FILL_FORM_JS
+from src.captcha import CaptchaResult
+from src.dataset import CaptchaDataset
+from src.config import Selectors
 from playwright.sync_api import TimeoutError as PlaywrightTimeout
 
 
@@ -9,9 +12,16 @@ class TestBookingAssistant:
 
     @pytest.fixture
     def assistant(self):
-        """Create a BookingAssistant instance with mocked dependencies."""
-        with patch('src.booking.CaptchaSolver'):
-            return BookingAssistant()
+        """
+        Create a BookingAssistant instance with mocked dependencies.
+
+        Uses the compat wait profile so run() checks Step 2/3 and errors
+        through the individually patchable is_on_step*/check_for_errors.
+        """
+        assistant = BookingAssistant()
+        assistant.solver = Mock()
+        assistant.config["wait_profile"] = "compat"
+        return assistant
 
     @pytest.fixture
     def mock_playwright_env(self):
@@ -39,9 +49,38 @@ class TestBookingAssistant:
         assert assistant.context is None
         assert assistant.page is None
 
+    def test_init_uses_shared_solver(self):
+        """Test every assistant reuses the process-wide OCR solver."""
+        with patch('src.booking.CaptchaSolver') as mock_solver_class:
+            first = BookingAssistant()
+            second = BookingAssistant()
+            mock_solver_class.shared.assert_not_called()  # Not loaded at construction
+
+            assert first.solver is second.solver is mock_solver_class.shared.return_value
+
+        mock_solver_class.assert_not_called()
+
+    def test_close_does_not_load_solver(self, assistant):
+        """Test close doesn't load the OCR model just to report on it."""
+        assistant.solver = None
+
+        with patch('src.booking.CaptchaSolver') as mock_solver_class:
+            assistant.close()
+
+        mock_solver_class.shared.assert_not_called()
+
+    def test_close_prints_ocr_summary(self, assistant, capsys):
+        """Test close reports the OCR model stats."""
+        assistant.solver.summary.return_value = "OCR model loaded in 60 ms, 3 inferences"
+
+        assistant.close()
+
+        captured = capsys.readouterr()
+        assert "OCR model loaded in 60 ms, 3 inferences" in captured.out
+
     def test_start(self, assistant, mock_playwright_env, capsys):
         """Test start method launches browser successfully."""
-        with patch('src.booking.sync_playwright') as mock_sync_playwright:
+        with patch('playwright.sync_api.sync_playwright') as mock_sync_playwright:
             mock_sync_playwright.return_value.start.return_value = mock_playwright_env['playwright']
 
             assistant.start()
@@ -154,6 +193,130 @@ class TestBookingAssistant:
         # When no date/time, evaluate should not be called for date
         # but may still be called for other reasons, so we just check it completed
 
+    def batch_results(self, fields, **overrides):
+        """What FILL_FORM_JS returns when every field takes its value."""
+        results = []
+        for field in fields:
+            if field["name"] in overrides:
+                results.append(overrides[field["name"]])
+            elif "count" in field:
+                results.append(f"{field['count']}{field['suffix']}")
+            else:
+                results.append(field["value"])
+        return results
+
+    def test_booking_form_fields(self, assistant):
+        """Test the Step 1 field list covers trip, car, seat and all five ticket rows."""
+        assistant.config.update({
+            "start_station": "2", "end_station": "12",
+            "travel_date": "2024/03/15", "travel_time": "08:00",
+            "car_type": "1", "seat_preference": "0",
+            "adult_count": 2, "child_count": 1, "disabled_count": 0,
+            "elder_count": 0, "student_count": 0,
+        })
+
+        fields = {field["name"]: field for field in assistant._booking_form_fields()}
+
+        assert list(fields) == [
+            "trip_type", "start_station", "end_station", "car_type", "seat_preference",
+            "travel_date", "travel_time",
+            "adult_count", "child_count", "disabled_count", "elder_count", "student_count",
+        ]
+        assert fields["trip_type"]["selector"] == Selectors.TRIP_TYPE
+        assert fields["travel_time"]["value"] == "800A"
+        assert fields["child_count"] == {
+            "name": "child_count", "selector": Selectors.CHILD_TICKETS,
+            "count": 1, "suffix": "H", "optional": False,
+        }
+        optional = {name for name, field in fields.items() if field.get("optional")}
+        assert optional == {"trip_type", "seat_preference", "disabled_count", "elder_count", "student_count"}
+
+    def test_booking_form_fields_without_date_time(self, assistant):
+        """Test date and time are left out when not configured."""
+        assistant.config["travel_date"] = ""
+        assistant.config["travel_time"] = ""
+
+        names = [field["name"] for field in assistant._booking_form_fields()]
+
+        assert "travel_date" not in names
+        assert "travel_time" not in names
+
+    def test_fill_booking_form_batched(self, assistant, capsys):
+        """Test the batched path sets the whole form in one evaluate call."""
+        assistant.page = Mock()
+        assistant.config["batch_fill"] = True
+        assistant.config["travel_date"] = "2024/03/15"
+        assistant.config["travel_time"] = "08:00"
+        assistant.page.evaluate.side_effect = lambda script, fields: self.batch_results(fields)
+
+        assistant.fill_booking_form()
+
+        assistant.page.evaluate.assert_called_once()
+        assert assistant.page.evaluate.call_args[0][0] == FILL_FORM_JS
+        assistant.page.select_option.assert_not_called()
+        captured = capsys.readouterr()
+        assert "Form filled successfully!" in captured.out
+        assert "filling them one by one" not in captured.out
+
+    def test_fill_booking_form_batched_partial(self, assistant, capsys):
+        """Test only required fields the script couldn't set are filled one by one."""
+        assistant.page = Mock()
+        assistant.config["batch_fill"] = True
+        assistant.config["travel_time"] = "08:00"
+        assistant.config["adult_count"] = 2
+        assistant.page.evaluate.side_effect = lambda script, fields: self.batch_results(
+            fields, travel_time="", seat_preference=None, adult_count="1F")
+
+        with patch('src.booking.TIME_VALUES', {'08:00': '800A'}):
+            assistant.fill_booking_form()
+
+        assert assistant.page.select_option.call_args_list == [
+            call(Selectors.DEPARTURE_TIME, value="800A"),
+            call(Selectors.ADULT_TICKETS, value="2F"),
+        ]
+        captured = capsys.readouterr()
+        assert "Batched fill didn't set travel_time, adult_count" in captured.out
+
+    def test_fill_booking_form_batched_error_falls_back(self, assistant, capsys):
+        """Test a failing script falls back to the per-field path."""
+        assistant.page = Mock()
+        assistant.config["batch_fill"] = True
+        assistant.config["start_station"] = "2"
+        assistant.config["end_station"] = "12"
+        assistant.config["travel_date"] = ""
+        assistant.config["travel_time"] = ""
+        assistant.config["adult_count"] = 1
+        assistant.page.evaluate.side_effect = Exception("Execution context was destroyed")
+
+        assistant.fill_booking_form()
+
+        assert assistant.page.select_option.call_args_list == [
+            call(Selectors.START_STATION, value="2"),
+            call(Selectors.END_STATION, value="12"),
+            call(Selectors.ADULT_TICKETS, value="1F"),
+        ]
+        captured = capsys.readouterr()
+        assert "Batched form fill failed" in captured.out
+
+    def test_fill_booking_form_per_field(self, assistant):
+        """Test batch_fill=false keeps one Playwright call per non-default field."""
+        assistant.page = Mock()
+        assistant.config["batch_fill"] = False
+        assistant.config["travel_date"] = "2024/03/15"
+        assistant.config["travel_time"] = ""
+        assistant.config["car_type"] = "1"
+        assistant.config["elder_count"] = 1
+
+        assistant.fill_booking_form()
+
+        selectors = [c[0][0] for c in assistant.page.select_option.call_args_list]
+        assert selectors == [
+            Selectors.START_STATION, Selectors.END_STATION, Selectors.CAR_TYPE,
+            Selectors.ADULT_TICKETS, Selectors.ELDER_TICKETS,
+        ]
+        assert assistant.page.select_option.call_args_list[-1] == call(Selectors.ELDER_TICKETS, value="1E")
+        assert "#toTimeInputField" in assistant.page.evaluate.call_args[0][0]
+
     def test_get_captcha_image(self, assistant, sample_image_bytes):
         """Test get_captcha_image returns image bytes."""
         assistant.page = Mock()
@@ -166,6 +329,205 @@ class TestBookingAssistant:
         assert result == sample_image_bytes
         mock_captcha.screenshot.assert_called_once()
 
+    def test_get_captcha_image_from_network(self, assistant, sample_image_bytes):
+        """Test get_captcha_image returns the captured response bytes without a screenshot."""
+        assistant.page = Mock()
+        assistant.config["captcha_source"] = "network"
+        captcha_url = "https://irs.thsrc.com.tw/IMINT/?wicket:interface=:0:BookingS1Form:homeCaptcha:passCode"
+        assistant.page.evaluate.return_value = captcha_url
+
+        response = Mock(url=captcha_url, ok=True)
+        response.request.resource_type = "image"
+        response.body.return_value = sample_image_bytes
+        assistant._remember_image_response(response)
+
+        result = assistant.get_captcha_image()
+
+        assert result == sample_image_bytes
+        assistant.page.locator.return_value.screenshot.assert_not_called()
+
+    def test_get_captcha_image_network_fallback(self, assistant, sample_image_bytes, capsys):
+        """Test get_captcha_image falls back to a screenshot when no response was captured."""
+        assistant.page = Mock()
+        assistant.config["captcha_source"] = "network"
+        assistant.page.evaluate.return_value = "https://example.invalid/unseen.png"
+        assistant.page.locator.return_value.screenshot.return_value = sample_image_bytes
+
+        result = assistant.get_captcha_image()
+
+        assert result == sample_image_bytes
+        captured = capsys.readouterr()
+        assert "falling back to screenshot" in captured.out
+
+    def test_get_captcha_image_network_error(self, assistant, sample_image_bytes, capsys):
+        """Test get_captcha_image falls back when reading the response body fails."""
+        assistant.page = Mock()
+        assistant.config["captcha_source"] = "network"
+        assistant.page.evaluate.return_value = "https://example.invalid/captcha"
+
+        response = Mock(url="https://example.invalid/captcha", ok=True)
+        response.request.resource_type = "image"
+        response.body.side_effect = Exception("No resource with given identifier found")
+        assistant._remember_image_response(response)
+        assistant.page.locator.return_value.screenshot.return_value = sample_image_bytes
+
+        assert assistant.get_captcha_image() == sample_image_bytes
+        captured = capsys.readouterr()
+        assert "Network captcha capture failed" in captured.out
+
+    def test_get_captcha_image_screenshot_mode(self, assistant, sample_image_bytes):
+        """Test screenshot mode never looks at captured responses."""
+        assistant.page = Mock()
+        assistant.config["captcha_source"] = "screenshot"
+        assistant.page.locator.return_value.screenshot.return_value = sample_image_bytes
+
+        assert assistant.get_captcha_image() == sample_image_bytes
+        assistant.page.evaluate.assert_not_called()
+
+    def test_remember_image_response_filters_and_bounds(self, assistant):
+        """Test only image responses are kept, and only the most recent 32."""
+        script = Mock(url="https://example.invalid/app.js")
+        script.request.resource_type = "script"
+        assistant._remember_image_response(script)
+        assert assistant._image_responses == {}
+
+        for i in range(40):
+            image = Mock(url=f"https://example.invalid/{i}.png")
+            image.request.resource_type = "image"
+            assistant._remember_image_response(image)
+
+        assert len(assistant._image_responses) == 32
+        assert "https://example.invalid/39.png" in assistant._image_responses
+        assert "https://example.invalid/0.png" not in assistant._image_responses
+
+    def test_start_installs_resource_policy(self, assistant, mock_playwright_env):
+        """Test start routes non-essential resources when block_resources is on."""
+        assistant.config["block_resources"] = True
+
+        with patch('playwright.sync_api.sync_playwright') as mock_sync_playwright:
+            mock_sync_playwright.return_value.start.return_value = mock_playwright_env['playwright']
+            assistant.start()
+
+        assert assistant.resource_policy is not None
+        mock_playwright_env['context'].route.assert_called_once()
+
+    def test_start_without_resource_policy(self, assistant, mock_playwright_env):
+        """Test start loads everything when block_resources is off."""
+        assistant.config["block_resources"] = False
+
+        with patch('playwright.sync_api.sync_playwright') as mock_sync_playwright:
+            mock_sync_playwright.return_value.start.return_value = mock_playwright_env['playwright']
+            assistant.start()
+
+        assert assistant.resource_policy is None
+        mock_playwright_env['context'].route.assert_not_called()
+
+    def test_attach(self, assistant):
+        """Test attach adopts a borrowed page and shares the owner's response cache."""
+        context, page = Mock(), Mock()
+        responses = {}
+
+        assistant.attach(context, page, preloaded=True, image_responses=responses)
+
+        assert assistant.context is context
+        assert assistant.page is page
+        assert assistant.page_preloaded is True
+        assert assistant._image_responses is responses
+        page.on.assert_not_called()
+
+    def test_attach_registers_listener(self, assistant):
+        """Test attach listens for image responses itself when given no cache."""
+        page = Mock()
+
+        assistant.attach(Mock(), page)
+
+        page.on.assert_called_once_with("response", assistant._remember_image_response)
+
+    def test_close_leaves_attached_page_open(self, assistant):
+        """Test close doesn't close a context/page the assistant doesn't own."""
+        context, page = Mock(), Mock()
+        assistant.attach(context, page)
+
+        assistant.close()
+
+        context.close.assert_not_called()
+        page.close.assert_not_called()
+
+    def test_stage_launch_with_attached_page(self, assistant):
+        """Test the launch stage only warms up OCR when a page is attached."""
+        assistant.attach(Mock(), Mock())
+
+        with patch.object(assistant, 'start') as mock_start:
+            assistant._stage_launch()
+
+        mock_start.assert_not_called()
+        assistant.solver.warm_up.assert_called_once()
+
+    def test_stage_launch_overlaps_preload(self, assistant):
+        """Test the launch stage starts the OCR preload before launching the browser."""
+        events = []
+        assistant.solver.warm_up.side_effect = lambda: events.append("warm_up")
+
+        with patch.object(assistant, 'start', side_effect=lambda: events.append("start")), \
+             patch.object(assistant, '_start_preload', wraps=assistant._start_preload) as mock_preload:
+            assistant._stage_launch()
+
+        mock_preload.assert_called_once()
+        assert sorted(events) == ["start", "warm_up"]
+        assert not assistant._preload_thread.is_alive()
+
+    def test_start_preload_once(self, assistant):
+        """Test the background preload runs only once per assistant."""
+        first = assistant._start_preload()
+        second = assistant._start_preload()
+        first.join()
+
+        assert first is second
+        assistant.solver.warm_up.assert_called_once()
+
+    def test_preload_failure(self, assistant, capsys):
+        """Test a failing background preload is reported, not raised."""
+        assistant.solver.warm_up.side_effect = Exception("onnxruntime missing")
+
+        assistant._preload()
+
+        captured = capsys.readouterr()
+        assert "Background preload failed: onnxruntime missing" in captured.out
+
+    def test_stage_prefill_preloaded(self, assistant, capsys):
+        """Test the prefill stage skips navigation on a preloaded page, once."""
+        assistant.attach(Mock(), Mock(), preloaded=True, image_responses={})
+
+        with patch.object(assistant, 'open_booking_page', return_value=True) as mock_open, \
+             patch.object(assistant, 'fill_booking_form') as mock_fill:
+            assert assistant._stage_prefill() is True
+            mock_open.assert_not_called()
+            mock_fill.assert_called_once()
+
+            assistant._stage_prefill()
+            mock_open.assert_called_once()
+
+        captured = capsys.readouterr()
+        assert "Using preloaded booking page." in captured.out
+
+    def test_close_prints_resource_summary(self, assistant, capsys):
+        """Test close reports what the resource policy blocked."""
+        assistant.resource_policy = Mock()
+        assistant.resource_policy.summary.return_value = "Resource policy blocked 4 requests (font=4)"
+
+        assistant.close()
+
+        captured = capsys.readouterr()
+        assert "Resource policy blocked 4 requests" in captured.out
+
+    def test_start_registers_response_listener(self, assistant, mock_playwright_env):
+        """Test start listens for responses so captcha bytes can be captured."""
+        with patch('playwright.sync_api.sync_playwright') as mock_sync_playwright:
+            mock_sync_playwright.return_value.start.return_value = mock_playwright_env['playwright']
+            assistant.start()
+
+        mock_playwright_env['page'].on.assert_called_once_with("response", assistant._remember_image_response)
+
     def test_solve_and_fill_captcha(self, assistant, sample_image_bytes, capsys):
         """Test solve_and_fill_captcha solves and fills captcha."""
         assistant.page = Mock()
@@ -177,7 +539,7 @@ class TestBookingAssistant:
 
         # Mock captcha input
         mock_captcha_input = Mock()
-        mock_captcha_input.input_value.return_value = "ABC123"
+        mock_captcha_input.input_value.return_value = "AB12"
 
         def locator_side_effect(selector):
             from src.config import Selectors
@@ -190,17 +552,127 @@ class TestBookingAssistant:
         assistant.page.locator.side_effect = locator_side_effect
 
         # Mock solver
-        assistant.solver.solve_bytes.return_value = "ABC123"
+        assistant.solver.solve_bytes.return_value = "AB12"
 
         with patch('src.booking.time.sleep'):
             result = assistant.solve_and_fill_captcha()
 
-        assert result == "ABC123"
-        mock_captcha_input.fill.assert_called_once_with("ABC123")
+        assert result == "AB12"
+        mock_captcha_input.fill.assert_called_once_with("AB12")
 
         captured = capsys.readouterr()
         assert "Solving Captcha" in captured.out
-        assert "Captcha recognized: ABC123" in captured.out
+        assert "Captcha recognized: AB12" in captured.out
+
+    def test_solve_and_fill_captcha_resolves_implausible(self, assistant, capsys):
+        """Test an implausible OCR result is re-solved on a new captcha instead of submitted."""
+        assistant.page = Mock()
+        assistant.solver.solve_bytes.side_effect = ["", "AB1", "AB12"]
+
+        with patch.object(assistant, 'get_captcha_image', return_value=b"img"), \
+             patch.object(assistant, 'refresh_captcha') as mock_refresh:
+            result = assistant.solve_and_fill_captcha()
+
+        assert result == "AB12"
+        assert mock_refresh.call_count == 2
+        assert assistant.submits_avoided == 2
+        assert "is not a plausible captcha" in capsys.readouterr().out
+
+    def test_solve_and_fill_captcha_max_resolves(self, assistant):
+        """Test the last re-solve is submitted even if still implausible."""
+        assistant.page = Mock()
+        assistant.config["captcha_max_resolves"] = 1
+        assistant.solver.solve_bytes.return_value = "?"
+
+        with patch.object(assistant, 'get_captcha_image', return_value=b"img"), \
+             patch.object(assistant, 'refresh_captcha') as mock_refresh:
+            result = assistant.solve_and_fill_captcha()
+
+        assert result == "?"
+        mock_refresh.assert_called_once()
+        assert assistant.submits_avoided == 1
+
+    def test_solve_and_fill_captcha_low_confidence(self, assistant, capsys):
+        """Test a plausible but low-confidence result is re-solved when a minimum is set."""
+        assistant.page = Mock()
+        assistant.config["captcha_min_confidence"] = 0.8
+        assistant.solver.solve_detailed.side_effect = [
+            CaptchaResult("AB12", [0.99, 0.4, 0.9, 0.95]), CaptchaResult("CD34", [0.9, 0.9, 0.85, 0.99]),
+        ]
+
+        with patch.object(assistant, 'get_captcha_image', return_value=b"img"), \
+             patch.object(assistant, 'refresh_captcha') as mock_refresh:
+            result = assistant.solve_and_fill_captcha()
+
+        assert result == "CD34"
+        mock_refresh.assert_called_once()
+        assistant.solver.solve_bytes.assert_not_called()
+        assert assistant.submits_avoided == 1
+        assert "low confidence (0.40 < 0.80)" in capsys.readouterr().out
+
+    def test_solve_and_fill_captcha_collecting(self, assistant, tmp_path):
+        """Test collection scores confidence and keeps the submitted captcha for the verdict."""
+        assistant.page = Mock()
+        assistant.config["captcha_dataset"] = str(tmp_path)
+        assistant.solver.solve_detailed.return_value = CaptchaResult("AB12", [0.9, 0.8, 0.9, 0.9])
+
+        with patch.object(assistant, 'get_captcha_image', return_value=b"img"):
+            assistant.solve_and_fill_captcha()
+
+        assistant.solver.solve_bytes.assert_not_called()
+        assert assistant._submitted_captcha == (b"img", "AB12", [0.9, 0.8, 0.9, 0.9])
+
+    def test_record_captcha_outcome(self, assistant, tmp_path):
+        """Test Step 2 records the captcha as accepted and a captcha error as rejected."""
+        assistant.config["captcha_dataset"] = str(tmp_path)
+
+        assistant._submitted_captcha = (b"\x89PNG one", "AB12", [0.9, 0.9, 0.9, 0.9])
+        assistant._record_captcha_outcome(Outcome.STEP2)
+        assistant._submitted_captcha = (b"\x89PNG two", "CD34", None)
+        assistant._record_captcha_outcome(Outcome.CAPTCHA_ERROR)
+        assistant._record_captcha_outcome(Outcome.STEP2)  # Nothing pending
+
+        records = CaptchaDataset(str(tmp_path)).records()
+        assert [(r["guess"], r["accepted"], r["confidence"]) for r in records] == [
+            ("AB12", True, 0.9), ("CD34", False, None),
+        ]
+        assert assistant._submitted_captcha is None
+
+    def test_record_captcha_outcome_other(self, assistant, tmp_path):
+        """Test outcomes that say nothing about the captcha aren't recorded."""
+        assistant.config["captcha_dataset"] = str(tmp_path)
+        assistant._submitted_captcha = (b"img", "AB12", None)
+
+        assistant._record_captcha_outcome(Outcome.OTHER_ERROR)
+
+        assert CaptchaDataset(str(tmp_path)).records() == []
+
+    def test_record_captcha_outcome_off(self, assistant):
+        """Test nothing is written and no dataset is created by default."""
+        assistant.config["captcha_dataset"] = ""
+        assistant._submitted_captcha = (b"img", "AB12", None)
+
+        assistant._record_captcha_outcome(Outcome.STEP2)
+
+        assert assistant._dataset is None
+
+    def test_record_captcha_outcome_write_error(self, assistant, tmp_path, capsys):
+        """Test a failing dataset write doesn't stop the booking."""
+        assistant.config["captcha_dataset"] = str(tmp_path)
+        assistant._submitted_captcha = (b"img", "AB12", None)
+
+        with patch.object(CaptchaDataset, 'add', side_effect=OSError("disk full")):
+            assistant._record_captcha_outcome(Outcome.STEP2)
+
+        assert "Could not record captcha" in capsys.readouterr().out
+
+    def test_close_prints_submits_avoided(self, assistant, capsys):
+        """Test close reports how many submits the plausibility check avoided."""
+        assistant.submits_avoided = 3
+
+        assistant.close()
+
+        assert "Captcha plausibility check avoided 3 submits" in capsys.readouterr().out
 
     def test_refresh_captcha(self, assistant):
         """Test refresh_captcha clicks refresh button."""
@@ -212,8 +684,9 @@ class TestBookingAssistant:
         assistant.page.click.assert_called_once()
 
     def test_submit_form(self, assistant, capsys):
-        """Test submit_form clicks submit button."""
+        """Test submit_form clicks submit button (compat timings)."""
         assistant.page = Mock()
+        assistant.config["wait_profile"] = "compat"
 
         assistant.submit_form()
 
@@ -370,8 +843,9 @@ class TestBookingAssistant:
         mock_train.click.assert_not_called()
 
     def test_confirm_train_selection(self, assistant, capsys):
-        """Test confirm_train_selection clicks confirm button."""
+        """Test confirm_train_selection clicks confirm button (compat timings)."""
         assistant.page = Mock()
+        assistant.config["wait_profile"] = "compat"
 
         with patch('src.booking.time.sleep'):
             assistant.confirm_train_selection()
@@ -473,8 +947,9 @@ class TestBookingAssistant:
         assert assistant.page.fill.call_count == 2
 
     def test_confirm_booking(self, assistant, capsys):
-        """Test confirm_booking clicks confirm button."""
+        """Test confirm_booking clicks confirm button (compat timings)."""
         assistant.page = Mock()
+        assistant.config["wait_profile"] = "compat"
 
         with patch('src.booking.time.sleep'):
             assistant.confirm_booking()
@@ -486,6 +961,139 @@ class TestBookingAssistant:
         assert "Confirming Booking" in captured.out
         assert "Booking confirmed!" in captured.out
 
+    def test_submit_form_event_waits(self, assistant):
+        """Test submit_form waits for the navigation instead of sleeping."""
+        assistant.page = MagicMock()
+        assistant.config["wait_profile"] = "event"
+
+        with patch('src.booking.time.sleep') as mock_sleep:
+            assistant.submit_form()
+
+        assistant.page.expect_navigation.assert_called_once_with(
+            wait_until="domcontentloaded", timeout=15000
+        )
+        assistant.page.click.assert_called_once_with(Selectors.SUBMIT_BUTTON)
+        mock_sleep.assert_not_called()
+
+    def test_submit_form_navigation_timeout(self, assistant, capsys):
+        """Test submit_form continues when no navigation happens."""
+        assistant.page = MagicMock()
+        assistant.config["wait_profile"] = "event"
+        assistant.page.expect_navigation.return_value.__exit__.side_effect = PlaywrightTimeout("Timeout")
+
+        assistant.submit_form()
+
+        captured = capsys.readouterr()
+        assert "No navigation within 15s" in captured.out
+
+    def test_confirm_train_selection_event_waits(self, assistant):
+        """Test confirm_train_selection waits for the navigation instead of sleeping."""
+        assistant.page = MagicMock()
+        assistant.config["wait_profile"] = "event"
+
+        with patch('src.booking.time.sleep') as mock_sleep:
+            assistant.confirm_train_selection()
+
+        assistant.page.expect_navigation.assert_called_once()
+        assistant.page.click.assert_called_once_with(Selectors.CONFIRM_TRAIN)
+        mock_sleep.assert_not_called()
+
+    def test_confirm_booking_event_waits(self, assistant):
+        """Test confirm_booking waits for the navigation instead of sleeping."""
+        assistant.page = MagicMock()
+        assistant.config["wait_profile"] = "event"
+
+        with patch('src.booking.time.sleep') as mock_sleep:
+            assistant.confirm_booking()
+
+        assistant.page.expect_navigation.assert_called_once()
+        assistant.page.click.assert_called_once_with(Selectors.CONFIRM_BOOKING)
+        mock_sleep.assert_not_called()
+
+    def test_refresh_captcha_event_waits(self, assistant):
+        """Test refresh_captcha waits for the captcha image to reload."""
+        assistant.page = Mock()
+        assistant.config["wait_profile"] = "event"
+        assistant.page.evaluate.return_value = "/captcha?antiCache=1"
+
+        with patch('src.booking.time.sleep') as mock_sleep:
+            assistant.refresh_captcha()
+
+        assistant.page.click.assert_called_once_with(Selectors.CAPTCHA_REFRESH)
+        args, kwargs = assistant.page.wait_for_function.call_args
+        assert kwargs["arg"] == [Selectors.CAPTCHA_IMAGE, "/captcha?antiCache=1"]
+        mock_sleep.assert_not_called()
+
+    def test_refresh_captcha_event_waits_timeout(self, assistant, capsys):
+        """Test refresh_captcha continues when the image never reloads."""
+        assistant.page = Mock()
+        assistant.config["wait_profile"] = "event"
+        assistant.page.wait_for_function.side_effect = PlaywrightTimeout("Timeout")
+
+        assistant.refresh_captcha()
+
+        captured = capsys.readouterr()
+        assert "did not reload within 5s" in captured.out
+
+    def test_refresh_captcha_compat(self, assistant):
+        """Test refresh_captcha sleeps one second in compat mode."""
+        assistant.page = Mock()
+        assistant.config["wait_profile"] = "compat"
+
+        with patch('src.booking.time.sleep') as mock_sleep:
+            assistant.refresh_captcha()
+
+        mock_sleep.assert_called_once_with(1)
+        assistant.page.wait_for_function.assert_not_called()
+
+    def test_get_captcha_image_waits_for_load(self, assistant, capsys):
+        """Test get_captcha_image waits for the image in event mode, even on timeout."""
+        assistant.page = Mock()
+        assistant.config["wait_profile"] = "event"
+        assistant.page.wait_for_function.side_effect = PlaywrightTimeout("Timeout")
+
+        assistant.get_captcha_image()
+
+        assistant.page.locator.return_value.screenshot.assert_called_once()
+        captured = capsys.readouterr()
+        assert "still loading" in captured.out
+
+    def test_start_turbo_profile(self, assistant, mock_playwright_env):
+        """Test turbo profile launches the browser with slow_mo=0."""
+        assistant.config["wait_profile"] = "turbo"
+        assistant.config["slow_mo"] = 300
+
+        with patch('playwright.sync_api.sync_playwright') as mock_sync_playwright:
+            mock_sync_playwright.return_value.start.return_value = mock_playwright_env['playwright']
+            assistant.start()
+
+        launch_kwargs = mock_playwright_env['playwright'].chromium.launch.call_args.kwargs
+        assert launch_kwargs["slow_mo"] == 0
+
+    def test_start_event_profile_keeps_slow_mo(self, assistant, mock_playwright_env):
+        """Test non-turbo profiles keep the configured slow_mo."""
+        assistant.config["wait_profile"] = "event"
+        assistant.config["slow_mo"] = 300
+
+        with patch('playwright.sync_api.sync_playwright') as mock_sync_playwright:
+            mock_sync_playwright.return_value.start.return_value = mock_playwright_env['playwright']
+            assistant.start()
+
+        launch_kwargs = mock_playwright_env['playwright'].chromium.launch.call_args.kwargs
+        assert launch_kwargs["slow_mo"] == 300
+
+    def test_open_booking_page_wait_until(self, assistant):
+        """Test event profiles only wait for DOMContentLoaded on goto."""
+        assistant.page = Mock()
+
+        assistant.config["wait_profile"] = "event"
+        assistant.open_booking_page()
+        assert assistant.page.goto.call_args.kwargs["wait_until"] == "domcontentloaded"
+
+        assistant.config["wait_profile"] = "compat"
+        assistant.open_booking_page()
+        assert assistant.page.goto.call_args.kwargs["wait_until"] == "load"
+
     def test_run_success_complete_flow(self, assistant, mock_env, capsys):
         """Test run method with successful complete booking flow."""
         with patch.object(assistant, 'start'), \
@@ -509,6 +1117,25 @@ class TestBookingAssistant:
         captured = capsys.readouterr()
         assert "BOOKING COMPLETE!" in captured.out
 
+    def test_run_event_profile_no_fixed_sleeps(self, assistant):
+        """Test run does not sleep after submit in the event profile."""
+        assistant.config["wait_profile"] = "event"
+
+        with patch.object(assistant, 'start'), \
+             patch.object(assistant, 'open_booking_page', return_value=True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'), \
+             patch.object(assistant, 'solve_and_fill_captcha'), \
+             patch.object(assistant, 'submit_form'), \
+             patch.object(assistant, 'probe_outcome', return_value=(Outcome.STEP2, "")), \
+             patch.object(assistant, 'select_first_train', return_value=False), \
+             patch.object(assistant, 'close'), \
+             patch('src.booking.time.sleep') as mock_sleep:
+
+            assistant.run()
+
+        mock_sleep.assert_not_called()
+
     def test_run_page_load_failure(self, assistant, capsys):
         """Test run when page fails to load."""
         with patch.object(assistant, 'start'), \
@@ -547,6 +1174,58 @@ class TestBookingAssistant:
         assert "Attempt 2/5" in captured.out
         assert "Captcha error - refreshing and retrying..." in captured.out
 
+    def test_run_records_captcha_outcomes(self, assistant):
+        """Test every Step 1 outcome is passed on to the captcha collector."""
+        with patch.object(assistant, '_run_stage', return_value=True), \
+             patch.object(assistant, 'probe_outcome', side_effect=[
+                 (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤"), (Outcome.STEP2, ""), (Outcome.STEP3, ""),
+                 (Outcome.UNKNOWN, ""),
+             ]), \
+             patch.object(assistant, 'refresh_captcha'), \
+             patch.object(assistant, 'select_first_train', return_value=True), \
+             patch.object(assistant, 'confirm_train_selection'), \
+             patch.object(assistant, 'fill_passenger_info'), \
+             patch.object(assistant, 'confirm_booking'), \
+             patch.object(assistant, '_record_captcha_outcome') as mock_record, \
+             patch('builtins.input'):
+            assistant.config["trigger_time"] = ""
+            assistant.run(max_captcha_retries=5)
+
+        assert mock_record.call_args_list == [call(Outcome.CAPTCHA_ERROR), call(Outcome.STEP2)]
+
+    def test_run_records_attempt_timings(self, assistant):
+        """Test each captcha attempt is timed, including getting the next captcha ready."""
+        with patch.object(assistant, '_run_stage', return_value=True), \
+             patch.object(assistant, 'probe_outcome', side_effect=[
+                 (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤"), (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤"),
+                 (Outcome.STEP2, ""), (Outcome.STEP3, ""), (Outcome.UNKNOWN, ""),
+             ]), \
+             patch.object(assistant, '_retry_captcha') as mock_retry, \
+             patch.object(assistant, 'select_first_train', return_value=True), \
+             patch.object(assistant, 'confirm_train_selection'), \
+             patch.object(assistant, 'fill_passenger_info'), \
+             patch.object(assistant, 'confirm_booking'), \
+             patch.object(assistant, 'close'), \
+             patch('builtins.input'):
+            assistant.config["trigger_time"] = ""
+            assistant.run(max_captcha_retries=5)
+
+        assert mock_retry.call_count == 2
+        assert len(assistant.attempt_timings) == 3
+
+    def test_retry_captcha_refreshes(self, assistant):
+        """Test the regular retry refreshes the captcha on the same page."""
+        with patch.object(assistant, 'refresh_captcha') as mock_refresh:
+            assistant._retry_captcha()
+
+        mock_refresh.assert_called_once()
+
+    def test_attempt_summary(self, assistant):
+        """Test the attempt rate covers every timed attempt."""
+        assistant.attempt_timings = [600.0, 400.0, 1000.0]
+
+        assert assistant.attempt_summary() == "Captcha attempts: 3 in 2.00s (1.50 attempts/s)"
+
     def test_run_max_captcha_retries_exceeded(self, assistant, capsys):
         """Test run when max captcha retries exceeded."""
         with patch.object(assistant, 'start'), \
@@ -655,6 +1334,163 @@ class TestBookingAssistant:
         mock_close.assert_called_once()
         mock_print_exc.assert_called_once()
 
+    def test_probe_outcome_step2(self, assistant):
+        """Test probe_outcome maps the in-page race result to STEP2."""
+        assistant.config["wait_profile"] = "event"
+        assistant.page = Mock()
+        assistant.page.evaluate.return_value = {"kind": "step2", "text": ""}
+
+        result = assistant.probe_outcome(Outcome.STEP2)
+
+        assert result == (Outcome.STEP2, "")
+        # One round trip carrying every selector being raced
+        assistant.page.evaluate.assert_called_once()
+        targets, error_selector, timeout = assistant.page.evaluate.call_args[0][1]
+        assert targets == [["step2", Selectors.STEP2_FORM]]
+        assert error_selector == Selectors.ERROR_MESSAGE
+        assert timeout == 5000
+
+    def test_probe_outcome_captcha_error(self, assistant):
+        """Test probe_outcome classifies captcha errors from #feedMSG."""
+        assistant.config["wait_profile"] = "event"
+        assistant.page = Mock()
+        assistant.page.evaluate.return_value = {"kind": "error", "text": "檢測碼輸入錯誤"}
+
+        assert assistant.probe_outcome(Outcome.STEP2) == (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤")
+
+    def test_probe_outcome_other_error(self, assistant):
+        """Test probe_outcome classifies non-captcha errors from #feedMSG."""
+        assistant.config["wait_profile"] = "event"
+        assistant.page = Mock()
+        assistant.page.evaluate.return_value = {"kind": "error", "text": "查無可售車次"}
+
+        assert assistant.probe_outcome(Outcome.STEP3) == (Outcome.OTHER_ERROR, "查無可售車次")
+
+    def test_probe_outcome_unknown(self, assistant):
+        """Test probe_outcome reports UNKNOWN for an unexpected page."""
+        assistant.config["wait_profile"] = "event"
+        assistant.page = Mock()
+        assistant.page.evaluate.return_value = {"kind": "unknown", "text": ""}
+
+        assert assistant.probe_outcome() == (Outcome.UNKNOWN, "")
+
+    def test_probe_outcome_evaluate_failure(self, assistant, capsys):
+        """Test probe_outcome returns UNKNOWN when the page script fails."""
+        assistant.config["wait_profile"] = "event"
+        assistant.page = Mock()
+        assistant.page.evaluate.side_effect = Exception("Execution context was destroyed")
+
+        assert assistant.probe_outcome(Outcome.STEP2) == (Outcome.UNKNOWN, "")
+        captured = capsys.readouterr()
+        assert "Outcome probe failed" in captured.out
+
+    def test_probe_outcome_compat_sequential(self, assistant):
+        """Test compat profile checks forms first, then the error message."""
+        with patch.object(assistant, 'is_on_step2', return_value=False), \
+             patch.object(assistant, 'is_on_step3', return_value=True), \
+             patch.object(assistant, 'check_for_errors', return_value="驗證碼錯誤") as mock_errors:
+
+            assert assistant.probe_outcome(Outcome.STEP3) == (Outcome.STEP3, "")
+            mock_errors.assert_not_called()
+
+            assert assistant.probe_outcome(Outcome.STEP2) == (Outcome.CAPTCHA_ERROR, "驗證碼錯誤")
+
+    def test_is_captcha_error(self):
+        """Test captcha error classification."""
+        assert is_captcha_error("驗證碼錯誤")
+        assert is_captcha_error("檢測碼輸入錯誤")
+        assert is_captcha_error("Wrong Security Code")
+        assert not is_captcha_error("系統錯誤")
+
+    def test_run_event_profile_captcha_retry(self, assistant, capsys):
+        """Test run retries on CAPTCHA_ERROR from a single outcome probe."""
+        assistant.config["wait_profile"] = "event"
+        outcomes = [
+            (Outcome.CAPTCHA_ERROR, "驗證碼錯誤"),
+            (Outcome.STEP2, ""),
+            (Outcome.STEP3, ""),
+            (Outcome.UNKNOWN, ""),
+        ]
+
+        with patch.object(assistant, 'start'), \
+             patch.object(assistant, 'open_booking_page', return_value=True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'), \
+             patch.object(assistant, 'solve_and_fill_captcha'), \
+             patch.object(assistant, 'submit_form'), \
+             patch.object(assistant, 'probe_outcome', side_effect=outcomes) as mock_probe, \
+             patch.object(assistant, 'refresh_captcha') as mock_refresh, \
+             patch.object(assistant, 'is_on_step2') as mock_step2, \
+             patch.object(assistant, 'check_for_errors') as mock_errors, \
+             patch.object(assistant, 'select_first_train', return_value=True), \
+             patch.object(assistant, 'confirm_train_selection'), \
+             patch.object(assistant, 'fill_passenger_info'), \
+             patch.object(assistant, 'confirm_booking'), \
+             patch.object(assistant, 'close'), \
+             patch('builtins.input'):
+
+            assistant.run()
+
+        assert mock_probe.call_args_list == [
+            call(Outcome.STEP2), call(Outcome.STEP2), call(Outcome.STEP3), call(),
+        ]
+        mock_refresh.assert_called_once()
+        mock_step2.assert_not_called()
+        mock_errors.assert_not_called()
+        captured = capsys.readouterr()
+        assert "BOOKING COMPLETE!" in captured.out
+
+    def test_run_step3_error_text(self, assistant):
+        """Test run includes the #feedMSG text when Step 3 is not reached."""
+        error_messages = []
+        assistant.on_error = error_messages.append
+        assistant.config["wait_profile"] = "event"
+
+        with patch.object(assistant, 'start'), \
+             patch.object(assistant, 'open_booking_page', return_value=True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'), \
+             patch.object(assistant, 'solve_and_fill_captcha'), \
+             patch.object(assistant, 'submit_form'), \
+             patch.object(assistant, 'probe_outcome', side_effect=[
+                 (Outcome.STEP2, ""), (Outcome.OTHER_ERROR, "座位已售完"),
+             ]), \
+             patch.object(assistant, 'select_first_train', return_value=True), \
+             patch.object(assistant, 'confirm_train_selection'), \
+             patch.object(assistant, 'close'):
+
+            assistant.run()
+
+        assert error_messages == ["Failed to reach passenger info page (Step 3): 座位已售完"]
+
+    def test_run_booking_not_confirmed(self, assistant):
+        """Test run reports an error shown after confirm_booking instead of success."""
+        error_messages = []
+        success_called = []
+        assistant.on_error = error_messages.append
+        assistant.on_success = lambda: success_called.append(True)
+        assistant.config["wait_profile"] = "event"
+
+        with patch.object(assistant, 'start'), \
+             patch.object(assistant, 'open_booking_page', return_value=True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'), \
+             patch.object(assistant, 'solve_and_fill_captcha'), \
+             patch.object(assistant, 'submit_form'), \
+             patch.object(assistant, 'probe_outcome', side_effect=[
+                 (Outcome.STEP2, ""), (Outcome.STEP3, ""), (Outcome.OTHER_ERROR, "身分證字號錯誤"),
+             ]), \
+             patch.object(assistant, 'select_first_train', return_value=True), \
+             patch.object(assistant, 'confirm_train_selection'), \
+             patch.object(assistant, 'fill_passenger_info'), \
+             patch.object(assistant, 'confirm_booking'), \
+             patch.object(assistant, 'close'):
+
+            assistant.run()
+
+        assert error_messages == ["Booking was not confirmed: 身分證字號錯誤"]
+        assert success_called == []
+
     def test_init_with_custom_config(self):
         """Test initialization with custom config (GUI mode)."""
         custom_config = {
@@ -700,6 +1536,7 @@ class TestBookingAssistant:
             "passenger_phone": "",
             "headless": False,
             "slow_mo": 300,
+            "wait_profile": "compat",
         }
 
         assistant = BookingAssistant(config=custom_config, on_success=on_success)
@@ -746,6 +1583,7 @@ class TestBookingAssistant:
             "passenger_phone": "",
             "headless": False,
             "slow_mo": 300,
+            "wait_profile": "compat",
         }
 
         assistant = BookingAssistant(config=custom_config, on_error=on_error)
@@ -781,6 +1619,7 @@ class TestBookingAssistant:
             "passenger_phone": "",
             "headless": False,
             "slow_mo": 300,
+            "wait_profile": "compat",
         }
 
         assistant = BookingAssistant(config=custom_config, on_error=on_error)
@@ -823,6 +1662,7 @@ class TestBookingAssistant:
             "passenger_phone": "",
             "headless": False,
             "slow_mo": 300,
+            "wait_profile": "compat",
         }
 
         assistant = BookingAssistant(config=custom_config, on_error=on_error)
@@ -865,6 +1705,7 @@ class TestBookingAssistant:
             "passenger_phone": "",
             "headless": False,
             "slow_mo": 300,
+            "wait_profile": "compat",
         }
 
         assistant = BookingAssistant(config=custom_config, on_error=on_error)
@@ -909,6 +1750,7 @@ class TestBookingAssistant:
             "passenger_phone": "",
             "headless": False,
             "slow_mo": 300,
+            "wait_profile": "compat",
         }
 
         assistant = BookingAssistant(config=custom_config, on_error=on_error)
@@ -943,6 +1785,7 @@ class TestBookingAssistant:
             "passenger_phone": "",
             "headless": False,
             "slow_mo": 300,
+            "wait_profile": "compat",
         }
 
         assistant = BookingAssistant(config=custom_config, on_error=on_error)
@@ -986,6 +1829,7 @@ class TestBookingAssistant:
             "passenger_phone": "",
             "headless": False,
             "slow_mo": 300,
+            "wait_profile": "compat",
         }
 
         assistant = BookingAssistant(config=custom_config, on_error=on_error)
@@ -1218,11 +2062,15 @@ class TestBookingAssistant:
         """Test run method waits when trigger_time is set."""
         from datetime import datetime, timedelta
 
-        future_time = datetime.now() + timedelta(seconds=2)
+        future_time = (datetime.now() + timedelta(seconds=2)).replace(microsecond=0)
         time_str = future_time.strftime("%Y-%m-%dT%H:%M:%S")
         assistant.config["trigger_time"] = time_str
 
-        with patch.object(assistant, '_wait_until_trigger_time') as mock_wait, \
+        assistant.config["prewarm_seconds"] = 30
+        assistant.config["prefill_seconds"] = 5
+
+        with patch.object(assistant, '_wait_until_trigger_time', return_value=future_time) as mock_wait, \
+             patch.object(assistant, '_sleep_until') as mock_sleep_until, \
              patch.object(assistant, 'start'), \
              patch.object(assistant, 'open_booking_page', return_value=True), \
              patch.object(assistant, 'dismiss_cookie_dialog'), \
@@ -1241,5 +2089,183 @@ class TestBookingAssistant:
 
             assistant.run()
 
-        # Should call wait method with the trigger time
-        mock_wait.assert_called_once_with(time_str)
+        # Should wait until the preload (T-prewarm-preload), then launch (T-prewarm),
+        # then T-prefill, then T-0
+        mock_wait.assert_called_once_with(time_str, lead_seconds=45)
+        assert mock_sleep_until.call_args_list == [
+            call(future_time - timedelta(seconds=30)),
+            call(future_time - timedelta(seconds=5)),
+            call(future_time),
+        ]
+
+    def test_run_pre_trigger_stages_order(self, assistant):
+        """Test launch and prefill run before the trigger, captcha only after it."""
+        from datetime import datetime, timedelta
+
+        trigger = datetime.now() + timedelta(minutes=5)
+        assistant.config["prewarm_seconds"] = 20
+        assistant.config["prefill_seconds"] = 3
+        assistant.config["preload_seconds"] = 10
+
+        events = []
+        with patch.object(assistant, '_wait_until_trigger_time',
+                          side_effect=lambda *a, **k: events.append(("wait", k["lead_seconds"])) or trigger), \
+             patch.object(assistant, '_sleep_until',
+                          side_effect=lambda target: events.append(("sleep", trigger - target))), \
+             patch.object(assistant, 'start', side_effect=lambda: events.append("start")), \
+             patch.object(assistant, 'open_booking_page',
+                          side_effect=lambda: events.append("open") or True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form', side_effect=lambda: events.append("fill")):
+
+            result = assistant._run_pre_trigger_stages("ignored")
+
+        assert result is True
+        assert events == [
+            ("wait", 30),
+            ("sleep", timedelta(seconds=20)),
+            "start",
+            ("sleep", timedelta(seconds=3)),
+            "open",
+            "fill",
+            ("sleep", timedelta(0)),
+        ]
+        assistant.solver.warm_up.assert_called_once()
+        assert set(assistant.stage_timings) == {"preload", "launch", "prefill"}
+
+    def test_run_pre_trigger_stages_page_load_failure(self, assistant):
+        """Test scheduled run stops before the trigger wait when the page fails to load."""
+        from datetime import datetime, timedelta
+
+        trigger = datetime.now() + timedelta(minutes=5)
+
+        with patch.object(assistant, '_wait_until_trigger_time', return_value=trigger), \
+             patch.object(assistant, '_sleep_until') as mock_sleep_until, \
+             patch.object(assistant, 'start'), \
+             patch.object(assistant, 'open_booking_page', return_value=False), \
+             patch.object(assistant, 'fill_booking_form') as mock_fill:
+
+            result = assistant._run_pre_trigger_stages("ignored")
+
+        assert result is False
+        mock_fill.assert_not_called()
+        assert mock_sleep_until.call_count == 2
+
+    def test_run_records_stage_timings(self, assistant, capsys):
+        """Test run reports latency for launch, prefill and submit stages."""
+        with patch.object(assistant, 'start'), \
+             patch.object(assistant, 'open_booking_page', return_value=True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'), \
+             patch.object(assistant, 'solve_and_fill_captcha'), \
+             patch.object(assistant, 'submit_form'), \
+             patch.object(assistant, 'is_on_step2', return_value=False), \
+             patch.object(assistant, 'check_for_errors', return_value="系統錯誤"), \
+             patch.object(assistant, 'close'), \
+             patch('src.booking.time.sleep'):
+
+            assistant.run()
+
+        assert set(assistant.stage_timings) == {"preload", "launch", "prefill", "submit_1"}
+        assert all(ms >= 0 for ms in assistant.stage_timings.values())
+
+        captured = capsys.readouterr()
+        assert "Stage 'launch' took" in captured.out
+        assert "Stage 'submit_1' took" in captured.out
+
+    def test_wait_until_trigger_time_with_lead(self, assistant, capsys):
+        """Test _wait_until_trigger_time returns lead_seconds before the trigger."""
+        from datetime import datetime, timedelta
+
+        future_time = datetime.now() + timedelta(hours=1)
+        time_str = future_time.strftime("%Y-%m-%dT%H:%M:%S")
+
+        with patch.object(assistant, '_sleep_until') as mock_sleep_until:
+            result = assistant._wait_until_trigger_time(time_str, lead_seconds=30)
+
+        assert result == future_time.replace(microsecond=0)
+        target = mock_sleep_until.call_args[0][0]
+        assert target == result - timedelta(seconds=30)
+
+        captured = capsys.readouterr()
+        assert "Browser warm-up starts 30s before trigger" in captured.out
+
+    def test_sleep_until_past_target(self, assistant):
+        """Test _sleep_until returns immediately when the target has passed."""
+        from datetime import datetime, timedelta
+
+        with patch('src.booking.time.sleep') as mock_sleep:
+            assistant._sleep_until(datetime.now() - timedelta(seconds=1))
+
+        mock_sleep.assert_not_called()
+
+    def test_sleep_until_clock_sync(self, assistant, capsys):
+        """Test _sleep_until hands the final approach to the server clock."""
+        from datetime import datetime, timedelta
+
+        target = datetime.now() + timedelta(seconds=90)
+        assistant.clock = Mock()
+        assistant.clock.seconds_until.side_effect = [90, 30.5, 0.4]
+        assistant.clock.wait_until.return_value = 0.25
+
+        with patch('src.booking.time.sleep') as mock_sleep, \
+             patch('src.booking.time.time', return_value=0):
+            assistant._sleep_until(target, remaining_seconds=1000)
+
+        # Coarse sleep stops one second short, the rest is ServerClock's job
+        assert mock_sleep.call_args_list == [call(60), call(29.5)]
+        assistant.clock.wait_until.assert_called_once_with(target.timestamp())
+        assert assistant.trigger_error_ms == 0.25
+
+        captured = capsys.readouterr()
+        assert "firing error +0.25 ms" in captured.out
+
+    def test_run_pre_trigger_stages_clock_sync(self, assistant):
+        """Test clock sync runs before waiting and again after launch."""
+        from datetime import datetime, timedelta
+
+        trigger = datetime.now() + timedelta(minutes=5)
+        assistant.config["clock_sync"] = True
+
+        def sync():
+            assistant.clock = Mock()
+
+        with patch.object(assistant, '_sync_clock', side_effect=sync) as mock_sync, \
+             patch.object(assistant, '_wait_until_trigger_time', return_value=trigger), \
+             patch.object(assistant, '_sleep_until'), \
+             patch.object(assistant, 'start'), \
+             patch.object(assistant, 'open_booking_page', return_value=True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'):
+
+            assistant._run_pre_trigger_stages("ignored")
+
+        assert mock_sync.call_count == 2
+        assert "clock_sync" in assistant.stage_timings
+        assert "clock_resync" in assistant.stage_timings
+
+    def test_sync_clock_success(self, assistant, capsys):
+        """Test _sync_clock stores a synced ServerClock."""
+        with patch('src.booking.ServerClock') as mock_clock_class:
+            mock_clock = mock_clock_class.return_value
+            mock_clock.offset = 0.120
+            mock_clock.uncertainty = 0.015
+
+            assistant._sync_clock()
+
+        assert assistant.clock is mock_clock
+        mock_clock.sync.assert_called_once()
+        captured = capsys.readouterr()
+        assert "Server clock offset: +120 ms (±15 ms)" in captured.out
+
+    def test_sync_clock_failure(self, assistant, capsys):
+        """Test _sync_clock keeps a local-clock ServerClock when sync fails."""
+        with patch('src.booking.ServerClock') as mock_clock_class:
+            mock_clock = mock_clock_class.return_value
+            mock_clock.sync.side_effect = OSError("unreachable")
+
+            assistant._sync_clock()
+
+        assert assistant.clock is mock_clock
+        captured = capsys.readouterr()
+        assert "Clock sync failed" in captured.out
@@ -1,21 +1,109 @@
 import pytest
+import threading
+import time
 from unittest.mock import Mock, patch, mock_open
-from src.captcha import CaptchaSolver
+from PIL import Image
+from src.captcha import CaptchaResult, CaptchaSolver, decode_probabilities, is_plausible
+
+
+class TestIsPlausible:
+    """Test cases for is_plausible function."""
+
+    def test_plausible(self):
+        """Test four characters from the charset pass, in either case."""
+        assert is_plausible("AB12") is True
+        assert is_plausible("ab12") is True
+
+    def test_wrong_length(self):
+        """Test results of the wrong length fail."""
+        assert is_plausible("ABC") is False
+        assert is_plausible("ABC12") is False
+
+    def test_empty_or_not_text(self):
+        """Test empty results (OCR errors) and non-strings fail."""
+        assert is_plausible("") is False
+        assert is_plausible(None) is False
+
+    def test_charset(self):
+        """Test characters outside the charset fail."""
+        assert is_plausible("AB-1") is False
+        assert is_plausible("AB12", charset="0123456789") is False
+        assert is_plausible("1234", length=4, charset="0123456789") is True
+
+
+class TestDecodeProbabilities:
+    """Test cases for decode_probabilities function."""
+
+    NAMES = ["", "A", "a", "B", "1", "掀"]
+
+    def frames(self, *rows):
+        """Probability frames over NAMES from {name: probability} rows."""
+        return [[row.get(name, 0.0) for name in self.NAMES] for row in rows]
+
+    def test_ctc_decoding(self):
+        """Test repeats collapse, blanks separate and each character keeps its best frame."""
+        output = {"probabilities": self.frames(
+            {"A": 0.6, "": 0.4}, {"A": 0.9, "": 0.1}, {"": 1.0}, {"A": 0.7, "": 0.3}, {"1": 0.8, "B": 0.2},
+        ), "charset": self.NAMES}
+
+        result = decode_probabilities(output, charset="AB1")
+
+        assert result.text == "AA1"
+        assert result.confidences == pytest.approx([0.9, 0.7, 0.8])
+
+    def test_case_folded(self):
+        """Test upper and lower case share their probability."""
+        output = {"probabilities": self.frames({"A": 0.4, "a": 0.4, "B": 0.2}), "charset": self.NAMES}
+
+        result = decode_probabilities(output, charset="AB1")
+
+        assert result.text == "A"
+        assert result.confidences == pytest.approx([0.8])
+
+    def test_charset_restricted(self):
+        """Test characters outside the charset are never decoded and lower confidence."""
+        output = {"probabilities": self.frames({"掀": 0.7, "B": 0.3}), "charset": self.NAMES}
+
+        result = decode_probabilities(output, charset="AB1")
+
+        assert result.text == "B"
+        assert result.min_confidence == pytest.approx(0.3)
+
+    def test_old_output_format(self):
+        """Test ddddocr 1.5 output with per-frame lists over the range charset."""
+        output = {"probability": [[0.1, 0.9, 0.0], [0.2, 0.0, 0.8]], "charsets": ["", "B", "1"]}
+
+        assert decode_probabilities(output, charset="AB1").text == "B1"
+
+    def test_result_summaries(self):
+        """Test min and mean confidence, and empty results."""
+        result = CaptchaResult("AB", [0.5, 1.0])
+
+        assert result.min_confidence == 0.5
+        assert result.mean_confidence == 0.75
+        assert repr(result) == "CaptchaResult('AB', [0.50, 1.00])"
+        assert CaptchaResult("", []).min_confidence == 0.0
 
 
 class TestCaptchaSolver:
     """Test cases for CaptchaSolver class."""
 
+    @pytest.fixture(autouse=True)
+    def reset_shared(self, monkeypatch):
+        """Give every test its own shared-solver slot."""
+        monkeypatch.setattr(CaptchaSolver, "_shared", None)
+        monkeypatch.setattr(CaptchaSolver, "_shared_by_format", {})
+
     def test_init(self):
         """Test CaptchaSolver initialization."""
-        with patch('src.captcha.ddddocr.DdddOcr') as mock_ocr:
+        with patch('ddddocr.DdddOcr') as mock_ocr:
             solver = CaptchaSolver()
             mock_ocr.assert_called_once()
             assert solver.ocr is not None
 
     def test_solve_bytes_success(self, sample_image_bytes):
         """Test solve_bytes with successful OCR."""
-        with patch('src.captcha.ddddocr.DdddOcr') as mock_ocr_class:
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
             mock_ocr = Mock()
             mock_ocr.classification.return_value = "ABC123"
             mock_ocr_class.return_value = mock_ocr
@@ -26,9 +114,78 @@ class TestCaptchaSolver:
             assert result == "ABC123"
             mock_ocr.classification.assert_called_once_with(sample_image_bytes)
 
+    def test_init_model(self):
+        """Test the beta/old ddddocr models can be chosen and unknown ones are rejected."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            assert CaptchaSolver(model="beta").model == "beta"
+            mock_ocr_class.assert_called_once_with(show_ad=False, beta=True)
+
+            with pytest.raises(ValueError, match="Unknown OCR model 'v2'"):
+                CaptchaSolver(model="v2")
+
+    def test_init_restricts_charset(self):
+        """Test decoding is limited to the captcha charset in both cases."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            CaptchaSolver()
+
+        charset_range = mock_ocr_class.return_value.set_ranges.call_args[0][0]
+        assert set(charset_range) == set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+
+    def test_solve_bytes_preprocessed(self, sample_image_bytes):
+        """Test a configured pipeline runs on the image before OCR."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            mock_ocr = mock_ocr_class.return_value
+            mock_ocr.classification.return_value = "AB12"
+            solver = CaptchaSolver(preprocess="grayscale,binarize")
+
+            assert solver.solve_bytes(sample_image_bytes) == "AB12"
+
+        image = mock_ocr.classification.call_args[0][0]
+        assert isinstance(image, Image.Image)
+        assert image.mode == "L"
+
+    def test_init_no_preprocess(self):
+        """Test preprocessing is off by default."""
+        with patch('ddddocr.DdddOcr'):
+            assert CaptchaSolver().pipeline is None
+
+    def test_init_unknown_preprocess_step(self):
+        """Test a misconfigured pipeline fails at load."""
+        with patch('ddddocr.DdddOcr'):
+            with pytest.raises(ValueError, match="Unknown preprocessing step"):
+                CaptchaSolver(preprocess="grayscale,blur")
+
+    def test_solve_detailed(self, sample_image_bytes):
+        """Test solve_detailed decodes the probability output."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            mock_ocr = mock_ocr_class.return_value
+            mock_ocr.classification.return_value = {
+                "probabilities": [[[0.1, 0.9, 0.0]], [[0.3, 0.0, 0.7]]], "charset": ["", "A", "1"],
+            }
+            solver = CaptchaSolver()
+
+            result = solver.solve_detailed(sample_image_bytes)
+
+        mock_ocr.classification.assert_called_once_with(sample_image_bytes, probability=True)
+        assert result.text == "A1"
+        assert result.min_confidence == pytest.approx(0.7)
+        assert solver.inference_count == 1
+
+    def test_solve_detailed_exception(self, sample_image_bytes, capsys):
+        """Test solve_detailed returns an empty result when OCR fails."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            mock_ocr_class.return_value.classification.side_effect = Exception("OCR failed")
+            solver = CaptchaSolver()
+
+            result = solver.solve_detailed(sample_image_bytes)
+
+        assert result.text == ""
+        assert result.min_confidence == 0.0
+        assert "OCR Error: OCR failed" in capsys.readouterr().out
+
     def test_solve_bytes_exception(self, sample_image_bytes, capsys):
         """Test solve_bytes when OCR raises an exception."""
-        with patch('src.captcha.ddddocr.DdddOcr') as mock_ocr_class:
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
             mock_ocr = Mock()
             mock_ocr.classification.side_effect = Exception("OCR failed")
             mock_ocr_class.return_value = mock_ocr
@@ -42,7 +199,7 @@ class TestCaptchaSolver:
 
     def test_solve_file_success(self, temp_image_file):
         """Test solve_file with successful file read and OCR."""
-        with patch('src.captcha.ddddocr.DdddOcr') as mock_ocr_class:
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
             mock_ocr = Mock()
             mock_ocr.classification.return_value = "XYZ789"
             mock_ocr_class.return_value = mock_ocr
@@ -55,7 +212,7 @@ class TestCaptchaSolver:
 
     def test_solve_file_with_bytes_exception(self, temp_image_file, capsys):
         """Test solve_file when OCR fails on bytes."""
-        with patch('src.captcha.ddddocr.DdddOcr') as mock_ocr_class:
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
             mock_ocr = Mock()
             mock_ocr.classification.side_effect = Exception("Classification error")
             mock_ocr_class.return_value = mock_ocr
@@ -69,9 +226,163 @@ class TestCaptchaSolver:
 
     def test_solve_file_file_not_found(self):
         """Test solve_file with non-existent file."""
-        with patch('src.captcha.ddddocr.DdddOcr') as mock_ocr_class:
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
             mock_ocr_class.return_value = Mock()
 
             solver = CaptchaSolver()
             with pytest.raises(FileNotFoundError):
                 solver.solve_file("/nonexistent/path/image.png")
+
+    def test_warm_up(self):
+        """Test warm_up runs one inference on a blank image."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            mock_ocr = Mock()
+            mock_ocr_class.return_value = mock_ocr
+
+            solver = CaptchaSolver()
+            solver.warm_up()
+
+            mock_ocr.classification.assert_called_once()
+            image_bytes = mock_ocr.classification.call_args[0][0]
+            assert image_bytes.startswith(b'\x89PNG')
+
+    def test_warm_up_runs_once(self):
+        """Test warm_up is a no-op after the first call."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            solver = CaptchaSolver()
+            solver.warm_up()
+            solver.warm_up()
+
+            assert mock_ocr_class.return_value.classification.call_count == 1
+
+    def test_shared_loads_once(self):
+        """Test shared() loads and warms up the model once per process."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            first = CaptchaSolver.shared()
+            second = CaptchaSolver.shared()
+
+        assert first is second
+        mock_ocr_class.assert_called_once()
+        assert first.warmed_up is True
+        assert first.inference_count == 1
+
+    def test_shared_per_charset(self):
+        """Test a custom charset gets its own shared solver, limited to that charset."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            default = CaptchaSolver.shared()
+            custom = CaptchaSolver.shared("0123456789")
+            again = CaptchaSolver.shared("0123456789")
+
+        assert custom is again
+        assert custom is not default
+        assert custom.charset == "0123456789"
+        mock_ocr_class.return_value.set_ranges.assert_called_with("01234567890123456789")
+        assert CaptchaSolver.shared(default.charset.lower()) is default
+
+    def test_shared_per_length(self, monkeypatch):
+        """Test a custom captcha length gets its own shared ensemble, voting at that length."""
+        monkeypatch.setattr("src.captcha.CAPTCHA_ENSEMBLE", "default;old")
+        with patch('ddddocr.DdddOcr'):
+            default = CaptchaSolver.shared()
+            custom = CaptchaSolver.shared(length=5)
+
+        assert custom is not default
+        assert (default.length, custom.length) == (4, 5)
+        default.close()
+        custom.close()
+
+    def test_assistant_solver_uses_job_charset(self):
+        """Test OCR and the plausibility check use the same per-job charset."""
+        from src.booking import BookingAssistant
+
+        assistant = BookingAssistant(config={"captcha_charset": "0123456789", "captcha_length": 4})
+        with patch('ddddocr.DdddOcr'):
+            assert assistant.solver.charset == "0123456789"
+        assert assistant._captcha_plausible("1234")
+        assert not assistant._captcha_plausible("AB12")
+
+    def test_shared_concurrent_first_use(self):
+        """Test threads racing on first use still get a single model."""
+        def slow_load(**kwargs):
+            time.sleep(0.05)
+            return Mock()
+
+        with patch('ddddocr.DdddOcr', side_effect=slow_load) as mock_ocr_class:
+            solvers = []
+            threads = [threading.Thread(target=lambda: solvers.append(CaptchaSolver.shared()))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert mock_ocr_class.call_count == 1
+        assert len(set(map(id, solvers))) == 1
+
+    def test_solve_bytes_serialized(self):
+        """Test concurrent solve_bytes calls never run the model at the same time."""
+        active = []
+        overlaps = []
+
+        def classification(image_bytes):
+            active.append(1)
+            if len(active) > 1:
+                overlaps.append(True)
+            time.sleep(0.005)
+            active.pop()
+            return "ABCD"
+
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            mock_ocr_class.return_value.classification.side_effect = classification
+            solver = CaptchaSolver()
+
+        threads = [threading.Thread(target=solver.solve_bytes, args=(b"img",)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert overlaps == []
+        assert solver.inference_count == 8
+
+    def test_stats(self):
+        """Test stats reports load time, inference count and latency percentiles."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            mock_ocr_class.return_value.classification.return_value = "ABCD"
+            solver = CaptchaSolver()
+        solver.solve_bytes(b"img")
+        solver.solve_bytes(b"img")
+
+        stats = solver.stats()
+
+        assert stats["inferences"] == 2
+        assert stats["load_ms"] >= 0
+        assert 0 <= stats["p50_ms"] <= stats["p95_ms"]
+
+    def test_stats_failed_inference_not_counted(self):
+        """Test failed inferences don't count towards the latency stats."""
+        with patch('ddddocr.DdddOcr') as mock_ocr_class:
+            mock_ocr_class.return_value.classification.side_effect = Exception("bad image")
+            solver = CaptchaSolver()
+        solver.solve_bytes(b"img")
+
+        assert solver.stats()["inferences"] == 0
+
+    def test_shared_stats(self):
+        """Test shared_stats is None until the shared solver is loaded."""
+        assert CaptchaSolver.shared_stats() is None
+
+        with patch('ddddocr.DdddOcr'):
+            CaptchaSolver.shared()
+
+        assert CaptchaSolver.shared_stats()["inferences"] == 1
+
+    def test_summary(self):
+        """Test summary formats stats() on one line."""
+        with patch('ddddocr.DdddOcr'):
+            solver = CaptchaSolver()
+        solver.load_ms = 61.7
+        solver._latencies_ms.extend([8.0, 10.0, 12.0])
+        solver.inference_count = 3
+
+        assert solver.summary() == "OCR model loaded in 62 ms, 3 inferences (p50 10.0 ms / p95 11.8 ms)"
@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from src.clock import ServerClock
+
+
+SERVER_OFFSET = 123.4  # Stub server clock runs this many seconds ahead
+
+
+class DateHeaderHandler(BaseHTTPRequestHandler):
+    """Stub handler whose Date header comes from a shifted clock."""
+
+    protocol_version = "HTTP/1.1"
+
+    def date_time_string(self, timestamp=None):
+        return formatdate(time.time() + self.server.offset, usegmt=True)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def date_server():
+    """Local HTTP server that sets Date headers from a shifted clock."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DateHeaderHandler)
+    server.offset = SERVER_OFFSET
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/IMINT/"
+    server.shutdown()
+    server.server_close()
+
+
+class TestServerClock:
+    """Test cases for ServerClock class."""
+
+    def test_init(self):
+        """Test ServerClock defaults to trusting the local clock."""
+        clock = ServerClock()
+
+        assert clock.offset == 0.0
+        assert clock.uncertainty is None
+
+    def test_sync_estimates_offset(self, date_server):
+        """Test sync recovers the stub server's clock offset."""
+        clock = ServerClock()
+
+        offset = clock.sync(date_server, samples=8)
+
+        assert offset == clock.offset
+        assert abs(offset - SERVER_OFFSET) < 1.0
+        # Samples spread over a second narrow the 1 s Date resolution
+        assert clock.uncertainty < 0.5
+        assert abs(offset - SERVER_OFFSET) <= clock.uncertainty + 0.05
+
+    def test_sync_inconsistent_samples(self):
+        """Test sync falls back to the last sample when intervals disagree."""
+        clock = ServerClock()
+        dates = iter([1000.0, 1000.0, 5000.0])
+
+        with patch('http.client.HTTPConnection'), \
+             patch.object(clock, '_fetch_date', side_effect=lambda conn, path: next(dates)), \
+             patch('src.clock.time.sleep'):
+
+            clock.sync("http://example.invalid/", samples=2)
+
+        assert clock.uncertainty == 0
+        assert abs(clock.now() - 5000.5) < 5
+
+    @pytest.mark.parametrize("samples", [0, -1])
+    def test_sync_needs_a_sample(self, samples):
+        """Test sync rejects a sample count below 1 before sending anything."""
+        clock = ServerClock()
+
+        with patch('http.client.HTTPConnection') as mock_conn_class:
+            with pytest.raises(ValueError, match="at least 1 sample"):
+                clock.sync("http://example.invalid/", samples=samples)
+
+        mock_conn_class.assert_not_called()
+        assert clock.offset == 0.0
+
+    def test_fetch_date_missing_header(self, date_server):
+        """Test sync raises when the server sends no Date header."""
+        clock = ServerClock()
+
+        with patch.object(DateHeaderHandler, 'send_header', autospec=True,
+                          side_effect=lambda self, k, v: None if k == "Date"
+                          else BaseHTTPRequestHandler.send_header(self, k, v)):
+            with pytest.raises(ValueError, match="no Date header"):
+                clock.sync(date_server, samples=1)
+
+    def test_now_applies_offset(self):
+        """Test now returns local time shifted by the offset."""
+        clock = ServerClock(offset=60.0)
+
+        assert abs(clock.now() - (time.time() + 60.0)) < 0.01
+        assert abs(clock.seconds_until(clock.now() + 5) - 5) < 0.01
+
+    def test_wait_until_precision(self):
+        """Test wait_until fires within a few ms of the deadline."""
+        clock = ServerClock(offset=SERVER_OFFSET)
+        target = clock.now() + 0.05
+
+        error_ms = clock.wait_until(target)
+
+        assert 0 <= error_ms < 5
+        assert clock.now() >= target
+
+    def test_wait_until_async_precision(self):
+        """Test the asyncio wait fires within a few ms and lets other tasks run meanwhile."""
+        clock = ServerClock(offset=SERVER_OFFSET)
+        target = clock.now() + 0.05
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.005)
+
+        async def wait():
+            task = asyncio.ensure_future(ticker())
+            error_ms = await clock.wait_until_async(target)
+            task.cancel()
+            return error_ms
+
+        error_ms = asyncio.run(wait())
+
+        assert 0 <= error_ms < 5
+        assert clock.now() >= target
+        assert len(ticks) > 3
+
+    def test_wait_until_past_deadline(self):
+        """Test wait_until returns immediately and reports lateness."""
+        clock = ServerClock()
+
+        with patch('src.clock.time.sleep') as mock_sleep:
+            error_ms = clock.wait_until(clock.now() - 1)
+
+        mock_sleep.assert_not_called()
+        assert error_ms >= 1000 - 5
@@ -0,0 +1,507 @@
+import json
+import queue
+import socket
+import threading
+import time
+import urllib.request
+import urllib.error
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+from src.captcha import CaptchaSolver
+from src.daemon import BookingDaemon, BrowserWorker, Job, WarmSlot, make_server
+
+
+def make_worker(**options):
+    """BrowserWorker with a mocked browser (no thread, no Playwright)."""
+    options.setdefault("block_resources", False)
+    worker = BrowserWorker("worker-test", queue.Queue(), base_url="https://example.com/IMINT/", **options)
+    worker.browser = MagicMock()
+    # Every context/page is a distinct mock, like real ones
+    worker.browser.new_context.side_effect = lambda **kwargs: MagicMock(new_page=MagicMock(side_effect=MagicMock))
+    return worker
+
+
+def fake_assistant_class(outcome: str = "success", error: str = "No available trains to select"):
+    """BookingAssistant stand-in whose run() reports the given outcome through the callbacks."""
+    instances = []
+
+    def factory(on_success=None, on_error=None):
+        assistant = MagicMock()
+        assistant.config = {"trigger_time": ""}
+        assistant.stage_timings = {"prefill": 12.0}
+
+        def run():
+            if outcome == "success":
+                on_success()
+            elif outcome == "error":
+                on_error(error)
+            else:
+                raise RuntimeError("browser crashed")
+
+        assistant.run.side_effect = run
+        instances.append(assistant)
+        return assistant
+
+    factory.instances = instances
+    return factory
+
+
+class TestJob:
+    """Test cases for Job class."""
+
+    def test_init(self):
+        """Test a new job is queued with its overrides."""
+        job = Job({"travel_time": "08:00"})
+
+        assert job.status == "queued"
+        assert job.overrides == {"travel_time": "08:00"}
+        assert len(job.id) == 12
+
+    def test_to_dict(self):
+        """Test to_dict is JSON serializable and has no overrides (passenger data)."""
+        job = Job({"passenger_id": "A123456789"})
+
+        payload = json.loads(json.dumps(job.to_dict()))
+
+        assert payload["id"] == job.id
+        assert payload["status"] == "queued"
+        assert "A123456789" not in json.dumps(payload)
+
+
+class TestBrowserWorker:
+    """Test cases for BrowserWorker class."""
+
+    def test_new_slot_preloads_booking_page(self):
+        """Test a new slot has the booking page loaded and the cookie dialog dismissed."""
+        worker = make_worker()
+
+        slot = worker._new_slot()
+
+        page = slot.page
+        page.goto.assert_called_once_with("https://example.com/IMINT/", timeout=60000, wait_until="domcontentloaded")
+        page.locator.assert_called_once_with("#cookieAccpetBtn")
+        page.locator.return_value.click.assert_called_once_with(timeout=2000)
+        assert slot.loaded_at is not None
+        assert slot.policy is None
+
+    def test_new_slot_installs_resource_policy(self):
+        """Test block_resources installs a ResourcePolicy on every context."""
+        worker = make_worker(block_resources=True)
+
+        slot = worker._new_slot()
+
+        assert slot.policy is not None
+        slot.context.route.assert_called_once()
+
+    def test_preload_feeds_image_responses(self):
+        """Test the slot's response listener fills its image response cache."""
+        worker = make_worker()
+        slot = worker._new_slot()
+        listener = slot.page.on.call_args[0][1]
+        response = Mock()
+        response.request.resource_type = "image"
+        response.url = "https://example.com/captcha.jpg"
+
+        listener(response)
+
+        assert slot.image_responses == {"https://example.com/captcha.jpg": response}
+
+    def test_preload_without_cookie_dialog(self):
+        """Test preloading tolerates a missing cookie dialog."""
+        worker = make_worker()
+        context = MagicMock()
+        context.new_page.return_value.locator.return_value.click.side_effect = Exception("Timeout")
+        slot = WarmSlot(context)
+
+        worker._preload(slot)
+
+        assert slot.loaded_at is not None
+
+    def test_top_up(self):
+        """Test _top_up fills the pool to warm_contexts."""
+        worker = make_worker(warm_contexts=3)
+
+        worker._top_up()
+
+        assert len(worker.ready_slots) == 3
+        assert worker.browser.new_context.call_count == 3
+
+    def test_lease_from_pool(self):
+        """Test lease hands out a warm slot without loading anything."""
+        worker = make_worker(warm_contexts=1)
+        worker._top_up()
+        slot = worker.ready_slots[0]
+        slot.page.goto.reset_mock()
+
+        leased = worker.lease()
+
+        assert leased is slot
+        assert worker.ready_slots == []
+        slot.page.goto.assert_not_called()
+
+    def test_lease_empty_pool(self):
+        """Test lease creates a slot when none is warm."""
+        worker = make_worker()
+
+        slot = worker.lease()
+
+        assert slot.page is not None
+        worker.browser.new_context.assert_called_once()
+
+    def test_lease_reloads_stale_page(self):
+        """Test lease reloads a warm page older than max_page_age."""
+        worker = make_worker(warm_contexts=1, max_page_age=60)
+        worker._top_up()
+        slot = worker.ready_slots[0]
+        old_page = slot.page
+        slot.loaded_at = time.monotonic() - 120
+
+        worker.lease()
+
+        old_page.close.assert_called_once()
+        slot.page.goto.assert_called_once()
+
+    def test_reset_reuses_context(self):
+        """Test a used slot gets fresh cookies and page and goes back to the pool."""
+        worker = make_worker(max_jobs_per_context=5, max_js_heap_mb=256)
+        slot = worker._new_slot()
+        slot.jobs_served = 1
+        slot.page.evaluate.return_value = 20 * 1024 * 1024
+
+        worker._reset(slot)
+
+        slot.context.clear_cookies.assert_called_once()
+        slot.context.close.assert_not_called()
+        assert worker.ready_slots == [slot]
+
+    def test_reset_recycles_after_max_jobs(self):
+        """Test a context is closed after max_jobs_per_context jobs."""
+        worker = make_worker(max_jobs_per_context=2)
+        slot = worker._new_slot()
+        slot.jobs_served = 2
+        slot.page.evaluate.return_value = 0
+
+        worker._reset(slot)
+
+        slot.context.close.assert_called_once()
+        assert worker.ready_slots == []
+        assert worker.contexts_recycled == 1
+
+    def test_reset_recycles_over_heap_threshold(self, capsys):
+        """Test a context is closed once its page's JS heap passes max_js_heap_mb."""
+        worker = make_worker(max_js_heap_mb=100)
+        slot = worker._new_slot()
+        slot.jobs_served = 1
+        slot.page.evaluate.return_value = 150 * 1024 * 1024
+
+        worker._reset(slot)
+
+        slot.context.close.assert_called_once()
+        captured = capsys.readouterr()
+        assert "Recycling context after 1 jobs (150 MB JS heap)" in captured.out
+
+    def test_heap_mb_evaluate_failure(self):
+        """Test heap measurement failures count as 0 MB."""
+        page = Mock()
+        page.evaluate.side_effect = Exception("Target closed")
+
+        assert make_worker()._js_heap_mb(page) == 0.0
+
+    def test_maintain_resets_dirty_then_tops_up(self):
+        """Test idle maintenance resets used slots and refills the pool."""
+        worker = make_worker(warm_contexts=2, max_jobs_per_context=1)
+        slot = worker._new_slot()
+        slot.jobs_served = 1
+        slot.page.evaluate.return_value = 0
+        worker.dirty_slots.append(slot)
+
+        worker._maintain()
+
+        assert worker.dirty_slots == []
+        assert len(worker.ready_slots) == 2
+        assert slot not in worker.ready_slots
+
+    def test_maintain_reloads_stalest_page(self):
+        """Test idle maintenance reloads a warm page past max_page_age."""
+        worker = make_worker(warm_contexts=1, max_page_age=60)
+        worker._top_up()
+        slot = worker.ready_slots[0]
+        slot.loaded_at = time.monotonic() - 120
+        old_page = slot.page
+
+        worker._maintain()
+
+        assert slot.page is not old_page
+        assert time.monotonic() - slot.loaded_at < 60
+
+    def test_maintain_failure(self, capsys):
+        """Test maintenance errors are reported, not raised."""
+        worker = make_worker()
+        worker.browser.new_context.side_effect = Exception("Browser closed")
+
+        worker._maintain()
+
+        captured = capsys.readouterr()
+        assert "Warm pool maintenance failed" in captured.out
+
+    def test_run_job_success(self):
+        """Test a job runs on an attached warm page and succeeds."""
+        worker = make_worker(warm_contexts=1)
+        worker._top_up()
+        slot = worker.ready_slots[0]
+        factory = fake_assistant_class("success")
+        job = Job({"travel_time": "08:00"})
+
+        with patch('src.daemon.BookingAssistant', side_effect=factory):
+            worker.run_job(job)
+
+        assistant = factory.instances[0]
+        assert assistant.config["travel_time"] == "08:00"
+        assistant.attach.assert_called_once_with(slot.context, slot.page, preloaded=True,
+                                                 image_responses=slot.image_responses)
+        assert job.status == "succeeded"
+        assert job.error is None
+        assert job.stage_timings == {"prefill": 12.0}
+        assert job.finished_at >= job.started_at
+        assert worker.dirty_slots == [slot]
+        assert slot.jobs_served == 1
+        assert worker.jobs_done == 1
+
+    def test_run_job_error(self):
+        """Test a job reporting an error through on_error fails with that message."""
+        worker = make_worker()
+        job = Job({})
+
+        with patch('src.daemon.BookingAssistant', side_effect=fake_assistant_class("error")):
+            worker.run_job(job)
+
+        assert job.status == "failed"
+        assert job.error == "No available trains to select"
+
+    def test_run_job_exception(self):
+        """Test an exception escaping the flow fails the job and still returns the slot."""
+        worker = make_worker()
+        job = Job({})
+
+        with patch('src.daemon.BookingAssistant', side_effect=fake_assistant_class("raise")):
+            worker.run_job(job)
+
+        assert job.status == "failed"
+        assert job.error == "browser crashed"
+        assert len(worker.dirty_slots) == 1
+
+    def test_run_job_scheduled_loads_its_own_page(self):
+        """Test a job with trigger_time doesn't use the preloaded form (it would be stale)."""
+        worker = make_worker()
+        factory = fake_assistant_class("success")
+
+        with patch('src.daemon.BookingAssistant', side_effect=factory):
+            worker.run_job(Job({"trigger_time": "08:00:00"}))
+
+        assert factory.instances[0].attach.call_args[1]["preloaded"] is False
+
+    def test_run_loop(self):
+        """Test the worker thread warms up, runs queued jobs and shuts down on None."""
+        worker = make_worker(warm_contexts=1)
+        browser = worker.browser
+        worker.browser = None
+        job = Job({})
+        worker.jobs.put(job)
+        worker.jobs.put(None)
+
+        def launch():
+            worker.playwright = Mock()
+            worker.browser = browser
+
+        with patch.object(worker, '_launch', side_effect=launch), \
+             patch('src.daemon.BookingAssistant', side_effect=fake_assistant_class("success")):
+            worker._run()
+
+        assert worker.ready.is_set()
+        assert job.status == "succeeded"
+        browser.close.assert_called_once()
+        worker.playwright.stop.assert_called_once()
+
+    def test_run_launch_failure(self, capsys):
+        """Test a worker whose browser fails to launch marks itself ready and exits."""
+        worker = make_worker()
+
+        with patch.object(worker, '_launch', side_effect=Exception("Executable doesn't exist")):
+            worker._run()
+
+        assert worker.ready.is_set()
+        captured = capsys.readouterr()
+        assert "Browser launch failed" in captured.out
+
+    def test_status(self):
+        """Test status reports pool sizes and counters."""
+        worker = make_worker(warm_contexts=2)
+        worker._top_up()
+        worker.ready.set()
+
+        status = worker.status()
+
+        assert status["ready"] is True
+        assert status["warm_contexts"] == 2
+        assert status["jobs_done"] == 0
+
+
+class TestBookingDaemon:
+    """Test cases for BookingDaemon class."""
+
+    def test_submit_and_get(self):
+        """Test submitted jobs are queued and retrievable by id."""
+        daemon = BookingDaemon(workers=2)
+
+        job = daemon.submit({"travel_time": "08:00"})
+
+        assert daemon.get(job.id) is job
+        assert daemon.get("missing") is None
+        assert daemon.queue.get_nowait() is job
+        assert len(daemon.workers) == 2
+
+    def test_status(self):
+        """Test status counts jobs by state."""
+        daemon = BookingDaemon(workers=1)
+        daemon.submit({})
+        done = daemon.submit({})
+        done.status = "succeeded"
+
+        status = daemon.status()
+
+        assert status["queued"] == 2
+        assert status["jobs"] == {"queued": 1, "succeeded": 1}
+        assert status["ocr"] is None or "p95_ms" in status["ocr"]
+        assert status["workers"][0]["name"] == "worker-1"
+
+    def test_start_preloads_ocr(self):
+        """Test start loads the shared OCR model alongside the browsers."""
+        daemon = BookingDaemon(workers=1)
+
+        with patch('src.daemon.threading.Thread') as mock_thread_class, \
+             patch.object(daemon.workers[0], 'start'):
+            daemon.start(wait=False)
+
+        assert mock_thread_class.call_args[1]["target"] == CaptchaSolver.shared
+        mock_thread_class.return_value.start.assert_called_once()
+
+    def test_stop_sends_sentinels(self):
+        """Test stop puts one stop sentinel per worker and joins them."""
+        daemon = BookingDaemon(workers=2)
+
+        with patch.object(threading.Thread, 'join') as mock_join:
+            daemon.stop()
+
+        assert [daemon.queue.get_nowait(), daemon.queue.get_nowait()] == [None, None]
+        assert mock_join.call_count == 2
+
+
+class TestDaemonApi:
+    """Test cases for the daemon HTTP API."""
+
+    @pytest.fixture
+    def api(self):
+        """Serve the API of a daemon whose workers are not started."""
+        daemon = BookingDaemon(workers=1)
+        server = make_server(daemon, "127.0.0.1", 0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield daemon, f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+    def request(self, url, body=None):
+        data = body.encode("utf-8") if body is not None else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_post_job(self, api):
+        """Test POST /jobs queues a job with the given overrides."""
+        daemon, base = api
+
+        status, payload = self.request(base + "/jobs", '{"travel_time": "08:00"}')
+
+        assert status == 202
+        assert payload["status"] == "queued"
+        assert daemon.get(payload["id"]).overrides == {"travel_time": "08:00"}
+
+    def test_get_job(self, api):
+        """Test GET /jobs/<id> returns the job status."""
+        daemon, base = api
+        job = daemon.submit({})
+
+        status, payload = self.request(f"{base}/jobs/{job.id}")
+
+        assert status == 200
+        assert payload["id"] == job.id
+
+    def test_get_unknown_job(self, api):
+        """Test GET /jobs/<id> for an unknown id is a 404."""
+        _, base = api
+
+        status, payload = self.request(base + "/jobs/nope")
+
+        assert status == 404
+        assert payload["error"] == "Unknown job"
+
+    def test_get_status(self, api):
+        """Test GET /status returns the pool status."""
+        _, base = api
+
+        status, payload = self.request(base + "/status")
+
+        assert status == 200
+        assert payload["workers"][0]["ready"] is False
+
+    def test_get_metrics(self, api):
+        """Test GET /metrics returns the Prometheus text format."""
+        _, base = api
+
+        with urllib.request.urlopen(base + "/metrics", timeout=5) as response:
+            content_type = response.headers["Content-Type"]
+            body = response.read().decode("utf-8")
+
+        assert content_type.startswith("text/plain; version=0.0.4")
+        assert "# TYPE hsr_captcha_attempts_total counter" in body
+        assert "hsr_process_resident_memory_bytes " in body
+
+    @pytest.mark.parametrize("body", ["not json", "[1, 2]"])
+    def test_post_invalid_body(self, api, body):
+        """Test POST /jobs rejects bodies that aren't a JSON object."""
+        daemon, base = api
+
+        status, payload = self.request(base + "/jobs", body)
+
+        assert status == 400
+        assert daemon.jobs == {}
+
+    def test_unknown_path(self, api):
+        """Test unknown paths are 404s."""
+        _, base = api
+
+        assert self.request(base + "/nope")[0] == 404
+        assert self.request(base + "/nope", "{}")[0] == 404
+
+    def test_unix_socket(self, tmp_path):
+        """Test the API can be served on a Unix socket."""
+        socket_path = str(tmp_path / "hsr.sock")
+        server = make_server(BookingDaemon(workers=1), socket_path=socket_path)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(socket_path)
+                client.sendall(b"GET /status HTTP/1.0\r\n\r\n")
+                response = b""
+                while chunk := client.recv(4096):
+                    response += chunk
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        head, body = response.split(b"\r\n\r\n", 1)
+        assert head.startswith(b"HTTP/1.0 200")
+        assert json.loads(body)["queued"] == 0
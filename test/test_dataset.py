@@ -0,0 +1,83 @@
+import json
+import threading
+from src.dataset import CaptchaDataset, image_suffix
+
+PNG = b"\x89PNG\r\n\x1a\n captcha"
+
+
+class TestCaptchaDataset:
+    """Test cases for CaptchaDataset class."""
+
+    def test_add(self, tmp_path):
+        """Test a record is appended to the index and the image stored next to it."""
+        dataset = CaptchaDataset(str(tmp_path / "captchas"))
+
+        record = dataset.add(PNG, "AB12", accepted=True, confidences=[0.91234, 0.8, 0.99, 0.95])
+
+        assert record["image"].startswith("images/") and record["image"].endswith(".png")
+        assert record["confidence"] == 0.8
+        assert record["confidences"] == [0.9123, 0.8, 0.99, 0.95]
+        assert (tmp_path / "captchas" / record["image"]).read_bytes() == PNG
+        lines = (tmp_path / "captchas" / "index.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == [record]
+
+    def test_add_without_confidence(self, tmp_path):
+        """Test confidences are optional."""
+        record = CaptchaDataset(str(tmp_path)).add(PNG, "AB12", accepted=False)
+
+        assert record["confidence"] is None
+        assert record["confidences"] is None
+
+    def test_same_image_stored_once(self, tmp_path):
+        """Test images are stored by content, so a resubmitted captcha isn't copied twice."""
+        dataset = CaptchaDataset(str(tmp_path))
+
+        first = dataset.add(PNG, "AB12", accepted=False)
+        second = dataset.add(PNG, "A812", accepted=True)
+
+        assert first["image"] == second["image"]
+        assert len(list((tmp_path / "images").iterdir())) == 1
+        assert len(dataset.records()) == 2
+
+    def test_records_and_labels(self, tmp_path):
+        """Test accepted guesses are labels and rejected ones aren't."""
+        dataset = CaptchaDataset(str(tmp_path))
+        dataset.add(PNG, "ab12", accepted=True)
+        dataset.add(b"\xff\xd8 other", "CD34", accepted=False)
+
+        records = dataset.records()
+
+        assert [dataset.label(record) for record in records] == ["AB12", None]
+        assert dataset.image(records[1]) == b"\xff\xd8 other"
+
+    def test_records_skip_partial_line(self, tmp_path):
+        """Test a line cut off mid-write is skipped."""
+        dataset = CaptchaDataset(str(tmp_path))
+        dataset.add(PNG, "AB12", accepted=True)
+        with open(dataset.index_path, "a", encoding="utf-8") as f:
+            f.write('{"image": "images/x')
+
+        assert len(dataset.records()) == 1
+
+    def test_records_empty(self, tmp_path):
+        """Test a dataset that was never written to has no records."""
+        assert CaptchaDataset(str(tmp_path / "missing")).records() == []
+
+    def test_concurrent_add(self, tmp_path):
+        """Test records from several threads don't interleave."""
+        dataset = CaptchaDataset(str(tmp_path))
+        threads = [threading.Thread(target=dataset.add, args=(bytes([i]) * 50, "AB12", True))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(dataset.records()) == 20
+
+    def test_image_suffix(self):
+        """Test the file extension follows the image format."""
+        assert image_suffix(PNG) == ".png"
+        assert image_suffix(b"\xff\xd8\xff") == ".jpg"
+        assert image_suffix(b"GIF89a...") == ".gif"
+        assert image_suffix(b"????") == ".bin"
@@ -0,0 +1,185 @@
+import time
+import pytest
+from unittest.mock import Mock, patch
+from src.captcha import CaptchaResult, CaptchaSolver
+from src.ensemble import EnsembleSolver, vote
+
+
+def member(text: str, confidences: list = None, delay: float = 0.0):
+    """Member solver stand-in returning one result after delay seconds."""
+    def solve_detailed(image_bytes):
+        time.sleep(delay)
+        return CaptchaResult(text, confidences if confidences is not None else [0.9] * len(text))
+
+    return Mock(solve_detailed=Mock(side_effect=solve_detailed), load_ms=10.0)
+
+
+class TestVote:
+    """Test cases for vote function."""
+
+    def test_unanimous(self):
+        """Test agreeing members keep their text and mean confidence."""
+        result = vote([CaptchaResult("AB12", [0.8, 0.9, 1.0, 0.9]), CaptchaResult("ab12", [1.0, 0.9, 0.8, 0.9])])
+
+        assert result.text == "AB12"
+        assert result.confidences == pytest.approx([0.9, 0.9, 0.9, 0.9])
+
+    def test_per_position_confidence(self):
+        """Test each position goes to the highest summed confidence, not the whole-string majority."""
+        result = vote([
+            CaptchaResult("AB12", [0.9, 0.3, 0.9, 0.9]),
+            CaptchaResult("A812", [0.9, 0.9, 0.9, 0.9]),
+            CaptchaResult("AB1Z", [0.9, 0.4, 0.9, 0.2]),
+        ])
+
+        assert result.text == "A812"
+        assert result.confidences[1] == pytest.approx(0.3)  # 0.9 of 3 voters
+
+    def test_tie_goes_to_first_member(self):
+        """Test equal scores keep the earlier member's character."""
+        assert vote([CaptchaResult("A", [0.5]), CaptchaResult("B", [0.5])], length=1).text == "A"
+
+    def test_captcha_length_votes(self):
+        """Test only results of the captcha length vote when there are any."""
+        result = vote([CaptchaResult("AB123", [1.0] * 5), CaptchaResult("AB12", [0.6] * 4)])
+
+        assert result.text == "AB12"
+        assert result.confidences == pytest.approx([0.6] * 4)
+
+    def test_most_common_length(self):
+        """Test the most common length votes when no result has the captcha length."""
+        result = vote([CaptchaResult("AB1", [0.9] * 3), CaptchaResult("AB123", [0.9] * 5),
+                       CaptchaResult("CB1", [0.2] * 3)])
+
+        assert result.text == "AB1"
+
+    def test_no_text(self):
+        """Test members that all failed give an empty result."""
+        assert vote([CaptchaResult("", []), CaptchaResult("", [])]).text == ""
+
+
+class TestEnsembleSolver:
+    """Test cases for EnsembleSolver class."""
+
+    @pytest.fixture(autouse=True)
+    def close_ensembles(self, monkeypatch):
+        """Shut down the member threads of every ensemble a test creates."""
+        created = []
+        init = EnsembleSolver.__init__
+
+        def tracked_init(self, *args, **kwargs):
+            init(self, *args, **kwargs)
+            created.append(self)
+
+        monkeypatch.setattr(EnsembleSolver, "__init__", tracked_init)
+        yield
+        for solver in created:
+            solver.close()
+
+    def test_solve_votes(self):
+        """Test every member decodes the image and the vote is returned."""
+        members = [member("AB12"), member("AB12"), member("XB12", [0.1, 0.9, 0.9, 0.9])]
+        solver = EnsembleSolver(members, budget_ms=1000)
+
+        result = solver.solve_detailed(b"img")
+
+        assert result.text == "AB12"
+        for m in members:
+            m.solve_detailed.assert_called_once_with(b"img")
+        assert solver.solve_bytes(b"img") == "AB12"
+
+    def test_budget(self):
+        """Test members slower than the budget past the primary are left out."""
+        solver = EnsembleSolver([member("AB12", delay=0.02), member("CD34", delay=0.5)], budget_ms=30)
+
+        started = time.perf_counter()
+        result = solver.solve_detailed(b"img")
+        elapsed = time.perf_counter() - started
+
+        assert result.text == "AB12"
+        assert elapsed < 0.3
+        assert solver.stats()["late"] == 1
+
+    def test_primary_always_waited_for(self):
+        """Test the primary's result is used even when it's slower than the budget."""
+        solver = EnsembleSolver([member("AB12", delay=0.1), member("CD34")], budget_ms=10)
+
+        assert solver.solve_detailed(b"img").text in ("AB12", "CD34")
+        assert solver.stats()["late"] == 0
+
+    def test_stats_agreement(self):
+        """Test stats count solves where every member agreed."""
+        solver = EnsembleSolver([member("AB12"), member("AB12")], budget_ms=1000)
+        solver.solve_detailed(b"img")
+        solver.members[1] = member("AB13")
+        solver.solve_detailed(b"img")
+
+        stats = solver.stats()
+
+        assert stats["inferences"] == 2
+        assert stats["agreement"] == 0.5
+        assert stats["members"] == 2
+        assert stats["load_ms"] == 20.0
+        assert "2 members agreed on 50%" in solver.summary()
+
+    def test_warm_up_members(self):
+        """Test warm_up warms every member once."""
+        members = [member("AB12"), member("AB12")]
+        solver = EnsembleSolver(members)
+
+        solver.warm_up()
+        solver.warm_up()
+
+        for m in members:
+            m.warm_up.assert_called_once()
+
+    def test_no_members(self):
+        """Test an empty ensemble is rejected."""
+        with pytest.raises(ValueError, match="at least one member"):
+            EnsembleSolver([])
+
+    def test_from_spec(self):
+        """Test the spec creates one solver per member with its model and preprocessing."""
+        with patch("src.ensemble.CaptchaSolver") as mock_solver_class:
+            mock_solver_class.return_value.load_ms = 5.0
+            solver = EnsembleSolver.from_spec(" default ; default:grayscale,binarize;beta;", budget_ms=80,
+                                              charset="0123456789")
+
+        assert [call.kwargs for call in mock_solver_class.call_args_list] == [
+            {"preprocess": "", "model": "default", "charset": "0123456789"},
+            {"preprocess": "grayscale,binarize", "model": "default", "charset": "0123456789"},
+            {"preprocess": "", "model": "beta", "charset": "0123456789"},
+        ]
+        assert solver.budget_ms == 80
+        assert solver.length == 4
+
+    def test_votes_at_job_length(self):
+        """Test the ensemble votes at its own captcha length, not the global one."""
+        solver = EnsembleSolver([member("AB123", [0.6] * 5), member("AB12", [1.0] * 4), member("XY345", [0.1] * 4 + [0.9])],
+                                budget_ms=1000, length=5)
+
+        assert solver.solve_detailed(b"img").text == "AB125"
+
+    def test_close(self):
+        """Test close shuts the member threads down and can be called twice."""
+        solver = EnsembleSolver([member("AB12"), member("AB12")])
+        solver.solve_detailed(b"img")
+
+        solver.close()
+        solver.close()
+
+        with pytest.raises(RuntimeError):
+            solver.solve_detailed(b"img")
+
+    def test_shared_uses_ensemble(self, monkeypatch):
+        """Test the process-wide solver is an ensemble when CAPTCHA_ENSEMBLE is set."""
+        monkeypatch.setattr(CaptchaSolver, "_shared", None)
+        monkeypatch.setattr("src.captcha.CAPTCHA_ENSEMBLE", "default;old")
+
+        with patch("ddddocr.DdddOcr") as mock_ocr_class:
+            solver = CaptchaSolver.shared()
+
+        assert isinstance(solver, EnsembleSolver)
+        assert [m.model for m in solver.members] == ["default", "old"]
+        assert mock_ocr_class.call_args_list[1].kwargs == {"show_ad": False, "old": True}
+        assert solver.warmed_up is True
@@ -0,0 +1,277 @@
+import pytest
+from unittest.mock import Mock
+from src.config import Selectors
+from src.http_engine import HtmlPage, HttpBookingEngine, HttpSession, selector_target
+from test.hsr_stub import HsrStubServer
+
+
+@pytest.fixture
+def stub():
+    """Local HSR stand-in, stopped after the test."""
+    server = HsrStubServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def engine(stub):
+    """HttpBookingEngine pointed at the stub, with a mocked captcha solver."""
+    results = {"success": 0, "errors": []}
+    engine = HttpBookingEngine(
+        on_success=lambda: results.__setitem__("success", results["success"] + 1),
+        on_error=results["errors"].append,
+    )
+    engine.config.update(
+        base_url=stub.url,
+        trigger_time="",
+        start_station="2",
+        end_station="12",
+        travel_date="2026/01/25",
+        travel_time="08:00",
+        adult_count=1,
+        child_count=0,
+        disabled_count=0,
+        elder_count=0,
+        student_count=0,
+        passenger_id="A123456789",
+        passenger_phone="0912345678",
+        passenger_email="test@example.com",
+    )
+    engine.solver = Mock()
+    engine.solver.solve_bytes.return_value = "ABCD"
+    engine.results = results
+    yield engine
+    engine.close()
+
+
+FORM_HTML = """
+<html><head><title> Booking </title>
+<script>var s = "<form id='fake'><input name='x'></form>";</script></head>
+<body>
+<form id="f" method="post" action="/submit">
+<input type="hidden" name="token" value="t1">
+<select name="station"><option value="1">A<option value="2" selected>B</select>
+<input type="radio" name="kind" value="a" checked><input type="radio" name="kind" value="b">
+<input type="checkbox" name="agree" value="on">
+<input type="text" name="disabled" value="x" disabled>
+<input type="submit" id="go" name="go" value="Go">
+<input type="submit" name="other" value="Other">
+</form>
+<div id="msg">  line one
+  <span>line two</span></div>
+<img id="pic" src="/img?n=1">
+</body></html>
+"""
+
+
+class TestSelectorTarget:
+    """Test cases for selector_target function."""
+
+    def test_id_selector(self):
+        """Test '#id' selectors map to the element id."""
+        assert selector_target("#BookingS1Form") == ("id", "BookingS1Form")
+
+    def test_name_selector(self):
+        """Test attribute selectors map to the control name."""
+        assert selector_target(Selectors.START_STATION) == ("name", "selectStartStation")
+        assert selector_target(Selectors.TRAIN_RADIO) == ("name", "TrainQueryDataViewPanel:TrainGroup")
+
+    def test_unsupported_selector(self):
+        """Test anything else is rejected."""
+        with pytest.raises(ValueError, match="Unsupported selector"):
+            selector_target(".result-listing")
+
+
+class TestHtmlPage:
+    """Test cases for HtmlPage and HtmlForm."""
+
+    def test_parse(self):
+        """Test forms, images, texts and the title are collected (script content ignored)."""
+        page = HtmlPage(FORM_HTML, "http://host/page")
+
+        assert list(page.forms) == ["f"]
+        assert page.images == {"pic": "/img?n=1"}
+        assert page.title.strip() == "Booking"
+        assert page.text("#msg") == "line one line two"
+
+    def test_submission_defaults(self):
+        """Test the default submission matches what a browser would post."""
+        form = HtmlPage(FORM_HTML).form("#f")
+
+        assert form.method == "POST"
+        assert form.action == "/submit"
+        assert form.submission() == [("token", "t1"), ("station", "2"), ("kind", "a")]
+
+    def test_submission_with_button(self):
+        """Test only the clicked submit button is posted."""
+        form = HtmlPage(FORM_HTML).form("#f")
+
+        pairs = form.submission("#go")
+
+        assert ("go", "Go") in pairs
+        assert ("other", "Other") not in pairs
+
+    def test_set_controls(self):
+        """Test setting a select, a radio group and a checkbox."""
+        form = HtmlPage(FORM_HTML).form("#f")
+
+        form.set('select[name="station"]', "1")
+        form.set('input[name="kind"]', "b")
+        form.set('input[name="agree"]', "on")
+
+        assert form.submission() == [("token", "t1"), ("station", "1"), ("kind", "b"), ("agree", "on")]
+
+    def test_set_invalid_option(self):
+        """Test a select only accepts one of its options."""
+        form = HtmlPage(FORM_HTML).form("#f")
+
+        with pytest.raises(ValueError, match="no option"):
+            form.set('select[name="station"]', "9")
+
+    def test_set_missing_control(self):
+        """Test setting an unknown control raises LookupError."""
+        form = HtmlPage(FORM_HTML).form("#f")
+
+        with pytest.raises(LookupError):
+            form.set('input[name="missing"]', "x")
+
+    def test_select_count(self):
+        """Test ticket selects are matched by their leading number."""
+        page = HtmlPage('<form id="f"><select name="t"><option value="0F">0<option value="1F">1'
+                        '<option value="10F">10</select></form>')
+        form = page.form("#f")
+
+        assert form.select_count('select[name="t"]', 10) == "10F"
+        assert form.value('select[name="t"]') == "10F"
+
+
+class TestHttpSession:
+    """Test cases for HttpSession class."""
+
+    def test_keep_alive_and_cookies(self, stub):
+        """Test requests reuse one connection and send back the session cookie."""
+        session = HttpSession()
+
+        page = session.request("GET", stub.url)
+        captcha_src = HtmlPage(page.text, page.url).images["BookingS1Form_homeCaptcha_passCode"]
+        captcha = session.request("GET", "http://127.0.0.1:%d%s" % (stub.server_address[1], captcha_src))
+        session.close()
+
+        assert page.ok
+        assert captcha.body == b"PNG-1"  # 404 without the JSESSIONID cookie
+        assert session.connections_opened == 1
+        assert session.requests_sent == 2
+        assert stub.connections == 1
+
+    def test_gzip_decoded(self, stub):
+        """Test gzip response bodies are decoded."""
+        session = HttpSession()
+
+        response = session.request("GET", stub.url)
+        session.close()
+
+        assert response.headers.get("Content-Encoding") == "gzip"
+        assert "BookingS1Form" in response.text
+
+    def test_redirect_becomes_get(self, stub):
+        """Test a 302 after a POST is followed with a GET."""
+        session = HttpSession()
+        session.request("GET", stub.url)
+
+        response = session.request(
+            "POST", stub.url + "?wicket:interface=:1:BookingS2Form::IFormSubmitListener::", fields=[("a", "1")]
+        )
+        session.close()
+
+        assert response.url.endswith("?wicket:interface=:2::")
+        assert [entry[0] for entry in stub.log] == ["GET", "POST", "GET"]
+
+
+class TestHttpBookingEngine:
+    """Test cases for HttpBookingEngine against the stub server."""
+
+    def test_run_success(self, engine, stub):
+        """Test a full booking calls on_success and posts the configured values."""
+        engine.run()
+
+        assert engine.results == {"success": 1, "errors": []}
+        state = next(iter(stub.sessions.values()))
+        assert state["step1"]["selectStartStation"] == "2"
+        assert state["step1"]["selectDestinationStation"] == "12"
+        assert state["step1"]["toTimeInputField"] == "2026/01/25"
+        assert state["step1"]["toTimeTable"] == "800A"
+        assert state["step1"]["ticketPanel:rows:0:ticketAmount"] == "1F"
+        assert state["step1"]["homeCaptcha:securityCode"] == "ABCD"
+        assert state["step1"]["SubmitButton"] == "開始查詢"
+        assert state["step2"]["TrainQueryDataViewPanel:TrainGroup"] == "radio0"
+        assert engine.selected_train == stub.trains[0]
+        assert state["step3"]["dummyId"] == "A123456789"
+        assert state["step3"]["dummyPhone"] == "0912345678"
+        assert state["step3"]["email"] == "test@example.com"
+        assert state["step3"]["agree"] == "on"
+        assert engine.current.text("#pnr") == "08123456"
+
+    def test_run_single_connection(self, engine, stub):
+        """Test the whole booking runs over one keep-alive connection."""
+        engine.run()
+
+        assert stub.connections == 1
+        assert engine.session.connections_opened == 1
+
+    def test_run_captcha_retry(self, engine, stub):
+        """Test a rejected captcha is solved again on the new Step 1 page."""
+        engine.solver.solve_bytes.side_effect = ["WRNG", "ABCD"]
+
+        engine.run()
+
+        assert engine.results["success"] == 1
+        images = [call.args[0] for call in engine.solver.solve_bytes.call_args_list]
+        assert images == [b"PNG-1", b"PNG-2"]
+
+    def test_run_other_error(self, engine, stub):
+        """Test a non-captcha error on Step 1 is reported through on_error."""
+        stub.trains = []
+
+        engine.run()
+
+        assert engine.results["success"] == 0
+        assert len(engine.results["errors"]) == 1
+        assert "去程查無可售車次" in engine.results["errors"][0]
+
+    def test_run_implausible_captcha_not_submitted(self, engine, stub):
+        """Test an implausible OCR result reloads the page instead of posting Step 1."""
+        engine.solver.solve_bytes.side_effect = ["", "ABCD"]
+
+        engine.run()
+
+        assert engine.results["success"] == 1
+        assert engine.submits_avoided == 1
+        step1_posts = [entry for entry in stub.log if entry[0] == "POST" and "BookingS1Form" in entry[1]]
+        assert len(step1_posts) == 1
+
+    def test_open_booking_page_not_found(self, engine, stub):
+        """Test a page without the booking form is reported as a failure."""
+        engine.config["base_url"] = stub.url.replace("/IMINT/", "/missing")
+        engine.start()
+
+        assert engine.open_booking_page() is False
+
+    def test_fill_booking_form_invalid_station(self, engine, stub):
+        """Test a required value the form doesn't offer raises ValueError."""
+        engine.config["start_station"] = "99"
+        engine.start()
+        assert engine.open_booking_page()
+
+        with pytest.raises(ValueError, match="start_station"):
+            engine.fill_booking_form()
+
+    def test_report_success_cli(self, engine, stub, capsys):
+        """Test CLI mode prints the confirmation page instead of waiting for a browser."""
+        engine.on_success = None
+
+        engine.run()
+
+        captured = capsys.readouterr()
+        assert "BOOKING COMPLETE" in captured.out
+        assert "08123456" in captured.out
+        assert "Press Enter" not in captured.out
@@ -0,0 +1,131 @@
+import json
+import pytest
+from unittest.mock import Mock, patch
+from src.booking import BookingAssistant, Outcome
+from src.instrumentation import STEPS, Tracer, result_field
+
+
+class TestTracer:
+    """Test cases for Tracer class."""
+
+    @pytest.fixture
+    def assistant(self):
+        assistant = BookingAssistant()
+        assistant.solver = Mock()
+        assistant.page = Mock()
+        return assistant
+
+    def test_instrument_records_steps(self, assistant):
+        """Test every wrapped call records its step, attempt, timing and result."""
+        tracer = Tracer()
+        assistant.solver.solve_bytes.return_value = "AB12"
+        with patch.object(BookingAssistant, 'is_on_step2', return_value=True):
+            tracer.instrument(assistant)
+            assistant.attempt = 2
+
+            assert assistant._recognize(b"png") == ("AB12", None)
+            assert assistant.is_on_step2() is True
+
+        ocr, step2 = tracer.events
+        assert (ocr["seq"], ocr["step"], ocr["attempt"], ocr["outcome"], ocr["result"]) == (1, "ocr", 2, "ok", "AB12")
+        assert (step2["step"], step2["result"]) == ("is_on_step2", True)
+        assert step2["start_ms"] >= ocr["start_ms"] + ocr["duration_ms"]
+        assert ocr["thread"] == "MainThread"
+
+    def test_instrument_nested_steps(self, assistant):
+        """Test steps called from other steps are traced too."""
+        tracer = Tracer()
+        assistant.solver.solve_bytes.return_value = "AB12"
+        assistant.config["captcha_max_resolves"] = 0
+        with patch.object(BookingAssistant, 'get_captcha_image', return_value=b"png"):
+            tracer.instrument(assistant)
+
+            assistant.solve_and_fill_captcha()
+
+        assert [event["step"] for event in tracer.events] == ["get_captcha_image", "ocr"]
+        assert "result" not in tracer.events[0]  # Image bytes aren't kept
+
+    def test_instrument_records_outcome_probe(self, assistant):
+        """Test the default-profile outcome detection is traced with the outcome it found."""
+        tracer = Tracer()
+        assistant.page.evaluate.return_value = {"kind": "step2"}
+        tracer.instrument(assistant)
+
+        assert assistant.probe_outcome(Outcome.STEP2) == (Outcome.STEP2, "")
+
+        (event,) = tracer.events
+        assert (event["step"], event["result"]) == ("probe_outcome", "step2")
+
+    def test_instrument_records_compat_checks(self, assistant):
+        """Test the compat profile's is_on_step2 check is traced inside probe_outcome."""
+        tracer = Tracer()
+        assistant.config["wait_profile"] = "compat"
+        with patch.object(BookingAssistant, 'is_on_step2', return_value=True):
+            tracer.instrument(assistant)
+
+            assistant.probe_outcome(Outcome.STEP2)
+
+        assert [event["step"] for event in tracer.events] == ["is_on_step2", "probe_outcome"]
+
+    def test_instrument_records_errors(self, assistant):
+        """Test a failing step is recorded with the error and the exception still raised."""
+        tracer = Tracer()
+        with patch.object(BookingAssistant, 'confirm_booking', side_effect=TimeoutError("no button")):
+            tracer.instrument(assistant)
+
+            with pytest.raises(TimeoutError):
+                assistant.confirm_booking()
+
+        event = tracer.events[0]
+        assert event["outcome"] == "error"
+        assert event["error"] == "TimeoutError: no button"
+
+    def test_untraced_assistant_not_wrapped(self, assistant):
+        """Test steps stay plain methods when tracing is off."""
+        assert assistant.tracer is None
+        assert not set(STEPS) & set(vars(assistant))
+
+    def test_export(self, tmp_path):
+        """Test events are appended as JSON lines and cleared."""
+        tracer = Tracer()
+        tracer.record("submit_form", tracer._origin_ns, 1, "ok")
+        path = tmp_path / "trace.jsonl"
+
+        assert tracer.export(str(path)) == 1
+        tracer.record("is_on_step2", tracer._origin_ns, 1, "ok", result=False)
+        assert tracer.export(str(path)) == 1
+
+        events = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert [(event["seq"], event["step"]) for event in events] == [(1, "submit_form"), (2, "is_on_step2")]
+        assert events[1]["result"] is False
+        assert tracer.events == []
+
+    def test_summary(self):
+        """Test the summary groups durations by step."""
+        tracer = Tracer()
+        for _ in range(3):
+            tracer.record("ocr", tracer._origin_ns, 1, "ok")
+
+        assert "ocr: 3x, p50" in tracer.summary()
+
+    def test_result_field(self):
+        """Test only small, useful return values are kept."""
+        assert result_field(True) is True
+        assert result_field("AB12") == "AB12"
+        assert result_field(("AB12", [0.9])) == "AB12"
+        assert result_field((Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤")) == "captcha_error"
+        assert result_field(b"png") is None
+        assert result_field(None) is None
+
+    def test_assistant_traces_and_exports_on_close(self, tmp_path, capsys):
+        """Test trace_file switches tracing on and close() writes the events."""
+        path = tmp_path / "trace.jsonl"
+        with patch.object(BookingAssistant, 'open_booking_page', return_value=True):
+            assistant = BookingAssistant(config={"trace_file": str(path), "base_url": "http://localhost/"})
+
+        assistant.open_booking_page()
+        assistant.close()
+
+        events = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert [event["step"] for event in events] == ["open_booking_page"]
+        assert "Trace: 1 events written" in capsys.readouterr().out
@@ -1,4 +1,7 @@
+import asyncio
 import pytest
+import subprocess
+import sys
 from unittest.mock import Mock, patch
 from src.main import main
 
@@ -66,3 +69,119 @@ class TestMain:
 
             captured = capsys.readouterr()
             assert "Cancelled by user" in captured.out
+
+    def test_main_function_race_mode(self, capsys):
+        """Test main runs a BookingRace when RACE_LANES > 1."""
+        mock_race = Mock()
+        mock_race.run = Mock(side_effect=lambda: asyncio.sleep(0))
+
+        with patch('src.main.RACE_LANES', 3), \
+             patch('src.race.BookingRace', return_value=mock_race) as mock_race_class, \
+             patch('src.main.BookingAssistant') as mock_assistant_class:
+
+            result = main()
+
+        assert result == 0
+        mock_race_class.assert_called_once()
+        mock_race.run.assert_called_once()
+        mock_assistant_class.assert_not_called()
+
+    def test_main_function_pipelined_retries(self):
+        """Test main runs a PipelinedBookingAssistant when PIPELINE_RETRIES is set."""
+        with patch('src.main.PIPELINE_RETRIES', True), \
+             patch('src.pipeline.PipelinedBookingAssistant') as mock_pipelined_class, \
+             patch('src.main.BookingAssistant') as mock_assistant_class:
+
+            result = main()
+
+        assert result == 0
+        mock_pipelined_class.return_value.run.assert_called_once()
+        mock_assistant_class.assert_not_called()
+
+    def test_main_function_profile(self):
+        """Test --profile samples the run, labels the assistant's steps and reports to the file."""
+        with patch('src.profiler.SamplingProfiler') as mock_profiler_class, \
+             patch('src.main.BookingAssistant') as mock_assistant_class:
+
+            result = main(["--profile", "run.folded"])
+
+        assert result == 0
+        profiler = mock_profiler_class.return_value
+        profiler.instrument.assert_called_once_with(mock_assistant_class.return_value)
+        profiler.start.assert_called_once()
+        profiler.stop.assert_called_once()
+        profiler.report.assert_called_once_with("run.folded")
+
+    def test_main_function_profile_http_engine(self):
+        """Test --profile labels the HTTP engine's steps too."""
+        with patch('src.main.ENGINE', "http"), \
+             patch('src.http_engine.HttpBookingEngine') as mock_engine_class, \
+             patch('src.profiler.SamplingProfiler') as mock_profiler_class:
+
+            result = main(["--profile", "run.folded"])
+
+        assert result == 0
+        mock_profiler_class.return_value.instrument.assert_called_once_with(mock_engine_class.return_value)
+        mock_engine_class.return_value.run.assert_called_once()
+
+    def test_main_function_profile_race(self, capsys):
+        """Test --profile samples a race (unlabelled) and still reports."""
+        mock_race = Mock()
+        mock_race.run = Mock(side_effect=lambda: asyncio.sleep(0))
+
+        with patch('src.main.RACE_LANES', 3), \
+             patch('src.race.BookingRace', return_value=mock_race), \
+             patch('src.profiler.SamplingProfiler') as mock_profiler_class:
+
+            result = main(["--profile", "run.folded"])
+
+        assert result == 0
+        profiler = mock_profiler_class.return_value
+        profiler.start.assert_called_once()
+        profiler.report.assert_called_once_with("run.folded")
+        assert "without stage/step labels" in capsys.readouterr().out
+
+    @pytest.mark.parametrize("race_lanes, engine, pipeline_retries", [
+        (3, "http", False),
+        (3, "browser", True),
+        (1, "http", True),
+    ])
+    def test_main_function_conflicting_modes(self, race_lanes, engine, pipeline_retries, capsys):
+        """Test run modes that would silently override each other are rejected before anything runs."""
+        with patch('src.main.RACE_LANES', race_lanes), \
+             patch('src.main.ENGINE', engine), \
+             patch('src.main.PIPELINE_RETRIES', pipeline_retries), \
+             patch('src.race.BookingRace') as mock_race_class, \
+             patch('src.http_engine.HttpBookingEngine') as mock_engine_class, \
+             patch('src.pipeline.PipelinedBookingAssistant') as mock_pipelined_class, \
+             patch('src.main.BookingAssistant') as mock_assistant_class:
+
+            result = main()
+
+        assert result == 1
+        assert "can't be combined" in capsys.readouterr().out
+        for mock_class in (mock_race_class, mock_engine_class, mock_pipelined_class, mock_assistant_class):
+            mock_class.assert_not_called()
+
+    def test_main_function_profile_default_file(self):
+        """Test a bare --profile writes to PROFILE_OUTPUT, even when the run fails."""
+        with patch('src.profiler.SamplingProfiler') as mock_profiler_class, \
+             patch('src.main.BookingAssistant') as mock_assistant_class:
+            mock_assistant_class.return_value.run.side_effect = ValueError("Invalid trigger time format")
+
+            result = main(["--profile"])
+
+        assert result == 1
+        mock_profiler_class.return_value.report.assert_called_once_with("profile.folded")
+
+    def test_import_is_lazy(self):
+        """Test importing the CLI doesn't load Playwright or the OCR stack."""
+        heavy = ("playwright", "ddddocr", "onnxruntime", "numpy", "PIL", "cv2")
+        code = (
+            "import sys, src.main; "
+            f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+        )
+
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+        assert result.stdout.strip() == ""
@@ -0,0 +1,180 @@
+import threading
+import urllib.request
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from src import metrics
+from src.booking import BookingAssistant
+from src.metrics import Counter, Gauge, Histogram, error_class, render, step_name
+
+
+class TestMetrics:
+    """Test cases for the metric types and the text format."""
+
+    def test_counter(self):
+        """Test counter increments are summed at scrape time."""
+        registry = []
+        counter = Counter("jobs_total", "Jobs", registry=registry)
+        counter.inc()
+        counter.inc(2)
+
+        assert render(registry) == "# HELP jobs_total Jobs\n# TYPE jobs_total counter\njobs_total 3\n"
+
+    def test_counter_before_first_event(self):
+        """Test an unlabelled series is exported as 0 from the start."""
+        registry = []
+        Counter("jobs_total", "Jobs", registry=registry)
+
+        assert "jobs_total 0\n" in render(registry)
+
+    def test_labelled_counter(self):
+        """Test each label value is its own series, with values escaped."""
+        registry = []
+        counter = Counter("failed_total", "Failures", ("error_class",), registry=registry)
+        counter.labels("captcha").inc()
+        counter.labels('say "hi"').inc()
+
+        text = render(registry)
+
+        assert 'failed_total{error_class="captcha"} 1' in text
+        assert 'failed_total{error_class="say \\"hi\\""} 1' in text
+
+    def test_histogram(self):
+        """Test buckets are cumulative and sum/count cover every observation."""
+        registry = []
+        histogram = Histogram("step_seconds", "Steps", ("step",), buckets=(0.1, 1), registry=registry)
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.labels("submit").observe(value)
+
+        lines = render(registry).splitlines()
+
+        assert lines[2:] == [
+            'step_seconds_bucket{step="submit",le="0.1"} 1',
+            'step_seconds_bucket{step="submit",le="1"} 3',
+            'step_seconds_bucket{step="submit",le="+Inf"} 4',
+            'step_seconds_sum{step="submit"} 4.25',
+            'step_seconds_count{step="submit"} 4',
+        ]
+
+    def test_gauge(self):
+        """Test gauges go up and down, or read a function at scrape time."""
+        registry = []
+        gauge = Gauge("open", "Open", registry=registry)
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        Gauge("rss", "RSS", function=lambda: 1234, registry=registry)
+
+        text = render(registry)
+
+        assert "\nopen 1\n" in text
+        assert "\nrss 1234\n" in text
+
+    def test_pending_folded_without_scrape(self):
+        """Test a series nobody scrapes doesn't grow without bound."""
+        counter = Counter("jobs_total", "Jobs", registry=[])
+        series = counter.labels()
+        for _ in range(metrics.MAX_PENDING + 1):
+            counter.inc()
+
+        assert len(series._pending) == 0
+        assert series.value() == metrics.MAX_PENDING + 1
+
+    def test_concurrent_increments(self):
+        """Test increments from many threads are all counted."""
+        counter = Counter("jobs_total", "Jobs", registry=[])
+        threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(5000)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.labels().value() == 40000
+
+    def test_error_class(self):
+        """Test on_error messages map to a bounded set of labels."""
+        assert error_class("Failed to load page") == "page_load"
+        assert error_class("Failed after 5 captcha attempts") == "captcha_retries"
+        assert error_class("Non-captcha error: 查無可售車次") == "rejected"
+        assert error_class("Booking was not confirmed: 身分證字號錯誤") == "not_confirmed"
+        assert error_class("Timeout 30000ms exceeded") == "exception"
+
+    def test_step_name(self):
+        """Test attempt numbers are dropped from stage names."""
+        assert step_name("submit_3") == "submit"
+        assert step_name("clock_sync") == "clock_sync"
+
+    def test_resident_memory(self):
+        """Test RSS is read for this process."""
+        assert metrics.resident_memory_bytes() > 1024 * 1024
+
+    @pytest.mark.parametrize("platform, expected", [("darwin", 2048), ("linux", 2048 * 1024)])
+    def test_resident_memory_without_proc(self, monkeypatch, platform, expected):
+        """Test the ru_maxrss fallback is read in bytes on macOS and KiB elsewhere."""
+        import resource
+
+        monkeypatch.setattr(metrics.sys, "platform", platform)
+        monkeypatch.setattr(resource, "getrusage", lambda who: SimpleNamespace(ru_maxrss=2048))
+        with patch("builtins.open", side_effect=OSError):
+            assert metrics.resident_memory_bytes() == expected
+
+    def test_serve(self):
+        """Test the standalone endpoint serves the registry."""
+        server = metrics.serve(0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert "# TYPE hsr_ocr_duration_seconds histogram" in body
+
+
+class TestBookingMetrics:
+    """Test cases for the metrics recorded by the booking flow."""
+
+    def test_failure_counted_by_error_class(self):
+        """Test a reported failure increments its error class."""
+        assistant = BookingAssistant(on_error=lambda message: None)
+        series = metrics.BOOKINGS_FAILED.labels("no_trains")
+        before = series.value()
+
+        assistant._fail("No available trains to select")
+
+        assert series.value() == before + 1
+
+    def test_fail_cli_message(self, capsys):
+        """Test CLI mode prints the failure (with an optional custom message)."""
+        assistant = BookingAssistant()
+
+        assistant._fail("Unknown error after form submission")
+        assistant._fail("Failed to load page", "Failed to load page. Exiting...")
+
+        assert capsys.readouterr().out.splitlines() == [
+            "Unknown error after form submission - stopping", "Failed to load page. Exiting...",
+        ]
+
+    def test_stage_latency_observed(self):
+        """Test every stage lands in the step histogram, without its attempt number."""
+        assistant = BookingAssistant()
+        series = metrics.STEP_SECONDS.labels("submit")
+        before = series.snapshot()[2]
+
+        assistant._run_stage("submit_1", lambda: None)
+        assistant._run_stage("submit_2", lambda: None)
+
+        assert series.snapshot()[2] == before + 2
+
+    def test_ocr_latency_observed(self):
+        """Test OCR inferences land in the OCR histogram."""
+        from src.captcha import CaptchaSolver
+
+        solver = CaptchaSolver(preprocess="")
+        series = metrics.OCR_SECONDS.labels()
+        before = series.snapshot()[2]
+        with patch.object(solver.ocr, "classification", return_value="AB12"):
+            solver.solve_bytes(b"png")
+
+        assert series.snapshot()[2] == before + 1
@@ -0,0 +1,92 @@
+import io
+import threading
+import pytest
+from unittest.mock import patch
+from PIL import Image, ImageDraw, ImageFont
+from src.captcha import CaptchaSolver
+from src.config import CAPTCHA_CHARSET
+from src.ocr_pool import SLOT_BYTES, PooledSolver
+
+
+def captcha_image(text: str = "AB12") -> bytes:
+    image = Image.new("RGB", (140, 48), "white")
+    ImageDraw.Draw(image).text((10, 5), text, fill="black", font=ImageFont.load_default(30))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    """One real worker process (spawned, model loaded) shared by the tests."""
+    solver = PooledSolver(workers=1)
+    yield solver
+    solver.close()
+
+
+class TestPooledSolver:
+    """Test cases for PooledSolver class."""
+
+    def test_solve_bytes_matches_in_process(self, pool):
+        """Test a worker decodes the image the same way as the in-process solver."""
+        image_bytes = captcha_image()
+
+        assert pool.solve_bytes(image_bytes) == CaptchaSolver(preprocess="").solve_bytes(image_bytes)
+
+    def test_solve_detailed(self, pool):
+        """Test confidences come back from the worker."""
+        result = pool.solve_detailed(captcha_image("XY99"))
+
+        assert result.text == "XY99"
+        assert len(result.confidences) == 4
+
+    def test_concurrent_callers(self, pool):
+        """Test callers from several threads share the slots safely."""
+        images = {text: captcha_image(text) for text in ("AB12", "XY99", "M4N8")}
+        results = {}
+
+        def solve(text):
+            results[text] = pool.solve_bytes(images[text])
+
+        threads = [threading.Thread(target=solve, args=(text,)) for text in images]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == {text: text for text in images}
+        assert pool._free.qsize() == len(pool._slots)
+
+    def test_oversized_image_is_pickled(self, pool, capsys):
+        """Test images bigger than a slot are sent to the worker directly."""
+        before = pool.pickled
+
+        assert pool.solve_bytes(b"x" * (SLOT_BYTES + 1)) == ""  # Not an image: OCR error in the worker
+        assert pool.pickled == before + 1
+
+    def test_stats(self, pool):
+        """Test stats report worker count and round-trip latency."""
+        pool.solve_bytes(captcha_image())
+
+        stats = pool.stats()
+
+        assert stats["workers"] == 1
+        assert stats["inferences"] >= 1
+        assert stats["load_ms"] > 0
+        assert "in 1 worker process(es)" in pool.summary()
+
+    def test_unknown_model(self):
+        """Test an unknown model is rejected before any worker starts."""
+        with pytest.raises(ValueError, match="Unknown OCR model"):
+            PooledSolver(workers=1, model="v2")
+
+    def test_shared_uses_pool(self, monkeypatch):
+        """Test the process-wide solver is a pool when OCR_WORKERS is set."""
+        monkeypatch.setattr(CaptchaSolver, "_shared", None)
+        monkeypatch.setattr("src.captcha.OCR_WORKERS", 3)
+
+        with patch("src.ocr_pool.PooledSolver") as mock_pool_class:
+            solver = CaptchaSolver.shared()
+
+        mock_pool_class.assert_called_once_with(3, charset=CAPTCHA_CHARSET)
+        assert solver is mock_pool_class.return_value
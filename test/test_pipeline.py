@@ -0,0 +1,204 @@
+import pytest
+from unittest.mock import MagicMock, Mock, call, patch
+from src.booking import Outcome
+from src.config import Selectors
+from src.pipeline import PipelinedBookingAssistant, SpareLane
+
+
+class TestPipelinedBookingAssistant:
+    """Test cases for PipelinedBookingAssistant class."""
+
+    @pytest.fixture
+    def assistant(self):
+        """Assistant with a mocked browser and active page, as start() leaves them."""
+        assistant = PipelinedBookingAssistant()
+        assistant.solver = Mock()
+        assistant.config["trigger_time"] = ""
+        assistant.browser = Mock()
+        assistant.context = Mock()
+        assistant.page = MagicMock(name="active_page")
+        return assistant
+
+    @pytest.fixture
+    def spare(self, assistant):
+        """A prepared spare lane."""
+        spare = SpareLane(Mock(), MagicMock(name="spare_page"), {})
+        spare.captcha_ready = True
+        assistant.spare = spare
+        return spare
+
+    def test_prefill_opens_spare(self, assistant):
+        """Test prefill loads, fills and solves the spare lane on a second context."""
+        pages = []
+        with patch.object(assistant, 'open_booking_page', side_effect=lambda: pages.append(assistant.page) or True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'), \
+             patch.object(assistant, 'solve_and_fill_captcha') as mock_solve:
+            active_page = assistant.page
+
+            assert assistant._stage_prefill()
+
+        spare_page = assistant.browser.new_context.return_value.new_page.return_value
+        assert pages == [active_page, spare_page]
+        assert assistant.page is active_page
+        assert assistant.spare.page is spare_page
+        assert assistant.spare.captcha_ready
+        assert not assistant.captcha_ready
+        mock_solve.assert_called_once()  # Only the spare lane solves ahead of the trigger
+        spare_page.on.assert_called_once()
+
+    def test_prefill_spare_failure(self, assistant, capsys):
+        """Test a spare lane that fails to load leaves retries unpipelined."""
+        with patch.object(assistant, 'open_booking_page', side_effect=[True, False]), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'):
+
+            assert assistant._stage_prefill()
+
+        assert assistant.spare is None
+        assistant.browser.new_context.return_value.close.assert_called_once()
+        assert "retries not pipelined" in capsys.readouterr().out
+
+    def test_prefill_attached_page(self, assistant):
+        """Test no spare lane is opened without a browser of our own."""
+        assistant.browser = None
+        with patch.object(assistant, 'open_booking_page', return_value=True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'):
+
+            assert assistant._stage_prefill()
+
+        assert assistant.spare is None
+
+    def test_submit_prepares_spare_in_flight(self, assistant, spare):
+        """Test the spare lane is refreshed and solved while the submit navigation is pending."""
+        spare.captcha_ready = False
+        events = []
+        navigation = assistant.page.expect_navigation.return_value
+        navigation.__enter__.side_effect = lambda *args: events.append("submit")
+        navigation.__exit__.side_effect = lambda *args: events.append("navigated")
+        with patch.object(assistant, 'solve_and_fill_captcha',
+                          side_effect=lambda: events.append(("solve", assistant.page))), \
+             patch.object(assistant, 'refresh_captcha',
+                          side_effect=lambda: events.append(("refresh", assistant.page))):
+            active_page = assistant.page
+
+            assistant._stage_submit()
+
+        assert events == [("solve", active_page), "submit", ("refresh", spare.page), ("solve", spare.page),
+                          "navigated"]
+        active_page.click.assert_called_once_with(Selectors.SUBMIT_BUTTON)
+        assert spare.captcha_ready
+        assert assistant.page is active_page
+
+    def test_submit_compat_waits(self, assistant, spare):
+        """Test wait_profile=compat clicks and waits for the load state instead of expecting a navigation."""
+        spare.captcha_ready = False
+        assistant.config["wait_profile"] = "compat"
+        with patch.object(assistant, 'solve_and_fill_captcha'), \
+             patch.object(assistant, 'refresh_captcha'):
+            active_page = assistant.page
+
+            assistant._stage_submit()
+
+        active_page.expect_navigation.assert_not_called()
+        active_page.click.assert_called_once_with(Selectors.SUBMIT_BUTTON)
+        active_page.wait_for_load_state.assert_called_once_with("domcontentloaded")
+        assert spare.captcha_ready
+
+    def test_submit_prepared_lane_skips_solve(self, assistant, spare):
+        """Test a lane that was prepared is submitted without solving again."""
+        assistant.captcha_ready = True
+        with patch.object(assistant, 'solve_and_fill_captcha') as mock_solve:
+            assistant._stage_submit()
+
+        mock_solve.assert_not_called()
+        assert not assistant.captcha_ready
+
+    def test_submit_without_spare(self, assistant):
+        """Test the regular submit is used when there is no spare lane."""
+        with patch('src.booking.BookingAssistant.submit_form') as mock_submit, \
+             patch.object(assistant, 'solve_and_fill_captcha'):
+            assistant._stage_submit()
+
+        mock_submit.assert_called_once()
+
+    def test_spare_preparation_failure(self, assistant, spare, capsys):
+        """Test a failing spare lane doesn't break the submit in flight."""
+        spare.captcha_ready = False
+        with patch.object(assistant, 'refresh_captcha', side_effect=RuntimeError("page crashed")):
+            active_page = assistant.page
+
+            assistant._prepare_spare()
+
+        assert assistant.page is active_page
+        assert not spare.captcha_ready
+        assert "Spare lane not prepared: page crashed" in capsys.readouterr().out
+
+    def test_retry_switches_lanes(self, assistant, spare):
+        """Test a captcha error switches to the prepared lane instead of refreshing."""
+        active_page, spare_page = assistant.page, spare.page
+        assistant._submitted_captcha = (b"old", "AB12", None)
+        spare._submitted_captcha = (b"new", "CD34", None)
+        with patch.object(assistant, 'refresh_captcha') as mock_refresh:
+            assistant._retry_captcha()
+
+        mock_refresh.assert_not_called()
+        assert assistant.page is spare_page
+        assert assistant.captcha_ready
+        assert assistant._submitted_captcha == (b"new", "CD34", None)
+        assert spare.page is active_page
+        assert not spare.captcha_ready
+        assert assistant.lane_switches == 1
+
+    def test_retry_refreshes_when_spare_not_ready(self, assistant, spare):
+        """Test the regular refresh is used while the spare lane isn't ready."""
+        spare.captcha_ready = False
+        active_page = assistant.page
+        with patch.object(assistant, 'refresh_captcha') as mock_refresh:
+            assistant._retry_captcha()
+
+        mock_refresh.assert_called_once()
+        assert assistant.page is active_page
+
+    def test_run_alternates_lanes(self, assistant, spare, capsys):
+        """Test run submits each lane in turn and solves each captcha once."""
+        assistant.browser = None  # Keep the fixture's spare lane
+        submitted = []
+        with patch.object(assistant, 'open_booking_page', return_value=True), \
+             patch.object(assistant, 'dismiss_cookie_dialog'), \
+             patch.object(assistant, 'fill_booking_form'), \
+             patch.object(assistant, 'solve_and_fill_captcha') as mock_solve, \
+             patch.object(assistant, 'refresh_captcha'), \
+             patch.object(assistant.page, 'click', side_effect=lambda selector: submitted.append("active")), \
+             patch.object(spare.page, 'click', side_effect=lambda selector: submitted.append("spare")), \
+             patch.object(assistant, 'probe_outcome', side_effect=[
+                 (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤"), (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤"),
+                 (Outcome.STEP2, ""), (Outcome.STEP3, ""), (Outcome.UNKNOWN, ""),
+             ]), \
+             patch('src.booking.BookingAssistant.select_first_train', return_value=True), \
+             patch.object(assistant, 'confirm_train_selection'), \
+             patch.object(assistant, 'fill_passenger_info'), \
+             patch.object(assistant, 'confirm_booking'), \
+             patch('builtins.input'):
+
+            assistant.run(max_captcha_retries=5)
+
+        assert submitted == ["active", "spare", "active"]
+        assert mock_solve.call_count == 3  # Active lane once, then the spare lane during each submit
+        assert assistant.lane_switches == 2
+        assert spare.context.close.called  # Spare lane closed once Step 1 is done
+        captured = capsys.readouterr()
+        assert "Switched to the prepared lane" in captured.out
+        assert "Captcha attempts: 3" in captured.out
+        assert "switched lanes 2 times" in captured.out
+
+    def test_close_closes_spare(self, assistant, spare):
+        """Test close() closes the spare context before the browser."""
+        browser = assistant.browser
+
+        assistant.close()
+
+        spare.context.close.assert_called_once()
+        browser.close.assert_called_once()
+        assert assistant.spare is None
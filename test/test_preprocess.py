@@ -0,0 +1,134 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from src.preprocess import Pipeline, STEPS, binarize, denoise, grayscale, otsu_threshold, remove_curve
+
+
+def white(height: int = 40, width: int = 120) -> np.ndarray:
+    return np.full((height, width), 255, dtype=np.uint8)
+
+
+class TestSteps:
+    """Test cases for the preprocessing steps."""
+
+    def test_grayscale(self):
+        """Test RGB(A) becomes one luma channel and gray input is kept."""
+        rgba = np.zeros((2, 3, 4), dtype=np.uint8)
+        rgba[..., 1] = 255  # Pure green
+
+        gray = grayscale(rgba)
+
+        assert gray.shape == (2, 3)
+        assert gray.dtype == np.uint8
+        assert int(gray[0, 0]) == 149
+        assert grayscale(gray) is gray
+
+    def test_otsu_threshold(self):
+        """Test the threshold falls between the two levels of a bimodal image."""
+        gray = np.array([[40] * 10 + [200] * 30], dtype=np.uint8)
+
+        assert 40 <= otsu_threshold(gray) < 200
+
+    def test_binarize(self):
+        """Test dark pixels become ink (0) and light ones background (255)."""
+        gray = np.array([[30, 60, 180, 220]], dtype=np.uint8)
+
+        assert binarize(gray).tolist() == [[0, 0, 255, 255]]
+
+    def test_binarize_blank_image(self):
+        """Test a uniform image stays blank."""
+        assert (binarize(white()) == 255).all()
+
+    def test_remove_curve(self):
+        """Test an arc spanning the width is erased while the characters in the middle stay."""
+        image = white()
+        xs = np.arange(120)
+        ys = np.round(30 - 0.004 * (xs - 60) ** 2).astype(int)
+        image[ys, xs] = 0
+        image[10:20, 50:70] = 0  # "Character" above the arc
+
+        cleaned = remove_curve(image)
+
+        assert (cleaned[ys, xs] == 255).all()
+        assert (cleaned[10:20, 50:70] == 0).all()
+
+    def test_remove_curve_keeps_crossed_strokes(self):
+        """Test a character stroke the arc runs through keeps its ink inside the band."""
+        image = white()
+        xs = np.arange(120)
+        ys = np.round(30 - 0.004 * (xs - 60) ** 2).astype(int)
+        image[ys, xs] = 0
+        image[5:38, 58:62] = 0  # Vertical stroke crossing the arc at y=30
+
+        cleaned = remove_curve(image)
+
+        assert (cleaned[5:38, 58:62] == 0).all()
+        outside = (xs < 58) | (xs >= 62)
+        assert (cleaned[ys[outside], xs[outside]] == 255).all()
+
+    def test_remove_curve_without_arc(self):
+        """Test nothing changes when the margins have no ink to fit."""
+        image = white()
+        image[10:20, 50:70] = 0
+
+        assert (remove_curve(image) == image).all()
+
+    def test_denoise(self):
+        """Test isolated specks are dropped and strokes kept."""
+        image = white()
+        image[5, 5] = 0
+        image[10:20, 50:53] = 0
+
+        cleaned = denoise(image)
+
+        assert cleaned[5, 5] == 255
+        assert (cleaned[10:20, 50:53] == 0).all()
+
+    def test_steps_accept_rgb(self):
+        """Test binary steps binarize color input first."""
+        rgb = np.full((40, 120, 3), 255, dtype=np.uint8)
+        rgb[10:20, 50:60] = 0
+
+        for step in (remove_curve, denoise):
+            assert step(rgb).shape == (40, 120)
+
+
+class TestPipeline:
+    """Test cases for Pipeline class."""
+
+    def test_from_spec(self):
+        """Test comma-separated step names, ignoring blanks."""
+        pipeline = Pipeline.from_spec(" grayscale, binarize ,")
+
+        assert pipeline.steps == ["grayscale", "binarize"]
+        assert repr(pipeline) == "Pipeline(grayscale,binarize)"
+
+    def test_from_spec_empty(self):
+        """Test an empty spec means no preprocessing."""
+        assert Pipeline.from_spec("") is None
+        assert Pipeline.from_spec(None) is None
+
+    def test_unknown_step(self):
+        """Test unknown step names are rejected with the available ones."""
+        with pytest.raises(ValueError, match="Unknown preprocessing step.*sharpen.*available: grayscale"):
+            Pipeline(["grayscale", "sharpen"])
+
+    def test_call(self):
+        """Test image bytes are decoded, processed and returned as a PIL image."""
+        buffer = io.BytesIO()
+        Image.new("RGB", (120, 40), (200, 200, 200)).save(buffer, format="PNG")
+
+        image = Pipeline(["grayscale", "binarize"])(buffer.getvalue())
+
+        assert isinstance(image, Image.Image)
+        assert image.size == (120, 40)
+        assert image.mode == "L"
+
+    def test_custom_step(self, monkeypatch):
+        """Test steps added to STEPS can be used by name."""
+        monkeypatch.setitem(STEPS, "invert", lambda image: 255 - image)
+
+        result = Pipeline(["grayscale", "invert"]).apply(white())
+
+        assert (result == 0).all()
@@ -0,0 +1,110 @@
+import time
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+from src.booking import BookingAssistant
+from src.profiler import SamplingProfiler
+
+
+def fake_frame(module, qualname, parent=None, filename="x.py", lineno=1):
+    code = compile("", filename, "exec").replace(co_qualname=qualname)
+    return SimpleNamespace(f_code=code, f_globals={"__name__": module}, f_back=parent, f_lineno=lineno)
+
+
+def spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestSamplingProfiler:
+    """Test cases for SamplingProfiler class."""
+
+    def test_categories(self):
+        """Test OCR and Playwright frames anywhere in the stack decide the category."""
+        profiler = SamplingProfiler()
+        run = fake_frame("src.booking", "BookingAssistant.run")
+
+        profiler._sample(fake_frame("onnxruntime.capi", "InferenceSession.run", fake_frame("src.captcha", "solve", run)), ())
+        profiler._sample(fake_frame("selectors", "EpollSelector.select", fake_frame("playwright._impl._sync_base", "_sync")), ())
+        profiler._sample(fake_frame("src.booking", "BookingAssistant.fill_booking_form", run), ())
+
+        assert [category for _, _, category in profiler.samples] == ["ocr", "playwright", "python"]
+
+    def test_sleep_category(self):
+        """Test a leaf frame blocked in time.sleep counts as sleep."""
+        profiler = SamplingProfiler(interval_ms=1)
+
+        with profiler:
+            time.sleep(0.2)
+
+        categories = {category for _, _, category in profiler.samples}
+        assert categories == {"sleep"}
+        assert profiler.elapsed >= 0.2
+
+    def test_samples_calling_thread_only(self):
+        """Test other threads' stacks are left out."""
+        profiler = SamplingProfiler(interval_ms=1)
+        other = threading.Thread(target=spin, args=(0.2,))
+
+        with profiler:
+            other.start()
+            spin(0.1)
+            other.join()
+
+        folded = profiler.folded()
+        assert "test_profiler:spin" in folded
+        assert "Thread.run" not in folded
+
+    def test_instrument_labels_stage_and_step(self):
+        """Test samples carry the stage and step in progress."""
+        profiler = SamplingProfiler(interval_ms=1)
+        assistant = BookingAssistant()
+        with patch.object(BookingAssistant, 'submit_form', lambda self: spin(0.1)):
+            profiler.instrument(assistant)
+
+            with profiler:
+                assistant._run_stage("submit_3", assistant.submit_form)
+
+        assert "stage:submit;step:submit_form;" in profiler.folded()
+        assert "python" in profiler.summary()
+
+    def test_folded_format(self):
+        """Test folded stacks are one 'frame;frame count' line per stack, heaviest first."""
+        profiler = SamplingProfiler()
+        submit = fake_frame("src.booking", "BookingAssistant.submit_form", fake_frame("src.booking", "BookingAssistant.run"))
+        profiler._sample(fake_frame("src.booking", "BookingAssistant.run"), ())
+        for _ in range(2):
+            profiler._sample(submit, ("stage:submit",))
+
+        assert profiler.folded() == (
+            "stage:submit;src.booking:BookingAssistant.run;src.booking:BookingAssistant.submit_form 2\n"
+            "src.booking:BookingAssistant.run 1\n"
+        )
+
+    def test_summary(self):
+        """Test the summary scales samples to the measured time and names the hot spots."""
+        profiler = SamplingProfiler()
+        profiler.elapsed = 4.0
+        dispatcher = fake_frame("selectors", "EpollSelector.select", fake_frame("playwright._impl._transport", "run"))
+        for _ in range(3):
+            profiler._sample(dispatcher, ("stage:submit", "step:submit_form"))
+        profiler._sample(fake_frame("src.booking", "BookingAssistant.run"), ())
+
+        summary = profiler.summary(top=2).splitlines()
+
+        assert summary[0] == "Profile: 4 samples over 4.00s"
+        assert "playwright    3.00s  75.0%" in summary[2]
+        assert summary[-2].endswith("playwright step:submit_form")
+        assert summary[-1].endswith("python     src.booking:BookingAssistant.run")
+
+    def test_report(self, tmp_path, capsys):
+        """Test report writes the folded stacks and prints the summary."""
+        profiler = SamplingProfiler()
+        profiler._sample(fake_frame("src.booking", "BookingAssistant.run"), ())
+        path = tmp_path / "profile.folded"
+
+        profiler.report(str(path))
+
+        assert path.read_text(encoding="utf-8") == "src.booking:BookingAssistant.run 1\n"
+        assert "Profile: 1 samples" in capsys.readouterr().out
@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from src import metrics
+from src.async_booking import AsyncBookingAssistant
+from src.race import BookingRace
+
+
+def fake_lane_class(plan: dict):
+    """
+    AsyncBookingAssistant stand-in. plan maps lane number (creation order,
+    from 1) to (seconds to finish Step 1, reached Step 2, error).
+    """
+    instances = []
+
+    class FakeAssistant:
+        def __init__(self, config=None, on_success=None, on_error=None, browser=None):
+            instances.append(self)
+            self.lane = len(instances)
+            self.config = config
+            self.on_success = on_success
+            self.on_error = on_error
+            self.browser = browser
+            self.stage_timings = {}
+            self.cancelled = False
+            self.closed = False
+            self.completed = False
+
+        async def run_until_step2(self, max_captcha_retries=5):
+            seconds, reached, error = plan[self.lane]
+            try:
+                await asyncio.sleep(seconds)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            if isinstance(error, Exception):
+                raise error
+            if not reached:
+                self.on_error(error)
+            return reached
+
+        async def complete_booking(self):
+            self.completed = True
+            self.on_success()
+
+        async def close(self):
+            self.closed = True
+
+    FakeAssistant.instances = instances
+    return FakeAssistant
+
+
+class TestBookingRace:
+    """Test cases for BookingRace class."""
+
+    def run_race(self, plan: dict, lanes: int = 3):
+        results = {"success": 0, "errors": []}
+        fake = fake_lane_class(plan)
+        race = BookingRace(
+            config={"trigger_time": ""},
+            on_success=lambda: results.__setitem__("success", results["success"] + 1),
+            on_error=results["errors"].append,
+            lanes=lanes,
+            browser=MagicMock(),
+        )
+        with patch("src.race.AsyncBookingAssistant", fake):
+            asyncio.run(race.run())
+        return race, fake.instances, results
+
+    def test_fastest_lane_wins(self):
+        """Test the first lane on Step 2 completes the booking and the others are cancelled."""
+        race, lanes, results = self.run_race({1: (0.5, True, None), 2: (0.01, True, None), 3: (0.5, True, None)})
+
+        assert race.winner.index == 2
+        assert results == {"success": 1, "errors": []}
+        assert lanes[1].completed is True
+        assert lanes[0].cancelled and lanes[2].cancelled
+        assert not lanes[0].completed and not lanes[2].completed
+        assert all(lane.closed for lane in lanes)
+        assert [lane.status for lane in race.lanes] == ["cancelled", "won", "cancelled"]
+
+    def test_failed_lane_does_not_stop_race(self):
+        """Test a lane with a captcha failure doesn't end the race."""
+        race, lanes, results = self.run_race({
+            1: (0.01, False, "Failed after 5 captcha attempts"), 2: (0.05, True, None), 3: (0.5, True, None),
+        })
+
+        assert race.winner.index == 2
+        assert results["success"] == 1
+        assert results["errors"] == []  # Lane errors stay on the lane
+        assert race.lanes[0].status == "failed"
+        assert race.lanes[0].error == "Failed after 5 captcha attempts"
+
+    def test_all_lanes_fail(self):
+        """Test on_error gets every lane's error when none reaches Step 2."""
+        race, lanes, results = self.run_race({
+            1: (0.01, False, "Non-captcha error: sold out"), 2: (0.02, False, None), 3: (0.01, None, RuntimeError("crash")),
+        })
+
+        assert race.winner is None
+        assert results["success"] == 0
+        assert len(results["errors"]) == 1
+        assert "lane 1: Non-captcha error: sold out" in results["errors"][0]
+        assert "lane 3: crash" in results["errors"][0]
+        assert all(lane.closed for lane in lanes)
+
+    def run_metered_race(self, outcomes: dict) -> dict:
+        """Race real assistants whose Step 1 fails (error message) or reaches Step 2 (None); return metric deltas."""
+        series = {
+            "succeeded": metrics.BOOKINGS_SUCCEEDED.labels(),
+            "captcha_retries": metrics.BOOKINGS_FAILED.labels("captcha_retries"),
+            "rejected": metrics.BOOKINGS_FAILED.labels("rejected"),
+        }
+        before = {name: value.value() for name, value in series.items()}
+        lanes = iter(sorted(outcomes))
+
+        async def run_until_step2(self, max_captcha_retries=5):
+            error = outcomes[next(lanes)]
+            await asyncio.sleep(0.05 if error is None else 0.01)
+            if error:
+                self._fail(error)
+                return False
+            return True
+
+        async def complete_booking(self):
+            self._count_booking()
+            self.on_success()
+
+        with patch.object(AsyncBookingAssistant, 'run_until_step2', run_until_step2), \
+             patch.object(AsyncBookingAssistant, 'complete_booking', complete_booking), \
+             patch.object(AsyncBookingAssistant, 'close', AsyncMock()):
+            race = BookingRace(on_success=lambda: None, on_error=lambda message: None, lanes=len(outcomes),
+                               browser=MagicMock())
+            asyncio.run(race.run())
+        return {name: value.value() - before[name] for name, value in series.items()}
+
+    def test_metrics_count_one_booking_per_race(self):
+        """Test failed lanes of a won race aren't counted as failed bookings."""
+        deltas = self.run_metered_race({1: "Failed after 5 captcha attempts", 2: None, 3: "Failed after 5 captcha attempts"})
+
+        assert deltas == {"succeeded": 1, "captcha_retries": 0, "rejected": 0}
+
+    def test_metrics_count_lost_race_once(self):
+        """Test a race no lane wins is one failed booking, classed by the first lane error."""
+        deltas = self.run_metered_race({1: "Non-captcha error: sold out", 2: "Failed after 5 captcha attempts"})
+
+        assert deltas == {"succeeded": 0, "captcha_retries": 0, "rejected": 1}
+
+    def test_lanes_use_own_config_copy(self):
+        """Test each lane gets its own copy of the config and the shared browser."""
+        race, lanes, _ = self.run_race({1: (0.01, True, None), 2: (0.02, True, None)}, lanes=2)
+
+        assert lanes[0].config == {"trigger_time": ""}
+        assert lanes[0].config is not lanes[1].config
+        assert lanes[0].browser is lanes[1].browser is race.browser
+
+    def test_summary(self, capsys):
+        """Test the summary names the winner and every lane's time."""
+        race, _, _ = self.run_race({1: (0.05, True, None), 2: (0.01, True, None)}, lanes=2)
+
+        summary = race.summary()
+
+        assert summary.startswith("🏁 Lane 2 won")
+        assert "lane 1: cancelled after" in summary
+        assert "lane 2: won after" in summary
+        assert "🏁 Lane 2 won" in capsys.readouterr().out
+
+    def test_launches_browser_when_not_shared(self):
+        """Test a browser is launched and closed when none is passed in."""
+        playwright, browser = MagicMock(), MagicMock()
+        playwright.stop = MagicMock(side_effect=lambda: asyncio.sleep(0))
+        browser.close = MagicMock(side_effect=lambda: asyncio.sleep(0))
+        fake = fake_lane_class({1: (0.01, True, None)})
+        race = BookingRace(config={"trigger_time": ""}, on_success=lambda: None, on_error=lambda m: None, lanes=1)
+
+        async def launch(config):
+            return playwright, browser
+
+        with patch("src.race.AsyncBookingAssistant", fake), patch("src.race.launch_browser", launch):
+            asyncio.run(race.run())
+
+        assert fake.instances[0].browser is browser
+        browser.close.assert_called_once()
+        playwright.stop.assert_called_once()
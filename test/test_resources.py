@@ -0,0 +1,116 @@
+import pytest
+from unittest.mock import Mock
+from src.resources import TYPICAL_BYTES, TYPICAL_BYTES_OTHER, ResourcePolicy
+
+
+class TestResourcePolicy:
+    """Test cases for ResourcePolicy class."""
+
+    @pytest.mark.parametrize("url", [
+        "https://irs.thsrc.com.tw/IMINT/images/banner.jpg",
+        "https://irs.thsrc.com.tw/IMINT/images/logo.PNG?v=3",
+        "https://irs.thsrc.com.tw/IMINT/fonts/NotoSansTC.woff2",
+        "https://cdn.example.com/video/promo.mp4#t=0",
+        "https://www.google-analytics.com/analytics.js",
+        "https://www.googletagmanager.com/gtag/js?id=G-XXXX",
+        "https://connect.facebook.net/en_US/fbevents.js",
+    ])
+    def test_should_block(self, url):
+        """Test images, fonts, media and tracking URLs are blocked."""
+        assert ResourcePolicy().should_block(url)
+
+    @pytest.mark.parametrize("url", [
+        "https://irs.thsrc.com.tw/IMINT/",
+        "https://irs.thsrc.com.tw/IMINT/css/style.css",
+        "https://irs.thsrc.com.tw/IMINT/js/flatpickr.min.js",
+        "https://irs.thsrc.com.tw/IMINT/?wicket:interface=:0:BookingS1Form:homeCaptcha:passCode::IResourceListener",
+        "https://irs.thsrc.com.tw/IMINT/captcha/code.jpg",
+        "https://example.com/notfacebook.com/page",
+    ])
+    def test_should_not_block(self, url):
+        """Test documents, styles, scripts and the captcha pass through."""
+        assert not ResourcePolicy().should_block(url)
+
+    def test_categories_configurable(self):
+        """Test each category can be switched off."""
+        policy = ResourcePolicy(block_images=False, block_tracking=False)
+
+        assert not policy.should_block("https://irs.thsrc.com.tw/IMINT/images/banner.jpg")
+        assert not policy.should_block("https://www.google-analytics.com/analytics.js")
+        assert policy.should_block("https://irs.thsrc.com.tw/IMINT/fonts/a.woff")
+
+    def test_everything_disabled(self):
+        """Test a policy with nothing to block registers no route."""
+        policy = ResourcePolicy(block_images=False, block_fonts=False,
+                                block_media=False, block_tracking=False)
+        context = Mock()
+
+        policy.install(context)
+
+        assert not policy.should_block("https://example.com/a.png")
+        context.route.assert_not_called()
+
+    def test_install(self):
+        """Test install routes only the policy's URL pattern."""
+        policy = ResourcePolicy()
+        context = Mock()
+
+        policy.install(context)
+
+        context.route.assert_called_once_with(policy.pattern, policy._handle_route)
+
+    def test_handle_route_counts(self):
+        """Test blocked requests are aborted and counted by type and size hint."""
+        policy = ResourcePolicy(size_hints={
+            "https://example.com/a.woff2": 2048,
+            "https://example.com/b.png": 4096,
+            "https://example.com/c.png": 8192,
+        })
+
+        for url, resource_type in [
+            ("https://example.com/a.woff2", "font"),
+            ("https://example.com/b.png", "image"),
+            ("https://example.com/c.png", "image"),
+        ]:
+            route = Mock()
+            route.request.url = url
+            route.request.resource_type = resource_type
+            policy._handle_route(route)
+            route.abort.assert_called_once_with("blockedbyclient")
+
+        assert policy.blocked_requests == 3
+        assert policy.blocked_by_type == {"font": 1, "image": 2}
+        assert policy.bytes_saved == 14336
+        assert policy.summary() == "Resource policy blocked 3 requests (font=1, image=2), ~14 KiB saved"
+
+    def test_bytes_saved_typical_sizes(self):
+        """Test requests without a size hint count the typical size of their type."""
+        policy = ResourcePolicy()
+
+        for url, resource_type in [
+            ("https://example.com/a.woff2", "font"),
+            ("https://www.google-analytics.com/g/collect?v=2", "ping"),
+        ]:
+            route = Mock()
+            route.request.url = url
+            route.request.resource_type = resource_type
+            policy._handle_route(route)
+
+        assert policy.bytes_saved == TYPICAL_BYTES["font"] + TYPICAL_BYTES_OTHER
+        assert policy.summary().endswith("~26 KiB saved")
+
+    def test_handle_route_captcha_fallback(self):
+        """Test a captcha URL that matched the pattern is let through."""
+        policy = ResourcePolicy()
+        route = Mock()
+        route.request.url = "https://irs.thsrc.com.tw/IMINT/captcha/code.jpg"
+
+        policy._handle_route(route)
+
+        route.fallback.assert_called_once()
+        route.abort.assert_not_called()
+        assert policy.blocked_requests == 0
+
+    def test_summary_nothing_blocked(self):
+        """Test summary when nothing was blocked."""
+        assert ResourcePolicy().summary() == "Resource policy blocked no requests"
@@ -0,0 +1,28 @@
+import pytest
+from src.stats import percentile, summarize_ms
+
+
+class TestStats:
+    """Test cases for stats helpers."""
+
+    def test_percentile_empty(self):
+        """Test percentile of no values is 0."""
+        assert percentile([], 50) == 0.0
+
+    def test_percentile_single(self):
+        """Test percentile of one value is that value."""
+        assert percentile([7.0], 95) == 7.0
+
+    def test_percentile_interpolates(self):
+        """Test percentile interpolates between ranks."""
+        values = [4, 1, 3, 2]
+
+        assert percentile(values, 0) == 1
+        assert percentile(values, 50) == 2.5
+        assert percentile(values, 100) == 4
+        assert percentile(values, 95) == pytest.approx(3.85)
+
+    def test_summarize_ms(self):
+        """Test latency summary formatting."""
+        assert summarize_ms([10, 20, 30]) == "p50 20.0 ms / p95 29.0 ms / max 30.0 ms"
+        assert summarize_ms([]) == "p50 0.0 ms / p95 0.0 ms / max 0.0 ms"
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from src import telemetry
+from src.booking import BookingAssistant, Outcome
+from src.telemetry import BookingTelemetry, OtlpJsonFileExporter, otlp_json
+
+
+RESOURCE = SimpleNamespace(attributes={"service.name": "hsr-booking"})
+
+
+def fake_span(name, span_id, parent_id=None, attributes=None, events=()):
+    return SimpleNamespace(
+        name=name,
+        context=SimpleNamespace(trace_id=0xABC, span_id=span_id),
+        parent=SimpleNamespace(span_id=parent_id) if parent_id else None,
+        kind=SimpleNamespace(value=0),
+        start_time=1000,
+        end_time=2500,
+        attributes=attributes or {},
+        events=list(events),
+        status=SimpleNamespace(status_code=SimpleNamespace(value=0), description=None),
+        resource=RESOURCE,
+        instrumentation_scope=SimpleNamespace(name="hsr-booking"),
+    )
+
+
+class TestOtlpJson:
+    """Test cases for the OTLP/JSON encoding of finished spans."""
+
+    def test_encodes_span_tree(self):
+        """Test ids, parents, attribute types and events follow the OTLP/JSON mapping."""
+        event = SimpleNamespace(timestamp=2000, name="navigation", attributes={"ttfb_ms": 42})
+        spans = [
+            fake_span("booking", 1, attributes={"hsr.start_station": "1", "hsr.attempts": 2}),
+            fake_span("submit_form", 2, parent_id=1, attributes={"hsr.result": True}, events=[event]),
+        ]
+
+        request = otlp_json(spans)
+
+        (resource_spans,) = request["resourceSpans"]
+        assert resource_spans["resource"]["attributes"] == [
+            {"key": "service.name", "value": {"stringValue": "hsr-booking"}}
+        ]
+        root, child = resource_spans["scopeSpans"][0]["spans"]
+        assert root["traceId"] == "00000000000000000000000000000abc"
+        assert "parentSpanId" not in root
+        assert child["parentSpanId"] == root["spanId"] == "0000000000000001"
+        assert root["attributes"][1] == {"key": "hsr.attempts", "value": {"intValue": "2"}}
+        assert child["attributes"] == [{"key": "hsr.result", "value": {"boolValue": True}}]
+        assert child["events"][0]["attributes"] == [{"key": "ttfb_ms", "value": {"intValue": "42"}}]
+        assert (child["startTimeUnixNano"], child["endTimeUnixNano"], child["kind"]) == ("1000", "2500", 1)
+
+    def test_file_exporter_appends_lines(self, tmp_path):
+        """Test every exported batch is one JSON line in the file."""
+        pytest.importorskip("opentelemetry.sdk")
+        path = tmp_path / "spans.jsonl"
+        exporter = OtlpJsonFileExporter(str(path))
+
+        exporter.export([fake_span("ocr", 1)])
+        exporter.export([fake_span("submit_form", 2)])
+
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] for line in lines] == [
+            "ocr", "submit_form"
+        ]
+
+    def test_missing_sdk(self, monkeypatch):
+        """Test switching spans on without the SDK names the package to install."""
+        monkeypatch.setattr(telemetry, "trace", None)
+
+        with pytest.raises(ValueError, match="opentelemetry-sdk"):
+            BookingTelemetry("console")
+
+
+class TestBookingTelemetry:
+    """Test cases for the spans recorded around a booking run."""
+
+    @pytest.fixture
+    def exporter(self):
+        pytest.importorskip("opentelemetry.sdk")
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        return InMemorySpanExporter()
+
+    @staticmethod
+    def spans_by_name(exporter) -> dict:
+        spans = {}
+        for span in exporter.get_finished_spans():
+            spans.setdefault(span.name, []).append(span)
+        return spans
+
+    def test_run_trace(self, exporter):
+        """Test a run is one trace: stages, captcha attempts with #feedMSG, steps and the train code."""
+        assistant = BookingAssistant(
+            config={"start_station": "1", "end_station": "12", "travel_time": "1000A"},
+            on_success=Mock(), on_error=Mock(),
+        )
+        assistant.page = Mock()
+        assistant.page.evaluate.return_value = {"url": "https://irs/", "ttfb_ms": 85, "load_ms": None}
+
+        def select_first_train(self):
+            self.selected_train = ("0803", "10:11", "11:56")
+            return True
+
+        with patch.object(BookingAssistant, 'start'), \
+             patch.object(BookingAssistant, 'open_booking_page', return_value=True), \
+             patch.object(BookingAssistant, 'dismiss_cookie_dialog'), \
+             patch.object(BookingAssistant, 'fill_booking_form'), \
+             patch.object(BookingAssistant, 'solve_and_fill_captcha'), \
+             patch.object(BookingAssistant, 'submit_form'), \
+             patch.object(BookingAssistant, 'probe_outcome', side_effect=[
+                 (Outcome.CAPTCHA_ERROR, "檢測碼輸入錯誤"), (Outcome.STEP2, ""), (Outcome.STEP3, ""),
+                 (Outcome.UNKNOWN, ""),
+             ]), \
+             patch.object(BookingAssistant, 'refresh_captcha'), \
+             patch.object(BookingAssistant, 'select_first_train', select_first_train), \
+             patch.object(BookingAssistant, 'confirm_train_selection'), \
+             patch.object(BookingAssistant, 'fill_passenger_info'), \
+             patch.object(BookingAssistant, 'confirm_booking'), \
+             patch.object(BookingAssistant, 'close'):
+            BookingTelemetry("memory", exporter=exporter).instrument(assistant)
+            assistant.run()
+
+        spans = self.spans_by_name(exporter)
+        (root,) = spans["booking"]
+        assert len({span.context.trace_id for span in exporter.get_finished_spans()}) == 1
+        assert root.attributes["hsr.start_station"] == "1"
+        assert root.attributes["hsr.travel_time"] == "1000A"
+        assert root.attributes["hsr.train_code"] == "0803"
+        assert root.attributes["hsr.attempts"] == 2
+
+        first, second = spans["captcha_attempt"]
+        assert (first.attributes["hsr.outcome"], first.attributes["hsr.feed_msg"]) == ("captcha_error", "檢測碼輸入錯誤")
+        assert second.attributes["hsr.outcome"] == "step2"
+        assert first.parent.span_id == root.context.span_id
+
+        submits = spans["stage submit"]
+        assert [span.parent.span_id for span in submits] == [first.context.span_id, second.context.span_id]
+        assert spans["submit_form"][0].parent.span_id == submits[0].context.span_id
+        assert spans["stage prefill"][0].parent.span_id == root.context.span_id
+
+        navigation = spans["open_booking_page"][0].events[0]
+        assert navigation.name == "navigation"
+        assert dict(navigation.attributes) == {"url": "https://irs/", "ttfb_ms": 85}
+        assert spans["select_first_train"][0].attributes["hsr.train_code"] == "0803"
+
+    def test_failure_sets_root_status(self, exporter):
+        """Test a reported failure marks the trace as an error with its error class."""
+        assistant = BookingAssistant(on_error=Mock())
+
+        with patch.object(BookingAssistant, '_run_stage', return_value=False), \
+             patch.object(BookingAssistant, 'close'):
+            BookingTelemetry("memory", exporter=exporter).instrument(assistant)
+            assistant.run()
+
+        (root,) = exporter.get_finished_spans()
+        assert root.status.status_code.name == "ERROR"
+        assert root.attributes["hsr.error_class"] == "page_load"
+
+    def test_async_run_trace(self, exporter):
+        """Test async steps are timed when awaited and OCR in the executor joins the attempt."""
+        from src.async_booking import AsyncBookingAssistant
+
+        assistant = AsyncBookingAssistant(on_error=Mock())
+        assistant.page = Mock()
+        assistant.page.evaluate = AsyncMock(return_value={"ttfb_ms": 12})
+
+        async def submit(self):
+            await asyncio.sleep(0.01)
+            await self.submit_form()
+            await self._in_executor(self._recognize, b"png")
+
+        with patch.object(AsyncBookingAssistant, '_stage_launch', AsyncMock()), \
+             patch.object(AsyncBookingAssistant, '_stage_prefill', AsyncMock(return_value=True)), \
+             patch.object(AsyncBookingAssistant, '_stage_submit', submit), \
+             patch.object(AsyncBookingAssistant, 'submit_form', AsyncMock()), \
+             patch.object(BookingAssistant, '_recognize', return_value=("AB12", None)), \
+             patch.object(AsyncBookingAssistant, 'probe_outcome', AsyncMock(return_value=(Outcome.UNKNOWN, ""))), \
+             patch.object(AsyncBookingAssistant, 'close', AsyncMock()):
+            BookingTelemetry("memory", exporter=exporter).instrument(assistant)
+            asyncio.run(assistant.run())
+
+        spans = self.spans_by_name(exporter)
+        (attempt,) = spans["captcha_attempt"]
+        (stage,) = spans["stage submit"]
+        assert stage.parent.span_id == attempt.context.span_id
+        assert spans["ocr"][0].parent.span_id == attempt.context.span_id
+        assert spans["submit_form"][0].events[0].attributes["ttfb_ms"] == 12
+        assert stage.end_time - stage.start_time >= 10_000_000
+
+    def test_assistant_instruments_when_configured(self):
+        """Test otel_export switches spans on through the shared telemetry."""
+        with patch.object(BookingTelemetry, 'shared') as mock_shared:
+            assistant = BookingAssistant(config={"otel_export": "spans.jsonl"})
+
+        mock_shared.assert_called_once_with("spans.jsonl")
+        mock_shared.return_value.instrument.assert_called_once_with(assistant)